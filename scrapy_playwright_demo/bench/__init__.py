@@ -0,0 +1,6 @@
+# scrapy_playwright_demo/bench/__init__.py
+"""Load-testing helpers: a synthetic catalog site and a crawl throughput harness."""
+
+from .catalog import CatalogConfig, CatalogServer
+
+__all__ = ["CatalogConfig", "CatalogServer"]
@@ -0,0 +1,282 @@
+# scrapy_playwright_demo/bench/catalog.py
+"""
+Synthetic, Zalando-like catalog site for local load tests.
+
+Serves ``/catalog/?p=N`` listing pages with the same markup the spiders
+expect (``article`` cards, ``header h3 span`` titles, ``€`` prices in the
+``1.199,95`` locale, ``a[data-testid='pagination-next']`` links and a
+consent banner). Part of each page's cards are only inserted by JavaScript
+once the page is scrolled, so a crawl that does not scroll will miss them.
+
+Latency and 429/5xx error rates are injected per request, deterministically
+from ``seed`` so two runs of the same matrix see the same traffic.
+
+Run standalone with::
+
+    python -m scrapy_playwright_demo.bench.catalog --port 8000 --pages 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONSENT_COOKIE = "bench_consent=1"
+
+
+@dataclass(frozen=True)
+class CatalogConfig:
+    pages: int = 20
+    cards_per_page: int = 48
+    lazy_cards: int = 12          # cards only inserted after the page is scrolled
+    latency_ms: float = 0.0       # base server-side latency per request
+    latency_jitter_ms: float = 0.0
+    error_429_rate: float = 0.0   # 0..1
+    error_5xx_rate: float = 0.0   # 0..1
+    cookie_banner: bool = True
+    seed: int = 0
+
+
+def _format_eur(cents: int) -> str:
+    """Format cents with the es-ES locale used by PRICE_RE (``1.199,95``)."""
+    units, frac = divmod(cents, 100)
+    return f"{units:,}".replace(",", ".") + f",{frac:02d}"
+
+
+def card_prices(page: int, index: int) -> tuple[int, int | None]:
+    """Deterministic (original, discounted) prices in cents for a card."""
+    original = (20 + (page * 31 + index * 17) % 180) * 100 + 95
+    if index % 3 == 0:
+        return original, original * 7 // 10
+    return original, None
+
+
+def render_card(page: int, index: int) -> str:
+    original, discounted = card_prices(page, index)
+    prices = f"<span>{_format_eur(original)}\xa0€</span>"
+    if discounted is not None:
+        prices = f"<span>{_format_eur(discounted)}\xa0€</span>" + prices
+    return (
+        f"<article><a href='/p/sku-{page}-{index}'>"
+        f"<header><h3><span>Brand {index % 7}</span>"
+        f"<span>Sneaker {page}-{index}</span></h3></header>"
+        f"</a><div class='price'>{prices}</div></article>"
+    )
+
+
+_LAZY_SCRIPT = """
+<script>
+(function () {
+  var pending = %s;
+  function load() {
+    if (!pending.length) { return; }
+    var grid = document.getElementById('grid');
+    grid.insertAdjacentHTML('beforeend', pending.join(''));
+    pending = [];
+  }
+  window.addEventListener('scroll', load, {passive: true});
+  window.addEventListener('wheel', load, {passive: true});
+})();
+</script>
+"""
+
+_BANNER = """
+<div id="uc-banner" style="position:fixed;bottom:0;width:100%%">
+  <button data-testid="uc-accept-all-button"
+          onclick="document.cookie='%s; path=/';
+                   document.getElementById('uc-banner').remove();">Accept</button>
+</div>
+"""
+
+
+def render_listing(config: CatalogConfig, page: int, show_banner: bool) -> str:
+    eager = max(0, config.cards_per_page - config.lazy_cards)
+    cards = [render_card(page, i) for i in range(config.cards_per_page)]
+    nav = f"<span data-testid='pagination-total-pages'>{config.pages}</span>"
+    if page < config.pages:
+        nav += f"<a data-testid='pagination-next' href='?p={page + 1}'>Next</a>"
+    return (
+        "<!doctype html><html><head><meta charset='utf-8'>"
+        f"<title>Catalog page {page}</title></head>"
+        "<body style='min-height:4000px'>"
+        + (_BANNER % CONSENT_COOKIE if show_banner else "")
+        + "<div id='grid'>" + "".join(cards[:eager]) + "</div>"
+        + f"<nav>{nav}</nav>"
+        + _LAZY_SCRIPT % json.dumps(cards[eager:])
+        + "</body></html>"
+    )
+
+
+class _CatalogHandler(BaseHTTPRequestHandler):
+    server: _CatalogHTTPServer
+
+    def do_GET(self) -> None:  # noqa: N802 (http.server naming)
+        srv = self.server
+        srv.inject_latency()
+        status = srv.draw_error()
+        if status is not None:
+            self._send(status, f"<html><body>error {status}</body></html>",
+                       {"Retry-After": "1"} if status == 429 else None)
+            return
+
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path.rstrip("/") == "/catalog":
+            qs = urllib.parse.parse_qs(parsed.query)
+            try:
+                page = int(qs.get("p", ["1"])[0])
+            except ValueError:
+                page = 0
+            if not 1 <= page <= srv.config.pages:
+                self._send(404, "<html><body>not found</body></html>")
+                return
+            consented = CONSENT_COOKIE in (self.headers.get("Cookie") or "")
+            show_banner = srv.config.cookie_banner and not consented
+            self._send(200, render_listing(srv.config, page, show_banner))
+            return
+        if parsed.path.startswith("/p/"):
+            sku = parsed.path[3:]
+            self._send(200, f"<html><body><h1>{sku}</h1></body></html>")
+            return
+        self._send(404, "<html><body>not found</body></html>")
+
+    def _send(self, status: int, body: str, headers: dict[str, str] | None = None) -> None:
+        payload = body.encode("utf-8")
+        # Count before anything reaches the client, so callers can read stats right away
+        self.server.record(status)
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        # Keep benchmark output clean; counts are available via CatalogServer.stats
+        pass
+
+
+class _CatalogHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: CatalogConfig) -> None:
+        super().__init__(address, _CatalogHandler)
+        self.config = config
+        self.stats: Counter[int] = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(config.seed)
+
+    def inject_latency(self) -> None:
+        with self._lock:
+            jitter = self._rng.random() * self.config.latency_jitter_ms
+        delay = (self.config.latency_ms + jitter) / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+    def draw_error(self) -> int | None:
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.config.error_429_rate:
+            return 429
+        if roll < self.config.error_429_rate + self.config.error_5xx_rate:
+            return 503
+        return None
+
+    def record(self, status: int) -> None:
+        with self._lock:
+            self.stats[status] += 1
+
+
+class CatalogServer:
+    """Run the synthetic catalog on a background thread.
+
+    Usage:
+        with CatalogServer(CatalogConfig(pages=5)) as server:
+            url = server.start_url
+    """
+
+    def __init__(self, config: CatalogConfig | None = None, host: str = "127.0.0.1",
+                 port: int = 0) -> None:
+        self.config = config or CatalogConfig()
+        self._httpd = _CatalogHTTPServer((host, port), self.config)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def start_url(self) -> str:
+        return f"{self.base_url}/catalog/?p=1"
+
+    @property
+    def stats(self) -> dict[int, int]:
+        with self._httpd._lock:
+            return dict(self._httpd.stats)
+
+    def start(self) -> str:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+            self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> CatalogServer:
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pages", type=int, default=CatalogConfig.pages)
+    parser.add_argument("--cards", type=int, default=CatalogConfig.cards_per_page)
+    parser.add_argument("--lazy-cards", type=int, default=CatalogConfig.lazy_cards)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-429-rate", type=float, default=0.0)
+    parser.add_argument("--error-5xx-rate", type=float, default=0.0)
+    parser.add_argument("--no-cookie-banner", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = CatalogConfig(
+        pages=args.pages,
+        cards_per_page=args.cards,
+        lazy_cards=args.lazy_cards,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_429_rate=args.error_429_rate,
+        error_5xx_rate=args.error_5xx_rate,
+        cookie_banner=not args.no_cookie_banner,
+        seed=args.seed,
+    )
+    server = CatalogServer(config, host=args.host, port=args.port)
+    print(f"Serving synthetic catalog at {server.start_url}")  # noqa: T201
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
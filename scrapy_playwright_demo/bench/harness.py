@@ -0,0 +1,396 @@
+# scrapy_playwright_demo/bench/harness.py
+"""
+End-to-end crawl throughput harness.
+
+Starts a local :class:`CatalogServer` and crawls it once per point of a
+matrix (spider x browser type x PLAYWRIGHT_MAX_CONTEXTS x pages per context
+x sink). Every run happens in a fresh subprocess, because a Twisted reactor
+cannot be restarted, and reports pages/min, items/sec, p50/p99 render
+latency and peak RSS of the crawler plus its browser processes.
+
+Example::
+
+    python -m scrapy_playwright_demo.bench.harness \\
+        --pages 30 --cards 48 --latency-ms 50 --error-429-rate 0.02 \\
+        --spiders zalando,listing --browsers chromium \\
+        --max-contexts 1,2 --pages-per-context 1,4 --sinks file \\
+        --output bench-report.json
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .catalog import CatalogConfig, CatalogServer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+@dataclass(frozen=True)
+class RunSpec:
+    spider: str                  # "zalando" | "listing"
+    browser: str                 # chromium | firefox | webkit
+    max_contexts: int
+    pages_per_context: int
+    sink: str
+    start_url: str
+    out_dir: str
+    result_path: str
+    log_level: str = "WARNING"
+
+
+@dataclass
+class RunResult:
+    spec: dict[str, Any]
+    pages: int = 0
+    items: int = 0
+    elapsed_s: float = 0.0
+    pages_per_min: float = 0.0
+    items_per_sec: float = 0.0
+    render_p50_ms: float | None = None
+    render_p99_ms: float | None = None
+    peak_rss_mb: float | None = None
+    finish_reason: str | None = None
+    server_statuses: dict[str, int] = field(default_factory=dict)
+    error: str | None = None
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile (``q`` in 0..100); ``None`` for no samples."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, round(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+# --------------------------------------------------------------------------- #
+# Worker side (runs inside the crawl subprocess)
+# --------------------------------------------------------------------------- #
+class _RssSampler:
+    """Track peak RSS of this process and all its children (browser included)."""
+
+    def __init__(self, interval: float = 0.5) -> None:
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.peak_bytes / (1024 * 1024)
+
+    def _sample(self) -> None:
+        if psutil is not None:
+            try:
+                proc = psutil.Process()
+                total = proc.memory_info().rss
+                for child in proc.children(recursive=True):
+                    try:
+                        total += child.memory_info().rss
+                    except psutil.Error:
+                        continue
+            except psutil.Error:
+                return
+        else:
+            import resource
+
+            # ru_maxrss is KiB on Linux; without psutil we only see ourselves
+            total = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        self.peak_bytes = max(self.peak_bytes, total)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+
+def _bench_spider_class(name: str) -> type:
+    from scrapy import Request
+
+    from scrapy_playwright_demo.items import Currency, ProductItem
+    from scrapy_playwright_demo.spiders.base import PlaywrightListingSpider
+    from scrapy_playwright_demo.spiders.zalando import ZalandoSpider
+
+    class RenderTimingMixin:
+        """Collect the ``total`` timing reported by ``rendered_page``."""
+
+        render_seconds: list[float]
+
+        @asynccontextmanager
+        async def rendered_page(self, response):
+            async with super().rendered_page(response) as rendered:
+                timings = rendered[2]
+                yield rendered
+            self.render_seconds.append(timings.get("total", 0.0))
+
+    class BenchZalandoSpider(RenderTimingMixin, ZalandoSpider):
+        name = "bench_zalando"
+
+    class BenchListingSpider(RenderTimingMixin, PlaywrightListingSpider):
+        """Minimal generic listing parser exercising only the base-class helpers."""
+
+        name = "bench_listing"
+
+        async def parse(self, response):
+            async with self.rendered_page(response) as (page, rendered, timings):
+                page_no = self._page_number(rendered.url)
+                for card in rendered.css("article"):
+                    href = card.css("a::attr(href)").get()
+                    if not href:
+                        continue
+                    yield ProductItem(
+                        page=page_no,
+                        title=" ".join(card.css("h3 span::text").getall()),
+                        currency=Currency.EUR,
+                        link=rendered.urljoin(href),
+                    )
+                yield self.emit_page_done(page_no)
+                next_href = self.get_next_page_href(rendered)
+                if next_href:
+                    yield Request(
+                        rendered.urljoin(next_href),
+                        meta={
+                            "playwright": True,
+                            "playwright_context": "persistent",
+                            "playwright_include_page": True,
+                        },
+                        callback=self.parse,
+                        dont_filter=True,
+                    )
+
+    classes = {"zalando": BenchZalandoSpider, "listing": BenchListingSpider}
+    if name not in classes:
+        raise ValueError(f"Unknown bench spider: {name} (expected one of {sorted(classes)})")
+    return classes[name]
+
+
+def run_worker(spec: RunSpec) -> RunResult:
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    from scrapy_playwright_demo.items import PageDone
+
+    settings = get_project_settings()
+    settings.setdict(
+        {
+            "PLAYWRIGHT_BROWSER_TYPE": spec.browser,
+            "PLAYWRIGHT_MAX_CONTEXTS": spec.max_contexts,
+            "PLAYWRIGHT_MAX_PAGES_PER_CONTEXT": spec.pages_per_context,
+            "CONCURRENT_REQUESTS": spec.max_contexts * spec.pages_per_context,
+            "PAGE_SINK": spec.sink,
+            "PAGE_OUT_DIR": spec.out_dir,
+            "JOBDIR": None,
+            "LOG_LEVEL": spec.log_level,
+            "TELNETCONSOLE_ENABLED": False,
+            # Measure the crawler, not the politeness budget
+            "RATELIMIT_HOST_RATE": 0,
+        },
+        priority="cmdline",
+    )
+    spidercls = _bench_spider_class(spec.spider)
+    spidercls.render_seconds = []
+
+    counts = {"pages": 0, "items": 0}
+
+    def _item_scraped(item, response, spider):
+        counts["pages" if isinstance(item, PageDone) else "items"] += 1
+
+    process = CrawlerProcess(settings, install_root_handler=False)
+    crawler = process.create_crawler(spidercls)
+    crawler.signals.connect(_item_scraped, signal=signals.item_scraped)
+
+    sampler = _RssSampler()
+    sampler.start()
+    process.crawl(crawler, start_urls=[spec.start_url])
+    process.start()
+    peak_rss_mb = sampler.stop()
+
+    stats = crawler.stats.get_stats()
+    started, finished = stats.get("start_time"), stats.get("finish_time")
+    elapsed = (finished - started).total_seconds() if started and finished else 0.0
+    render = spidercls.render_seconds
+    p50, p99 = percentile(render, 50), percentile(render, 99)
+    return RunResult(
+        spec=asdict(spec),
+        pages=counts["pages"],
+        items=counts["items"],
+        elapsed_s=round(elapsed, 3),
+        pages_per_min=round(counts["pages"] / elapsed * 60, 2) if elapsed else 0.0,
+        items_per_sec=round(counts["items"] / elapsed, 2) if elapsed else 0.0,
+        render_p50_ms=round(p50 * 1000, 1) if p50 is not None else None,
+        render_p99_ms=round(p99 * 1000, 1) if p99 is not None else None,
+        peak_rss_mb=round(peak_rss_mb, 1),
+        finish_reason=stats.get("finish_reason"),
+    )
+
+
+# --------------------------------------------------------------------------- #
+# Driver side
+# --------------------------------------------------------------------------- #
+def _csv(value: str, cast=str) -> list:
+    return [cast(v.strip()) for v in value.split(",") if v.strip()]
+
+
+def _run_one(spec: RunSpec, timeout: float) -> RunResult:
+    spec_path = Path(spec.result_path).with_suffix(".spec.json")
+    spec_path.write_text(json.dumps(asdict(spec)), encoding="utf-8")
+    env = {
+        **os.environ,
+        "SCRAPY_SETTINGS_MODULE": "scrapy_playwright_demo.settings",
+        # AppSettings (and therefore the DI container's sink) reads the environment
+        "PAGE_SINK": spec.sink,
+        "PAGE_OUT_DIR": spec.out_dir,
+        "PLAYWRIGHT_BROWSER_TYPE": spec.browser,
+        "PLAYWRIGHT_MAX_CONTEXTS": str(spec.max_contexts),
+        "PLAYWRIGHT_MAX_PAGES_PER_CONTEXT": str(spec.pages_per_context),
+    }
+    cmd = [sys.executable, "-m", "scrapy_playwright_demo.bench.harness", "--worker", str(spec_path)]
+    try:
+        proc = subprocess.run(cmd, env=env, timeout=timeout, capture_output=True, text=True)  # noqa: S603
+    except subprocess.TimeoutExpired:
+        return RunResult(spec=asdict(spec), error=f"timeout after {timeout}s")
+    result_path = Path(spec.result_path)
+    if proc.returncode != 0 or not result_path.exists():
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+        return RunResult(spec=asdict(spec), error=" | ".join(tail) or f"exit {proc.returncode}")
+    return RunResult(**json.loads(result_path.read_text(encoding="utf-8")))
+
+
+def run_matrix(args: argparse.Namespace) -> list[RunResult]:
+    catalog = CatalogConfig(
+        pages=args.pages,
+        cards_per_page=args.cards,
+        lazy_cards=args.lazy_cards,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_429_rate=args.error_429_rate,
+        error_5xx_rate=args.error_5xx_rate,
+        seed=args.seed,
+    )
+    matrix = itertools.product(
+        _csv(args.spiders),
+        _csv(args.browsers),
+        _csv(args.max_contexts, int),
+        _csv(args.pages_per_context, int),
+        _csv(args.sinks),
+    )
+    results: list[RunResult] = []
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        for n, (spider, browser, contexts, per_context, sink) in enumerate(matrix):
+            # Fresh server per run: same seed → same latency/error sequence
+            with CatalogServer(catalog) as server:
+                run_dir = Path(tmp) / f"run-{n}"
+                run_dir.mkdir()
+                spec = RunSpec(
+                    spider=spider,
+                    browser=browser,
+                    max_contexts=contexts,
+                    pages_per_context=per_context,
+                    sink=sink,
+                    start_url=server.start_url,
+                    out_dir=str(run_dir / "out"),
+                    result_path=str(run_dir / "result.json"),
+                    log_level=args.log_level,
+                )
+                result = _run_one(spec, args.timeout)
+                result.server_statuses = {str(k): v for k, v in sorted(server.stats.items())}
+            results.append(result)
+            print(_format_row(result), flush=True)  # noqa: T201
+    return results
+
+
+_COLUMNS = (
+    ("spider", 8), ("browser", 9), ("ctx", 4), ("ppc", 4), ("sink", 6),
+    ("pages", 6), ("items", 7), ("pages/min", 10), ("items/s", 8),
+    ("p50 ms", 8), ("p99 ms", 8), ("rss MB", 8),
+)
+
+
+def _format_header() -> str:
+    return " ".join(name.rjust(width) for name, width in _COLUMNS)
+
+
+def _format_row(r: RunResult) -> str:
+    s = r.spec
+    if r.error:
+        head = [s["spider"], s["browser"], s["max_contexts"], s["pages_per_context"], s["sink"]]
+        prefix = " ".join(str(v).rjust(w) for v, (_, w) in zip(head, _COLUMNS, strict=False))
+        return f"{prefix} ERROR: {r.error}"
+    values = [
+        s["spider"], s["browser"], s["max_contexts"], s["pages_per_context"], s["sink"],
+        r.pages, r.items, r.pages_per_min, r.items_per_sec,
+        r.render_p50_ms, r.render_p99_ms, r.peak_rss_mb,
+    ]
+    return " ".join(
+        ("-" if v is None else str(v)).rjust(width)
+        for v, (_, width) in zip(values, _COLUMNS, strict=True)
+    )
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Crawl throughput harness")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    # catalog
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=48)
+    parser.add_argument("--lazy-cards", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-429-rate", type=float, default=0.0)
+    parser.add_argument("--error-5xx-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    # matrix
+    parser.add_argument("--spiders", default="zalando", help="comma list: zalando,listing")
+    parser.add_argument("--browsers", default="chromium", help="comma list")
+    parser.add_argument("--max-contexts", default="1", help="comma list of ints")
+    parser.add_argument("--pages-per-context", default="1", help="comma list of ints")
+    parser.add_argument("--sinks", default="file", help="comma list of PAGE_SINK values")
+    # run
+    parser.add_argument("--timeout", type=float, default=900.0, help="seconds per run")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="write the JSON report here")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    if args.worker:
+        spec = RunSpec(**json.loads(Path(args.worker).read_text(encoding="utf-8")))
+        result = run_worker(spec)
+        Path(spec.result_path).write_text(json.dumps(asdict(result)), encoding="utf-8")
+        return
+
+    print(_format_header(), flush=True)  # noqa: T201
+    started = time.perf_counter()
+    results = run_matrix(args)
+    if args.output:
+        report = {
+            "catalog": {k: v for k, v in vars(args).items() if k not in {"worker", "output"}},
+            "wall_time_s": round(time.perf_counter() - started, 1),
+            "runs": [asdict(r) for r in results],
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# scrapy_playwright_demo/bench/log_overhead.py
+"""
+Per-request logging overhead, as seen by the reactor thread.
+
+Every simulated request does what the downloader middlewares do: fetch the
+spider logger, emit a DEBUG event (disabled at INFO) and an INFO event. The
+modes are:
+
+* ``legacy``: a fresh ``get_logger()`` bind per call, stdlib BoundLogger and
+  synchronous JSON rendering (the previous bootstrap setup);
+* ``sync``: cached loggers plus a level-filtering wrapper, rendered inline;
+* ``async``: the same, with rendering and I/O on the QueueListener thread;
+* ``async+sampled``: async, keeping 10% of the INFO event.
+
+Output goes to ``os.devnull``, so only formatting/dispatch cost is measured::
+
+    python -m scrapy_playwright_demo.bench.log_overhead --requests 20000
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import time
+from typing import Any
+
+import structlog
+from scrapy.settings import Settings
+
+from scrapy_playwright_demo.utils import logging as log_utils
+
+
+class _Spider:
+    name = "bench"
+
+    def __init__(self) -> None:
+        self.crawler = type("Crawler", (), {"settings": Settings({"JOB": "bench-job"})})()
+
+
+def _legacy_get_logger(spider: Any, **extra: Any):
+    bound = {"spider": spider.name}
+    try:
+        bound["job_id"] = spider.crawler.settings.get("JOB")
+    except Exception:
+        pass
+    bound.update({k: v for k, v in extra.items() if v is not None})
+    return structlog.get_logger().bind(**bound)
+
+
+def _configure_legacy(stream) -> None:
+    log_utils.stop_listener()
+    structlog.configure(
+        processors=[
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.stdlib.add_log_level,
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(),
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.StreamHandler(stream))
+    root.setLevel(logging.INFO)
+
+
+def _one_request(get_logger, spider, i: int) -> None:
+    logger = get_logger(spider)
+    logger.debug("using_user_agent", ua="Mozilla/5.0 (X11; Linux x86_64)")
+    logger.info("retrying_response", url=f"https://example.com/catalog/?p={i}", status=503, attempt=1, delay=1.5)
+
+
+def run_mode(mode: str, requests: int) -> dict[str, float]:
+    spider = _Spider()
+    with open(os.devnull, "w") as sink:
+        if mode == "legacy":
+            _configure_legacy(sink)
+            get_logger = _legacy_get_logger
+        else:
+            log_utils.configure_logging(
+                "INFO",
+                async_emission=mode.startswith("async"),
+                sample_rates={"retrying_response": 0.1} if mode.endswith("sampled") else None,
+                stream=sink,
+            )
+            get_logger = log_utils.get_logger
+        for i in range(min(1000, requests)):  # warm caches
+            _one_request(get_logger, spider, i)
+        t0 = time.perf_counter()
+        for i in range(requests):
+            _one_request(get_logger, spider, i)
+        caller = time.perf_counter() - t0
+        log_utils.stop_listener()  # drain: the writes still have to happen somewhere
+        total = time.perf_counter() - t0
+        for handler in list(logging.getLogger().handlers):
+            logging.getLogger().removeHandler(handler)
+    return {"caller_us": caller / requests * 1e6, "total_us": total / requests * 1e6}
+
+
+MODES = ("legacy", "sync", "async", "async+sampled")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<15} {'reactor µs/req':>15} {'incl. drain µs/req':>19}")  # noqa: T201
+    for mode in args.modes:
+        result = run_mode(mode, args.requests)
+        print(f"{mode:<15} {result['caller_us']:>15.1f} {result['total_us']:>19.1f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# scrapy_playwright_demo/bench/money.py
+"""
+Price handling cost per money mode, on synthetic listing pages.
+
+For each ``MONEY_MODE`` (``decimal``, ``minor``) a page of catalog cards
+(see ``bench.catalog``) goes through the same steps as in a crawl:
+
+* ``extract``: ``ZalandoSpider._extract_products`` builds the items;
+* ``validate``: ``ValidateProductPipeline.validate_batch`` over the page;
+* ``serialize``: ``model_dump(mode="json")`` plus ``encode_items``, as the
+  per-page sink pipeline does.
+
+It reports µs per item for each step and the memory the page's items keep
+alive (tracemalloc). It also checks that both modes write the same bytes::
+
+    python -m scrapy_playwright_demo.bench.money --cards 5000 --rounds 5
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+
+from scrapy_playwright_demo.bench.catalog import render_card
+from scrapy_playwright_demo.pipelines import ValidateProductPipeline
+from scrapy_playwright_demo.sinks.base import encode_items
+from scrapy_playwright_demo.spiders.zalando import ZalandoSpider
+
+MODES = ("decimal", "minor")
+
+
+def listing(cards: int) -> HtmlResponse:
+    body = "<html><body><div id='grid'>" + "".join(render_card(1, i) for i in range(cards)) + "</div></body></html>"
+    return HtmlResponse("https://bench.local/catalog/?p=1", body=body.encode("utf-8"), encoding="utf-8")
+
+
+def _spider(mode: str) -> ZalandoSpider:
+    spider = ZalandoSpider()
+    spider.settings = Settings({"MONEY_MODE": mode})
+    return spider
+
+
+def run_mode(mode: str, response: HtmlResponse, rounds: int) -> dict[str, float]:
+    spider = _spider(mode)
+    model = ValidateProductPipeline.from_crawler(type("Crawler", (), {"stats": None, "settings": spider.settings})).model
+    timings = {"extract": 0.0, "validate": 0.0, "serialize": 0.0}
+    items: list = []
+    payload = b""
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        items = list(spider._extract_products(response, 1))
+        t1 = time.perf_counter()
+        ValidateProductPipeline.validate_batch(items, spider, None, model)
+        t2 = time.perf_counter()
+        payload = encode_items(item.model_dump(mode="json") for item in items)
+        t3 = time.perf_counter()
+        timings["extract"] += t1 - t0
+        timings["validate"] += t2 - t1
+        timings["serialize"] += t3 - t2
+    per_item = {step: seconds / rounds / len(items) * 1e6 for step, seconds in timings.items()}
+
+    del items
+    gc.collect()
+    tracemalloc.start()
+    kept = list(spider._extract_products(response, 1))
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # scraped_at differs per run; compare the prices only
+    prices = [(i.model_dump(mode="json")["price_discounted"], i.model_dump(mode="json")["price_original"]) for i in kept]
+    return {**per_item, "bytes_per_item": retained / len(kept), "payload": len(payload), "prices": prices}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cards", type=int, default=5_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    response = listing(args.cards)
+    results = {mode: run_mode(mode, response, args.rounds) for mode in MODES}
+    print(f"{'mode':<8} {'extract µs':>11} {'validate µs':>12} {'serialize µs':>13} {'bytes/item':>11}")  # noqa: T201
+    for mode, r in results.items():
+        print(f"{mode:<8} {r['extract']:>11.1f} {r['validate']:>12.1f} {r['serialize']:>13.1f} "  # noqa: T201
+              f"{r['bytes_per_item']:>11.0f}")
+    same = results["decimal"]["prices"] == results["minor"]["prices"]
+    print(f"identical JSON prices: {same}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
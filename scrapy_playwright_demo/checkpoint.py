@@ -0,0 +1,194 @@
+# scrapy_playwright_demo/checkpoint.py
+"""
+Crash-safe crawl checkpoint.
+
+``JOBDIR`` persists Scrapy's request queue, but not what the per-page pipeline
+has buffered. It also cannot tell which listing pages are already written, so a
+resumed job re-renders them before ``FileSink`` notices. ``Checkpoint`` keeps
+three things in one SQLite file (``<JOBDIR>/checkpoint.sqlite`` by default):
+
+* completed pages: marked by ``PerPageSinkPipeline`` once the sink has the page,
+  and seeded from the sink's own markers (``page-N.done``) when opened;
+* known listing-page requests that are not done yet, so a resume can re-issue
+  them even if the crash hit between scheduling and the queue being persisted;
+* buffered items of in-flight pages, keyed per item, so a re-rendered page
+  replaces them instead of duplicating them.
+
+Buffered items are written in batches, not one autocommit per item: they are
+kept in memory and written in one transaction every ``CHECKPOINT_FLUSH_ITEMS``
+items, with the next ``mark_done`` (a page's ``PageDone``), on ``flush()``
+(the pipeline calls it when the spider is idle or closes) and on ``close()``.
+A crash loses at most the items since the last write; their page is not done,
+so it is rendered again on resume.
+
+``FrontierScheduler`` drops requests for completed pages on enqueue *and* on
+dequeue, before they reach Playwright.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page        TEXT PRIMARY KEY,
+    done        INTEGER NOT NULL DEFAULT 0,
+    request     BLOB,
+    finished_at TEXT,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    page TEXT NOT NULL,
+    key  TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (page, key)
+);
+"""
+
+
+def item_key(item: dict[str, Any]) -> str:
+    """Identity of an item within its page: its link, or a hash of its content."""
+    link = item.get("link")
+    if link:
+        return str(link)
+    return hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode()).hexdigest()  # noqa: S324
+
+
+class Checkpoint:
+    def __init__(self, path: str | Path, flush_items: int = 500) -> None:
+        self.path = str(path)
+        self.flush_items = flush_items
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # NORMAL + WAL: a committed row survives a process crash (not necessarily a power cut)
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._done: set[str] = {row[0] for row in self._db.execute("SELECT page FROM pages WHERE done = 1")}
+        # Item keys per unfinished page (so buffer_item needs no SELECT), and rows not written yet
+        self._keys: dict[str, set[str]] = {}
+        for page, key in self._db.execute("SELECT page, key FROM items"):
+            self._keys.setdefault(page, set()).add(key)
+        self._unwritten: dict[tuple[str, str], str] = {}
+        self.closed = False
+
+    @classmethod
+    def from_settings(cls, settings) -> "Checkpoint | None":
+        """None when disabled, or when there is neither ``CHECKPOINT_PATH`` nor ``JOBDIR``."""
+        if not _setting(settings, "CHECKPOINT_ENABLED", True):
+            return None
+        path = _setting(settings, "CHECKPOINT_PATH", None)
+        if not path:
+            jobdir = _setting(settings, "JOBDIR", None)
+            if not jobdir:
+                return None
+            path = Path(jobdir) / "checkpoint.sqlite"
+        return cls(path, flush_items=int(_setting(settings, "CHECKPOINT_FLUSH_ITEMS", 500)))
+
+    # Completed pages ---------------------------------------------------------
+
+    def is_done(self, page: str) -> bool:
+        return page in self._done  # cached: checked for every listing request
+
+    def mark_done(self, pages: Iterable[str], finished_at: str | None = None) -> int:
+        """Mark pages complete and forget their buffered items; returns how many were new."""
+        new = [p for p in dict.fromkeys(map(str, pages)) if p not in self._done]
+        if not new:
+            return 0
+        now = time.time()
+        for key in [k for k in self._unwritten if k[0] in new]:
+            del self._unwritten[key]  # the sink has them: no need to write them at all
+        with self._db:
+            self._db.execute("BEGIN")
+            self._write_items()  # everything else buffered so far, in the same transaction
+            self._db.executemany(
+                "INSERT INTO pages (page, done, finished_at, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(page) DO UPDATE SET done = 1, request = NULL, "
+                "finished_at = excluded.finished_at, updated_at = excluded.updated_at",
+                [(page, finished_at, now) for page in new],
+            )
+            self._db.executemany("DELETE FROM items WHERE page = ?", [(page,) for page in new])
+        self._done.update(new)
+        for page in new:
+            self._keys.pop(page, None)
+        return len(new)
+
+    @property
+    def done_pages(self) -> set[str]:
+        return set(self._done)
+
+    # Pending listing requests ------------------------------------------------
+
+    def remember_request(self, page: str, payload: bytes) -> None:
+        """Record the request for a page that is not done yet (first one wins)."""
+        self._db.execute(
+            "INSERT INTO pages (page, request, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(page) DO UPDATE SET request = COALESCE(pages.request, excluded.request) "
+            "WHERE pages.done = 0",
+            (str(page), payload, time.time()),
+        )
+
+    def pending_requests(self) -> list[bytes]:
+        rows = self._db.execute(
+            "SELECT request FROM pages WHERE done = 0 AND request IS NOT NULL ORDER BY CAST(page AS INTEGER), page"
+        )
+        return [row[0] for row in rows]
+
+    # Partial page buffers ----------------------------------------------------
+
+    def buffer_item(self, page: str, item: dict[str, Any]) -> bool:
+        """Buffer one item for writing; False if the page already had it (a re-render)."""
+        page, key = str(page), item_key(item)
+        keys = self._keys.setdefault(page, set())
+        seen = key in keys
+        keys.add(key)
+        self._unwritten[(page, key)] = json.dumps(item, default=str)  # a re-render replaces it
+        if len(self._unwritten) >= self.flush_items:
+            self.flush()
+        return not seen
+
+    def flush(self) -> int:
+        """Write the buffered items in one transaction; returns how many."""
+        if not self._unwritten:
+            return 0
+        with self._db:
+            self._db.execute("BEGIN")
+            return self._write_items()
+
+    def _write_items(self) -> int:
+        rows = [(page, key, data) for (page, key), data in self._unwritten.items()]
+        self._db.executemany("INSERT OR REPLACE INTO items (page, key, data) VALUES (?, ?, ?)", rows)
+        self._unwritten.clear()
+        return len(rows)
+
+    def restore_buffers(self) -> dict[str, list[dict[str, Any]]]:
+        self.flush()
+        buffers: dict[str, list[dict[str, Any]]] = {}
+        for page, data in self._db.execute("SELECT page, data FROM items ORDER BY page, rowid"):
+            buffers.setdefault(page, []).append(json.loads(data))
+        return buffers
+
+    def close(self) -> None:
+        """Write what is buffered and close; the last connection out also checkpoints the WAL."""
+        if self.closed:
+            return
+        self.flush()
+        self._db.close()
+        self.closed = True
+
+
+def _setting(settings, key: str, default):
+    if hasattr(settings, "getbool") and isinstance(default, bool):
+        return settings.getbool(key, default)
+    if hasattr(settings, "get"):
+        return settings.get(key, default)
+    return getattr(settings, key.lower(), default)
@@ -0,0 +1,112 @@
+# scrapy_playwright_demo/concurrency.py
+"""
+AIMD controller for the number of concurrent browser renders.
+
+The controller is fed one ``LoadSample`` per tick (rolling render latency,
+error/timeout and 429 rates, host CPU and memory headroom) and answers with a
+``Decision``:
+
+* any overload signal → multiplicative decrease (``limit * decrease_factor``),
+  followed by a cool-down so the next tick does not react to the same window;
+* healthy and the current limit actually used → additive increase;
+* otherwise hold.
+
+It knows nothing about Scrapy; ``middlewares.concurrency`` collects the samples
+and applies the limit to the downloader.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Literal
+
+Action = Literal["increase", "decrease", "hold"]
+
+
+@dataclass(frozen=True)
+class ControllerConfig:
+    min_limit: int = 1
+    max_limit: int = 8
+    increase_step: float = 1.0
+    decrease_factor: float = 0.7
+    target_latency_s: float = 30.0     # navigation p90 + render p90
+    max_error_rate: float = 0.10       # errors + timeouts / requests
+    max_throttle_rate: float = 0.05    # 429 / requests
+    max_cpu_percent: float = 85.0      # host-wide
+    min_memory_percent: float = 10.0   # host memory still available
+    min_samples: int = 5               # requests per window before rates count
+    cooldown_s: float = 30.0           # hold after a decrease
+
+
+@dataclass(frozen=True)
+class LoadSample:
+    requests: int = 0
+    latency_s: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    cpu_percent: float | None = None
+    memory_available_percent: float | None = None
+    peak_inflight: int = 0
+
+
+@dataclass(frozen=True)
+class Decision:
+    action: Action
+    reason: str
+    previous: int
+    limit: int
+
+    @property
+    def changed(self) -> bool:
+        return self.previous != self.limit
+
+
+class AimdController:
+    def __init__(self, config: ControllerConfig, initial: int | None = None) -> None:
+        if config.min_limit < 1 or config.max_limit < config.min_limit:
+            raise ValueError(f"Invalid concurrency bounds: {config.min_limit}..{config.max_limit}")
+        self.config = config
+        start = config.max_limit if initial is None else initial
+        self._limit = float(min(max(start, config.min_limit), config.max_limit))
+        self._hold_until = -math.inf
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def overload_reason(self, sample: LoadSample) -> str | None:
+        cfg = self.config
+        if sample.cpu_percent is not None and sample.cpu_percent >= cfg.max_cpu_percent:
+            return "cpu"
+        if (sample.memory_available_percent is not None
+                and sample.memory_available_percent <= cfg.min_memory_percent):
+            return "memory"
+        if sample.requests < cfg.min_samples:
+            return None
+        if sample.throttle_rate > cfg.max_throttle_rate:
+            return "throttled"
+        if sample.error_rate > cfg.max_error_rate:
+            return "errors"
+        if sample.latency_s > cfg.target_latency_s:
+            return "latency"
+        return None
+
+    def decide(self, sample: LoadSample, now: float) -> Decision:
+        cfg = self.config
+        previous = self.limit
+        reason = self.overload_reason(sample)
+        if reason is not None:
+            if now < self._hold_until:
+                return Decision("hold", "cooldown", previous, previous)
+            self._limit = max(float(cfg.min_limit), self._limit * cfg.decrease_factor)
+            self._hold_until = now + cfg.cooldown_s
+            return Decision("decrease", reason, previous, self.limit)
+        if sample.requests < cfg.min_samples:
+            return Decision("hold", "no_traffic", previous, previous)
+        if sample.peak_inflight < previous:
+            # Growing a limit that is not reached only hides a later overload
+            return Decision("hold", "underused", previous, previous)
+        if previous >= cfg.max_limit:
+            return Decision("hold", "at_max", previous, previous)
+        self._limit = min(float(cfg.max_limit), self._limit + cfg.increase_step)
+        return Decision("increase", "healthy", previous, self.limit)
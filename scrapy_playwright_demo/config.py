@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import List, Literal, Optional
+from functools import lru_cache
+from typing import Dict, List, Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl, Field
 from pathlib import Path
@@ -10,6 +11,8 @@ class AppSettings(BaseSettings):
     bot_name: str = "scrapy_playwright_demo"
     spider_modules: List[str] = ["scrapy_playwright_demo.spiders"]
     log_level: str = "INFO"
+    log_async_emission: bool = True            # render + write logs on a QueueListener thread
+    log_sample_rates: Dict[str, float] = {}    # event name -> share of debug/info events kept
     jobdir: str = "/data/state/zalando"
 
     # ---- Playwright ----
@@ -18,8 +21,55 @@ class AppSettings(BaseSettings):
     playwright_default_navigation_timeout_ms: int = 45_000
     playwright_max_contexts: int = 2
     playwright_max_pages_per_context: int = 4
+    playwright_cdp_url: Optional[str] = None   # connect to a running Chromium (browser server) instead of launching one
     autoplay_scroll_loops: int = 5
 
+    # ---- Browser supervision / context recycling (0 disables a threshold) ----
+    browser_supervisor_enabled: bool = True
+    browser_sample_interval_s: float = 15.0
+    context_max_rss_mb: float = 0.0        # RSS of the whole browser process tree
+    context_max_js_heap_mb: float = 512.0  # per context, Chromium only
+    context_max_age_s: float = 1800.0
+    context_max_pages: int = 500
+
+    # ---- Memory diagnostics (tracemalloc reports; ceiling 0 disables) ----
+    memory_diagnostics_enabled: bool = False
+    memory_diagnostics_signal: Optional[str] = "SIGUSR2"  # 1st: start tracing, then: dump a report
+    memory_snapshot_every_pages: int = 50
+    memory_top_n: int = 15
+    memory_report_dir: Optional[str] = None     # default: <page_out_dir>/_memory
+    memory_ceiling_mb: float = 0.0              # process RSS
+    memory_ceiling_action: Literal["recycle", "pause", "close"] = "pause"
+    memory_resume_ratio: float = 0.85           # "pause" resumes under ceiling * ratio
+    memory_pause_max_s: float = 300.0           # "pause" escalates to "close" after this (0 = wait forever)
+    memory_check_interval_s: float = 10.0
+
+    # ---- Adaptive render concurrency (AIMD; max 0 = contexts * pages per context) ----
+    adaptive_concurrency_enabled: bool = False
+    adaptive_concurrency_start: int = 0   # 0 = CONCURRENT_REQUESTS_PER_DOMAIN
+    adaptive_concurrency_min: int = 1
+    adaptive_concurrency_max: int = 0
+    adaptive_concurrency_interval_s: float = 10.0
+    adaptive_concurrency_window_s: float = 30.0
+    adaptive_concurrency_target_latency_s: float = 30.0
+    adaptive_concurrency_max_error_rate: float = 0.10
+    adaptive_concurrency_max_throttle_rate: float = 0.05
+    adaptive_concurrency_max_cpu_percent: float = 85.0
+    adaptive_concurrency_min_memory_percent: float = 10.0
+
+    # ---- Rate limiting / circuit breakers (rate 0 = unlimited) ----
+    ratelimit_enabled: bool = True       # circuit breakers always; buckets only with a rate
+    ratelimit_host_rate: float = 0.0     # requests/s per host (e.g. 2 for a site that needs a hard cap)
+    ratelimit_host_burst: float = 4.0
+    ratelimit_proxy_rate: float = 0.0    # requests/s per proxy
+    ratelimit_proxy_burst: float = 2.0
+    circuit_failure_rate: float = 0.5    # 429/5xx/errors share that opens the circuit
+    circuit_min_requests: int = 10
+    circuit_window_s: float = 60.0
+    circuit_open_s: float = 30.0         # doubled after every failed half-open probe
+    circuit_max_open_s: float = 300.0
+    circuit_half_open_probes: int = 1
+
     # ---- Throttling / retries ----
     autothrottle_enabled: bool = True
     autothrottle_target_concurrency: float = 2.0
@@ -29,20 +79,87 @@ class AppSettings(BaseSettings):
     retry_jitter: float = 0.3
     retry_http_codes: list[int] = [429, 500, 502, 503, 504]
     retry_exceptions: tuple = (Exception,)
+    retry_throttled_backoff_factor: float = 2.0   # 429s back off longer than other transient errors
+    retry_budget_ratio: float = 0.2               # max retries / requests per host and window (0 = off)
+    retry_budget_window_s: float = 60.0
+    retry_budget_min_retries: int = 10
+    retry_budget_action: Literal["defer", "drop"] = "defer"
 
     # ---- UA / Proxies ----
     rotating_ua_list: List[str] = [
         "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
     ]
-    proxy_list: List[str] = []  # optional
+    proxy_list: List[str] = []  # optional; one Playwright context per proxy
+    proxy_ban_codes: List[int] = [403, 407]   # statuses that quarantine a proxy right away
+    proxy_failure_threshold: float = 0.5      # failure share over the window that quarantines
+    proxy_min_samples: int = 5
+    proxy_window_s: float = 300.0
+    proxy_quarantine_base_s: float = 60.0     # doubled on every consecutive quarantine
+    proxy_quarantine_max_s: float = 1800.0
+
+    # ---- Shared crawl frontier (multi-node page partitioning) ----
+    frontier_enabled: bool = False
+    frontier_backend: str = "sqlite"            # or dotted path to a FrontierBackend
+    frontier_path: str = "/data/state/frontier.sqlite"
+    frontier_sqlite_journal_mode: str = "WAL"   # "DELETE" on network filesystems
+    frontier_node_id: Optional[str] = None      # default: <hostname>-<pid>
+    frontier_lease_s: float = 300.0
+    frontier_heartbeat_s: float = 30.0
+    frontier_claim_size: int = 4                # pages claimed at once (a contiguous range)
+    frontier_max_leases: int = 8
+    frontier_max_attempts: int = 3
+    frontier_poll_s: float = 2.0                # wait between empty claims
+
+    # ---- Sitemap discovery (-a discovery=sitemap instead of listing traversal) ----
+    sitemap_urls: List[str] = []                  # sitemap / index / robots.txt URLs; default: <start origin>/robots.txt
+    sitemap_category_patterns: List[str] = [r"^https?://[^/]+/[a-z0-9-]+/$"]
+    sitemap_product_patterns: List[str] = [r"\.html$"]
+    sitemap_since: Optional[str] = None           # "last" (last finished run) or an ISO date
+    sitemap_state_path: str = "/data/state/sitemap-{spider}.json"
+    sitemap_batch_size: int = 500                 # URLs handed to the spider at a time
+
+    # ---- Product-detail enrichment (ProductDetailSpider: plain HTTP, Playwright fallback) ----
+    detail_input: str = "/data/products"          # listing run output (page-N.jl[.gz] + .done)
+    detail_out_dir: str = "/data/product_details"
+    detail_jobdir: str = "/data/state/product_detail"  # checkpoint of the detail crawl (not the listing JOBDIR)
+    detail_concurrency: int = 64
+    detail_concurrency_per_host: int = 16
+    detail_host_rate: float = 20.0                # requests/s per host (RateLimitMiddleware)
+    detail_host_burst: float = 40.0
+    detail_playwright_fallback: bool = True
+    detail_fallback_max_pages: int = 2            # browser pages for the fallback (one context)
+
+    # ---- Site profiles (SiteListingSpider: `scrapy crawl sites -a site=<name>`) ----
+    site_profile: Optional[str] = None          # default profile when -a site is not given
+    site_profiles_dir: Optional[str] = None     # extra *.toml profiles, on top of the built-in ones
+
+    # ---- Spider fleet (several spiders in one process on one shared browser) ----
+    fleet_context_budget: int = 0               # contexts split across the fleet's spiders (0 = PLAYWRIGHT_MAX_CONTEXTS each)
+    fleet_page_budget: int = 0                  # concurrent pages across all spiders (0 = contexts * pages per context)
+    browser_server_executable: Optional[str] = None  # Chromium for the browser server (default: Playwright's)
+
+    # ---- Crash-safe checkpoint (completed pages + partial page buffers) ----
+    checkpoint_enabled: bool = True
+    checkpoint_path: Optional[str] = None       # default: <jobdir>/checkpoint.sqlite (off without a jobdir)
+    checkpoint_flush_items: int = 500           # buffered items written per transaction (also on PageDone/idle)
 
     # ---- Pipelines / per-page sink ----
-    page_sink: Literal["file", "kafka", "s3"] = "file"
+    page_sink: str = "file"                     # file | kafka | s3, or a comma list to fan out: "file,s3"
+    page_sink_policies: dict[str, Literal["fatal", "log"]] = {}  # per fan-out child; default fatal
+    page_sink_queue_size: int = 8               # pages queued per fan-out child
+    page_sink_close_timeout_s: float = 60.0
+    page_spool_dir: Optional[str] = None        # write-ahead spool for remote sinks; None = write directly
+    page_spool_sinks: list[str] = ["kafka", "s3"]
+    page_spool_segment_mb: float = 64.0
+    page_spool_fsync: bool = True
+    page_spool_drain_timeout_s: float = 30.0    # at close; undelivered pages wait for the next run
     page_out_dir: str = "/data/products"
     page_compress: bool = True
     page_idempotent: bool = True
     page_drop_missing_field: bool = True
+    validate_batch_size: int = 500              # items validated per call, up to PageDone; 0 = one by one
+    money_mode: Literal["decimal", "minor"] = "decimal"  # minor = prices as int cents (same JSON output)
 
     # Kafka
     page_kafka_topic: str = "scrapy_pages"
@@ -51,9 +168,20 @@ class AppSettings(BaseSettings):
     # S3
     page_s3_template: str = "s3://bucket/prefix/page-{page}.jl.gz"
 
+    # ---- Price history (columnar store of each finished run; needs numpy) ----
+    price_history_dir: Optional[str] = None     # None = off
+
     # Observability toggles (disabled by default here)
     sentry_dsn: Optional[str] = None
     prometheus_enabled: bool = False
+    prometheus_port: Optional[int] = None  # metrics endpoint, started when the first spider opens
+    instrumentation_enabled: bool = True  # per-stage latency histograms + stats summaries
+    profiling_enabled: bool = False       # /debug/profile on the metrics port (needs prometheus_port)
+    profiling_max_seconds: float = 60.0
+    profiling_continuous_hz: float = 0.0  # low-rate sampling exported as profile_frame_share; 0 = off
+    profiling_export_interval_s: float = 60.0
+    profiling_top_n: int = 20
+    profiling_output_dir: Optional[str] = None  # whole-run collapsed stacks written at close
 
     model_config = SettingsConfigDict(
         env_file=(".env", ".env.local"),
@@ -65,5 +193,26 @@ class AppSettings(BaseSettings):
         if not self.rotating_ua_list:
             raise ValueError("ROTATING_UA_LIST must not be empty")
 
-# Global singleton
-app_settings = AppSettings() 
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_app_settings() -> AppSettings:
+    """
+    Process-wide AppSettings, resolved on first use.
+
+    ``.env`` is also loaded into ``os.environ`` here (for libraries that read
+    the environment directly), so importing this module parses nothing.
+    """
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        pass
+    else:
+        load_dotenv()
+    return AppSettings()
+
+
+def __getattr__(name: str):
+    # `from scrapy_playwright_demo.config import app_settings` keeps working,
+    # but only resolves the settings when something actually imports them.
+    if name == "app_settings":
+        return get_app_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,20 +3,25 @@ Container for dependency injection in scrapy_playwright_demo.
 
 Lifecycles:
 - retry_policy: Singleton per process (memoized)
-- page_sink: Singleton per process (memoized)
+- retry_budget: Singleton per process (memoized, shared by every retry path)
+- page_sink: Singleton per crawler settings (memoized; built from those settings, so each
+  crawler's PAGE_OUT_DIR / PAGE_SINK apply)
+- checkpoint: Singleton per crawler settings (memoized, shared by the scheduler and the sink pipeline)
 - logger: Per spider (stateless factory, new instance per call)
 
 Usage:
     container = Container(app_settings, crawler_settings)
     retry_policy = container.retry_policy()
-    page_sink = container.page_sink()
+    page_sink = container.page_sink(crawler.settings)
     logger = container.logger(spider=spider)
 """
+from dataclasses import dataclass
 from typing import Callable, Any, Optional, Protocol
 from uuid import uuid4
 import structlog
+from scrapy_playwright_demo.checkpoint import Checkpoint
 from scrapy_playwright_demo.config import AppSettings
-from scrapy_playwright_demo.retry import build_retry_policy, RetryPolicy
+from scrapy_playwright_demo.retry import build_retry_budget, build_retry_policy, RetryBudget, RetryPolicy
 from scrapy_playwright_demo.sinks.base import PageSink
 from scrapy_playwright_demo.utils.logging import get_logger
 
@@ -26,6 +31,14 @@ class PageSinkProto(Protocol):
     def write_page(self, page_number: int, items: list[dict]) -> None: ...
     def close(self) -> None: ...
 
+@dataclass
+class _Scope:
+    """The sink and checkpoint built for one settings object (one crawler)."""
+    settings: Any
+    page_sink: Any = None
+    checkpoint: Optional[Checkpoint] = None
+    checkpoint_built: bool = False
+
 class Container:
     def __init__(
         self,
@@ -35,8 +48,11 @@ class Container:
     ):
         self.app_settings = app_settings
         self.crawler_settings = crawler_settings
-        self._page_sink = None
         self._retry_policy = None
+        self._retry_budget = None
+        self._retry_budget_built = False
+        self._scopes: dict[int, _Scope] = {}
+        self._default_scope: Optional[_Scope] = None
         self._sink_factory = sink_factory
 
     def retry_policy(self) -> RetryPolicy:
@@ -47,16 +63,54 @@ class Container:
                 self._retry_policy = build_retry_policy(self.app_settings)
         return self._retry_policy
 
-    def page_sink(self):
-        if self._page_sink is None:
+    def retry_budget(self) -> Optional[RetryBudget]:
+        if not self._retry_budget_built:
+            self._retry_budget = build_retry_budget(self.retry_policy())
+            self._retry_budget_built = True
+        return self._retry_budget
+
+    def _scope(self, settings=None) -> _Scope:
+        """
+        Per-settings state. The project CONTAINER is reachable from every crawler of a
+        process, so a sink built from AppSettings alone would give them all the same
+        PAGE_OUT_DIR; each crawler passes its own settings instead. Without settings,
+        the first scope built (or crawler_settings / app_settings) is used.
+        """
+        if settings is None:
+            if self._default_scope is not None:
+                return self._default_scope
+            settings = self.crawler_settings if self.crawler_settings is not None else self.app_settings
+        scope = self._scopes.get(id(settings))
+        if scope is None:
+            # The scope keeps a reference to its settings, so the id stays unique
+            scope = self._scopes[id(settings)] = _Scope(settings)
+            if self._default_scope is None:
+                self._default_scope = scope
+        return scope
+
+    def page_sink(self, settings=None):
+        scope = self._scope(settings)
+        if scope.page_sink is None:
             if self._sink_factory is None:
                 # Import at runtime for monkeypatch compatibility
                 from scrapy_playwright_demo.sinks import registry
                 factory = registry.build_sink
             else:
                 factory = self._sink_factory
-            self._page_sink = factory(self.app_settings)
-        return self._page_sink
+            scope.page_sink = factory(scope.settings)
+        return scope.page_sink
+
+    def checkpoint(self, settings=None) -> Optional[Checkpoint]:
+        """Crawl checkpoint (None without JOBDIR/CHECKPOINT_PATH), seeded with the sink's finished pages."""
+        scope = self._scope(settings)
+        if not scope.checkpoint_built:
+            scope.checkpoint = Checkpoint.from_settings(scope.settings)
+            if scope.checkpoint is not None:
+                completed = getattr(self.page_sink(scope.settings), "completed_pages", None)
+                if completed is not None:
+                    scope.checkpoint.mark_done(completed(scope.settings))
+            scope.checkpoint_built = True
+        return scope.checkpoint
 
     def logger(self, spider=None, **extra):
         # Always return a fresh BoundLogger instance
@@ -0,0 +1,2 @@
+# scrapy_playwright_demo/extensions/__init__.py
+"""Scrapy extensions (enabled through the EXTENSIONS setting)."""
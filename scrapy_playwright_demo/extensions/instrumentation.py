@@ -0,0 +1,76 @@
+# scrapy_playwright_demo/extensions/instrumentation.py
+from __future__ import annotations
+
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from scrapy_playwright_demo import instrumentation
+
+# Request.meta keys used to carry timestamps between signals
+META_SCHEDULED_AT = "_instr_scheduled_at"
+META_DOWNLOAD_STARTED_AT = "_instr_download_started_at"
+
+
+class StageLatencyExtension:
+    """
+    Measures the scheduler/downloader stages and publishes per-stage
+    percentile summaries into Scrapy stats when the spider closes::
+
+        latency/<stage>/count, latency/<stage>/p50_ms, .../p90_ms, .../p99_ms, .../max_ms
+
+    The spider's samples are reset when it opens, so a spider run twice in one
+    process reports each run on its own. Observations made outside any spider
+    scope (e.g. in sink threads) are process-wide: they are published apart,
+    as ``latency/unscoped/<stage>/...``, instead of inside every crawler's stages.
+
+    Render, extraction, pipeline and sink stages are observed where they
+    happen (see ``scrapy_playwright_demo.instrumentation``).
+    """
+
+    def __init__(self, stats) -> None:
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("INSTRUMENTATION_ENABLED", True):
+            raise NotConfigured("INSTRUMENTATION_ENABLED is off")
+        ext = cls(crawler.stats)
+        crawler.signals.connect(ext.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(ext.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(ext.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        instrumentation.recorder.reset(spider.name)
+
+    def request_scheduled(self, request, spider):
+        request.meta[META_SCHEDULED_AT] = time.perf_counter()
+
+    def request_reached_downloader(self, request, spider):
+        now = time.perf_counter()
+        scheduled_at = request.meta.pop(META_SCHEDULED_AT, None)
+        if scheduled_at is not None:
+            instrumentation.observe("queue_wait", now - scheduled_at, spider.name)
+        request.meta[META_DOWNLOAD_STARTED_AT] = now
+
+    def response_downloaded(self, response, request, spider):
+        started_at = request.meta.pop(META_DOWNLOAD_STARTED_AT, None)
+        if started_at is not None:
+            instrumentation.observe("navigation", time.perf_counter() - started_at, spider.name)
+
+    def spider_closed(self, spider, reason):
+        self._publish("latency", instrumentation.recorder.summary(spider.name), spider)
+        self._publish("latency/unscoped", instrumentation.recorder.summary(), spider)
+
+    def _publish(self, base: str, summaries: dict[str, dict[str, float]], spider) -> None:
+        for stage, summary in summaries.items():
+            prefix = f"{base}/{stage}"
+            self.stats.set_value(f"{prefix}/count", summary["count"], spider=spider)
+            for key in ("mean", "p50", "p90", "p99", "max"):
+                self.stats.set_value(
+                    f"{prefix}/{key}_ms", round(summary[key] * 1000, 3), spider=spider
+                )
@@ -0,0 +1,376 @@
+# scrapy_playwright_demo/extensions/memory.py
+"""
+Memory diagnostics for long crawls.
+
+``MemoryDiagnosticsExtension`` attributes the Python side's memory growth.
+It traces allocations with ``tracemalloc`` (``MEMORY_DIAGNOSTICS_ENABLED``,
+or on demand with ``MEMORY_DIAGNOSTICS_SIGNAL``). Every
+``MEMORY_SNAPSHOT_EVERY_PAGES`` finished pages it takes a snapshot and
+writes a JSON report to ``MEMORY_REPORT_DIR``. Each report holds:
+
+* the top allocation sites, diffed against the previous snapshot;
+* live object counts for ``MEMORY_TRACK_TYPES`` (ProductItem, responses,
+  Playwright pages...);
+* the usual suspects: items buffered by the per-page pipeline, and the
+  series count of each Prometheus metric.
+
+The first signal starts tracing; every later one dumps a report right away.
+
+``MEMORY_CEILING_MB`` watches the process RSS. Once crossed, it writes a
+report, collects garbage, recycles the browser contexts (see
+``BrowserSupervisorMiddleware``) and, depending on ``MEMORY_CEILING_ACTION``:
+
+* ``recycle``: nothing more;
+* ``pause``: pauses the engine until RSS is back under
+  ``MEMORY_RESUME_RATIO`` of the ceiling (in-flight pages still finish).
+  CPython seldom hands freed memory back to the OS, and recycled browser
+  memory is not in this process's RSS, so a pause lasts at most
+  ``MEMORY_PAUSE_MAX_S``; then it escalates to ``close``;
+* ``close``: closes the spider with reason ``memory_ceiling`` (resume from
+  the checkpoint).
+"""
+from __future__ import annotations
+
+import gc
+import json
+import logging
+import os
+import signal
+import time
+import tracemalloc
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.misc import load_object
+from twisted.internet import reactor, task
+
+from scrapy_playwright_demo.items import PageDone
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from prometheus_client import REGISTRY
+except ImportError:
+    REGISTRY = None
+
+logger = logging.getLogger(__name__)
+
+CEILING_ACTIONS = ("recycle", "pause", "close")
+DEFAULT_TRACK_TYPES = (
+    "scrapy_playwright_demo.items.ProductItem",
+    "scrapy.http.Response",
+    "scrapy.Request",
+    "playwright.async_api.Page",
+)
+
+_MB = 1024 * 1024
+
+
+def process_rss_mb() -> float | None:
+    """Resident set size of this process, or None if it cannot be read."""
+    if psutil is not None:
+        try:
+            return psutil.Process().memory_info().rss / _MB
+        except psutil.Error:
+            return None
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / _MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def load_types(paths) -> dict[str, type]:
+    """``{class name: class}`` for the importable ``paths`` (optional deps are skipped)."""
+    types: dict[str, type] = {}
+    for path in paths:
+        try:
+            cls = load_object(path)
+        except (ImportError, AttributeError, NameError, ValueError):
+            continue
+        types[cls.__name__] = cls
+    return types
+
+
+def count_objects(types: dict[str, type]) -> dict[str, int]:
+    """Live instances (subclasses included) of each type, in one pass over the GC."""
+    counts = dict.fromkeys(types, 0)
+    if not types:
+        return counts
+    classes = tuple(types.values())
+    names = list(types)
+    for obj in gc.get_objects():
+        if isinstance(obj, classes):
+            for name in names:
+                if isinstance(obj, types[name]):
+                    counts[name] += 1
+    return counts
+
+
+def top_sites(current: tracemalloc.Snapshot, previous: tracemalloc.Snapshot | None, limit: int) -> list[dict]:
+    """Largest allocation sites by line, with their growth since ``previous``."""
+    if previous is None:
+        stats = [(s.traceback, s.size, s.size, s.count, s.count) for s in current.statistics("lineno")]
+    else:
+        stats = [
+            (s.traceback, s.size, s.size_diff, s.count, s.count_diff)
+            for s in current.compare_to(previous, "lineno")
+        ]
+    stats.sort(key=lambda s: abs(s[2]), reverse=True)
+    return [
+        {
+            "site": f"{tb[0].filename}:{tb[0].lineno}",
+            "size_kb": round(size / 1024, 1),
+            "size_diff_kb": round(size_diff / 1024, 1),
+            "count": count,
+            "count_diff": count_diff,
+        }
+        for tb, size, size_diff, count, count_diff in stats[:limit]
+    ]
+
+
+class MemoryDiagnosticsExtension:
+    def __init__(
+        self,
+        crawler,
+        *,
+        trace: bool = False,
+        every_pages: int = 50,
+        top_n: int = 15,
+        frames: int = 1,
+        report_dir: str | Path = "memory",
+        ceiling_mb: float = 0.0,
+        action: str = "pause",
+        resume_ratio: float = 0.85,
+        max_pause_s: float = 300.0,
+        interval: float = 10.0,
+        track_types=DEFAULT_TRACK_TYPES,
+        signal_name: str | None = None,
+        clock=time.monotonic,
+    ) -> None:
+        if action not in CEILING_ACTIONS:
+            raise ValueError(f"MEMORY_CEILING_ACTION must be one of {CEILING_ACTIONS}, not {action!r}")
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.trace = trace
+        self.every_pages = every_pages
+        self.top_n = top_n
+        self.frames = frames
+        self.report_dir = Path(report_dir)
+        self.ceiling_mb = ceiling_mb
+        self.action = action
+        self.resume_ratio = resume_ratio
+        self.max_pause_s = max_pause_s
+        self.interval = interval
+        self.clock = clock
+        self.types = load_types(track_types)
+        self.signal_name = signal_name
+        self.pages = 0
+        self.reports = 0
+        self.over_ceiling = False
+        self.paused = False
+        self._paused_at = 0.0
+        self._spider = None
+        self._started_tracing = False
+        self._previous: tracemalloc.Snapshot | None = None
+        self._loop: task.LoopingCall | None = None
+        self._old_handler: Any = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        trace = s.getbool("MEMORY_DIAGNOSTICS_ENABLED", False)
+        signal_name = s.get("MEMORY_DIAGNOSTICS_SIGNAL") or None
+        ceiling_mb = s.getfloat("MEMORY_CEILING_MB", 0.0)
+        if not trace and signal_name is None and ceiling_mb <= 0:
+            raise NotConfigured("memory diagnostics are off")
+        report_dir = s.get("MEMORY_REPORT_DIR") or Path(s.get("PAGE_OUT_DIR", ".")) / "_memory"
+        ext = cls(
+            crawler,
+            trace=trace,
+            every_pages=s.getint("MEMORY_SNAPSHOT_EVERY_PAGES", 50),
+            top_n=s.getint("MEMORY_TOP_N", 15),
+            frames=s.getint("MEMORY_TRACE_FRAMES", 1),
+            report_dir=report_dir,
+            ceiling_mb=ceiling_mb,
+            action=s.get("MEMORY_CEILING_ACTION", "pause"),
+            resume_ratio=s.getfloat("MEMORY_RESUME_RATIO", 0.85),
+            max_pause_s=s.getfloat("MEMORY_PAUSE_MAX_S", 300.0),
+            interval=s.getfloat("MEMORY_CHECK_INTERVAL_S", 10.0),
+            track_types=s.getlist("MEMORY_TRACK_TYPES", list(DEFAULT_TRACK_TYPES)),
+            signal_name=signal_name,
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        return ext
+
+    # Lifecycle -------------------------------------------------------------
+
+    def spider_opened(self, spider):
+        self._spider = spider
+        if self.trace:
+            self.start_tracing()
+        if self.signal_name is not None:
+            self._install_signal()
+        if self.ceiling_mb > 0 and self.interval > 0:
+            self._loop = task.LoopingCall(self.check_ceiling)
+            self._loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        if self._old_handler is not None:
+            signal.signal(getattr(signal, self.signal_name), self._old_handler)
+            self._old_handler = None
+        if tracemalloc.is_tracing():
+            self.report("close")
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def item_scraped(self, item, response, spider):
+        if not isinstance(item, PageDone):
+            return
+        self.pages += 1
+        if self.every_pages > 0 and self.pages % self.every_pages == 0 and tracemalloc.is_tracing():
+            self.report("pages")
+
+    def start_tracing(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._previous = tracemalloc.take_snapshot()
+        logger.info("memory tracing started (%d frame(s) per allocation)", self.frames)
+
+    # On-demand -------------------------------------------------------------
+
+    def _install_signal(self) -> None:
+        signum = getattr(signal, self.signal_name, None)
+        if signum is None:
+            logger.warning("unknown MEMORY_DIAGNOSTICS_SIGNAL %r", self.signal_name)
+            return
+        try:
+            self._old_handler = signal.signal(signum, self._on_signal)
+        except ValueError:
+            # Not the main thread (e.g. an embedded CrawlerRunner): only the setting works
+            logger.warning("cannot install %s handler outside the main thread", self.signal_name)
+
+    def _on_signal(self, signum, frame):
+        reactor.callFromThread(self.on_demand)
+
+    def on_demand(self) -> None:
+        if tracemalloc.is_tracing():
+            self.report("signal")
+        else:
+            self.start_tracing()
+
+    # Reports ---------------------------------------------------------------
+
+    def report(self, trigger: str) -> Path:
+        rss_mb = process_rss_mb()
+        data: dict[str, Any] = {
+            "time": datetime.now(UTC).isoformat(),
+            "trigger": trigger,
+            "pages": self.pages,
+            "rss_mb": None if rss_mb is None else round(rss_mb, 1),
+            "objects": count_objects(self.types),
+            "holders": self._holders(),
+        }
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),)
+            )
+            traced, peak = tracemalloc.get_traced_memory()
+            data["traced_mb"] = round(traced / _MB, 1)
+            data["traced_peak_mb"] = round(peak / _MB, 1)
+            data["top"] = top_sites(snapshot, self._previous, self.top_n)
+            self._previous = snapshot
+
+        self.reports += 1
+        name = getattr(self._spider, "name", "spider")
+        path = self.report_dir / f"memory-{name}-{self.reports:04d}.json"
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+        self.stats.inc_value("memory/reports")
+        if rss_mb is not None:
+            self.stats.max_value("memory/rss_mb/max", round(rss_mb, 1))
+        if "traced_mb" in data:
+            self.stats.set_value("memory/traced_mb", data["traced_mb"])
+        growth = ", ".join(f"{s['site']} {s['size_diff_kb']:+.0f} KiB" for s in data.get("top", [])[:3])
+        logger.info("memory report %s (%s): rss=%s MB %s", path, trigger, data["rss_mb"], growth)
+        return path
+
+    def _holders(self) -> dict[str, Any]:
+        """Sizes of the structures most likely to grow over a long crawl."""
+        holders: dict[str, Any] = {}
+        engine = getattr(self.crawler, "engine", None)
+        itemproc = getattr(getattr(engine, "scraper", None), "itemproc", None)
+        for pipe in getattr(itemproc, "middlewares", ()):
+            buffer = getattr(pipe, "buffer", None)
+            if isinstance(buffer, dict):
+                holders["pipeline_buffer_pages"] = len(buffer)
+                holders["pipeline_buffer_items"] = sum(len(items) for items in buffer.values())
+        if REGISTRY is not None:
+            series = {}
+            for metric in REGISTRY.collect():
+                series[metric.name] = len(metric.samples)
+            holders["metric_series"] = dict(sorted(series.items(), key=lambda kv: kv[1], reverse=True)[:10])
+        return holders
+
+    # Ceiling ---------------------------------------------------------------
+
+    def check_ceiling(self, rss_mb: float | None = None) -> None:
+        rss_mb = process_rss_mb() if rss_mb is None else rss_mb
+        if rss_mb is None or self.ceiling_mb <= 0:
+            return
+        self.stats.max_value("memory/rss_mb/max", round(rss_mb, 1))
+        if self.over_ceiling:
+            if rss_mb < self.ceiling_mb * self.resume_ratio:
+                self.over_ceiling = False
+                if self.paused:
+                    self.paused = False
+                    self.crawler.engine.unpause()
+                    logger.info("memory back to %.0f MB; crawl resumed", rss_mb)
+            elif self.paused and 0 < self.max_pause_s <= self.clock() - self._paused_at:
+                # RSS did not come down: a paused engine never goes idle, so close and resume later
+                self.paused = False
+                self.stats.inc_value("memory/pause_timeouts")
+                logger.warning("memory still %.0f MB after %.0fs paused; closing the spider", rss_mb, self.max_pause_s)
+                engine = self.crawler.engine
+                engine.unpause()
+                engine.close_spider(self._spider, "memory_ceiling")
+            return
+        if rss_mb < self.ceiling_mb:
+            return
+
+        self.over_ceiling = True
+        self.stats.inc_value("memory/ceiling_hits")
+        logger.warning("memory ceiling hit: rss=%.0f MB >= %.0f MB (%s)", rss_mb, self.ceiling_mb, self.action)
+        self.report("ceiling")
+        gc.collect()
+        self._recycle_browser()
+        engine = self.crawler.engine
+        if self.action == "pause":
+            self.paused = True
+            self._paused_at = self.clock()
+            engine.pause()
+        elif self.action == "close":
+            engine.close_spider(self._spider, "memory_ceiling")
+
+    def _recycle_browser(self) -> None:
+        from scrapy_playwright_demo.middlewares.browser import BrowserSupervisorMiddleware
+
+        downloader = getattr(getattr(self.crawler, "engine", None), "downloader", None)
+        for mw in getattr(getattr(downloader, "middleware", None), "middlewares", ()):
+            if isinstance(mw, BrowserSupervisorMiddleware):
+                d = deferred_from_coro(mw.recycle_all("memory"))
+                d.addErrback(lambda f: logger.warning("recycling contexts failed: %s", f.value))
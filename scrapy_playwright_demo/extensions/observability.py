@@ -0,0 +1,27 @@
+# scrapy_playwright_demo/extensions/observability.py
+from __future__ import annotations
+
+from scrapy import signals
+
+from scrapy_playwright_demo import bootstrap
+
+
+class ObservabilityExtension:
+    """
+    Runs the process bootstrap for a crawler.
+
+    Config validation and logging are set up when the crawler is built, before
+    any request is scheduled. Sentry and the Prometheus endpoint start on the
+    first ``spider_opened``, so commands that never open a spider never pay for
+    them. Both steps are idempotent across crawlers in the same process.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        bootstrap.bootstrap()
+        ext = cls()
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        return ext
+
+    def spider_opened(self, spider):
+        bootstrap.start_integrations()
@@ -0,0 +1,64 @@
+# scrapy_playwright_demo/extensions/pricehistory.py
+from __future__ import annotations
+
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import threads
+
+logger = logging.getLogger(__name__)
+
+
+class PriceHistoryExtension:
+    """
+    Appends each finished crawl to the price history store at
+    ``PRICE_HISTORY_DIR`` (see ``scrapy_playwright_demo.pricehistory``).
+
+    When the spider closes with reason ``finished``, the file sink's output
+    (``PAGE_OUT_DIR``) is read back and stored as one run, dated by the
+    crawl's ``start_time``. The ingest runs in a thread, and the close waits
+    for it. Interrupted crawls are skipped: their resumed run is the one
+    that gets recorded. Needs ``numpy`` and the ``file`` sink.
+    """
+
+    def __init__(self, stats, directory: str, out_dir: str) -> None:
+        self.stats = stats
+        self.directory = directory
+        self.out_dir = out_dir
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        directory = s.get("PRICE_HISTORY_DIR")
+        if not directory:
+            raise NotConfigured("PRICE_HISTORY_DIR is not set")
+        if "file" not in [name.strip() for name in str(s.get("PAGE_SINK", "file")).split(",")]:
+            raise NotConfigured("price history reads the file sink's output")
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            raise NotConfigured("price history needs numpy") from None
+        ext = cls(crawler.stats, directory, s.get("PAGE_OUT_DIR"))
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_closed(self, spider, reason):
+        if reason != "finished":
+            logger.info("price history: %s run not recorded (reason %s)", spider.name, reason)
+            return None
+        return threads.deferToThread(self.ingest, self.stats.get_value("start_time"))
+
+    def ingest(self, run_at) -> int:
+        from scrapy_playwright_demo.pricehistory import PriceHistory
+
+        rows = PriceHistory(self.directory).append_run(self._records(), run_at)
+        self.stats.set_value("price_history/rows", rows)
+        logger.info("price history: %d rows appended to %s", rows, self.directory)
+        return rows
+
+    def _records(self):
+        from scrapy_playwright_demo import reader
+
+        # In-process: a forked worker would inherit the reactor's threads
+        return reader.iter_records(self.out_dir, workers=1)
@@ -0,0 +1,75 @@
+# scrapy_playwright_demo/extensions/profiling.py
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from scrapy_playwright_demo import profiling
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingExtension:
+    """
+    Runs the process-wide continuous profiler while spiders are open
+    (``PROFILING_CONTINUOUS_HZ``; see ``scrapy_playwright_demo.profiling``).
+
+    The top leaf frames of each export window go to the
+    ``profile_frame_share`` gauge and to ``/debug/profile/top``. When the
+    last spider closes, the whole run is written as collapsed stacks to
+    ``PROFILING_OUTPUT_DIR/profile-<spider>.collapsed``, and its busiest
+    frames are published in stats as ``profile/top/<n>``.
+    """
+
+    _open_spiders = 0
+
+    def __init__(self, stats, hz: float, export_interval_s: float, top_n: int, output_dir: str | None) -> None:
+        self.stats = stats
+        self.hz = hz
+        self.export_interval_s = export_interval_s
+        self.top_n = top_n
+        self.output_dir = Path(output_dir) if output_dir else None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        hz = s.getfloat("PROFILING_CONTINUOUS_HZ", 0.0)
+        if hz <= 0:
+            raise NotConfigured("PROFILING_CONTINUOUS_HZ is 0")
+        ext = cls(
+            crawler.stats,
+            hz,
+            s.getfloat("PROFILING_EXPORT_INTERVAL_S", 60.0),
+            s.getint("PROFILING_TOP_N", 20),
+            s.get("PROFILING_OUTPUT_DIR"),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        if profiling.continuous is None:
+            profiling.continuous = profiling.ContinuousProfiler(self.hz, self.export_interval_s, self.top_n)
+        ProfilingExtension._open_spiders += 1
+        profiling.continuous.start()
+
+    def spider_closed(self, spider, reason):
+        ProfilingExtension._open_spiders -= 1
+        profiler = profiling.continuous
+        if profiler is None or ProfilingExtension._open_spiders > 0:
+            return
+        profiler.stop()
+        profiling.continuous = None
+        self.stats.set_value("profile/samples", profiler.samples)
+        for n, (thread, frame, share) in enumerate(
+            profiling.top_frames(profiler.total, profiler.samples, self.top_n), 1
+        ):
+            self.stats.set_value(f"profile/top/{n}", f"{share:.1%} {thread} {frame}")
+        if self.output_dir is not None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            path = self.output_dir / f"profile-{spider.name}.collapsed"
+            path.write_text(profiling.collapsed(profiler.total), encoding="utf-8")
+            logger.info("continuous profile written to %s (%d samples)", path, profiler.samples)
@@ -0,0 +1,399 @@
+# scrapy_playwright_demo/fleet.py
+"""
+Several spiders in one process, on one shared browser.
+
+``scrapy crawl`` runs one spider per process. Each process starts its own
+Chromium and pays for its startup and memory. The fleet runs several
+spiders (categories, sites) as crawlers of one ``CrawlerProcess`` instead:
+
+* one Chromium is launched as a *browser server* (remote debugging on
+  localhost) and every crawler connects to it with ``PLAYWRIGHT_CDP_URL``.
+  Each crawler still gets its own browser contexts, so cookies and consent
+  state stay separate;
+* ``FLEET_CONTEXT_BUDGET`` browser contexts are split across the spiders
+  (``PLAYWRIGHT_MAX_CONTEXTS`` per crawler, at least one each);
+* ``FLEET_PAGE_BUDGET`` pages may be open at once across the fleet.
+  ``FairShare`` hands a freed page slot to the waiting spider that holds
+  the fewest, so one busy spider cannot starve the others, and an idle
+  spider's share is used by the rest;
+* every spider writes to ``<out-dir>/<label>/`` with its own sink and
+  checkpoint (``<jobdir>/<label>/``). Per-spider and combined stats go to
+  ``<out-dir>/fleet-stats.json``.
+
+A spider is given as ``NAME`` or ``NAME:arg=value,arg=value``; the label is
+the ``site`` argument if there is one, else the spider name::
+
+    python -m scrapy_playwright_demo.fleet run zalando sites:site=shop-us \\
+        --contexts 6 --pages 16 --out-dir out/fleet
+
+The browser server also works across processes: ``fleet serve`` keeps one
+Chromium running and prints its endpoint; ``scrapy crawl`` (or
+``runner --browser-server``, which starts one itself) then connects with
+``-s PLAYWRIGHT_CDP_URL=<endpoint>`` instead of launching a browser per
+process.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+Grant = Callable[[], None]
+
+
+# --------------------------------------------------------------------------- #
+# Fleet plan
+# --------------------------------------------------------------------------- #
+@dataclass(frozen=True)
+class FleetMember:
+    label: str
+    spider: str
+    kwargs: dict[str, str] = field(default_factory=dict)
+    contexts: int = 1
+
+
+def parse_member(text: str) -> tuple[str, dict[str, str]]:
+    """``"sites:site=shop-us,start_urls=..."`` → ``("sites", {"site": "shop-us", ...})``."""
+    spider, _, rest = text.partition(":")
+    kwargs = {}
+    for pair in filter(None, rest.split(",")):
+        key, sep, value = pair.partition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"spider arguments are key=value, got {pair!r} in {text!r}")
+        kwargs[key.strip()] = value.strip()
+    if not spider.strip():
+        raise ValueError(f"no spider name in {text!r}")
+    return spider.strip(), kwargs
+
+
+def split_budget(total: int, n: int) -> list[int]:
+    """``total`` contexts as ``n`` near-equal shares, the remainder to the first ones."""
+    if n < 1:
+        return []
+    if total < n:
+        raise ValueError(f"a budget of {total} contexts cannot give each of {n} spiders one")
+    base, extra = divmod(total, n)
+    return [base + (i < extra) for i in range(n)]
+
+
+def plan_fleet(specs: Iterable[str], context_budget: int = 0, contexts_each: int = 1) -> list[FleetMember]:
+    """One member per spec with a unique label and its share of the context budget."""
+    parsed = [parse_member(spec) for spec in specs]
+    shares = split_budget(context_budget, len(parsed)) if context_budget else [contexts_each] * len(parsed)
+    seen: Counter[str] = Counter()
+    members = []
+    for (spider, kwargs), contexts in zip(parsed, shares):
+        base = kwargs.get("site") or spider
+        seen[base] += 1
+        label = base if seen[base] == 1 else f"{base}-{seen[base]}"
+        members.append(FleetMember(label, spider, kwargs, contexts))
+    return members
+
+
+# --------------------------------------------------------------------------- #
+# Fair page slots
+# --------------------------------------------------------------------------- #
+class FairShare:
+    """
+    ``slots`` page slots shared by several spiders.
+
+    A request acquires a slot before its page is opened and releases it when
+    the page closes. A free slot goes to a caller at once unless its spider
+    is at its own ``limit``. When callers wait, each freed slot goes to the
+    waiting spider holding the fewest slots; ties go to the one granted
+    least recently. It is plain bookkeeping on the reactor thread: grants
+    are callbacks, and the middleware turns them into Deferreds.
+    """
+
+    def __init__(self, slots: int) -> None:
+        if slots < 1:
+            raise ValueError(f"FairShare needs at least one slot, got {slots}")
+        self.slots = slots
+        self.held: Counter[str] = Counter()
+        self.limits: dict[str, int] = {}
+        self.waiting: dict[str, deque[Grant]] = {}
+        self._last_grant: dict[str, int] = {}
+        self._grants = 0
+
+    @property
+    def free(self) -> int:
+        return self.slots - sum(self.held.values())
+
+    def register(self, spider: str, limit: int | None = None) -> None:
+        self.limits[spider] = max(1, min(limit or self.slots, self.slots))
+        self.waiting.setdefault(spider, deque())
+
+    def acquire(self, spider: str, grant: Grant) -> bool:
+        """True if granted now; otherwise ``grant`` is called once a slot frees up."""
+        if spider not in self.limits:
+            self.register(spider)
+        # After every release no waiter could take a free slot, so a free slot is this caller's
+        if self.free > 0 and self.held[spider] < self.limits[spider]:
+            self._take(spider)
+            return True
+        self.waiting[spider].append(grant)
+        return False
+
+    def cancel(self, spider: str, grant: Grant) -> None:
+        queue = self.waiting.get(spider)
+        if queue is not None and grant in queue:
+            queue.remove(grant)
+
+    def release(self, spider: str) -> None:
+        if self.held[spider] > 0:
+            self.held[spider] -= 1
+        self._dispatch()
+
+    def close(self, spider: str) -> None:
+        """Forget ``spider``: drop its waiters and give its slots to the others."""
+        self.waiting.pop(spider, None)
+        self.held.pop(spider, None)
+        self.limits.pop(spider, None)
+        self._dispatch()
+
+    def _take(self, spider: str) -> None:
+        self.held[spider] += 1
+        self._grants += 1
+        self._last_grant[spider] = self._grants
+
+    def _dispatch(self) -> None:
+        while self.free > 0:
+            eligible = [name for name, queue in self.waiting.items()
+                        if queue and self.held[name] < self.limits[name]]
+            if not eligible:
+                return
+            spider = min(eligible, key=lambda name: (self.held[name], self._last_grant.get(name, 0)))
+            self._take(spider)
+            self.waiting[spider].popleft()()
+
+
+# --------------------------------------------------------------------------- #
+# Browser server
+# --------------------------------------------------------------------------- #
+def chromium_executable() -> str:
+    """Path of Playwright's Chromium (``playwright install chromium``)."""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        return p.chromium.executable_path
+
+
+def devtools_endpoint(profile_dir: str | Path, host: str = "127.0.0.1") -> str | None:
+    """The ``ws://`` endpoint Chromium wrote to ``DevToolsActivePort``, once it listens."""
+    try:
+        lines = (Path(profile_dir) / "DevToolsActivePort").read_text(encoding="utf-8").split()
+    except OSError:
+        return None
+    if len(lines) < 2 or not lines[0].isdigit():
+        return None  # not written completely yet
+    return f"ws://{host}:{lines[0]}{lines[1]}"
+
+
+class BrowserServer:
+    """One local Chromium that crawlers in this or other processes connect to over CDP."""
+
+    def __init__(self, executable: str | None = None, port: int = 0, headless: bool = True,
+                 args: Iterable[str] = (), startup_timeout_s: float = 30.0) -> None:
+        self.executable = executable
+        self.port = port
+        self.headless = headless
+        self.args = list(args)
+        self.startup_timeout_s = startup_timeout_s
+        self.proc: subprocess.Popen | None = None
+        self.endpoint: str | None = None
+        self._profile: str | None = None
+
+    @property
+    def pid(self) -> int | None:
+        return self.proc.pid if self.proc is not None else None
+
+    def command(self, profile_dir: str) -> list[str]:
+        return [
+            self.executable or chromium_executable(),
+            f"--remote-debugging-port={self.port}",  # 0: any free port, read back from DevToolsActivePort
+            "--remote-debugging-address=127.0.0.1",
+            f"--user-data-dir={profile_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            *(["--headless=new"] if self.headless else []),
+            *self.args,
+            "about:blank",
+        ]
+
+    def start(self) -> str:
+        self._profile = tempfile.mkdtemp(prefix="browser-server-")
+        self.proc = subprocess.Popen(  # noqa: S603
+            self.command(self._profile), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + self.startup_timeout_s
+        while (endpoint := devtools_endpoint(self._profile)) is None:
+            code = self.proc.poll()
+            if code is not None or time.monotonic() >= deadline:
+                self.stop()
+                reason = f"exited with {code}" if code is not None else f"not listening after {self.startup_timeout_s:.0f}s"
+                raise RuntimeError(f"browser server {reason}")
+            time.sleep(0.05)
+        self.endpoint = endpoint
+        logger.info("browser server (pid %d) listening on %s", self.proc.pid, endpoint)
+        return endpoint
+
+    def stop(self, timeout_s: float = 10.0) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout_s)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        if self._profile is not None:
+            shutil.rmtree(self._profile, ignore_errors=True)
+            self._profile = None
+
+    def __enter__(self) -> BrowserServer:
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def browser_server(settings, port: int = 0) -> BrowserServer:
+    """A (not yet started) server with the executable and headless mode of the Scrapy settings."""
+    launch = settings.get("PLAYWRIGHT_LAUNCH_OPTIONS") or {}
+    return BrowserServer(settings.get("BROWSER_SERVER_EXECUTABLE"), port=port, headless=launch.get("headless", True))
+
+
+# --------------------------------------------------------------------------- #
+# Running
+# --------------------------------------------------------------------------- #
+def member_settings(member: FleetMember, out_dir: str | Path, jobdir: str = "",
+                    cdp_url: str | None = None) -> dict[str, Any]:
+    settings = {
+        "PAGE_OUT_DIR": str(Path(out_dir) / member.label),
+        "JOBDIR": str(Path(jobdir) / member.label) if jobdir else "",
+        "JOB": f"fleet-{member.label}",
+        "PLAYWRIGHT_MAX_CONTEXTS": member.contexts,
+    }
+    if cdp_url:
+        settings["PLAYWRIGHT_CDP_URL"] = cdp_url
+    return settings
+
+
+def run_fleet(members: list[FleetMember], settings, out_dir: str | Path, jobdir: str = "",
+              page_budget: int = 0, shared_browser: bool = True) -> dict[str, Any]:
+    """Crawl every member in one process; returns (and writes) per-spider and combined stats."""
+    from scrapy.crawler import CrawlerProcess
+
+    from scrapy_playwright_demo.container import Container
+    from scrapy_playwright_demo.runner import merge_stats
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    server = None
+    cdp_url = settings.get("PLAYWRIGHT_CDP_URL")
+    if not cdp_url and shared_browser:
+        server = browser_server(settings)
+        cdp_url = server.start()
+
+    pages_per_context = settings.getint("PLAYWRIGHT_MAX_PAGES_PER_CONTEXT", 1)
+    share = FairShare(page_budget or sum(m.contexts for m in members) * pages_per_context)
+    crawlers = {}
+    try:
+        process = CrawlerProcess(settings)
+        for member in members:
+            crawler = process.create_crawler(member.spider)
+            crawler.settings.setdict(member_settings(member, out_dir, jobdir, cdp_url), priority="cmdline")
+            # Each spider its own sink and checkpoint: the project container is one per process
+            crawler.settings.set("CONTAINER", Container(crawler.settings, crawler.settings), priority="cmdline")
+            crawler.settings.set("FLEET_SHARE", share, priority="cmdline")
+            crawler.settings.set("FLEET_LABEL", member.label, priority="cmdline")
+            share.register(member.label, member.contexts * pages_per_context)
+            process.crawl(crawler, **member.kwargs)
+            crawlers[member.label] = crawler
+        logger.info("fleet of %d spiders: %d contexts, %d page slots, browser %s",
+                    len(members), sum(m.contexts for m in members), share.slots, cdp_url or "per crawler")
+        process.start()
+    finally:
+        if server is not None:
+            server.stop()
+
+    per_spider = {label: crawler.stats.get_stats() for label, crawler in crawlers.items()}
+    stats = {"spiders": per_spider, "total": merge_stats(per_spider.values())}
+    (out_dir / "fleet-stats.json").write_text(json.dumps(stats, indent=2, default=str), encoding="utf-8")
+    for label, spider_stats in per_spider.items():
+        logger.info("%s: %s items, %s pages waited for a slot (%.1fs), %s",
+                    label, spider_stats.get("item_scraped_count", 0), spider_stats.get("fleet/slots/waited", 0),
+                    spider_stats.get("fleet/slots/wait_s", 0.0), spider_stats.get("finish_reason", "?"))
+    return stats
+
+
+def serve(settings, port: int = 0) -> int:
+    """Run a browser server until SIGINT/SIGTERM."""
+    server = browser_server(settings, port)
+    stopping = False
+
+    def stop(*_: Any) -> None:
+        nonlocal stopping
+        stopping = True
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, stop)
+    with server:
+        print(server.endpoint, flush=True)  # noqa: T201
+        while not stopping and server.proc.poll() is None:
+            time.sleep(0.5)
+    return 0 if stopping else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Several spiders in one process on one shared browser")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="crawl several spiders in this process")
+    run.add_argument("spiders", nargs="+", metavar="SPIDER[:arg=value,...]")
+    run.add_argument("--contexts", type=int, default=None, help="context budget (default: FLEET_CONTEXT_BUDGET)")
+    run.add_argument("--pages", type=int, default=None, help="page budget (default: FLEET_PAGE_BUDGET)")
+    run.add_argument("--out-dir", default=None, help="writes <out-dir>/<label>/ (default: PAGE_OUT_DIR)")
+    run.add_argument("--jobdir", default=None, help="<jobdir>/<label>/ per spider (default: JOBDIR)")
+    run.add_argument("--no-browser-server", action="store_true", help="every crawler launches its own browser")
+    run.add_argument("-s", "--set", action="append", default=[], metavar="KEY=VALUE")
+    serve_cmd = sub.add_parser("serve", help="run a browser server and print its endpoint")
+    serve_cmd.add_argument("--port", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from scrapy.utils.project import get_project_settings
+
+    from scrapy_playwright_demo.runner import _parse_overrides
+
+    settings = get_project_settings()
+    if args.command == "serve":
+        logging.basicConfig(level="INFO", format="%(asctime)s fleet %(levelname)s %(message)s")
+        return serve(settings, args.port)
+
+    settings.setdict(dict(_parse_overrides(args.set)), priority="cmdline")
+    contexts = args.contexts if args.contexts is not None else settings.getint("FLEET_CONTEXT_BUDGET")
+    pages = args.pages if args.pages is not None else settings.getint("FLEET_PAGE_BUDGET")
+    try:
+        members = plan_fleet(args.spiders, contexts, settings.getint("PLAYWRIGHT_MAX_CONTEXTS", 1))
+    except ValueError as e:
+        parser.error(str(e))
+    jobdir = args.jobdir if args.jobdir is not None else settings.get("JOBDIR") or ""
+    stats = run_fleet(members, settings, args.out_dir or settings.get("PAGE_OUT_DIR"), jobdir,
+                      page_budget=pages, shared_browser=not args.no_browser_server)
+    return 0 if all(s.get("finish_reason") == "finished" for s in stats["spiders"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
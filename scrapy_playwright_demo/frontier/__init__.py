@@ -0,0 +1,30 @@
+# scrapy_playwright_demo/frontier/__init__.py
+"""Shared crawl frontier (see ``scheduler.FrontierScheduler``)."""
+from __future__ import annotations
+
+from scrapy.utils.misc import load_object
+
+from .base import FRONTIER_LEASE, FRONTIER_META, FrontierBackend, Lease, Task, TaskState, task_position
+from .sqlite import SqliteFrontier
+
+_BACKENDS = {"sqlite": SqliteFrontier}
+
+
+def build_frontier(settings) -> FrontierBackend:
+    """``FRONTIER_BACKEND`` is ``"sqlite"`` or the dotted path of a ``FrontierBackend`` with ``from_settings()``."""
+    name = settings.get("FRONTIER_BACKEND", "sqlite")
+    cls = _BACKENDS.get(name) or load_object(name)
+    return cls.from_settings(settings)
+
+
+__all__ = [
+    "FRONTIER_LEASE",
+    "FRONTIER_META",
+    "FrontierBackend",
+    "Lease",
+    "SqliteFrontier",
+    "Task",
+    "TaskState",
+    "build_frontier",
+    "task_position",
+]
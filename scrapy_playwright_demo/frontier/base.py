@@ -0,0 +1,104 @@
+# scrapy_playwright_demo/frontier/base.py
+"""
+Shared crawl frontier: the contract between ``FrontierScheduler`` and a backend.
+
+A task is one listing page (``group`` = category URL, ``page`` = page number)
+with the serialized request that fetches it. Nodes *claim* tasks under a lease
+that expires unless renewed. Each claim takes the next pages of the lowest
+group in order, so a node works through a contiguous page range. A node that
+crashes stops renewing, and its pages go back to the pool when the leases
+expire. Completed tasks are never re-added, which dedups pages across nodes
+and across runs.
+"""
+from __future__ import annotations
+
+import urllib.parse
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import Enum
+from typing import Iterable
+
+# Request.meta keys: FRONTIER_META marks requests that belong to the shared
+# frontier (True, or {"group": ..., "page": ...}); FRONTIER_LEASE carries the
+# task key once a node has claimed it (retries keep it).
+FRONTIER_META = "frontier"
+FRONTIER_LEASE = "_frontier_lease"
+
+
+class TaskState(str, Enum):
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"  # gave up after max_attempts claims
+
+
+@dataclass(frozen=True)
+class Task:
+    key: str
+    payload: bytes  # serialized request
+    group: str = ""
+    page: int = 0
+
+
+@dataclass(frozen=True)
+class Lease:
+    key: str
+    payload: bytes
+    node: str
+    expires_at: float
+    attempts: int
+
+
+def task_position(url: str, page_param: str = "p") -> tuple[str, int]:
+    """``https://x/cat/?p=3`` → ``("https://x/cat/", 3)``. Page 1 when there is no page parameter."""
+    parsed = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+    page = 1
+    rest = []
+    for name, value in query:
+        if name == page_param and value.isdigit():
+            page = int(value)
+        else:
+            rest.append((name, value))
+    group = parsed._replace(query=urllib.parse.urlencode(rest), fragment="").geturl()
+    return group, page
+
+
+class FrontierBackend(ABC):
+    """Storage shared by every node. Implementations must make ``claim`` atomic across processes."""
+
+    @abstractmethod
+    def add(self, tasks: Iterable[Task]) -> int:
+        """Insert tasks whose key is unknown; returns how many were new."""
+
+    @abstractmethod
+    def claim(self, node: str, limit: int, lease_s: float, max_attempts: int) -> list[Lease]:
+        """Lease up to ``limit`` pending (or expired) tasks to ``node``, ordered by group then page."""
+
+    @abstractmethod
+    def heartbeat(self, node: str, keys: Iterable[str], lease_s: float) -> set[str]:
+        """Extend ``node``'s leases on ``keys``; returns the keys it still holds."""
+
+    @abstractmethod
+    def complete(self, key: str) -> None:
+        """Mark a task done, whoever holds it."""
+
+    @abstractmethod
+    def release(self, key: str, node: str, max_attempts: int) -> TaskState:
+        """Give a leased task back (pending again, or failed after ``max_attempts``)."""
+
+    @abstractmethod
+    def release_node(self, node: str) -> int:
+        """Give back every lease held by ``node`` without counting an attempt (clean shutdown)."""
+
+    @abstractmethod
+    def counts(self) -> dict[str, int]:
+        """Tasks per ``TaskState`` value, plus ``expired`` leases."""
+
+    def close(self) -> None:
+        pass
+
+    def outstanding(self) -> int:
+        """Tasks that some node still has to finish."""
+        counts = self.counts()
+        return counts.get(TaskState.PENDING.value, 0) + counts.get(TaskState.LEASED.value, 0)
@@ -0,0 +1,166 @@
+# scrapy_playwright_demo/frontier/sqlite.py
+"""
+SQLite frontier backend: one database file shared by every node.
+
+Claims run in a ``BEGIN IMMEDIATE`` transaction, so SQLite's file lock makes
+them atomic across processes on one machine or across containers that mount
+the same volume. Use ``journal_mode="DELETE"`` on network filesystems (NFS,
+SMB), where WAL's shared-memory index does not work.
+
+Lease expiry uses wall-clock time (``time.time``), because several processes
+compare the same timestamps.
+"""
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable
+
+from scrapy_playwright_demo.frontier.base import FrontierBackend, Lease, Task, TaskState
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    key        TEXT PRIMARY KEY,
+    grp        TEXT NOT NULL,
+    page       INTEGER NOT NULL,
+    payload    BLOB NOT NULL,
+    state      TEXT NOT NULL DEFAULT 'pending',
+    node       TEXT,
+    expires_at REAL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (state, grp, page);
+"""
+
+
+class SqliteFrontier(FrontierBackend):
+    def __init__(self, path: str | Path, journal_mode: str = "WAL", timeout_s: float = 30.0,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.clock = clock
+        # Autocommit mode: transactions are explicit (BEGIN IMMEDIATE) where they matter
+        self._db = sqlite3.connect(self.path, timeout=timeout_s, isolation_level=None)
+        self._db.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def from_settings(cls, settings) -> "SqliteFrontier":
+        return cls(
+            settings.get("FRONTIER_PATH", "frontier.sqlite"),
+            journal_mode=settings.get("FRONTIER_SQLITE_JOURNAL_MODE", "WAL"),
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        self._db.execute("BEGIN IMMEDIATE")  # takes the write lock up front
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def add(self, tasks: Iterable[Task]) -> int:
+        now = self.clock()
+        rows = [(t.key, t.group, t.page, t.payload, now) for t in tasks]
+        if not rows:
+            return 0
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (key, grp, page, payload, updated_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            return db.total_changes - before
+
+    def claim(self, node: str, limit: int, lease_s: float, max_attempts: int) -> list[Lease]:
+        if limit <= 0:
+            return []
+        now = self.clock()
+        expires_at = now + lease_s
+        with self._transaction() as db:
+            # Expired leases that already used every attempt will not be handed out again
+            db.execute(
+                "UPDATE tasks SET state = ?, node = NULL, updated_at = ? "
+                "WHERE state = ? AND expires_at < ? AND attempts >= ?",
+                (TaskState.FAILED.value, now, TaskState.LEASED.value, now, max_attempts),
+            )
+            rows = db.execute(
+                "SELECT key, payload, attempts FROM tasks "
+                "WHERE (state = ? OR (state = ? AND expires_at < ?)) AND attempts < ? "
+                "ORDER BY grp, page, key LIMIT ?",
+                (TaskState.PENDING.value, TaskState.LEASED.value, now, max_attempts, limit),
+            ).fetchall()
+            db.executemany(
+                "UPDATE tasks SET state = ?, node = ?, expires_at = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE key = ?",
+                [(TaskState.LEASED.value, node, expires_at, now, key) for key, _, _ in rows],
+            )
+        return [Lease(key, payload, node, expires_at, attempts + 1) for key, payload, attempts in rows]
+
+    def heartbeat(self, node: str, keys: Iterable[str], lease_s: float) -> set[str]:
+        keys = list(keys)
+        if not keys:
+            return set()
+        now = self.clock()
+        held = set()
+        with self._transaction() as db:
+            for key in keys:
+                cur = db.execute(
+                    "UPDATE tasks SET expires_at = ?, updated_at = ? WHERE key = ? AND node = ? AND state = ?",
+                    (now + lease_s, now, key, node, TaskState.LEASED.value),
+                )
+                if cur.rowcount:
+                    held.add(key)
+        return held
+
+    def complete(self, key: str) -> None:
+        self._db.execute(
+            "UPDATE tasks SET state = ?, node = NULL, expires_at = NULL, updated_at = ? WHERE key = ?",
+            (TaskState.DONE.value, self.clock(), key),
+        )
+
+    def release(self, key: str, node: str, max_attempts: int) -> TaskState:
+        now = self.clock()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT attempts FROM tasks WHERE key = ? AND node = ? AND state = ?",
+                (key, node, TaskState.LEASED.value),
+            ).fetchone()
+            if row is None:
+                state = db.execute("SELECT state FROM tasks WHERE key = ?", (key,)).fetchone()
+                return TaskState(state[0]) if state else TaskState.FAILED
+            state = TaskState.FAILED if row[0] >= max_attempts else TaskState.PENDING
+            db.execute(
+                "UPDATE tasks SET state = ?, node = NULL, expires_at = NULL, updated_at = ? WHERE key = ?",
+                (state.value, now, key),
+            )
+        return state
+
+    def release_node(self, node: str) -> int:
+        with self._transaction() as db:
+            cur = db.execute(
+                "UPDATE tasks SET state = ?, node = NULL, expires_at = NULL, attempts = MAX(attempts - 1, 0), "
+                "updated_at = ? WHERE node = ? AND state = ?",
+                (TaskState.PENDING.value, self.clock(), node, TaskState.LEASED.value),
+            )
+            return cur.rowcount
+
+    def counts(self) -> dict[str, int]:
+        now = self.clock()
+        counts = {state.value: 0 for state in TaskState}
+        for state, n in self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"):
+            counts[state] = n
+        counts["expired"] = self._db.execute(
+            "SELECT COUNT(*) FROM tasks WHERE state = ? AND expires_at < ?", (TaskState.LEASED.value, now)
+        ).fetchone()[0]
+        return counts
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,191 @@
+# scrapy_playwright_demo/instrumentation.py
+"""
+Per-stage latency instrumentation shared by spiders, pipelines and sinks.
+
+Every measurement belongs to one of a fixed set of ``STAGES`` and (optionally)
+a spider name, so label cardinality stays bounded no matter how many pages are
+crawled. Observations go to:
+
+* a Prometheus histogram ``scrapy_stage_seconds{spider, stage}`` (if
+  prometheus_client is installed), and
+* an in-process recorder keeping exact count/sum/max plus a fixed-size
+  reservoir sample per (spider, stage), used to publish percentile summaries
+  into Scrapy stats at close (see ``extensions.instrumentation``).
+
+Code that has no spider at hand (e.g. sinks) inherits it from the nearest
+``spider_scope()``.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+try:
+    from prometheus_client import Histogram
+
+    stage_seconds = Histogram(
+        "scrapy_stage_seconds",
+        "Time spent per crawl stage",
+        ["spider", "stage"],
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+    )
+except ImportError:
+    stage_seconds = None
+
+STAGES = frozenset(
+    {
+        # scheduler → downloader → browser
+        "queue_wait",       # request scheduled → reached the downloader
+        "navigation",       # reached the downloader → response downloaded (goto + page methods)
+        "scroll",           # lazy-load scrolling in rendered_page()
+        "snapshot",         # page.content() DOM snapshot
+        "render",           # scroll + snapshot
+        # spider
+        "extract",          # cards → items for one page
+        # item pipelines
+        "validate",         # ValidateProductPipeline, per item
+        "buffer",           # PerPageSinkPipeline, per item
+        "flush",            # PerPageSinkPipeline, whole page through the sink
+        # sinks
+        "serialize",        # items → JSON lines
+        "compress",         # gzip
+        "write",            # bytes → storage
+    }
+)
+
+NO_SPIDER = "-"
+
+_current_spider: ContextVar[str] = ContextVar("instrumentation_spider", default=NO_SPIDER)
+
+
+@dataclass
+class StageStats:
+    """Exact count/sum/max plus a uniform reservoir sample of durations."""
+
+    capacity: int
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+    samples: list[float] = field(default_factory=list)
+
+    def add(self, seconds: float, rng: random.Random) -> None:
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        if len(self.samples) < self.capacity:
+            self.samples.append(seconds)
+        else:
+            # Algorithm R: every observation has capacity/count chance to be kept
+            slot = rng.randrange(self.count)
+            if slot < self.capacity:
+                self.samples[slot] = seconds
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        rank = max(1, round(q / 100 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.maximum,
+        }
+
+
+class LatencyRecorder:
+    """Thread-safe registry of StageStats keyed by (spider, stage)."""
+
+    def __init__(self, reservoir_size: int = 2048, seed: int | None = None) -> None:
+        self.reservoir_size = reservoir_size
+        self._stats: dict[tuple[str, str], StageStats] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._listeners: list[Callable[[str, float, str], None]] = []
+
+    def add_listener(self, listener: Callable[[str, float, str], None]) -> None:
+        """Call ``listener(stage, seconds, spider)`` on every observation."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, float, str], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def observe(self, stage: str, seconds: float, spider: str | None = None) -> None:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown instrumentation stage: {stage!r}")
+        spider = spider or _current_spider.get()
+        with self._lock:
+            key = (spider, stage)
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StageStats(self.reservoir_size)
+            stats.add(seconds, self._rng)
+        if stage_seconds is not None:
+            stage_seconds.labels(spider=spider, stage=stage).observe(seconds)
+        for listener in self._listeners:
+            listener(stage, seconds, spider)
+
+    @contextmanager
+    def timed(self, stage: str, spider: str | None = None) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0, spider)
+
+    def summary(self, spider: str | None = None) -> dict[str, dict[str, float]]:
+        """Summaries per stage for ``spider``; without one, for the stages recorded outside any spider scope."""
+        wanted = spider or NO_SPIDER
+        with self._lock:
+            merged: dict[str, StageStats] = {}
+            for (name, stage), stats in self._stats.items():
+                if name != wanted:
+                    continue
+                acc = merged.setdefault(stage, StageStats(self.reservoir_size))
+                acc.count += stats.count
+                acc.total += stats.total
+                acc.maximum = max(acc.maximum, stats.maximum)
+                acc.samples.extend(stats.samples)
+        return {stage: stats.summary() for stage, stats in sorted(merged.items())}
+
+    def reset(self, spider: str | None = None) -> None:
+        with self._lock:
+            if spider is None:
+                self._stats.clear()
+            else:
+                for key in [k for k in self._stats if k[0] == spider]:
+                    del self._stats[key]
+
+
+# Process-wide recorder used by the helpers below
+recorder = LatencyRecorder()
+
+
+def observe(stage: str, seconds: float, spider: str | None = None) -> None:
+    recorder.observe(stage, seconds, spider)
+
+
+def timed(stage: str, spider: str | None = None):
+    """Context manager timing its body into ``stage``."""
+    return recorder.timed(stage, spider)
+
+
+@contextmanager
+def spider_scope(spider: str | None) -> Iterator[None]:
+    """Attribute nested observations without an explicit spider to ``spider``."""
+    token = _current_spider.set(spider or NO_SPIDER)
+    try:
+        yield
+    finally:
+        _current_spider.reset(token)
@@ -3,9 +3,11 @@ from enum import Enum
 from decimal import Decimal
 from typing import Optional
 from datetime import datetime, UTC
-from pydantic import BaseModel, Field, ConfigDict, field_validator, field_serializer
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr, field_validator, field_serializer
 from dataclasses import dataclass
 
+from scrapy_playwright_demo import money
+
 class Currency(str, Enum):
     EUR = "EUR"
     USD = "USD"
@@ -20,7 +22,10 @@ class ProductItem(BaseModel):
     price_original: Decimal | None = None
     currency: Currency
     link: str
+    category: Optional[str] = None  # listing category with sitemap discovery (pages are numbered per category)
     scraped_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    # Set by ValidateProductPipeline.validate_batch, so the pipeline does not validate the item again
+    _validated: bool = PrivateAttr(default=False)
 
     # --- ensure Decimals even if floats slip in ---
     @field_validator("price_discounted", "price_original", mode="before")
@@ -40,7 +45,84 @@ class ProductItem(BaseModel):
     def serialize_decimal(self, v: Decimal | None):
         return str(v) if v is not None else None
 
+class MinorUnitProductItem(ProductItem):
+    """
+    ``ProductItem`` with prices as integer minor units (``MONEY_MODE=minor``).
+
+    Ints are taken as cents; ``Decimal``/str/float input (JSON read back,
+    other sources) is converted exactly (see ``money``). Serializes to the
+    same JSON as ``ProductItem``.
+    """
+
+    price_discounted: int | None = None
+    price_original: int | None = None
+
+    # Same names as ProductItem's, so they replace its Decimal coercion/serialization
+    @field_validator("price_discounted", "price_original", mode="before")
+    @classmethod
+    def to_decimal(cls, v):
+        if v is None or type(v) is int:
+            return v
+        try:
+            return money.to_minor(v)
+        except ValueError:
+            return v  # reported by pydantic as an invalid price
+
+    @field_serializer("price_discounted", "price_original", when_used="json")
+    def serialize_decimal(self, v: int | None):
+        return money.format_minor(v) if v is not None else None
+
+def product_item_class(money_mode: str | None) -> type[ProductItem]:
+    """The ProductItem model for ``MONEY_MODE`` (``decimal``, the default, or ``minor``)."""
+    if money_mode == "minor":
+        return MinorUnitProductItem
+    if money_mode in (None, "", "decimal"):
+        return ProductItem
+    raise ValueError(f"Unknown MONEY_MODE {money_mode!r}; expected 'decimal' or 'minor'")
+
+class ProductDetailItem(BaseModel):
+    """A listing ``ProductItem`` enriched from its product page (``ProductDetailSpider``)."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    page: int                      # listing page the link came from (one sink page per listing page)
+    category: Optional[str] = None  # that listing page's category, if the listing run had several
+    link: str
+    title: str
+    brand: Optional[str] = None
+    sku: Optional[str] = None
+    gtin: Optional[str] = None
+    description: Optional[str] = None
+    color: Optional[str] = None
+    images: list[str] = Field(default_factory=list)
+    price: Decimal | None = None
+    currency: Optional[str] = None  # ISO code as published; not limited to ``Currency``
+    availability: Optional[str] = None
+    rating: Decimal | None = None
+    review_count: Optional[int] = None
+    listing_price_discounted: Decimal | None = None
+    listing_price_original: Decimal | None = None
+    source: str                    # "json-ld", "state" (hydration data) or "playwright"
+    scraped_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+    @field_serializer("price", "rating", "listing_price_discounted", "listing_price_original", when_used="json")
+    def serialize_decimal(self, v: Decimal | None):
+        return str(v) if v is not None else None
+
+CATEGORY_META = "category"  # request meta: the category a listing page belongs to (see page_key)
+
+
+def page_key(page: int | str, category: str | None = None) -> str:
+    """Sink/checkpoint key of a page: ``"3"``, or ``"<category>/3"`` when pages are numbered per category."""
+    return f"{category}/{page}" if category else str(page)
+
+
 @dataclass(slots=True)
 class PageDone:
     page: int
     finished_at: str
+    category: str | None = None
+    lease: str | None = None  # frontier lease of the page; completed once the sink has it
+
+    @property
+    def key(self) -> str:
+        return page_key(self.page, self.category)
@@ -0,0 +1,27 @@
+import random
+import logging
+from scrapy.exceptions import NotConfigured
+from scrapy_playwright_demo.config import get_app_settings
+from scrapy_playwright_demo.utils.logging import get_logger
+
+class RotatingUserAgentAndProxyMiddleware:
+    # Proxies are assigned by middlewares.proxy.ProxyPoolMiddleware (one browser
+    # context per proxy) and status retries by CustomRetryMiddleware; this class
+    # only rotates the User-Agent.
+    def __init__(self, ua_list):
+        self.ua_list = ua_list
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # Prefer app_settings, fallback to Scrapy settings for compatibility
+        ua_list = get_app_settings().rotating_ua_list or crawler.settings.getlist("ROTATING_UA_LIST")
+        if not ua_list:
+            raise NotConfigured("ROTATING_UA_LIST is not set or empty")
+        return cls(ua_list)
+
+    def process_request(self, request, spider):
+        ua = random.choice(self.ua_list)
+        request.headers["User-Agent"] = ua
+        # Filtered out by the bound logger's level: no formatting cost unless DEBUG
+        get_logger(spider).debug("using_user_agent", ua=ua)
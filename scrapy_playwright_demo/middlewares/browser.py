@@ -0,0 +1,333 @@
+# scrapy_playwright_demo/middlewares/browser.py
+"""
+Browser resource telemetry and automatic context recycling.
+
+``BrowserSupervisorMiddleware`` routes every Playwright request through a
+*logical* context name (``persistent``, ``proxy-0``...) that maps to a
+*physical* scrapy-playwright context (``persistent``, ``persistent@1``...).
+A periodic sampler reads browser process RSS/CPU, open pages and JS heap
+(Chromium ``Performance.getMetrics``) and, once a context crosses its memory,
+age or page-count threshold, recycles it:
+
+1. the current storage state (cookies, localStorage) is captured,
+2. new requests go to the next generation, created lazily by scrapy-playwright
+   with that storage state,
+3. the old context is closed only after its in-flight requests and open pages
+   are gone, so nothing is dropped.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import task
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from prometheus_client import Counter as PromCounter
+    from prometheus_client import Gauge
+
+    browser_rss_bytes = Gauge("browser_rss_bytes", "RSS of all browser processes")
+    browser_cpu_percent = Gauge("browser_cpu_percent", "CPU usage of all browser processes")
+    browser_open_pages = Gauge("browser_open_pages", "Open pages per context", ["context"])
+    browser_js_heap_bytes = Gauge("browser_js_heap_bytes", "JS heap used per context", ["context"])
+    browser_context_recycles = PromCounter(
+        "browser_context_recycles_total", "Recycled browser contexts", ["reason"]
+    )
+except ImportError:
+    browser_rss_bytes = browser_cpu_percent = browser_open_pages = None
+    browser_js_heap_bytes = browser_context_recycles = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT = "default"
+META_LOGICAL = "_ctx_logical"
+META_PHYSICAL = "_ctx_physical"
+
+_MB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class RecycleThresholds:
+    """A threshold of 0 disables that check."""
+
+    max_rss_mb: float = 0.0       # whole browser process tree
+    max_js_heap_mb: float = 0.0   # per context (Chromium only)
+    max_age_s: float = 0.0
+    max_pages: int = 0            # pages opened in one context generation
+
+    def reason(self, ctx: ManagedContext, browser_rss_mb: float | None, now: float) -> str | None:
+        if self.max_pages and ctx.pages_opened >= self.max_pages:
+            return "pages"
+        if self.max_age_s and now - ctx.created_at >= self.max_age_s:
+            return "age"
+        if self.max_js_heap_mb and ctx.js_heap_mb >= self.max_js_heap_mb:
+            return "js_heap"
+        if self.max_rss_mb and browser_rss_mb is not None and browser_rss_mb >= self.max_rss_mb:
+            return "rss"
+        return None
+
+
+@dataclass
+class ManagedContext:
+    logical: str
+    generation: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+    pages_opened: int = 0
+    js_heap_mb: float = 0.0
+    storage_state: dict[str, Any] | None = None
+
+    @property
+    def physical(self) -> str:
+        # Generation 0 keeps the plain name so nothing changes until a recycle
+        return self.logical if self.generation == 0 else f"{self.logical}@{self.generation}"
+
+
+def playwright_handler(crawler) -> Any | None:
+    """Return the active scrapy-playwright download handler, if loaded."""
+    engine = getattr(crawler, "engine", None)
+    handlers = getattr(getattr(getattr(engine, "downloader", None), "handlers", None), "_handlers", {})
+    for handler in handlers.values():
+        if hasattr(handler, "context_wrappers"):
+            return handler
+    return None
+
+
+class BrowserSupervisorMiddleware:
+    def __init__(self, crawler, thresholds: RecycleThresholds, interval: float) -> None:
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.thresholds = thresholds
+        self.interval = interval
+        self.contexts: dict[str, ManagedContext] = {}
+        self.inflight: Counter[str] = Counter()
+        self.draining: set[str] = set()
+        self._loop: task.LoopingCall | None = None
+        self._sampling = False
+        self._processes: dict[int, Any] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("BROWSER_SUPERVISOR_ENABLED", True):
+            raise NotConfigured("BROWSER_SUPERVISOR_ENABLED is off")
+        thresholds = RecycleThresholds(
+            max_rss_mb=s.getfloat("CONTEXT_MAX_RSS_MB", 0.0),
+            max_js_heap_mb=s.getfloat("CONTEXT_MAX_JS_HEAP_MB", 0.0),
+            max_age_s=s.getfloat("CONTEXT_MAX_AGE_S", 0.0),
+            max_pages=s.getint("CONTEXT_MAX_PAGES", 0),
+        )
+        mw = cls(crawler, thresholds, s.getfloat("BROWSER_SAMPLE_INTERVAL_S", 15.0))
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    # Lifecycle -------------------------------------------------------------
+
+    def spider_opened(self, spider):
+        if self.interval > 0:
+            self._loop = task.LoopingCall(self._tick)
+            self._loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+
+    def _tick(self):
+        if self._sampling:
+            return None
+        self._sampling = True
+        d = deferred_from_coro(self.sample())
+        d.addErrback(lambda f: logger.warning("browser sampling failed: %s", f.value))
+        d.addBoth(lambda _: setattr(self, "_sampling", False))
+        return None
+
+    # Routing ---------------------------------------------------------------
+
+    def process_request(self, request, spider):
+        if not request.meta.get("playwright"):
+            return None
+        meta = request.meta
+        # Retries carry the physical name of the previous attempt: route by logical name
+        logical = meta.setdefault(META_LOGICAL, meta.get("playwright_context", DEFAULT_CONTEXT))
+        ctx = self.contexts.get(logical)
+        if ctx is None:
+            ctx = self.contexts[logical] = ManagedContext(logical)
+        meta["playwright_context"] = ctx.physical
+        if ctx.storage_state is not None:
+            kwargs = dict(meta.get("playwright_context_kwargs") or {})
+            kwargs["storage_state"] = ctx.storage_state
+            meta["playwright_context_kwargs"] = kwargs
+        ctx.pages_opened += 1
+        self._release(meta)  # a retried request may still hold its previous slot
+        meta[META_PHYSICAL] = ctx.physical
+        self.inflight[ctx.physical] += 1
+        return None
+
+    def process_response(self, request, response, spider):
+        self._release(request.meta)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._release(request.meta)
+        return None
+
+    def _release(self, meta) -> None:
+        physical = meta.pop(META_PHYSICAL, None)
+        if physical is not None and self.inflight[physical] > 0:
+            self.inflight[physical] -= 1
+            if physical in self.draining and not self.inflight[physical]:
+                self._schedule_drain()
+
+    def _schedule_drain(self, *_: Any) -> None:
+        d = deferred_from_coro(self.close_drained())
+        d.addErrback(lambda f: logger.warning("closing drained context failed: %s", f.value))
+
+    # Sampling & recycling --------------------------------------------------
+
+    def _browser_process_usage(self) -> tuple[float, float] | None:
+        """(RSS MB, CPU %) summed over all child processes (driver + browser)."""
+        if psutil is None:
+            return None
+        rss = cpu = 0.0
+        seen: dict[int, Any] = {}
+        try:
+            children = psutil.Process().children(recursive=True)
+        except psutil.Error:
+            return None
+        for child in children:
+            proc = self._processes.get(child.pid, child)
+            try:
+                rss += proc.memory_info().rss
+                cpu += proc.cpu_percent(interval=None)  # first call per process primes
+            except psutil.Error:
+                continue
+            seen[child.pid] = proc
+        self._processes = seen
+        return rss / _MB, cpu
+
+    @staticmethod
+    async def _js_heap_mb(context) -> float | None:
+        total = 0
+        for page in list(context.pages):
+            try:
+                session = await context.new_cdp_session(page)
+                try:
+                    await session.send("Performance.enable")
+                    metrics = await session.send("Performance.getMetrics")
+                finally:
+                    await session.detach()
+            except Exception:
+                # Not Chromium, or the page went away meanwhile
+                return None
+            total += next(
+                (m["value"] for m in metrics.get("metrics", []) if m["name"] == "JSHeapUsedSize"), 0
+            )
+        return total / _MB
+
+    async def sample(self) -> None:
+        handler = playwright_handler(self.crawler)
+        usage = self._browser_process_usage()
+        rss_mb = None
+        if usage is not None:
+            rss_mb, cpu = usage
+            self.stats.set_value("browser/rss_mb", round(rss_mb, 1))
+            self.stats.max_value("browser/rss_mb/max", round(rss_mb, 1))
+            self.stats.set_value("browser/cpu_percent", round(cpu, 1))
+            self.stats.max_value("browser/cpu_percent/max", round(cpu, 1))
+            if browser_rss_bytes is not None:
+                browser_rss_bytes.set(rss_mb * _MB)
+                browser_cpu_percent.set(cpu)
+        if handler is None:
+            return
+
+        wrappers = handler.context_wrappers
+        chromium = handler.config.browser_type_name == "chromium"
+        self.stats.set_value("browser/contexts_open", len(wrappers))
+        self.stats.set_value("browser/pages_open", sum(len(w.context.pages) for w in wrappers.values()))
+
+        now = time.monotonic()
+        for ctx in list(self.contexts.values()):
+            wrapper = wrappers.get(ctx.physical)
+            if wrapper is None:
+                continue
+            pages_open = len(wrapper.context.pages)
+            self.stats.max_value(f"browser/context/{ctx.logical}/pages_open/max", pages_open)
+            if browser_open_pages is not None:
+                browser_open_pages.labels(context=ctx.logical).set(pages_open)
+            if chromium:
+                heap = await self._js_heap_mb(wrapper.context)
+                if heap is not None:
+                    ctx.js_heap_mb = heap
+                    self.stats.max_value(f"browser/context/{ctx.logical}/js_heap_mb/max", round(heap, 1))
+                    if browser_js_heap_bytes is not None:
+                        browser_js_heap_bytes.labels(context=ctx.logical).set(heap * _MB)
+            if wrapper.persistent:
+                continue  # a user_data_dir can only back one live context
+            reason = self.thresholds.reason(ctx, rss_mb, now)
+            if reason is not None:
+                await self.recycle(ctx.logical, reason)
+
+        await self.close_drained()
+
+    async def recycle(self, logical: str, reason: str = "manual") -> bool:
+        """Move ``logical`` to a fresh context generation, re-seeded with its storage state."""
+        ctx = self.contexts.get(logical)
+        handler = playwright_handler(self.crawler)
+        if ctx is None or handler is None:
+            return False
+        wrapper = handler.context_wrappers.get(ctx.physical)
+        if wrapper is not None:
+            try:
+                ctx.storage_state = await wrapper.context.storage_state()
+            except Exception as e:
+                logger.warning("could not capture storage state of %s: %s", ctx.physical, e)
+        old = ctx.physical
+        ctx.generation += 1
+        ctx.created_at = time.monotonic()
+        ctx.pages_opened = 0
+        ctx.js_heap_mb = 0.0
+        self.draining.add(old)
+        if wrapper is not None:
+            # Close the old generation as soon as its last page goes away
+            for page in wrapper.context.pages:
+                page.on("close", self._schedule_drain)
+            wrapper.context.on("page", lambda page: page.on("close", self._schedule_drain))
+        self.stats.inc_value("browser/contexts_recycled")
+        self.stats.inc_value(f"browser/contexts_recycled/{reason}")
+        if browser_context_recycles is not None:
+            browser_context_recycles.labels(reason=reason).inc()
+        logger.info("recycling context %s → %s (reason: %s)", old, ctx.physical, reason)
+        await self.close_drained()
+        return True
+
+    async def recycle_all(self, reason: str = "manual") -> int:
+        recycled = 0
+        for logical in list(self.contexts):
+            recycled += await self.recycle(logical, reason)
+        return recycled
+
+    async def close_drained(self) -> None:
+        handler = playwright_handler(self.crawler)
+        if handler is None:
+            return
+        for physical in list(self.draining):
+            wrapper = handler.context_wrappers.get(physical)
+            if wrapper is None:
+                self.draining.discard(physical)
+                continue
+            if self.inflight[physical] or wrapper.context.pages:
+                continue  # still serving requests routed before the recycle
+            self.draining.discard(physical)
+            self.inflight.pop(physical, None)
+            await wrapper.context.close()
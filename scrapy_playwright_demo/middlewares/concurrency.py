@@ -0,0 +1,202 @@
+# scrapy_playwright_demo/middlewares/concurrency.py
+"""
+Adaptive render concurrency.
+
+``AdaptiveConcurrencyMiddleware`` watches every request going through the
+downloader (latency, 429s, 5xx, timeouts and other download errors) and the
+``render`` stage reported by ``PlaywrightListingSpider.rendered_page()``. Every
+``ADAPTIVE_CONCURRENCY_INTERVAL_S`` it asks ``AimdController`` for a new limit
+and applies it to the concurrency of every downloader slot. A slot created
+between ticks (a new host, or one Scrapy dropped after it idled) gets the
+current limit in ``process_request``, before its first download.
+
+The browser page pool (``PLAYWRIGHT_MAX_CONTEXTS`` *
+``PLAYWRIGHT_MAX_PAGES_PER_CONTEXT``) stays the hard ceiling, so it is also the
+default upper bound.
+"""
+from __future__ import annotations
+
+import logging
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+from scrapy_playwright_demo import instrumentation
+from scrapy_playwright_demo.concurrency import AimdController, ControllerConfig, Decision, LoadSample
+from scrapy_playwright_demo.utils.window import SlidingWindow
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from prometheus_client import Counter, Gauge
+
+    concurrency_limit = Gauge("adaptive_concurrency_limit", "Current render concurrency limit")
+    concurrency_decisions = Counter(
+        "adaptive_concurrency_decisions_total", "Concurrency controller decisions", ["action", "reason"]
+    )
+except ImportError:
+    concurrency_limit = concurrency_decisions = None
+
+logger = logging.getLogger(__name__)
+
+META_STARTED = "_acc_started_at"
+
+
+class AdaptiveConcurrencyMiddleware:
+    def __init__(self, crawler, controller: AimdController, interval: float, window_s: float) -> None:
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.controller = controller
+        self.interval = interval
+        self.requests = SlidingWindow(window_s)
+        self.errors = SlidingWindow(window_s)
+        self.throttled = SlidingWindow(window_s)
+        self.navigation = SlidingWindow(window_s)
+        self.render = SlidingWindow(window_s)
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.spider_name: str | None = None
+        self._loop: task.LoopingCall | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("ADAPTIVE_CONCURRENCY_ENABLED", False):
+            raise NotConfigured("ADAPTIVE_CONCURRENCY_ENABLED is off")
+        pool = s.getint("PLAYWRIGHT_MAX_CONTEXTS", 1) * s.getint("PLAYWRIGHT_MAX_PAGES_PER_CONTEXT", 1)
+        interval = s.getfloat("ADAPTIVE_CONCURRENCY_INTERVAL_S", 10.0)
+        window_s = s.getfloat("ADAPTIVE_CONCURRENCY_WINDOW_S", 30.0)
+        config = ControllerConfig(
+            min_limit=s.getint("ADAPTIVE_CONCURRENCY_MIN", 1),
+            max_limit=s.getint("ADAPTIVE_CONCURRENCY_MAX", 0) or pool,
+            target_latency_s=s.getfloat("ADAPTIVE_CONCURRENCY_TARGET_LATENCY_S", 30.0),
+            max_error_rate=s.getfloat("ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE", 0.10),
+            max_throttle_rate=s.getfloat("ADAPTIVE_CONCURRENCY_MAX_THROTTLE_RATE", 0.05),
+            max_cpu_percent=s.getfloat("ADAPTIVE_CONCURRENCY_MAX_CPU_PERCENT", 85.0),
+            min_memory_percent=s.getfloat("ADAPTIVE_CONCURRENCY_MIN_MEMORY_PERCENT", 10.0),
+            cooldown_s=window_s,
+        )
+        initial = s.getint("ADAPTIVE_CONCURRENCY_START", 0) or s.getint("CONCURRENT_REQUESTS_PER_DOMAIN", 8)
+        mw = cls(crawler, AimdController(config, initial), interval, window_s)
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    # Lifecycle -------------------------------------------------------------
+
+    def spider_opened(self, spider):
+        self.spider_name = spider.name
+        instrumentation.recorder.add_listener(self._on_stage)
+        if psutil is not None:
+            psutil.cpu_percent(interval=None)  # prime: the first reading is meaningless
+        self.apply(self.controller.limit)
+        if self.interval > 0:
+            self._loop = task.LoopingCall(self.tick)
+            self._loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        instrumentation.recorder.remove_listener(self._on_stage)
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+
+    def _on_stage(self, stage: str, seconds: float, spider: str) -> None:
+        if stage == "render" and spider in (self.spider_name, instrumentation.NO_SPIDER):
+            self.render.add(seconds)
+
+    # Observation -----------------------------------------------------------
+
+    def process_request(self, request, spider):
+        if META_STARTED in request.meta:
+            self._finish(request)  # retried before its previous attempt was accounted
+        self._limit_slot(request)
+        request.meta[META_STARTED] = time.monotonic()
+        self.inflight += 1
+        self.peak_inflight = max(self.peak_inflight, self.inflight)
+        return None
+
+    def process_response(self, request, response, spider):
+        started = self._finish(request)
+        self.requests.add()
+        if response.status == 429:
+            self.throttled.add()
+        elif response.status >= 500:
+            self.errors.add()
+        elif started is not None:
+            self.navigation.add(time.monotonic() - started)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._finish(request)
+        self.requests.add()
+        self.errors.add()
+        if "timeout" in type(exception).__name__.lower():
+            self.stats.inc_value("concurrency/timeouts")
+        return None
+
+    def _limit_slot(self, request) -> None:
+        # Creates the slot the downloader is about to use, if it does not exist yet
+        _, slot = self.crawler.engine.downloader._get_slot(request)
+        if slot.concurrency != self.controller.limit:
+            slot.concurrency = self.controller.limit
+
+    def _finish(self, request) -> float | None:
+        started = request.meta.pop(META_STARTED, None)
+        if started is not None and self.inflight > 0:
+            self.inflight -= 1
+        return started
+
+    # Control ---------------------------------------------------------------
+
+    def sample(self) -> LoadSample:
+        requests = self.requests.count()
+        cpu = memory = None
+        if psutil is not None:
+            cpu = psutil.cpu_percent(interval=None)
+            vm = psutil.virtual_memory()
+            memory = vm.available / vm.total * 100 if vm.total else None
+        return LoadSample(
+            requests=requests,
+            latency_s=self.navigation.percentile(90) + self.render.percentile(90),
+            error_rate=self.errors.count() / requests if requests else 0.0,
+            throttle_rate=self.throttled.count() / requests if requests else 0.0,
+            cpu_percent=cpu,
+            memory_available_percent=memory,
+            peak_inflight=self.peak_inflight,
+        )
+
+    def tick(self) -> Decision:
+        sample = self.sample()
+        decision = self.controller.decide(sample, time.monotonic())
+        self.peak_inflight = self.inflight
+        self.record(decision, sample)
+        self.apply(decision.limit)
+        return decision
+
+    def record(self, decision: Decision, sample: LoadSample) -> None:
+        self.stats.inc_value(f"concurrency/decisions/{decision.action}")
+        self.stats.inc_value(f"concurrency/decisions/{decision.action}/{decision.reason}")
+        if concurrency_decisions is not None:
+            concurrency_decisions.labels(action=decision.action, reason=decision.reason).inc()
+        if decision.changed:
+            logger.info(
+                "render concurrency %d → %d (%s; latency=%.1fs errors=%.0f%% 429=%.0f%% cpu=%s mem_free=%s)",
+                decision.previous, decision.limit, decision.reason, sample.latency_s,
+                sample.error_rate * 100, sample.throttle_rate * 100,
+                "n/a" if sample.cpu_percent is None else f"{sample.cpu_percent:.0f}%",
+                "n/a" if sample.memory_available_percent is None else f"{sample.memory_available_percent:.0f}%",
+            )
+
+    def apply(self, limit: int) -> None:
+        downloader = self.crawler.engine.downloader
+        for slot in downloader.slots.values():
+            slot.concurrency = limit
+        self.stats.set_value("concurrency/limit", limit)
+        self.stats.max_value("concurrency/limit/max", limit)
+        self.stats.min_value("concurrency/limit/min", limit)
+        if concurrency_limit is not None:
+            concurrency_limit.set(limit)
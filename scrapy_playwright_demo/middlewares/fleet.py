@@ -0,0 +1,92 @@
+# scrapy_playwright_demo/middlewares/fleet.py
+"""
+Fair page slots across the spiders of a fleet (``scrapy_playwright_demo.fleet``).
+
+``FairShareMiddleware`` is active only when the fleet runner put a shared
+``FairShare`` in ``FLEET_SHARE``. Every Playwright request then waits for a
+page slot before it reaches the browser, and gives it back when its page
+closes. With ``playwright_include_page`` that is when the spider closes the
+page, after rendering; otherwise it is when the response arrives. Waits are
+counted in the crawler's stats (``fleet/slots/*``).
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.defer import CancelledError, Deferred
+
+META_SLOT = "_fleet_slot"
+
+
+class FairShareMiddleware:
+    def __init__(self, crawler, share, label: str) -> None:
+        self.stats = crawler.stats
+        self.share = share
+        self.label = label
+        self._waiting: set[Deferred] = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        share = crawler.settings.get("FLEET_SHARE")
+        if share is None:
+            raise NotConfigured("not running in a fleet (no FLEET_SHARE)")
+        mw = cls(crawler, share, crawler.settings.get("FLEET_LABEL") or crawler.spidercls.name)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def spider_closed(self, spider):
+        self.share.close(self.label)
+        for d in list(self._waiting):
+            d.cancel()
+
+    async def process_request(self, request, spider):
+        if not request.meta.get("playwright"):
+            return None
+        self._release(request.meta)  # a retried request may still hold its previous slot
+        self.stats.inc_value("fleet/slots/requests")
+        d: Deferred = Deferred()
+
+        def grant() -> None:
+            if d.called:  # cancelled meanwhile: pass the slot on
+                self.share.release(self.label)
+            else:
+                d.callback(None)
+
+        if not self.share.acquire(self.label, grant):
+            started = time.monotonic()
+            self.stats.inc_value("fleet/slots/waited")
+            self._waiting.add(d)
+            try:
+                await maybe_deferred_to_future(d)
+            except (CancelledError, asyncio.CancelledError):
+                self.share.cancel(self.label, grant)
+                raise
+            finally:
+                self._waiting.discard(d)
+            waited = time.monotonic() - started
+            self.stats.inc_value("fleet/slots/wait_s", waited)
+            self.stats.max_value("fleet/slots/wait_s/max", waited)
+        request.meta[META_SLOT] = True
+        return None
+
+    def process_response(self, request, response, spider):
+        page = request.meta.get("playwright_page")
+        if page is not None and META_SLOT in request.meta:
+            # The page outlives the download: the slot is free once the callback closes it
+            meta = request.meta
+            page.once("close", lambda *_: self._release(meta))
+        else:
+            self._release(request.meta)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._release(request.meta)
+        return None
+
+    def _release(self, meta) -> None:
+        if meta.pop(META_SLOT, None):
+            self.share.release(self.label)
@@ -0,0 +1,86 @@
+# scrapy_playwright_demo/middlewares/frontier.py
+"""
+Spider middleware that tells ``FrontierScheduler`` what became of a claimed page.
+
+A page is complete only once the sink has it: the middleware puts the lease
+key on the callback's ``PageDone``, and ``PerPageSinkPipeline`` completes the
+task after writing the page. Output is queued before the pipelines run, so
+completing it when the callback ends could lose a page to a crash in between.
+A callback that ends without a ``PageDone`` (nothing to write) and without a
+retry for the same lease completes the task here. The task is failed if the
+callback raises. Errback output does not go through spider middlewares.
+A download failure without a retry is therefore not reported here. Its lease
+expires and the page is claimed again (see ``FrontierScheduler``).
+"""
+from __future__ import annotations
+
+from scrapy import Request
+from scrapy.exceptions import NotConfigured
+
+from scrapy_playwright_demo import signals as project_signals
+from scrapy_playwright_demo.frontier import FRONTIER_LEASE
+from scrapy_playwright_demo.items import PageDone
+
+
+class FrontierSpiderMiddleware:
+    def __init__(self, crawler) -> None:
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("FRONTIER_ENABLED"):
+            raise NotConfigured("FRONTIER_ENABLED is off")
+        return cls(crawler)
+
+    def process_spider_output(self, response, result, spider):
+        key = response.meta.get(FRONTIER_LEASE)
+        if key is None:
+            yield from result
+            return
+        handed_off = False  # retried, or left to the sink pipeline
+        try:
+            for output in result:
+                handed_off = _hand_off(output, key) or handed_off
+                yield output
+        except Exception as exc:
+            self._failed(response, spider, exc)
+            raise
+        if not handed_off:
+            self._done(key, spider)
+
+    async def process_spider_output_async(self, response, result, spider):
+        key = response.meta.get(FRONTIER_LEASE)
+        if key is None:
+            async for output in result:
+                yield output
+            return
+        handed_off = False
+        try:
+            async for output in result:
+                handed_off = _hand_off(output, key) or handed_off
+                yield output
+        except Exception as exc:
+            self._failed(response, spider, exc)
+            raise
+        if not handed_off:
+            self._done(key, spider)
+
+    def _done(self, key: str, spider) -> None:
+        self.crawler.signals.send_catch_log(project_signals.frontier_task_done, lease=key, spider=spider)
+
+    def _failed(self, response, spider, exc: Exception) -> None:
+        self.crawler.signals.send_catch_log(
+            project_signals.frontier_task_failed, request=response.request, spider=spider, reason=repr(exc)
+        )
+
+
+def _hand_off(output, key: str) -> bool:
+    """
+    True if someone else finishes the task: a request carrying the same lease
+    is a retry of this page, and a ``PageDone`` (tagged here) is completed by
+    the sink pipeline once the page is written.
+    """
+    if isinstance(output, PageDone):
+        output.lease = key
+        return True
+    return isinstance(output, Request) and output.meta.get(FRONTIER_LEASE) == key
@@ -0,0 +1,131 @@
+# scrapy_playwright_demo/middlewares/proxy.py
+"""
+Proxy selection from a health-scored ``ProxyPool``.
+
+Playwright ignores ``meta["proxy"]``: proxies are a browser *context* option.
+Playwright requests therefore get ``playwright_context="proxy-<n>"`` plus
+``playwright_context_kwargs={"proxy": {...}}``, so scrapy-playwright creates one
+context per proxy (``BrowserSupervisorMiddleware`` then recycles them like any
+other context). Plain HTTP requests keep using ``meta["proxy"]``.
+
+Sits after ``CustomRetryMiddleware`` (550) so it sees raw responses, including
+the 429/5xx that will be retried, and records every outcome against the proxy
+that served it. A quarantined proxy's context is recycled without a
+successor, which frees its slot in ``PLAYWRIGHT_MAX_CONTEXTS``.
+"""
+from __future__ import annotations
+
+import logging
+import time
+
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+
+from scrapy_playwright_demo.middlewares.browser import META_LOGICAL, BrowserSupervisorMiddleware
+from scrapy_playwright_demo.proxies import PoolConfig, ProxyPool, ProxyState, playwright_proxy
+
+try:
+    from prometheus_client import Counter, Gauge
+
+    proxy_requests = Counter("proxy_requests_total", "Requests per proxy and outcome", ["proxy", "outcome"])
+    proxy_score = Gauge("proxy_score", "Current proxy health score", ["proxy"])
+except ImportError:
+    proxy_requests = proxy_score = None
+
+logger = logging.getLogger(__name__)
+
+META_PROXY = "_proxy_index"
+META_STARTED = "_proxy_started_at"
+
+
+class ProxyPoolMiddleware:
+    def __init__(self, crawler, pool: ProxyPool, ban_codes: set[int]) -> None:
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.pool = pool
+        self.ban_codes = ban_codes
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        proxies = s.getlist("PROXY_LIST") or ([s.get("PROXY_URL")] if s.get("PROXY_URL") else [])
+        if not proxies:
+            raise NotConfigured("PROXY_LIST is empty")
+        config = PoolConfig(
+            window_s=s.getfloat("PROXY_WINDOW_S", 300.0),
+            failure_threshold=s.getfloat("PROXY_FAILURE_THRESHOLD", 0.5),
+            min_samples=s.getint("PROXY_MIN_SAMPLES", 5),
+            quarantine_base_s=s.getfloat("PROXY_QUARANTINE_BASE_S", 60.0),
+            quarantine_max_s=s.getfloat("PROXY_QUARANTINE_MAX_S", 1800.0),
+            # One context per proxy: never rotate through more than the browser allows
+            max_active=s.getint("PLAYWRIGHT_MAX_CONTEXTS", 0),
+        )
+        ban_codes = {int(c) for c in s.getlist("PROXY_BAN_CODES", [403, 407])}
+        return cls(crawler, ProxyPool(proxies, config), ban_codes)
+
+    def process_request(self, request, spider):
+        proxy = self.pool.choose()
+        if proxy is None:
+            return None
+        meta = request.meta
+        meta[META_PROXY] = proxy.index
+        meta[META_STARTED] = time.monotonic()
+        if meta.get("playwright"):
+            meta["playwright_context"] = proxy.label
+            kwargs = dict(meta.get("playwright_context_kwargs") or {})
+            kwargs["proxy"] = playwright_proxy(proxy.url)
+            meta["playwright_context_kwargs"] = kwargs
+            meta.pop(META_LOGICAL, None)  # a retry may land on another proxy's context
+        else:
+            meta["proxy"] = proxy.url
+        return None
+
+    def process_response(self, request, response, spider):
+        proxy, latency = self._pop(request)
+        if proxy is not None:
+            status = response.status
+            ok = status < 400 or (400 <= status < 500 and status not in self.ban_codes and status != 429)
+            self._record(proxy, ok, latency if ok else None, banned=status in self.ban_codes)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        proxy, _ = self._pop(request)
+        if proxy is not None:
+            self._record(proxy, False)
+        return None
+
+    def _pop(self, request) -> tuple[ProxyState | None, float | None]:
+        index = request.meta.pop(META_PROXY, None)
+        started = request.meta.pop(META_STARTED, None)
+        if index is None:
+            return None, None
+        latency = time.monotonic() - started if started is not None else None
+        return self.pool.proxies[index], latency
+
+    def _record(self, proxy: ProxyState, ok: bool, latency: float | None = None, banned: bool = False) -> None:
+        quarantined = self.pool.record(proxy, ok, latency, banned)
+        outcome = "success" if ok else ("ban" if banned else "failure")
+        prefix = f"proxy/{proxy.label}"
+        self.stats.inc_value(f"{prefix}/requests")
+        self.stats.inc_value(f"{prefix}/{outcome}")
+        if ok and latency is not None:
+            self.stats.set_value(f"{prefix}/latency_ms", round(proxy.latency_s * 1000, 1))
+        if proxy_requests is not None:
+            proxy_requests.labels(proxy=proxy.label, outcome=outcome).inc()
+            proxy_score.labels(proxy=proxy.label).set(self.pool.score(proxy))
+        if quarantined:
+            self.stats.inc_value(f"{prefix}/quarantined")
+            cool_down = proxy.quarantined_until - time.monotonic()
+            logger.warning("proxy %s quarantined for %.0fs (%s)", proxy.label, cool_down, outcome)
+            self._release_context(proxy)
+        self.stats.set_value("proxy/active", len(self.pool.active))
+
+    def _release_context(self, proxy: ProxyState) -> None:
+        try:
+            supervisor = self.crawler.get_downloader_middleware(BrowserSupervisorMiddleware)
+        except RuntimeError:
+            supervisor = None  # engine not running yet
+        if supervisor is None or proxy.label not in supervisor.contexts:
+            return
+        d = deferred_from_coro(supervisor.recycle(proxy.label, "quarantine"))
+        d.addErrback(lambda f: logger.warning("could not release context of %s: %s", proxy.label, f.value))
@@ -0,0 +1,224 @@
+# scrapy_playwright_demo/middlewares/ratelimit.py
+"""
+Per-host / per-proxy rate limiting and circuit breaking.
+
+``RateLimitMiddleware`` holds a request in ``process_request`` (a reactor
+timer, the reactor keeps running) until
+
+1. the circuit breakers of its host and of its proxy let it through, and
+2. a token is available in the host and proxy buckets.
+
+Outcomes (429, 5xx, download errors vs. anything else) feed the breakers. A
+host whose error rate crosses ``CIRCUIT_FAILURE_RATE`` is opened: its
+requests wait locally, without reaching the browser, until a half-open probe
+succeeds. A 429 ``Retry-After`` blocks the host bucket for that long.
+
+Held requests still count as active in the downloader, so the engine stops
+pulling new work from the scheduler while a storm lasts.
+
+By default the rates are 0 (unlimited), so only the breakers act; a bucket
+binds once ``RATELIMIT_HOST_RATE`` / ``RATELIMIT_PROXY_RATE`` is set.
+"""
+from __future__ import annotations
+
+import logging
+import time
+import urllib.parse
+
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
+
+from scrapy_playwright_demo.ratelimit import (
+    BREAKER_STATE_VALUE,
+    BreakerConfig,
+    BreakerState,
+    CircuitBreaker,
+    TokenBucket,
+)
+
+try:
+    from prometheus_client import Counter, Gauge
+
+    breaker_state = Gauge(
+        "circuit_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ["kind", "key"]
+    )
+    breaker_trips = Counter("circuit_breaker_trips_total", "Circuit breaker openings", ["kind"])
+    throttled_seconds = Counter(
+        "ratelimit_throttled_seconds_total", "Time requests were held locally", ["reason"]
+    )
+except ImportError:
+    breaker_state = breaker_trips = throttled_seconds = None
+
+logger = logging.getLogger(__name__)
+
+
+def proxy_key(request) -> str | None:
+    """Proxy of a request (HTTP ``meta["proxy"]`` or Playwright context proxy), without credentials."""
+    proxy = request.meta.get("proxy")
+    if not proxy:
+        kwargs = request.meta.get("playwright_context_kwargs") or {}
+        proxy = (kwargs.get("proxy") or {}).get("server")
+    if not proxy:
+        return None
+    parsed = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    host = parsed.hostname or proxy
+    return f"{parsed.scheme}://{host}:{parsed.port}" if parsed.port else f"{parsed.scheme}://{host}"
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        stats,
+        host_rate: float,
+        host_burst: float,
+        proxy_rate: float,
+        proxy_burst: float,
+        breaker_config: BreakerConfig,
+        clock=time.monotonic,
+    ) -> None:
+        self.stats = stats
+        self.limits = {"host": (host_rate, host_burst), "proxy": (proxy_rate, proxy_burst)}
+        self.breaker_config = breaker_config
+        self.clock = clock
+        self.buckets: dict[tuple[str, str], TokenBucket] = {}
+        self.breakers: dict[tuple[str, str], CircuitBreaker] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = crawler.settings
+        if not s.getbool("RATELIMIT_ENABLED", True):
+            raise NotConfigured("RATELIMIT_ENABLED is off")
+        breaker_config = BreakerConfig(
+            failure_rate=s.getfloat("CIRCUIT_FAILURE_RATE", 0.5),
+            min_requests=s.getint("CIRCUIT_MIN_REQUESTS", 10),
+            window_s=s.getfloat("CIRCUIT_WINDOW_S", 60.0),
+            open_s=s.getfloat("CIRCUIT_OPEN_S", 30.0),
+            max_open_s=s.getfloat("CIRCUIT_MAX_OPEN_S", 300.0),
+            half_open_probes=s.getint("CIRCUIT_HALF_OPEN_PROBES", 1),
+        )
+        return cls(
+            crawler.stats,
+            host_rate=s.getfloat("RATELIMIT_HOST_RATE", 0.0),
+            host_burst=s.getfloat("RATELIMIT_HOST_BURST", 1.0),
+            proxy_rate=s.getfloat("RATELIMIT_PROXY_RATE", 0.0),
+            proxy_burst=s.getfloat("RATELIMIT_PROXY_BURST", 1.0),
+            breaker_config=breaker_config,
+        )
+
+    # Keys ------------------------------------------------------------------
+
+    @staticmethod
+    def scopes(request) -> list[tuple[str, str]]:
+        keys = [("host", urlparse_cached(request).hostname or "")]
+        proxy = proxy_key(request)
+        if proxy:
+            keys.append(("proxy", proxy))
+        return keys
+
+    def _bucket(self, scope: tuple[str, str]) -> TokenBucket:
+        bucket = self.buckets.get(scope)
+        if bucket is None:
+            rate, burst = self.limits[scope[0]]
+            bucket = self.buckets[scope] = TokenBucket(rate, burst, now=self.clock())
+        return bucket
+
+    def _breaker(self, scope: tuple[str, str]) -> CircuitBreaker:
+        breaker = self.breakers.get(scope)
+        if breaker is None:
+            breaker = self.breakers[scope] = CircuitBreaker(self.breaker_config)
+        return breaker
+
+    # Admission -------------------------------------------------------------
+
+    def admission_delay(self, request) -> tuple[float, str | None]:
+        """Seconds to hold ``request`` and why ("circuit" or "rate"); takes tokens when admitted."""
+        now = self.clock()
+        scopes = self.scopes(request)
+        circuit_wait = 0.0
+        for scope in scopes:
+            breaker = self._breaker(scope)
+            before = breaker.state
+            circuit_wait = max(circuit_wait, breaker.before_request(now))
+            self._transition(scope, breaker, before)
+        if circuit_wait > 0:
+            return circuit_wait, "circuit"
+        rate_wait = max(self._bucket(scope).reserve(now) for scope in scopes)
+        if rate_wait > 0:
+            return rate_wait, "rate"
+        return 0.0, None
+
+    async def process_request(self, request, spider):
+        held = False
+        while True:
+            wait, reason = self.admission_delay(request)
+            if reason is None:
+                return None
+            if not held:
+                held = True
+                self.stats.inc_value("ratelimit/held_requests")
+            self._throttled(reason, wait)
+            await maybe_deferred_to_future(deferLater(reactor, wait, lambda: None))
+            if reason == "rate":
+                return None  # the token was reserved for this request
+
+    def _throttled(self, reason: str, seconds: float) -> None:
+        self.stats.inc_value(f"ratelimit/throttled_seconds/{reason}", seconds, start=0.0)
+        if throttled_seconds is not None:
+            throttled_seconds.labels(reason=reason).inc(seconds)
+
+    # Outcomes --------------------------------------------------------------
+
+    def process_response(self, request, response, spider):
+        failure = response.status == 429 or response.status >= 500
+        self._record(request, failure)
+        if response.status == 429:
+            retry_after = self._retry_after(response)
+            if retry_after:
+                host = self.scopes(request)[0]
+                until = self.clock() + min(retry_after, self.breaker_config.max_open_s)
+                self._bucket(host).block_until(until)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self._record(request, True)
+        return None
+
+    @staticmethod
+    def _retry_after(response) -> float | None:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return float(value.decode("latin-1"))
+        except ValueError:
+            return None  # HTTP-date form: leave it to the breaker
+
+    def _record(self, request, failure: bool) -> None:
+        now = self.clock()
+        for scope in self.scopes(request):
+            breaker = self._breaker(scope)
+            before = breaker.state
+            breaker.record(failure, now)
+            self._transition(scope, breaker, before)
+
+    def _transition(self, scope: tuple[str, str], breaker: CircuitBreaker, before: BreakerState) -> None:
+        state = breaker.state
+        if state is before:
+            return
+        kind, key = scope
+        self.stats.inc_value(f"circuit/{kind}/{state.value}")
+        self.stats.set_value("circuit/not_closed", self.not_closed_count())
+        if breaker_state is not None:
+            breaker_state.labels(kind=kind, key=key).set(BREAKER_STATE_VALUE[state])
+        if state is BreakerState.OPEN:
+            if breaker_trips is not None:
+                breaker_trips.labels(kind=kind).inc()
+            logger.warning("circuit open for %s %s (%.0fs)", kind, key, breaker.open_for)
+        else:
+            logger.info("circuit %s for %s %s", state.value, kind, key)
+
+    def not_closed_count(self) -> int:
+        return sum(b.state is not BreakerState.CLOSED for b in self.breakers.values())
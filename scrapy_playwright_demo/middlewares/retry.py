@@ -1,12 +1,13 @@
-from scrapy_playwright_demo.retry import build_retry_policy
+from scrapy_playwright_demo.retry import RETRY_ATTEMPT_KEY, RETRY_DELAY_KEY, plan_retry
 from scrapy_playwright_demo.utils.logging import get_logger
-from twisted.internet import reactor, defer
 from scrapy.utils.response import response_status_message
 from scrapy.exceptions import IgnoreRequest
 
 class CustomRetryMiddleware:
-    def __init__(self, policy):
+    def __init__(self, policy, budget=None, stats=None):
         self.policy = policy
+        self.budget = budget
+        self.stats = stats
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -14,38 +15,45 @@ class CustomRetryMiddleware:
         if container is None:
             raise RuntimeError("DI Container not found in settings. Make sure settings.CONTAINER is set.")
         policy = container.retry_policy()
-        return cls(policy)
+        return cls(policy, container.retry_budget(), crawler.stats)
+
+    def process_request(self, request, spider):
+        # Every attempt counts towards the host's retry budget denominator
+        if self.budget is not None:
+            self.budget.record_request(self.budget.host(request))
+        return None
 
     def process_response(self, request, response, spider):
         logger = get_logger(spider)
-        attempt = request.meta.get("retry_attempt", 0)
+        attempt = request.meta.get(RETRY_ATTEMPT_KEY, 0)
         if response.status in self.policy.retry_http_codes:
-            if attempt < self.policy.max_retries:
-                delay = self.policy.next_delay(attempt)
-                logger.info("retrying_response", url=request.url, status=response.status, attempt=attempt+1, delay=delay)
-                new_request = request.copy()
-                new_request.meta["retry_attempt"] = attempt + 1
-                new_request.meta["download_delay"] = delay
-                new_request.dont_filter = True
+            classification = self.policy.classify_status(response.status)
+            new_request = plan_retry(self.policy, self.budget, request, classification, self.stats)
+            if new_request is not None:
+                delay = new_request.meta[RETRY_DELAY_KEY]
+                logger.info("retrying_response", url=request.url, status=response.status, attempt=attempt+1,
+                            delay=delay, error_class=classification.error_class.value)
                 return new_request
             else:
                 logger.warning("max_retries_exceeded", url=request.url, status=response.status)
-                raise IgnoreRequest(f"Gave up retrying {request} (failed {attempt} times): {response_status_message(response.status)}")
+                raise IgnoreRequest(f"Gave up retrying {request} (failed {attempt + 1} times): {response_status_message(response.status)}")
         return response
 
     def process_exception(self, request, exception, spider):
         logger = get_logger(spider)
-        attempt = request.meta.get("retry_attempt", 0)
-        if isinstance(exception, self.policy.retry_exceptions):
-            if attempt < self.policy.max_retries:
-                delay = self.policy.next_delay(attempt)
-                logger.info("retrying_exception", url=request.url, exc=type(exception).__name__, attempt=attempt+1, delay=delay)
-                new_request = request.copy()
-                new_request.meta["retry_attempt"] = attempt + 1
-                new_request.meta["download_delay"] = delay
-                new_request.dont_filter = True
-                return new_request
-            else:
-                logger.warning("max_retries_exceeded_exception", url=request.url, exc=type(exception).__name__)
-                raise IgnoreRequest(f"Gave up retrying {request} (failed {attempt} times): {exception}")
-        return None 
\ No newline at end of file
+        attempt = request.meta.get(RETRY_ATTEMPT_KEY, 0)
+        if isinstance(exception, IgnoreRequest):
+            return None
+        classification = self.policy.classify_exception(exception)
+        new_request = plan_retry(self.policy, self.budget, request, classification, self.stats)
+        if new_request is not None:
+            delay = new_request.meta[RETRY_DELAY_KEY]
+            logger.info("retrying_exception", url=request.url, exc=type(exception).__name__, attempt=attempt+1,
+                        delay=delay, kind=classification.kind)
+            return new_request
+        if classification.retryable:
+            logger.warning("max_retries_exceeded_exception", url=request.url, exc=type(exception).__name__)
+            raise IgnoreRequest(f"Gave up retrying {request} (failed {attempt + 1} times): {exception}")
+        # Permanent failures go straight to the errback, with the original exception
+        logger.warning("permanent_failure", url=request.url, exc=type(exception).__name__, kind=classification.kind)
+        return None
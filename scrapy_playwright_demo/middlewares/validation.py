@@ -0,0 +1,116 @@
+# scrapy_playwright_demo/middlewares/validation.py
+"""
+Spider middleware that validates a page's items in one batch.
+
+An item pipeline only ever sees one item. To hold items back until their
+page is complete, it would have to return pending results. Those stall the
+scraper once ``CONCURRENT_ITEMS`` of them are open, and they let ``PageDone``
+overtake its own items. A spider callback's output, by contrast, holds the
+whole page. This middleware collects the product items up to each
+``PageDone`` (or ``VALIDATE_BATCH_SIZE`` items) and runs
+``ValidateProductPipeline.validate_batch`` on them. It then yields the
+surviving ProductItems in their original order, ahead of the marker.
+They are marked as validated, so ``ValidateProductPipeline`` passes them
+on without a second check and the ``validate`` stage is timed once, here.
+Requests pass straight through.
+
+Dropped items never reach the pipelines: they are counted in
+``validate/dropped/<reason>`` and logged at debug level instead of raising
+``DropItem``. ``item_dropped`` is still sent for each, with the ``DropItem``
+the pipeline would have raised, so Scrapy's ``item_dropped_count`` and
+``item_dropped_reasons_count/DropItem`` keep counting them. Errback output does not go through spider middlewares. Its items
+are validated one by one by the pipeline, as before.
+"""
+from __future__ import annotations
+
+import logging
+
+from itemadapter import is_item
+from pydantic import BaseModel
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+
+from scrapy_playwright_demo import instrumentation
+from scrapy_playwright_demo.items import PageDone, ProductItem, product_item_class
+from scrapy_playwright_demo.pipelines import ValidateProductPipeline, _drop_message
+
+logger = logging.getLogger(__name__)
+
+_PIPELINE = "scrapy_playwright_demo.pipelines.ValidateProductPipeline"
+
+
+class BatchValidationSpiderMiddleware:
+    def __init__(
+        self, batch_size: int, stats=None, model: type[ProductItem] = ProductItem, signals=None
+    ) -> None:
+        self.batch_size = batch_size
+        self.stats = stats
+        self.model = model
+        self.signals = signals
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        batch_size = crawler.settings.getint("VALIDATE_BATCH_SIZE", 0)
+        if batch_size <= 0:
+            raise NotConfigured("VALIDATE_BATCH_SIZE is 0")
+        if _PIPELINE not in crawler.settings.getwithbase("ITEM_PIPELINES"):
+            raise NotConfigured("ValidateProductPipeline is not enabled")
+        return cls(
+            batch_size, crawler.stats, product_item_class(crawler.settings.get("MONEY_MODE")), crawler.signals
+        )
+
+    def process_spider_output(self, response, result, spider):
+        batch: list = []
+        for output in result:
+            if self._is_product(output):
+                batch.append(output)
+                if len(batch) >= self.batch_size:
+                    yield from self._flush(batch, response, spider)
+                    batch = []
+                continue
+            if isinstance(output, PageDone):
+                yield from self._flush(batch, response, spider)
+                batch = []
+            yield output
+        yield from self._flush(batch, response, spider)
+
+    async def process_spider_output_async(self, response, result, spider):
+        batch: list = []
+        async for output in result:
+            if self._is_product(output):
+                batch.append(output)
+                if len(batch) >= self.batch_size:
+                    for item in self._flush(batch, response, spider):
+                        yield item
+                    batch = []
+                continue
+            if isinstance(output, PageDone):
+                for item in self._flush(batch, response, spider):
+                    yield item
+                batch = []
+            yield output
+        for item in self._flush(batch, response, spider):
+            yield item
+
+    @staticmethod
+    def _is_product(output) -> bool:
+        # ProductItems and plain dict-like items; other models (e.g. ProductDetailItem) are not ours
+        if isinstance(output, ProductItem):
+            return True
+        return is_item(output) and not isinstance(output, (PageDone, BaseModel))
+
+    def _flush(self, batch: list, response, spider):
+        if not batch:
+            return
+        with instrumentation.timed("validate", getattr(spider, "name", None)):
+            results = ValidateProductPipeline.validate_batch(batch, spider, self.stats, self.model)
+        for item, reason in results:
+            if reason is None:
+                yield item
+            else:
+                logger.debug("Dropped item (%s): %r", reason, item)
+                if self.signals is not None:
+                    self.signals.send_catch_log(
+                        signals.item_dropped, item=item, response=response,
+                        exception=DropItem(_drop_message(reason)), spider=spider,
+                    )
@@ -0,0 +1,62 @@
+# scrapy_playwright_demo/money.py
+"""
+Exact money as integer minor units (``MONEY_MODE=minor``).
+
+In the default ``decimal`` mode a price is a ``Decimal`` from extraction to
+serialization. In ``minor`` mode it is an ``int`` of cents from the moment
+it is parsed. Comparisons, validation and sorting are then integer
+operations, and each price is a small int instead of a ``Decimal`` object.
+Conversion happens only at the edges, and it is exact:
+
+* ``parse_es("1.199,95")`` → ``119995`` (listing text, no ``Decimal``);
+* ``to_minor(Decimal("19.9"))`` → ``1990``; a value with more decimals
+  than the currency has is rejected instead of rounded;
+* ``format_minor(119995)`` → ``"1199.95"``, the same string
+  ``str(Decimal("1199.95"))`` gives, so the JSON output is unchanged;
+* ``from_minor(119995)`` → ``Decimal("1199.95")`` for callers that want one.
+
+Every ``Currency`` (EUR, USD, GBP) has two minor digits.
+"""
+from __future__ import annotations
+
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+MINOR_DIGITS = 2
+_FACTOR = 10 ** MINOR_DIGITS
+
+
+def parse_amount(raw: str, thousands: str = ".", decimal: str = ",") -> int:
+    """Minor units of a localized amount (``1.199,95``, ``99,9``, ``12``; ``1,199.95`` with the separators swapped)."""
+    units, _, frac = (raw.replace(thousands, "") if thousands else raw).partition(decimal)
+    if len(frac) > MINOR_DIGITS or not units.isdigit() or (frac and not frac.isdigit()):
+        raise ValueError(f"not an exact amount: {raw!r}")
+    return int(units) * _FACTOR + int(frac.ljust(MINOR_DIGITS, "0") or 0)
+
+
+def parse_es(raw: str) -> int:
+    """Minor units of an es-ES formatted amount (``1.199,95``)."""
+    return parse_amount(raw, ".", ",")
+
+
+def to_minor(value: Any) -> int:
+    """Minor units of a major-unit amount (``Decimal``, ``str`` or ``float``), exactly."""
+    try:
+        scaled = Decimal(str(value)).scaleb(MINOR_DIGITS)
+    except InvalidOperation:
+        raise ValueError(f"not an amount: {value!r}") from None
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"{value!r} has more than {MINOR_DIGITS} decimals")
+    return int(scaled)
+
+
+def from_minor(minor: int) -> Decimal:
+    return Decimal(minor).scaleb(-MINOR_DIGITS)
+
+
+def format_minor(minor: int) -> str:
+    """``str(from_minor(minor))`` without building the ``Decimal``."""
+    if minor < 0:
+        return "-" + format_minor(-minor)
+    units, frac = divmod(minor, _FACTOR)
+    return f"{units}.{frac:0{MINOR_DIGITS}d}"
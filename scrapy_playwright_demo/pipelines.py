@@ -4,15 +4,17 @@ from __future__ import annotations
 from collections import defaultdict
 from dataclasses import asdict
 from datetime import UTC, datetime
-from decimal import Decimal
 from typing import Any, Dict, Iterable, List, Mapping
 
 from itemadapter import ItemAdapter
-from pydantic import ValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from scrapy import signals
 from scrapy.exceptions import DropItem
 
-from scrapy_playwright_demo.items import PageDone, ProductItem
+from scrapy_playwright_demo import instrumentation
+from scrapy_playwright_demo import signals as project_signals
+from scrapy_playwright_demo.checkpoint import Checkpoint
+from scrapy_playwright_demo.items import PageDone, ProductDetailItem, ProductItem, page_key, product_item_class
 from scrapy_playwright_demo.sinks.base import PageSink
 from scrapy_playwright_demo.sinks.registry import build_sink
 
@@ -21,8 +23,8 @@ from scrapy_playwright_demo.sinks.registry import build_sink
 # Utils
 # --------------------------------------------------------------------------- #
 def _to_jsonable_dict(item: Any) -> Dict[str, Any]:
-    if isinstance(item, ProductItem):
-        # pydantic v2 → json mode already converts Decimal/Datetime
+    if isinstance(item, BaseModel):
+        # pydantic v2 (ProductItem, ProductDetailItem) → json mode already converts Decimal/Datetime
         return item.model_dump(mode="json")
     if hasattr(item, "__dataclass_fields__"):
         return asdict(item)
@@ -40,45 +42,146 @@ def _get_bool(settings, key, default):
         return bool(getattr(settings, attr, default))
 
 
+def _spider_name(spider) -> str | None:
+    return getattr(spider, "name", None)
+
+
 # --------------------------------------------------------------------------- #
 # 1) Validation pipeline
 # --------------------------------------------------------------------------- #
 class ValidateProductPipeline:
-    """Lightweight validation for ProductItem."""
+    """
+    Lightweight validation for ProductItem.
+
+    ``process_item`` validates one item at a time. ``validate_batch`` applies
+    the same rules to a whole page in one pydantic call; it is used by
+    ``BatchValidationSpiderMiddleware`` (``VALIDATE_BATCH_SIZE``). The items
+    it returns are marked as validated, and this pipeline passes them through
+    untouched (and untimed: the middleware records the ``validate`` stage).
+    Drops are counted in stats as ``validate/dropped/<reason>``.
+    """
 
     REQUIRED = ("title", "link", "currency", "page")
+    _LIST_ADAPTERS: Dict[type, TypeAdapter] = {ProductItem: TypeAdapter(List[ProductItem])}
+
+    def __init__(self, stats=None, model: type[ProductItem] = ProductItem):
+        self.stats = stats
+        self.model = model
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(stats=crawler.stats, model=product_item_class(crawler.settings.get("MONEY_MODE")))
 
     def process_item(self, item, spider):
         # Do not try to validate PageDone
         if isinstance(item, PageDone):
             return item
+        # Validated with the rest of its page (BatchValidationSpiderMiddleware)
+        if isinstance(item, ProductItem) and item._validated:
+            return item
+        with instrumentation.timed("validate", _spider_name(spider)):
+            return self._validate(item, spider)
 
+    def _validate(self, item, spider):
         # If not a ProductItem, try to validate it
         if not isinstance(item, ProductItem):
             try:
                 raw = ItemAdapter(item).asdict()
-                item = ProductItem.model_validate(raw)
+                item = self.model.model_validate(raw)
             except ValidationError as e:
+                _count_drop(self.stats, _error_reason(e.errors()[0]))
                 raise DropItem(f"ProductItem validation error: {e}")
 
         # From here on, we always have a ProductItem
-        data = item.model_dump(mode="python")
+        reason = self._apply_rules(item, spider)
+        if reason is not None:
+            _count_drop(self.stats, reason)
+            raise DropItem(_drop_message(reason))
+        return item
+
+    @classmethod
+    def validate_batch(
+        cls, items: List[Any], spider=None, stats=None, model: type[ProductItem] = ProductItem
+    ) -> List[tuple[Any, str | None]]:
+        """
+        ``(ProductItem, None)`` or ``(original item, drop reason)`` for each input, in order.
+
+        Returned ProductItems are marked as validated, so ``process_item``
+        lets them through without checking them again.
+
+        Items that are not ProductItems yet are validated in a single
+        ``TypeAdapter(list[ProductItem])`` call. If that fails, the failing
+        positions are read from the error locations and the rest is validated
+        again, so one bad item costs one extra call, not one call per item.
+        ``model`` is the class raw items become (see ``product_item_class``).
+        """
+        adapter = cls._LIST_ADAPTERS.get(model)
+        if adapter is None:
+            adapter = cls._LIST_ADAPTERS[model] = TypeAdapter(List[model])
+        results: List[tuple[Any, str | None]] = [(item, None) for item in items]
+        positions = [i for i, item in enumerate(items) if not isinstance(item, ProductItem)]
+        # Plain dicts go to pydantic as they are; ItemAdapter.asdict() would deep-copy them
+        raws = [items[i] if type(items[i]) is dict else ItemAdapter(items[i]).asdict() for i in positions]
+        try:
+            models = adapter.validate_python(raws)
+            valid = positions
+        except ValidationError as e:
+            failed: Dict[int, str] = {}
+            for err in e.errors():
+                failed.setdefault(err["loc"][0], _error_reason(err, skip=1))
+            for k, reason in failed.items():
+                results[positions[k]] = (items[positions[k]], reason)
+            valid = [positions[k] for k in range(len(raws)) if k not in failed]
+            models = adapter.validate_python([raws[k] for k in range(len(raws)) if k not in failed])
+        for i, model in zip(valid, models):
+            results[i] = (model, None)
+
+        for i, (item, reason) in enumerate(results):
+            if reason is None:
+                reason = cls._apply_rules(item, spider)
+                if reason is not None:
+                    results[i] = (items[i], reason)
+                else:
+                    item._validated = True
+            if reason is not None:
+                _count_drop(stats, reason)
+        return results
 
+    @classmethod
+    def _apply_rules(cls, item: ProductItem, spider) -> str | None:
+        """Drop reason, or None after normalising the item in place."""
         # Required fields
-        for field in self.REQUIRED:
-            if data.get(field) in (None, ""):
-                raise DropItem(f"Missing required field: {field}")
-
-        # Rule: if discounted > original → swap
-        now = data.get("price_discounted")
-        orig = data.get("price_original")
-        if now is not None and orig is not None and Decimal(str(now)) > Decimal(str(orig)):
+        for field in cls.REQUIRED:
+            if getattr(item, field, None) in (None, ""):
+                return f"missing_{field}"
+
+        # Rule: if discounted > original → swap (Decimals, or int cents in minor money mode)
+        now, orig = item.price_discounted, item.price_original
+        if now is not None and orig is not None and now > orig:
             # swap in the model itself
-            item.price_discounted, item.price_original = item.price_original, item.price_discounted
+            item.price_discounted, item.price_original = orig, now
             if spider:
                 spider.logger.debug("Swapping prices because discounted > original")
+        return None
+
+
+def _error_reason(err: Mapping[str, Any], skip: int = 0) -> str:
+    """Bounded stats key for a pydantic error: ``invalid_<field>`` (``missing_<field>`` if absent)."""
+    loc = err.get("loc", ())[skip:]
+    field = str(loc[0]) if loc else "item"
+    return f"missing_{field}" if err.get("type") == "missing" else f"invalid_{field}"
 
-        return item
+
+def _drop_message(reason: str) -> str:
+    if reason.startswith("missing_"):
+        return f"Missing required field: {reason[len('missing_'):]}"
+    return f"ProductItem validation error: {reason}"
+
+
+def _count_drop(stats, reason: str) -> None:
+    if stats is not None:
+        stats.inc_value("validate/dropped")
+        stats.inc_value(f"validate/dropped/{reason}")
 
 
 # --------------------------------------------------------------------------- #
@@ -87,35 +190,90 @@ class ValidateProductPipeline:
 class PerPageSinkPipeline:
     """
     Generic per-page buffering pipeline writing through a PageSink.
+
+    Pages are keyed by ``page_key(page, category)``: with sitemap discovery
+    every category is numbered from 1, so ``"<category>/3"`` keeps their
+    pages apart in the buffer, the sink and the checkpoint.
+
+    With a ``Checkpoint`` every buffered item is also persisted (in batches,
+    written at the latest when the spider goes idle or closes), so a crashed
+    crawl resumes with its partial pages instead of losing them. A page is
+    marked complete once the sink has it. A spider closed before finishing
+    keeps its partial pages in the checkpoint rather than flushing them as
+    if they were complete. A ``PageDone`` carrying a frontier lease completes
+    that task (``frontier_task_done``) only after the sink write.
     """
 
-    def __init__(self, sink: PageSink, drop_missing_page: bool = True):
+    def __init__(self, sink: PageSink, drop_missing_page: bool = True, checkpoint: Checkpoint | None = None):
         self.sink = sink
         self.drop_missing_page = drop_missing_page
+        self.checkpoint = checkpoint
         self.buffer: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
         self._settings: Mapping[str, Any] = {}
+        self.spider_name: str | None = None
+        self.stats = None
+        self.signals = None
 
     @classmethod
     def from_crawler(cls, crawler):
         container = crawler.settings.get("CONTAINER")
         if container is None:
             raise RuntimeError("DI Container not found in settings. Make sure settings.CONTAINER is set.")
-        sink = container.page_sink()
+        sink = container.page_sink(crawler.settings)
         drop_missing_page = _get_bool(crawler.settings, "PAGE_DROP_MISSING_FIELD", True)
         pipe = cls(
             sink=sink,
             drop_missing_page=drop_missing_page,
+            checkpoint=container.checkpoint(crawler.settings),
         )
         pipe._settings = crawler.settings
+        pipe.stats = getattr(crawler, "stats", None)
+        pipe.signals = crawler.signals
         crawler.signals.connect(pipe.spider_opened, signals.spider_opened)
+        crawler.signals.connect(pipe.spider_idle, signals.spider_idle)
         crawler.signals.connect(pipe.close_spider, signals.spider_closed)
         return pipe
 
-    # Not strictly needed for file sink, but keep the hook in case
     def spider_opened(self, spider):
-        pass
+        self.spider_name = _spider_name(spider)
+        sink_open = getattr(self.sink, "open", None)
+        if sink_open is not None:
+            sink_open(self._settings)
+        if self.checkpoint is not None:
+            restored = self.checkpoint.restore_buffers()
+            for page_no, items in restored.items():
+                self.buffer[page_no].extend(items)
+            if restored and spider:
+                spider.logger.info(
+                    "Restored %d buffered items of %d unfinished pages from the checkpoint",
+                    sum(map(len, restored.values())), len(restored),
+                )
+
+    def spider_idle(self, spider):
+        if self.checkpoint is not None:
+            self.checkpoint.flush()
+
+    def close_spider(self, spider, reason: str = "finished"):
+        try:
+            self._flush_remaining(spider, reason)
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.flush()  # partial pages of an interrupted crawl
+            # A fan-out sink drains its queues here; its per-sink counters are final afterwards
+            close = getattr(self.sink, "close", None)
+            if close is not None:
+                close()
+            sink_stats = getattr(self.sink, "stats", None)
+            if self.stats is not None and sink_stats is not None:
+                for key, value in sink_stats().items():
+                    self.stats.set_value(key, value)
 
-    def close_spider(self, spider):
+    def _flush_remaining(self, spider, reason: str) -> None:
+        if self.checkpoint is not None and reason != "finished" and self.buffer:
+            # Partial pages stay in the checkpoint; the resumed crawl completes them
+            if spider:
+                spider.logger.info("Keeping %d unfinished pages in the checkpoint (%s)", len(self.buffer), reason)
+            return
         # Flush any page left in the buffer
         now = datetime.now(UTC).isoformat()
         for page_no in list(self.buffer.keys()):
@@ -125,13 +283,13 @@ class PerPageSinkPipeline:
     def process_item(self, item, spider):
         # If the end-of-page marker arrives → flush
         if isinstance(item, PageDone):
-            self._flush_page(str(item.page), item.finished_at.isoformat())
+            self._flush_page(item.key, item.finished_at.isoformat(), item.lease)
             return item
 
         # Normal item
         page_no: str | None = None
-        if isinstance(item, ProductItem):
-            page_no = str(item.page)
+        if isinstance(item, (ProductItem, ProductDetailItem)):
+            page_no = page_key(item.page, item.category)
         else:
             page_no = self._get_page_from_generic_item(item)
 
@@ -149,26 +307,46 @@ class PerPageSinkPipeline:
                 spider.logger.warning("%s: %s", msg, item)
             return item
 
-        self.buffer[page_no].append(_to_jsonable_dict(item))
+        with instrumentation.timed("buffer", self.spider_name):
+            data = _to_jsonable_dict(item)
+            if self.checkpoint is not None:
+                if self.checkpoint.is_done(page_no):
+                    return item  # re-rendered page the sink already has
+                if not self.checkpoint.buffer_item(page_no, data):
+                    return item  # restored from the checkpoint already
+            self.buffer[page_no].append(data)
         return item
 
     # Helpers
-    def _flush_page(self, page_no: str, finished_at: str):
+    def _flush_page(self, page_no: str, finished_at: str, lease: str | None = None):
         items = self.buffer.pop(page_no, [])
         if not items:
+            if self.checkpoint is not None:
+                self.checkpoint.mark_done([page_no], finished_at)
+            self._complete(lease)
             return
 
         # Delegate to the sink. It will handle compression, idempotency, etc.
-        self.sink.write_page(
-            items=items,
-            page=page_no,
-            finished_at=finished_at,
-            settings=self._settings,
-        )
+        with instrumentation.spider_scope(self.spider_name), instrumentation.timed("flush"):
+            self.sink.write_page(
+                items=items,
+                page=page_no,
+                finished_at=finished_at,
+                settings=self._settings,
+            )
+        if self.checkpoint is not None:
+            self.checkpoint.mark_done([page_no], finished_at)
+        self._complete(lease)
+
+    def _complete(self, lease: str | None) -> None:
+        # The page is in the sink: only now may the shared frontier forget it
+        if lease is not None and self.signals is not None:
+            self.signals.send_catch_log(project_signals.frontier_task_done, lease=lease, spider=None)
 
     @staticmethod
     def _get_page_from_generic_item(item: Any) -> str | None:
         try:
-            return str(ItemAdapter(item).get("page"))
+            adapter = ItemAdapter(item)
+            return page_key(adapter.get("page"), adapter.get("category"))
         except Exception:
             return None
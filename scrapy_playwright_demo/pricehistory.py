@@ -0,0 +1,358 @@
+# scrapy_playwright_demo/pricehistory.py
+"""
+Columnar price history across crawl runs.
+
+Each run appends one row per product:
+``(product, run, price_discounted, price_original, currency)``. A store
+is a directory with one raw little-endian file per column, read back
+with ``numpy.memmap``, so a query over 90 runs of 200k products touches
+the bytes it needs and no per-row Python objects. The columns are:
+
+=================  ========  =============================================
+``product.u4``     uint32    index into ``products.txt`` (one key per line)
+``run.i8``         int64     run timestamp, seconds since the epoch (UTC)
+``discounted.i8``  int64     price × ``SCALE`` (``MISSING`` when absent)
+``original.i8``    int64     price × ``SCALE`` (``MISSING`` when absent)
+``currency.u1``    uint8     index into ``meta.json["currencies"]``
+=================  ========  =============================================
+
+Prices are fixed-point integers, so ``Decimal`` values round-trip exactly
+(to 4 decimal places). Queries return floats. ``meta.json`` holds the
+committed row and product counts and is replaced atomically after the
+columns are fsynced. On open, anything past those counts (a crash mid-
+append) is cut off. A run already in the store is not appended twice.
+
+Queries return a ``dict`` of equal-length NumPy arrays (the ``key``
+column holds product keys), optionally restricted to some products and a
+run window::
+
+    history = PriceHistory("/data/price_history")
+    history.ingest("/data/products")  # one run, dated by its earliest scraped_at
+    drops = history.price_drops(min_pct=10, since=datetime(2024, 4, 1, tzinfo=UTC))
+
+Command line::
+
+    python -m scrapy_playwright_demo.pricehistory /data/price_history ingest /data/products
+    python -m scrapy_playwright_demo.pricehistory /data/price_history drops --min-pct 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from collections.abc import Iterable, Mapping
+from datetime import UTC, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from scrapy_playwright_demo import reader
+
+SCALE = 10_000
+MISSING = np.iinfo(np.int64).min
+
+COLUMNS: dict[str, np.dtype] = {
+    "product": np.dtype("<u4"),
+    "run": np.dtype("<i8"),
+    "discounted": np.dtype("<i8"),
+    "original": np.dtype("<i8"),
+    "currency": np.dtype("u1"),
+}
+_SUFFIX = {"product": "u4", "run": "i8", "discounted": "i8", "original": "i8", "currency": "u1"}
+
+Frame = dict[str, np.ndarray]
+
+
+def _fixed(value: Any) -> int:
+    if value is None or value == "":
+        return MISSING
+    return int((Decimal(str(value)) * SCALE).to_integral_value())
+
+
+def _epoch(value: datetime | str) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return int(value.timestamp())
+
+
+class PriceHistory:
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._meta_path = self.directory / "meta.json"
+        meta = self._read_meta()
+        self.rows: int = meta["rows"]
+        self.runs: list[int] = meta["runs"]
+        self.currencies: list[str] = meta["currencies"]
+        self.keys: list[str] = self._read_keys()
+        self._recover(meta["products"])
+        self._ids = {key: i for i, key in enumerate(self.keys)}
+
+    # Layout ----------------------------------------------------------------
+
+    def _path(self, column: str) -> Path:
+        return self.directory / f"{column}.{_SUFFIX[column]}"
+
+    def _read_meta(self) -> dict[str, Any]:
+        try:
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {"scale": SCALE, "rows": 0, "products": 0, "runs": [], "currencies": []}
+        if meta.get("scale") != SCALE:
+            raise ValueError(f"{self.directory}: price scale {meta.get('scale')} != {SCALE}")
+        return meta
+
+    def _read_keys(self) -> list[str]:
+        path = self.directory / "products.txt"
+        return path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+
+    def _recover(self, products: int) -> None:
+        """Cut every file back to the committed counts."""
+        for column, dtype in COLUMNS.items():
+            path = self._path(column)
+            if path.exists() and path.stat().st_size != self.rows * dtype.itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(self.rows * dtype.itemsize)
+        if len(self.keys) != products:
+            del self.keys[products:]
+            (self.directory / "products.txt").write_text("".join(k + "\n" for k in self.keys), encoding="utf-8")
+
+    def _write_meta(self) -> None:
+        tmp = self._meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "scale": SCALE, "rows": self.rows, "products": len(self.keys),
+            "runs": self.runs, "currencies": self.currencies,
+        }), encoding="utf-8")
+        tmp.replace(self._meta_path)
+
+    # Writing ---------------------------------------------------------------
+
+    def append_run(
+        self,
+        records: Iterable[Mapping[str, Any]],
+        run_at: datetime | str | None = None,
+        key: str = "link",
+    ) -> int:
+        """
+        Append one run's records, streamed; returns the rows written (0 if the
+        run is already stored). ``run_at`` defaults to the earliest ``scraped_at``.
+        """
+        if run_at is not None and _epoch(run_at) in self.runs:
+            return 0
+        new_ids: dict[str, int] = {}
+        currencies = list(self.currencies)
+        columns: dict[str, list[int]] = {name: [] for name in COLUMNS if name != "run"}
+        earliest: str | None = None
+        for record in records:
+            product = record.get(key)
+            if not product:
+                continue
+            pid = self._ids.get(product)
+            if pid is None:
+                pid = new_ids.setdefault(product, len(self.keys) + len(new_ids))
+            currency = str(record.get("currency") or "")
+            if currency not in currencies:
+                currencies.append(currency)
+            columns["product"].append(pid)
+            columns["discounted"].append(_fixed(record.get("price_discounted")))
+            columns["original"].append(_fixed(record.get("price_original")))
+            columns["currency"].append(currencies.index(currency))
+            stamp = record.get("scraped_at")
+            if run_at is None and stamp and (earliest is None or str(stamp) < earliest):
+                earliest = str(stamp)
+        if run_at is None:
+            if earliest is None:
+                raise ValueError("no scraped_at to date the run; pass run_at")
+            run_at = earliest
+        run = _epoch(run_at)
+        if run in self.runs:
+            return 0
+        count = len(columns["product"])
+        arrays = {name: np.asarray(values, dtype=COLUMNS[name]) for name, values in columns.items()}
+        arrays["run"] = np.full(count, run, dtype=COLUMNS["run"])
+
+        for name, array in arrays.items():
+            with open(self._path(name), "ab") as f:
+                f.write(array.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self.directory / "products.txt", "a", encoding="utf-8") as f:
+            f.write("".join(k + "\n" for k in new_ids))
+            f.flush()
+            os.fsync(f.fileno())
+        self.keys.extend(new_ids)
+        self._ids.update(new_ids)
+        self.currencies = currencies
+        self.rows += count
+        self.runs.append(run)
+        self._write_meta()
+        return count
+
+    def ingest(self, root: str | Path, run_at: datetime | str | None = None, workers: int | None = None) -> int:
+        """Append a crawl's FileSink output (``reader.iter_records``) as one run."""
+        return self.append_run(reader.iter_records(root, workers=workers), run_at)
+
+    # Reading ---------------------------------------------------------------
+
+    def columns(self) -> Frame:
+        """Every column, memory-mapped read-only (empty arrays for an empty store)."""
+        if not self.rows:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {
+            name: np.memmap(self._path(name), dtype=dtype, mode="r", shape=(self.rows,))
+            for name, dtype in COLUMNS.items()
+        }
+
+    def _select(
+        self,
+        products: Iterable[str] | None,
+        since: datetime | None,
+        until: datetime | None,
+    ) -> Frame:
+        cols = self.columns()
+        mask = np.ones(self.rows, dtype=bool)
+        if products is not None:
+            ids = np.fromiter((self._ids[p] for p in products if p in self._ids), dtype=np.uint32)
+            mask &= np.isin(cols["product"], ids)
+        if since is not None:
+            mask &= cols["run"] >= _epoch(since)
+        if until is not None:
+            mask &= cols["run"] <= _epoch(until)
+        rows = np.flatnonzero(mask)
+        selected = {name: np.asarray(col[rows]) for name, col in cols.items()}
+        # Runs are normally appended in order, so a stable sort on product is enough
+        runs = selected["run"]
+        if runs.size and np.all(runs[1:] >= runs[:-1]):
+            order = np.argsort(selected["product"], kind="stable")
+        else:
+            order = np.lexsort((runs, selected["product"]))
+        return {name: col[order] for name, col in selected.items()}
+
+    def _frame(self, product: np.ndarray, **columns: np.ndarray) -> Frame:
+        return {"key": np.asarray(self.keys, dtype=object)[product], **columns}
+
+    @staticmethod
+    def _prices(cols: Frame) -> np.ndarray:
+        """The price paid: discounted when present, else original (NaN when neither)."""
+        paid = np.where(cols["discounted"] != MISSING, cols["discounted"], cols["original"])
+        return np.where(paid != MISSING, paid / SCALE, np.nan)
+
+    @staticmethod
+    def _dates(epochs: np.ndarray) -> np.ndarray:
+        return epochs.astype("datetime64[s]")
+
+    def discounts(
+        self,
+        products: Iterable[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> Frame:
+        """Every observation with both prices: ``run``, ``discounted``, ``original``, ``discount_pct``."""
+        cols = self._select(products, since, until)
+        disc, orig = cols["discounted"], cols["original"]
+        ok = (disc != MISSING) & (orig != MISSING) & (orig > 0)
+        pct = (orig[ok] - disc[ok]) / orig[ok] * 100.0
+        return self._frame(
+            cols["product"][ok],
+            run=self._dates(cols["run"][ok]),
+            discounted=disc[ok] / SCALE,
+            original=orig[ok] / SCALE,
+            discount_pct=pct,
+        )
+
+    def price_drops(
+        self,
+        products: Iterable[str] | None = None,
+        min_pct: float = 0.0,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> Frame:
+        """Observations cheaper than the same product's previous one (same currency) by at least ``min_pct``."""
+        cols = self._select(products, since, until)
+        price = self._prices(cols)
+        p, cur = cols["product"], cols["currency"]
+        same = (p[1:] == p[:-1]) & (cur[1:] == cur[:-1])
+        before, after = price[:-1], price[1:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = (before - after) / before * 100.0
+            hit = same & (after < before) & (pct >= min_pct)
+        idx = np.flatnonzero(hit) + 1
+        return self._frame(
+            p[idx],
+            run=self._dates(cols["run"][idx]),
+            previous=before[idx - 1],
+            price=after[idx - 1],
+            drop_pct=pct[idx - 1],
+        )
+
+    def seen(
+        self,
+        products: Iterable[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> Frame:
+        """Per product: ``first_seen``, ``last_seen``, ``runs`` observed and the ``last_price``."""
+        cols = self._select(products, since, until)
+        p = cols["product"]
+        starts = np.flatnonzero(np.r_[True, p[1:] != p[:-1]]) if p.size else np.empty(0, dtype=np.intp)
+        ends = np.append(starts[1:], p.size) - 1 if p.size else starts
+        return self._frame(
+            p[starts],
+            first_seen=self._dates(cols["run"][starts]),
+            last_seen=self._dates(cols["run"][ends]),
+            runs=ends - starts + 1,
+            last_price=self._prices(cols)[ends],
+        )
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, np.datetime64):
+        return str(value)
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _write_frame(frame: Frame) -> None:
+    out = sys.stdout
+    names = list(frame)
+    for row in zip(*(frame[name] for name in names)):
+        out.write(json.dumps({name: _jsonable(value) for name, value in zip(names, row)}) + "\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("store", help="price history directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="append a crawl's FileSink output as one run")
+    ingest.add_argument("root")
+    ingest.add_argument("--run-at", help="ISO timestamp of the run (default: earliest scraped_at)")
+    ingest.add_argument("--workers", type=int, default=None)
+    for name in ("discounts", "drops", "seen"):
+        query = sub.add_parser(name)
+        query.add_argument("--product", action="append", help="product key (repeatable); default all")
+        query.add_argument("--since", type=datetime.fromisoformat)
+        query.add_argument("--until", type=datetime.fromisoformat)
+        if name == "drops":
+            query.add_argument("--min-pct", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    history = PriceHistory(args.store)
+    if args.command == "ingest":
+        print(history.ingest(args.root, args.run_at, args.workers))
+        return 0
+    window = {"products": args.product, "since": args.since, "until": args.until}
+    if args.command == "discounts":
+        _write_frame(history.discounts(**window))
+    elif args.command == "drops":
+        _write_frame(history.price_drops(min_pct=args.min_pct, **window))
+    else:
+        _write_frame(history.seen(**window))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
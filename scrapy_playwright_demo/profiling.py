@@ -0,0 +1,270 @@
+# scrapy_playwright_demo/profiling.py
+"""
+Sampling CPU profiler for a running crawler, in pure Python.
+
+A daemon thread reads every other thread's stack (``sys._current_frames()``)
+at a fixed rate. The target threads are the reactor (main) thread, log
+emission, sink writers and the like. They are never paused or instrumented,
+so a 100 Hz sample costs well under 1% of a core. A stack is counted as
+``thread;outer;...;inner``, which is the collapsed format read by
+``flamegraph.pl``, speedscope and most flamegraph viewers.
+
+Two ways to use it:
+
+* on demand, served next to the Prometheus metrics (``PROFILING_ENABLED``):
+  ``GET /debug/profile?seconds=30&hz=100`` returns a collapsed-stack file
+  for that window, and ``GET /debug/profile/top`` returns the continuous
+  profiler's current top frames;
+* continuously at a low rate (``PROFILING_CONTINUOUS_HZ``): the leaf frames
+  with the most samples over each ``PROFILING_EXPORT_INTERVAL_S`` are
+  exported as ``profile_frame_share{thread, frame}``. The label set is
+  bounded by ``PROFILING_TOP_N``.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+try:
+    from prometheus_client import Gauge
+
+    profile_frame_share = Gauge(
+        "profile_frame_share",
+        "Share of samples with this frame on top of the stack (last export window)",
+        ["thread", "frame"],
+    )
+except ImportError:
+    profile_frame_share = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PATH = "/debug/profile"
+TOP_PATH = "/debug/profile/top"
+MAX_HZ = 1000
+
+_PREFIXES = sorted({p for p in sys.path if p and os.path.isdir(p)}, key=len, reverse=True)
+
+
+def _short_path(filename: str) -> str:
+    for prefix in _PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix):].lstrip(os.sep)
+    return filename
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def thread_names() -> dict[int, str]:
+    main = threading.main_thread().ident
+    return {t.ident: "reactor" if t.ident == main else t.name for t in threading.enumerate()}
+
+
+class StackSampler:
+    """Counts the collapsed stack of every thread but its own, ``hz`` times a second."""
+
+    def __init__(self, hz: float = 100.0, max_depth: int = 64) -> None:
+        if not 0 < hz <= MAX_HZ:
+            raise ValueError(f"hz must be in (0, {MAX_HZ}], not {hz}")
+        self.interval = 1.0 / hz
+        self.max_depth = max_depth
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sample(self) -> None:
+        own = threading.get_ident()
+        names = thread_names()
+        collapsed = []
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, f"thread-{ident}")
+            if ident == own or name.startswith("profiler"):
+                continue
+            frames = []
+            while frame is not None and len(frames) < self.max_depth:
+                frames.append(frame_label(frame))
+                frame = frame.f_back
+            frames.append(name)
+            collapsed.append(";".join(reversed(frames)))
+        with self._lock:
+            self.stacks.update(collapsed)
+            self.samples += 1
+
+    def start(self) -> StackSampler:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            next_at += self.interval
+            # Never try to catch up: a late sample is just one sample
+            next_at = max(next_at, time.monotonic())
+            self._stop.wait(next_at - time.monotonic())
+
+    def drain(self) -> tuple[Counter[str], int]:
+        """Counts since the last drain, resetting them."""
+        with self._lock:
+            stacks, samples = self.stacks, self.samples
+            self.stacks, self.samples = Counter(), 0
+        return stacks, samples
+
+
+def collapsed(stacks: Counter[str]) -> str:
+    """Collapsed-stack text: one ``frame;frame;frame count`` line per stack."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def profile_for(seconds: float, hz: float = 100.0) -> str:
+    """Sample every thread for ``seconds`` and return the collapsed stacks."""
+    sampler = StackSampler(hz).start()
+    try:
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+    return collapsed(sampler.drain()[0])
+
+
+def top_frames(stacks: Counter[str], samples: int, limit: int) -> list[tuple[str, str, float]]:
+    """``(thread, leaf frame, share of samples)`` for the ``limit`` busiest leaves."""
+    leaves: Counter[tuple[str, str]] = Counter()
+    for stack, count in stacks.items():
+        parts = stack.split(";")
+        leaves[(parts[0], parts[-1])] += count
+    return [(thread, frame, count / samples) for (thread, frame), count in leaves.most_common(limit)] if samples else []
+
+
+class ContinuousProfiler:
+    """Low-rate sampling whose top leaf frames are exported once per window."""
+
+    def __init__(self, hz: float = 10.0, export_interval_s: float = 60.0, top_n: int = 20) -> None:
+        self.sampler = StackSampler(hz)
+        self.export_interval_s = export_interval_s
+        self.top_n = top_n
+        self.top: list[tuple[str, str, float]] = []
+        self.total: Counter[str] = Counter()  # whole run, for the collapsed file written at close
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self.sampler.start()
+        self._thread = threading.Thread(target=self._run, name="profiler-export", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.sampler.stop()
+        self.export()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.export_interval_s):
+            self.export()
+
+    def export(self) -> None:
+        stacks, samples = self.sampler.drain()
+        self.total.update(stacks)
+        self.samples += samples
+        self.top = top_frames(stacks, samples, self.top_n)
+        if profile_frame_share is not None:
+            profile_frame_share.clear()  # last window only: old frames must not linger as labels
+            for thread, frame, share in self.top:
+                profile_frame_share.labels(thread=thread, frame=frame).set(share)
+
+
+# Process-wide: one sampler per process, shared by every crawler in it
+continuous: ContinuousProfiler | None = None
+_profile_lock = threading.Lock()
+
+
+# --------------------------------------------------------------------------- #
+# HTTP endpoint (served with the Prometheus metrics)
+# --------------------------------------------------------------------------- #
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True  # a running profile must not keep the process alive
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):  # noqa: A002 (stdlib signature)
+        logger.debug("profiling endpoint: " + format, *args)
+
+
+def wsgi_app(fallback, max_seconds: float = 60.0):
+    """Serve the profile routes and hand every other path to ``fallback`` (the metrics app)."""
+
+    def app(environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path == TOP_PATH:
+            rows = continuous.top if continuous is not None else []
+            body = "".join(f"{share:.4f} {thread} {frame}\n" for thread, frame, share in rows)
+            return _reply(start_response, "200 OK", body)
+        if path != PROFILE_PATH:
+            return fallback(environ, start_response)
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        try:
+            seconds = min(float(query.get("seconds", ["10"])[0]), max_seconds)
+            hz = float(query.get("hz", ["100"])[0])
+            if seconds <= 0 or not 0 < hz <= MAX_HZ:
+                raise ValueError
+        except ValueError:
+            return _reply(start_response, "400 Bad Request", f"seconds > 0 and 0 < hz <= {MAX_HZ}\n")
+        if not _profile_lock.acquire(blocking=False):
+            return _reply(start_response, "409 Conflict", "a profile is already running\n")
+        try:
+            logger.info("profiling all threads for %.0fs at %.0f Hz", seconds, hz)
+            body = profile_for(seconds, hz)
+        finally:
+            _profile_lock.release()
+        return _reply(start_response, "200 OK", body)
+
+    return app
+
+
+def _reply(start_response, status: str, body: str):
+    data = body.encode("utf-8")
+    start_response(status, [("Content-Type", "text/plain; charset=utf-8"), ("Content-Length", str(len(data)))])
+    return [data]
+
+
+def start_server(port: int, addr: str = "0.0.0.0", max_seconds: float = 60.0):
+    """Metrics and profile routes on one port, from a daemon thread."""
+    from prometheus_client import make_wsgi_app
+
+    server = make_server(
+        addr, port, wsgi_app(make_wsgi_app(), max_seconds),
+        server_class=_ThreadingWSGIServer, handler_class=_QuietHandler,
+    )
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server, thread
@@ -0,0 +1,154 @@
+# scrapy_playwright_demo/proxies.py
+"""
+Health-scored proxy pool.
+
+Each proxy keeps rolling success/failure counts and a latency EWMA. Picks are
+weighted random by score, so healthy, fast proxies take most of the traffic
+while the others still get some to prove they recovered. A ban signal (403,
+407...) or a failure rate over ``failure_threshold`` puts a proxy in
+quarantine; every consecutive quarantine doubles its cool-down, up to
+``quarantine_max_s``.
+
+Playwright binds proxies per browser context, so every proxy gets its own
+context name (``proxy-<index>``). ``max_active`` keeps the number of proxies
+in rotation within ``PLAYWRIGHT_MAX_CONTEXTS``.
+"""
+from __future__ import annotations
+
+import math
+import random
+import time
+import urllib.parse
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from scrapy_playwright_demo.utils.window import SlidingWindow
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    window_s: float = 300.0
+    failure_threshold: float = 0.5   # failure share in the window that quarantines a proxy
+    min_samples: int = 5
+    quarantine_base_s: float = 60.0
+    quarantine_max_s: float = 1800.0
+    latency_ref_s: float = 5.0       # latency at which a proxy's score halves
+    max_active: int = 0              # 0 = every proxy may be in rotation at once
+
+
+@dataclass
+class ProxyState:
+    index: int
+    url: str
+    outcomes: SlidingWindow          # 1.0 = failure, 0.0 = success
+    latency_s: float = 0.0           # EWMA
+    strikes: int = 0                 # consecutive quarantines
+    quarantined_until: float = -math.inf
+    counts: dict[str, int] = field(default_factory=lambda: {"requests": 0, "success": 0, "failures": 0, "bans": 0})
+
+    @property
+    def label(self) -> str:
+        """Credential-free name used for contexts, stats and metric labels."""
+        return f"proxy-{self.index}"
+
+    def quarantined(self, now: float) -> bool:
+        return now < self.quarantined_until
+
+
+def playwright_proxy(url: str) -> dict[str, str]:
+    """``http://user:pw@host:port`` → Playwright ``proxy`` context option."""
+    parsed = urllib.parse.urlsplit(url if "://" in url else f"http://{url}")
+    server = f"{parsed.scheme}://{parsed.hostname}" + (f":{parsed.port}" if parsed.port else "")
+    proxy = {"server": server}
+    if parsed.username:
+        proxy["username"] = urllib.parse.unquote(parsed.username)
+        proxy["password"] = urllib.parse.unquote(parsed.password or "")
+    return proxy
+
+
+class ProxyPool:
+    def __init__(self, proxies: list[str], config: PoolConfig | None = None,
+                 rng: random.Random | None = None, clock: Callable[[], float] = time.monotonic) -> None:
+        self.config = config or PoolConfig()
+        self.clock = clock
+        self._rng = rng or random.Random()
+        self.proxies = [
+            ProxyState(i, url, SlidingWindow(self.config.window_s, clock)) for i, url in enumerate(proxies)
+        ]
+        self.active: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    def score(self, proxy: ProxyState, now: float | None = None) -> float:
+        now = self.clock() if now is None else now
+        if proxy.quarantined(now):
+            return 0.0
+        n = proxy.outcomes.count(now)
+        failures = proxy.outcomes.total(now)
+        success_rate = (n - failures + 1) / (n + 2)  # Laplace: unknown proxies start at 0.5
+        return success_rate / (1 + proxy.latency_s / self.config.latency_ref_s)
+
+    def choose(self, now: float | None = None) -> ProxyState | None:
+        if not self.proxies:
+            return None
+        now = self.clock() if now is None else now
+        available = [p for p in self.proxies if not p.quarantined(now)]
+        if not available:
+            # Everything is cooling down: use the one released first rather than going direct
+            return min(self.proxies, key=lambda p: p.quarantined_until)
+        limit = self.config.max_active
+        if limit and len(self.active) >= limit:
+            in_rotation = [p for p in available if p.index in self.active]
+            available = in_rotation or available
+        weights = [self.score(p, now) for p in available]
+        proxy = self._rng.choices(available, weights=weights)[0]
+        self.active.add(proxy.index)
+        return proxy
+
+    def record(self, proxy: ProxyState, ok: bool, latency_s: float | None = None,
+               banned: bool = False, now: float | None = None) -> bool:
+        """Record an outcome; True if it sent the proxy to quarantine."""
+        now = self.clock() if now is None else now
+        proxy.counts["requests"] += 1
+        if ok:
+            proxy.counts["success"] += 1
+            proxy.strikes = 0
+            proxy.outcomes.add(0.0, now)
+            if latency_s is not None:
+                proxy.latency_s = latency_s if proxy.latency_s == 0 else 0.8 * proxy.latency_s + 0.2 * latency_s
+            return False
+        proxy.counts["failures"] += 1
+        proxy.outcomes.add(1.0, now)
+        if banned:
+            proxy.counts["bans"] += 1
+            return self.quarantine(proxy, now)
+        n = proxy.outcomes.count(now)
+        if n >= self.config.min_samples and proxy.outcomes.total(now) / n >= self.config.failure_threshold:
+            return self.quarantine(proxy, now)
+        return False
+
+    def quarantine(self, proxy: ProxyState, now: float | None = None) -> bool:
+        now = self.clock() if now is None else now
+        if proxy.quarantined(now):
+            return False
+        cfg = self.config
+        proxy.quarantined_until = now + min(cfg.quarantine_max_s, cfg.quarantine_base_s * 2 ** proxy.strikes)
+        proxy.strikes += 1
+        proxy.outcomes.clear()  # start fresh after the cool-down
+        self.active.discard(proxy.index)
+        return True
+
+    def snapshot(self, now: float | None = None) -> list[dict[str, Any]]:
+        now = self.clock() if now is None else now
+        return [
+            {
+                "proxy": p.label,
+                "score": round(self.score(p, now), 3),
+                "latency_s": round(p.latency_s, 3),
+                "quarantined_for_s": round(max(0.0, p.quarantined_until - now), 1),
+                **p.counts,
+            }
+            for p in self.proxies
+        ]
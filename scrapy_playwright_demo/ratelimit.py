@@ -0,0 +1,120 @@
+# scrapy_playwright_demo/ratelimit.py
+"""
+Token buckets and circuit breakers, keyed by host or proxy.
+
+Both primitives answer "how long should this request wait?" instead of
+sleeping themselves, so the caller decides how to hold it (the downloader
+middleware uses a reactor timer). Time is passed in explicitly to keep them
+deterministic under test.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from enum import Enum
+
+from scrapy_playwright_demo.utils.window import SlidingWindow
+
+
+class TokenBucket:
+    """
+    ``rate`` tokens per second, up to ``burst``. A rate of 0 disables the bucket.
+
+    ``reserve()`` always takes a token and may drive the balance negative: the
+    returned wait is how long the caller must hold the request, so concurrent
+    callers queue up behind each other instead of all retrying at once.
+    """
+
+    def __init__(self, rate: float, burst: float, now: float = 0.0) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = now
+        self.blocked_until = -math.inf
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now: float) -> float:
+        if self.rate <= 0:
+            return max(0.0, self.blocked_until - now)
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def block_until(self, until: float) -> None:
+        """Hold everything until ``until`` (e.g. a 429 ``Retry-After``)."""
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+# Numeric encoding for gauges
+BREAKER_STATE_VALUE = {BreakerState.CLOSED: 0, BreakerState.HALF_OPEN: 1, BreakerState.OPEN: 2}
+
+
+@dataclass(frozen=True)
+class BreakerConfig:
+    failure_rate: float = 0.5      # failures / outcomes in the window that trip the breaker
+    min_requests: int = 10         # outcomes in the window before the rate counts
+    window_s: float = 60.0
+    open_s: float = 30.0           # first open period; doubles on every failed probe
+    max_open_s: float = 300.0
+    half_open_probes: int = 1      # requests let through to test recovery
+
+
+class CircuitBreaker:
+    def __init__(self, config: BreakerConfig) -> None:
+        self.config = config
+        self.state = BreakerState.CLOSED
+        self.outcomes = SlidingWindow(config.window_s)  # 1.0 = failure, 0.0 = success
+        self.opened_at = -math.inf
+        self.open_for = config.open_s
+        self.probes = 0
+
+    def before_request(self, now: float) -> float:
+        """0 if the request may go now, otherwise seconds to wait before asking again."""
+        if self.state is BreakerState.OPEN:
+            remaining = self.opened_at + self.open_for - now
+            if remaining > 0:
+                return remaining
+            self.state = BreakerState.HALF_OPEN
+            self.probes = 0
+        if self.state is BreakerState.HALF_OPEN:
+            if self.probes >= self.config.half_open_probes:
+                return min(1.0, self.config.open_s)  # let the probes report back first
+            self.probes += 1
+        return 0.0
+
+    def record(self, failure: bool, now: float) -> BreakerState:
+        cfg = self.config
+        if self.state is BreakerState.HALF_OPEN:
+            self.probes = max(0, self.probes - 1)
+            if failure:
+                self._trip(now, min(cfg.max_open_s, self.open_for * 2))
+            else:
+                self.state = BreakerState.CLOSED
+                self.open_for = cfg.open_s
+                self.outcomes.clear()
+            return self.state
+        if self.state is BreakerState.OPEN:
+            return self.state  # late result of a request sent before the trip
+        self.outcomes.add(1.0 if failure else 0.0, now)
+        count = self.outcomes.count(now)
+        if count >= cfg.min_requests and self.outcomes.total(now) / count >= cfg.failure_rate:
+            self._trip(now, cfg.open_s)
+        return self.state
+
+    def _trip(self, now: float, open_for: float) -> None:
+        self.state = BreakerState.OPEN
+        self.opened_at = now
+        self.open_for = open_for
+        self.probes = 0
+        self.outcomes.clear()
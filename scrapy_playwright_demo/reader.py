@@ -0,0 +1,270 @@
+# scrapy_playwright_demo/reader.py
+"""
+Streaming reader and link index over FileSink output.
+
+A crawl's output is a directory of ``page-N.jl[.gz]`` files, each with a
+``page-N.done`` marker. The runner writes one such directory per worker
+(``worker-*/``). Pages keyed by category (sitemap discovery) are in a
+``<category>/`` sub-directory and read back as ``"<category>/N"``.
+``iter_pages()`` yields ``(page, records)`` in page order.
+Decompression, JSON parsing and, with ``models=True``, ``ProductItem``
+validation run in a process pool, one page file per task. At most
+``prefetch`` files are in flight, so memory stays bounded however large the
+directory is. Records come out as dicts or ``ProductItem``s.
+
+* ``pages=range(1, 101)`` keeps those page numbers only;
+* ``done_only=False`` also reads pages without a ``.done`` marker
+  (a crawl still running, or one that crashed);
+* a page written by two workers (at-least-once) is read once, as in the
+  runner's ``manifest.json``.
+
+``LinkIndex`` maps each product ``link`` to its file and offset, stored in
+SQLite. ``get(link)`` then reads that one record and no other file. For
+``.gz`` files the offset is into the decompressed stream, so only the
+one file is decompressed, up to that point.
+
+Command line::
+
+    python -m scrapy_playwright_demo.reader /data/products --pages 1-100 > products.jl
+    python -m scrapy_playwright_demo.reader /data/products --build-index links.sqlite
+    python -m scrapy_playwright_demo.reader /data/products --index links.sqlite --lookup https://...
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+from collections import deque
+from collections.abc import Container, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+_PAGE_FILE_RE = re.compile(r"^page-(.+?)\.jl(\.gz)?$")
+
+
+@dataclass(frozen=True)
+class PageFile:
+    page: str
+    path: Path
+    done: bool
+
+    @property
+    def number(self) -> int | None:
+        number = self.page.rpartition("/")[2]
+        return int(number) if number.isdigit() else None
+
+
+def _sort_key(page: str) -> tuple:
+    category, _, number = page.rpartition("/")
+    return (category, not number.isdigit(), int(number) if number.isdigit() else 0, number)
+
+
+def page_files(
+    root: str | Path,
+    pages: Container[int] | None = None,
+    done_only: bool = True,
+) -> list[PageFile]:
+    """Page files under ``root`` (itself a page file, a sink directory, or a runner output with ``worker-*/``)."""
+    root = Path(root)
+    if root.is_file():
+        candidates = [root]
+    else:
+        candidates = [
+            path
+            for pattern in ("page-*.jl*", "*/page-*.jl*", "worker-*/*/page-*.jl*")
+            for path in sorted(root.glob(pattern))
+        ]
+    found: dict[str, PageFile] = {}
+    for path in candidates:
+        match = _PAGE_FILE_RE.match(path.name)
+        if match is None:
+            continue
+        number = match.group(1)
+        if pages is not None and not (number.isdigit() and int(number) in pages):
+            continue
+        done = path.with_name(f"page-{number}.done").exists()
+        parent = path.parent
+        category = parent.name if parent != root and path != root and not parent.name.startswith("worker-") else None
+        page = f"{category}/{number}" if category else number
+        if (done_only and not done) or page in found:
+            continue  # first worker wins, like the runner's manifest
+        found[page] = PageFile(page, path, done)
+    return sorted(found.values(), key=lambda f: _sort_key(f.page))
+
+
+def _open(path: Path):
+    return gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+
+
+def read_page_file(path: str | Path, models: bool = False) -> list[Any]:
+    """All records of one page file (the unit of work of the process pool)."""
+    with _open(Path(path)) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if models:
+        from scrapy_playwright_demo.items import ProductItem
+
+        return [ProductItem.model_validate(r) for r in records]
+    return records
+
+
+def _link_offsets(path: str | Path) -> list[tuple[str, int]]:
+    """``(link, offset)`` of every record with a link; offsets are in the decompressed stream."""
+    out = []
+    offset = 0
+    with _open(Path(path)) as f:
+        for line in f:
+            if line.strip():
+                link = json.loads(line).get("link")
+                if link:
+                    out.append((link, offset))
+            offset += len(line)
+    return out
+
+
+def _default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _pooled(fn, args: list[tuple], workers: int | None, prefetch: int | None) -> Iterator[Any]:
+    """``fn(*a)`` for each ``a`` in order, with at most ``prefetch`` results pending."""
+    workers = _default_workers() if workers is None else workers
+    if workers <= 1 or len(args) <= 1:
+        for a in args:
+            yield fn(*a)
+        return
+    prefetch = prefetch or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: deque = deque()
+        todo = iter(args)
+        for a in todo:
+            pending.append(executor.submit(fn, *a))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            result = pending.popleft().result()
+            for a in todo:
+                pending.append(executor.submit(fn, *a))
+                break
+            yield result
+
+
+def iter_pages(
+    root: str | Path,
+    pages: Container[int] | None = None,
+    done_only: bool = True,
+    models: bool = False,
+    workers: int | None = None,
+    prefetch: int | None = None,
+) -> Iterator[tuple[str, list[Any]]]:
+    """``(page, records)`` in page order, parsed in ``workers`` processes (1 = in this process)."""
+    files = page_files(root, pages, done_only)
+    results = _pooled(read_page_file, [(str(f.path), models) for f in files], workers, prefetch)
+    for file, records in zip(files, results):
+        yield file.page, records
+
+
+def iter_records(root: str | Path, **kwargs) -> Iterator[Any]:
+    """Every record, page after page (``iter_pages`` keywords)."""
+    for _, records in iter_pages(root, **kwargs):
+        yield from records
+
+
+class LinkIndex:
+    """Product link → (page file, offset), in SQLite."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS links (link TEXT PRIMARY KEY, file TEXT NOT NULL, offset INTEGER NOT NULL)")
+
+    def build(
+        self,
+        root: str | Path,
+        pages: Container[int] | None = None,
+        done_only: bool = True,
+        workers: int | None = None,
+    ) -> int:
+        """(Re)index ``root``; a link seen on several pages points at the first one. Returns the link count."""
+        files = page_files(root, pages, done_only)
+        with self._db:
+            self._db.execute("DELETE FROM links")
+            results = _pooled(_link_offsets, [(str(f.path),) for f in files], workers, None)
+            for file, rows in zip(files, results):
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO links (link, file, offset) VALUES (?, ?, ?)",
+                    [(link, str(file.path.resolve()), offset) for link, offset in rows],
+                )
+        return self._db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    def locate(self, link: str) -> tuple[Path, int] | None:
+        row = self._db.execute("SELECT file, offset FROM links WHERE link = ?", (link,)).fetchone()
+        return (Path(row[0]), row[1]) if row else None
+
+    def get(self, link: str) -> dict[str, Any] | None:
+        found = self.locate(link)
+        if found is None:
+            return None
+        path, offset = found
+        with _open(path) as f:
+            f.seek(offset)  # gzip: decompresses up to the offset, this file only
+            return json.loads(f.readline())
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _page_range(spec: str) -> range:
+    first, _, last = spec.partition("-")
+    return range(int(first), int(last or first) + 1)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0], formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="FileSink output directory (or runner --out-dir)")
+    parser.add_argument("--pages", type=_page_range, help="page range, e.g. 1-100")
+    parser.add_argument("--include-unfinished", action="store_true", help="also read pages without a .done marker")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: cores - 1)")
+    parser.add_argument("--count", action="store_true", help="print the record count only")
+    parser.add_argument("--build-index", metavar="PATH", help="write a link index (SQLite) and exit")
+    parser.add_argument("--index", metavar="PATH", help="link index to use with --lookup")
+    parser.add_argument("--lookup", metavar="LINK", help="print the record of one product link")
+    args = parser.parse_args(argv)
+    done_only = not args.include_unfinished
+
+    if args.build_index:
+        index = LinkIndex(args.build_index)
+        print(index.build(args.root, args.pages, done_only, args.workers))
+        index.close()
+        return 0
+    if args.lookup:
+        if not args.index:
+            parser.error("--lookup needs --index")
+        index = LinkIndex(args.index)
+        record = index.get(args.lookup)
+        index.close()
+        if record is None:
+            return 1
+        print(json.dumps(record, ensure_ascii=False))
+        return 0
+
+    records = iter_records(args.root, pages=args.pages, done_only=done_only, workers=args.workers)
+    if args.count:
+        print(sum(1 for _ in records))
+        return 0
+    out = sys.stdout
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,62 @@
 from dataclasses import dataclass
+from enum import Enum
 import random
+import re
+import urllib.parse
 from typing import Iterable, Type, Set, Tuple
 
+from twisted.internet import error as net_error
+
+from scrapy_playwright_demo.utils.window import SlidingWindow
+
+# Request.meta keys shared by every retry path (middlewares, errbacks) and the
+# DelayedRetryScheduler that honours the delay.
+RETRY_ATTEMPT_KEY = "retry_attempt"
+RETRY_DELAY_KEY = "retry_delay"
+
+
+class ErrorClass(str, Enum):
+    TRANSIENT = "transient"   # worth retrying with the normal backoff
+    THROTTLED = "throttled"   # the site asked us to slow down: longer backoff
+    PERMANENT = "permanent"   # a retry will fail the same way (bugs, 404, bad URL...)
+
+
+@dataclass(frozen=True)
+class Classification:
+    error_class: ErrorClass
+    kind: str  # bounded label for stats: "http_503", "timeout", "navigation", "network", "browser", "error"
+
+    @property
+    def retryable(self) -> bool:
+        return self.error_class is not ErrorClass.PERMANENT
+
+
+# Twisted/Scrapy download errors that are worth another attempt
+_NETWORK_ERRORS = (
+    net_error.TimeoutError,
+    net_error.DNSLookupError,
+    net_error.ConnectError,
+    net_error.ConnectionDone,
+    net_error.ConnectionLost,
+    ConnectionError,
+    TimeoutError,
+)
+# Transport-level failures raised by name to avoid importing twisted.web/scrapy here
+_NETWORK_ERROR_NAMES = {"ResponseFailed", "ResponseNeverReceived", "TunnelError", "_ResponseFailed"}
+
+# Chromium/Firefox navigation errors that a retry will not fix
+_NET_ERR_RE = re.compile(r"net::(ERR_[A-Z_]+)|NS_ERROR_[A-Z_]+")
+_PERMANENT_NET_ERRORS = {
+    "ERR_INVALID_URL",
+    "ERR_UNKNOWN_URL_SCHEME",
+    "ERR_ABORTED",
+    "ERR_BLOCKED_BY_CLIENT",
+    "ERR_BLOCKED_BY_RESPONSE",
+    "ERR_TOO_MANY_REDIRECTS",
+    "ERR_UNSAFE_PORT",
+}
+
+
 @dataclass(frozen=True)
 class RetryPolicy:
     max_retries: int
@@ -10,16 +65,149 @@ class RetryPolicy:
     jitter: float        # 0..1
     retry_http_codes: Set[int]
     retry_exceptions: Tuple[type[Exception], ...]
+    throttled_backoff_factor: float = 2.0  # THROTTLED delays are this much longer
+    # Retry budget: retries may be at most budget_ratio of a host's requests in the window
+    budget_ratio: float = 0.2
+    budget_window_s: float = 60.0
+    budget_min_retries: int = 10           # always allowed per window, so small crawls can retry
+    budget_action: str = "defer"           # "defer" (wait a whole window) or "drop"
 
-    def next_delay(self, attempt: int) -> float:
+    def next_delay(self, attempt: int, error_class: ErrorClass = ErrorClass.TRANSIENT) -> float:
         raw = min(self.backoff_cap, self.backoff_base ** attempt)
+        if error_class is ErrorClass.THROTTLED:
+            raw = min(self.backoff_cap, raw * self.throttled_backoff_factor)
         return raw * (1 + random.random() * self.jitter)
 
+    def retry_request(self, request, attempt: int, error_class: ErrorClass = ErrorClass.TRANSIENT,
+                      delay: float | None = None):
+        """Copy of ``request`` for retry number ``attempt + 1``, delayed by ``next_delay(attempt)``."""
+        new_request = request.copy()
+        new_request.meta[RETRY_ATTEMPT_KEY] = attempt + 1
+        new_request.meta[RETRY_DELAY_KEY] = self.next_delay(attempt, error_class) if delay is None else delay
+        new_request.dont_filter = True
+        return new_request
+
+    # Classification ---------------------------------------------------------
+
+    def classify_status(self, status: int) -> Classification | None:
+        """None for statuses that are not failures."""
+        if status == 429:
+            return Classification(ErrorClass.THROTTLED, "http_429")
+        if status in self.retry_http_codes:
+            return Classification(ErrorClass.TRANSIENT, f"http_{status}")
+        if status >= 500:
+            return Classification(ErrorClass.TRANSIENT, "http_5xx")
+        if status >= 400:
+            return Classification(ErrorClass.PERMANENT, "http_4xx")
+        return None
+
+    def classify_exception(self, exc: BaseException) -> Classification:
+        cls = type(exc)
+        if not isinstance(exc, self.retry_exceptions):
+            return Classification(ErrorClass.PERMANENT, "error")
+        if cls.__module__.startswith("playwright"):
+            return self._classify_playwright(exc)
+        if isinstance(exc, _NETWORK_ERRORS) or cls.__name__ in _NETWORK_ERROR_NAMES:
+            name = cls.__name__.lower()
+            kind = "timeout" if "timeout" in name or "timedout" in name else "network"
+            return Classification(ErrorClass.TRANSIENT, kind)
+        # Anything else is a bug or a data problem: re-rendering will not help
+        return Classification(ErrorClass.PERMANENT, "error")
+
+    @staticmethod
+    def _classify_playwright(exc: BaseException) -> Classification:
+        message = str(exc)
+        if type(exc).__name__ == "TimeoutError":
+            return Classification(ErrorClass.TRANSIENT, "timeout")
+        match = _NET_ERR_RE.search(message)
+        if match:
+            code = match.group(1)
+            if code in _PERMANENT_NET_ERRORS or (code or "").startswith("ERR_CERT_"):
+                return Classification(ErrorClass.PERMANENT, "navigation")
+            return Classification(ErrorClass.TRANSIENT, "navigation")
+        if "has been closed" in message or "Connection closed" in message:
+            # Context recycled or browser restarted under the request
+            return Classification(ErrorClass.TRANSIENT, "browser")
+        return Classification(ErrorClass.PERMANENT, "browser")
+
+
+class RetryBudget:
+    """
+    Per-host sliding-window retry budget.
+
+    A retry is allowed while the host's retries in the last ``window_s`` stay
+    below ``max(min_retries, ratio * requests)``, so during an outage retries
+    cannot multiply the load on the site (or on the browser pool).
+    """
+
+    def __init__(self, ratio: float, window_s: float, min_retries: int) -> None:
+        self.ratio = ratio
+        self.window_s = window_s
+        self.min_retries = min_retries
+        self._requests: dict[str, SlidingWindow] = {}
+        self._retries: dict[str, SlidingWindow] = {}
+
+    @staticmethod
+    def host(request) -> str:
+        return urllib.parse.urlsplit(request.url).hostname or ""
+
+    def _window(self, windows: dict[str, SlidingWindow], host: str) -> SlidingWindow:
+        window = windows.get(host)
+        if window is None:
+            window = windows[host] = SlidingWindow(self.window_s)
+        return window
+
+    def record_request(self, host: str, now: float | None = None) -> None:
+        self._window(self._requests, host).add(1.0, now)
+
+    def allowance(self, host: str, now: float | None = None) -> float:
+        requests = self._window(self._requests, host).count(now)
+        return max(float(self.min_retries), self.ratio * requests)
+
+    def try_spend(self, host: str, now: float | None = None) -> bool:
+        retries = self._window(self._retries, host)
+        if retries.count(now) >= self.allowance(host, now):
+            return False
+        retries.add(1.0, now)
+        return True
+
+
+def plan_retry(policy: RetryPolicy, budget: RetryBudget | None, request,
+               classification: Classification, stats=None):
+    """
+    Decide what to do with a failed ``request``: a retry Request, or None to give up.
+
+    Counts ``retry/class/<class>/<kind>``, ``retry/gave_up/<reason>`` and
+    ``retry/budget/<deferred|dropped>`` in ``stats`` when given.
+    """
+    def inc(key: str) -> None:
+        if stats is not None:
+            stats.inc_value(key)
+
+    attempt = request.meta.get(RETRY_ATTEMPT_KEY, 0)
+    inc(f"retry/class/{classification.error_class.value}/{classification.kind}")
+    if not classification.retryable:
+        inc("retry/gave_up/permanent")
+        return None
+    if attempt >= policy.max_retries:
+        inc("retry/gave_up/max_retries")
+        return None
+    if budget is not None and not budget.try_spend(budget.host(request)):
+        if policy.budget_action == "drop":
+            inc("retry/budget/dropped")
+            return None
+        # Defer past the current window; the attempt still counts towards max_retries
+        inc("retry/budget/deferred")
+        return policy.retry_request(request, attempt, classification.error_class, delay=policy.budget_window_s)
+    inc("retry/scheduled")
+    return policy.retry_request(request, attempt, classification.error_class)
+
+
 # Helper to build from settings or AppSettings
-from scrapy_playwright_demo.config import app_settings
+from scrapy_playwright_demo.config import get_app_settings
 
 def build_retry_policy(settings=None) -> RetryPolicy:
-    s = settings or app_settings
+    s = settings or get_app_settings()
     return RetryPolicy(
         max_retries=getattr(s, "retry_max_retries", 5),
         backoff_base=getattr(s, "retry_backoff_base", 1.5),
@@ -27,4 +215,16 @@ def build_retry_policy(settings=None) -> RetryPolicy:
         jitter=getattr(s, "retry_jitter", 0.3),
         retry_http_codes=set(getattr(s, "retry_http_codes", [429, 500, 502, 503, 504])),
         retry_exceptions=tuple(getattr(s, "retry_exceptions", (Exception,))),
-    ) 
\ No newline at end of file
+        throttled_backoff_factor=getattr(s, "retry_throttled_backoff_factor", 2.0),
+        budget_ratio=getattr(s, "retry_budget_ratio", 0.2),
+        budget_window_s=getattr(s, "retry_budget_window_s", 60.0),
+        budget_min_retries=getattr(s, "retry_budget_min_retries", 10),
+        budget_action=getattr(s, "retry_budget_action", "defer"),
+    )
+
+
+def build_retry_budget(policy: RetryPolicy) -> RetryBudget | None:
+    """None when the budget is disabled (ratio <= 0)."""
+    if policy.budget_ratio <= 0:
+        return None
+    return RetryBudget(policy.budget_ratio, policy.budget_window_s, policy.budget_min_retries)
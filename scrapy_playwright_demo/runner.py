@@ -0,0 +1,412 @@
+# scrapy_playwright_demo/runner.py
+"""
+Multi-process crawl runner.
+
+One Scrapy process does Playwright control, HTML parsing, validation and sink
+serialization on a single reactor thread, so it tops out at one core. This
+runner starts ``--workers`` processes. Each one has its own reactor and
+browser, writes to ``<out-dir>/worker-<i>/`` and, with ``--partition static``,
+uses ``<jobdir>/worker-<i>/``.
+
+Work is partitioned in one of two ways:
+
+* ``frontier`` (default): every worker is a node of one shared
+  ``FrontierScheduler`` frontier (``<out-dir>/frontier.sqlite``). Nodes claim
+  page ranges as they go, so even a single category is split.
+* ``static``: start URLs are dealt round-robin to the workers.
+
+The runner restarts a worker that crashes (non-zero exit, e.g. OOM-killed),
+with exponential backoff, up to ``--max-restarts`` times. On SIGINT/SIGTERM it
+forwards SIGTERM, which Scrapy treats as a graceful shutdown, and kills any
+worker still running after ``--shutdown-timeout``. When the workers are done
+it writes ``manifest.json`` (every page file, across workers) and
+``stats.json`` (per-worker and combined Scrapy stats). With ``--metrics-port``
+and ``prometheus_client`` installed, the workers' Prometheus metrics are
+aggregated and served from the runner. With ``--browser-server`` the runner
+launches one Chromium and every worker connects to it over CDP
+(``PLAYWRIGHT_CDP_URL``) instead of starting its own browser.
+
+Example::
+
+    python -m scrapy_playwright_demo.runner --workers 8 --out-dir /data/products \\
+        -s PLAYWRIGHT_MAX_CONTEXTS=2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS = ("frontier", "static")
+
+
+@dataclass(frozen=True)
+class WorkerSpec:
+    index: int
+    spider: str
+    out_dir: str
+    stats_dir: str
+    start_urls: list[str] = field(default_factory=list)  # empty = the spider's own
+    settings: dict[str, Any] = field(default_factory=dict)
+    env: dict[str, str] = field(default_factory=dict)
+    attempt: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"worker-{self.index}"
+
+
+# --------------------------------------------------------------------------- #
+# Worker side
+# --------------------------------------------------------------------------- #
+def run_worker(spec: WorkerSpec) -> None:
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    settings.setdict(spec.settings, priority="cmdline")
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(spec.spider)
+    kwargs = {"start_urls": spec.start_urls} if spec.start_urls else {}
+    process.crawl(crawler, **kwargs)
+    process.start()
+
+    stats_path = Path(spec.stats_dir) / f"{spec.name}.attempt-{spec.attempt}.json"
+    stats_path.write_text(json.dumps(crawler.stats.get_stats(), default=str), encoding="utf-8")
+
+
+# --------------------------------------------------------------------------- #
+# Partitioning
+# --------------------------------------------------------------------------- #
+def partition(urls: list[str], workers: int) -> list[list[str]]:
+    """Deal ``urls`` round-robin; never more partitions than URLs."""
+    n = max(1, min(workers, len(urls)))
+    return [urls[i::n] for i in range(n)]
+
+
+def build_specs(args: argparse.Namespace, start_urls: list[str]) -> list[WorkerSpec]:
+    out_dir = Path(args.out_dir)
+    stats_dir = out_dir / "_runner"
+    overrides = dict(_parse_overrides(args.set))
+    if args.partition == "static":
+        parts = partition(start_urls, args.workers)
+        if len(parts) < args.workers:
+            logger.warning("only %d start URLs: running %d static workers", len(start_urls), len(parts))
+    else:
+        parts = [start_urls] * args.workers
+        overrides.update({"FRONTIER_ENABLED": True, "FRONTIER_PATH": str(out_dir / "frontier.sqlite")})
+    specs = []
+    for i, urls in enumerate(parts):
+        worker_out = out_dir / f"worker-{i}"
+        jobdir = str(Path(args.jobdir) / f"worker-{i}") if args.jobdir and args.partition == "static" else ""
+        settings = {
+            **overrides,
+            "PAGE_OUT_DIR": str(worker_out),
+            "JOBDIR": jobdir,  # the frontier already persists the shared state
+            "JOB": f"{args.spider}-w{i}",
+            "LOG_LEVEL": args.log_level,
+        }
+        env = {
+            # AppSettings (and so the DI container's sink) reads the environment
+            "PAGE_OUT_DIR": str(worker_out),
+            # The runner serves the aggregated metrics; workers must not bind a port
+            "PROMETHEUS_PORT": "0",
+        }
+        if settings.get("FRONTIER_ENABLED"):
+            env.update({"FRONTIER_ENABLED": "true", "FRONTIER_PATH": str(settings["FRONTIER_PATH"])})
+        specs.append(WorkerSpec(i, args.spider, str(worker_out), str(stats_dir), urls, settings, env))
+    return specs
+
+
+def _parse_overrides(pairs: Iterable[str]) -> Iterable[tuple[str, str]]:
+    for pair in pairs or ():
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"-s expects KEY=VALUE, got {pair!r}")
+        yield key.strip(), value
+
+
+# --------------------------------------------------------------------------- #
+# Supervision
+# --------------------------------------------------------------------------- #
+@dataclass
+class _Slot:
+    spec: WorkerSpec
+    proc: Any = None
+    restarts: int = 0
+    restart_at: float | None = None
+    state: str = "pending"  # pending | running | done | failed
+
+
+class WorkerSupervisor:
+    """Starts worker processes, restarts crashed ones and coordinates shutdown."""
+
+    def __init__(self, specs: list[WorkerSpec], spawn: Callable[[WorkerSpec], Any],
+                 max_restarts: int = 3, restart_backoff_s: float = 5.0, shutdown_timeout_s: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic, on_exit: Callable[[int], None] | None = None) -> None:
+        self.slots = [_Slot(spec) for spec in specs]
+        self.spawn = spawn
+        self.max_restarts = max_restarts
+        self.restart_backoff_s = restart_backoff_s
+        self.shutdown_timeout_s = shutdown_timeout_s
+        self.clock = clock
+        self.on_exit = on_exit
+        self.stopping = False
+        self._kill_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return all(slot.state in ("done", "failed") for slot in self.slots)
+
+    def start(self) -> None:
+        for slot in self.slots:
+            self._launch(slot)
+
+    def stop(self) -> None:
+        """Graceful shutdown: SIGTERM now, SIGKILL after ``shutdown_timeout_s``."""
+        if self.stopping:
+            return
+        self.stopping = True
+        self._kill_at = self.clock() + self.shutdown_timeout_s
+        for slot in self.slots:
+            if slot.state == "running":
+                slot.proc.terminate()
+            elif slot.state == "pending":
+                slot.state = "failed"  # waiting for a restart that will not happen
+
+    def poll(self) -> None:
+        now = self.clock()
+        for slot in self.slots:
+            if slot.state == "pending" and slot.restart_at is not None and now >= slot.restart_at:
+                self._launch(slot)
+            if slot.state != "running":
+                continue
+            code = slot.proc.poll()
+            if code is None:
+                if self._kill_at is not None and now >= self._kill_at:
+                    logger.warning("%s did not stop in time; killing it", slot.spec.name)
+                    slot.proc.kill()
+                continue
+            if self.on_exit is not None:
+                self.on_exit(slot.proc.pid)
+            if code == 0 or self.stopping:
+                slot.state = "done" if code == 0 else "failed"
+            elif slot.restarts < self.max_restarts:
+                delay = self.restart_backoff_s * 2 ** slot.restarts
+                slot.restarts += 1
+                slot.state, slot.restart_at = "pending", now + delay
+                logger.warning("%s exited with %s; restart %d/%d in %.0fs",
+                               slot.spec.name, code, slot.restarts, self.max_restarts, delay)
+            else:
+                slot.state = "failed"
+                logger.error("%s exited with %s; giving up after %d restarts", slot.spec.name, code, slot.restarts)
+
+    def run(self, interval_s: float = 1.0, sleep: Callable[[float], None] = time.sleep) -> bool:
+        """Block until every worker is done; True if none failed."""
+        self.start()
+        while not self.finished:
+            sleep(interval_s)
+            self.poll()
+        return all(slot.state == "done" for slot in self.slots)
+
+    def _launch(self, slot: _Slot) -> None:
+        spec = WorkerSpec(**{**asdict(slot.spec), "attempt": slot.restarts})
+        slot.proc, slot.state, slot.restart_at = self.spawn(spec), "running", None
+
+
+def spawn_subprocess(spec: WorkerSpec, base_env: Mapping[str, str] | None = None) -> subprocess.Popen:
+    Path(spec.stats_dir).mkdir(parents=True, exist_ok=True)
+    spec_path = Path(spec.stats_dir) / f"{spec.name}.spec.json"
+    spec_path.write_text(json.dumps(asdict(spec)), encoding="utf-8")
+    env = {**(base_env if base_env is not None else os.environ), **spec.env}
+    cmd = [sys.executable, "-m", "scrapy_playwright_demo.runner", "--worker", str(spec_path)]
+    return subprocess.Popen(cmd, env=env)  # noqa: S603
+
+
+# --------------------------------------------------------------------------- #
+# Consolidation
+# --------------------------------------------------------------------------- #
+def merge_stats(per_worker: Iterable[Mapping[str, Any]]) -> dict[str, Any]:
+    """
+    Combine Scrapy stats dicts: counters are summed, ``*max*``/``*min*`` keys
+    keep the extreme, ``start_time``/``finish_time`` the earliest/latest. Any
+    other value is collected into a sorted list of distinct values.
+    """
+    merged: dict[str, Any] = {}
+    others: dict[str, set] = {}
+    for stats in per_worker:
+        for key, value in stats.items():
+            leaf = key.rsplit("/", 1)[-1]
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if key not in merged:
+                    merged[key] = value
+                elif "max" in leaf:
+                    merged[key] = max(merged[key], value)
+                elif "min" in leaf:
+                    merged[key] = min(merged[key], value)
+                else:
+                    merged[key] += value
+            elif key == "start_time":
+                merged[key] = min(merged.get(key, value), value)
+            elif key == "finish_time":
+                merged[key] = max(merged.get(key, value), value)
+            else:
+                others.setdefault(key, set()).add(str(value))
+    for key, values in others.items():
+        merged[key] = sorted(values)
+    return merged
+
+
+def _page_order(page: str) -> tuple:
+    category, _, number = page.rpartition("/")
+    return (category, not number.isdigit(), int(number) if number.isdigit() else 0, number)
+
+
+def build_manifest(out_dir: Path, workers: int) -> dict[str, Any]:
+    """Every finished page across ``worker-*`` dirs; a page written twice (at-least-once) is listed once."""
+    pages: dict[str, dict[str, Any]] = {}
+    duplicates = []
+    for i in range(workers):
+        worker_dir = out_dir / f"worker-{i}"
+        for done in sorted(worker_dir.glob("page-*.done")) + sorted(worker_dir.glob("*/page-*.done")):
+            number = done.name[len("page-"):-len(".done")]
+            data = next((p for p in (done.with_name(f"page-{number}.jl.gz"), done.with_name(f"page-{number}.jl")) if p.exists()), None)
+            if data is None:
+                continue
+            # Pages of a category (sitemap discovery) are in a sub-directory: "<category>/N"
+            page = number if done.parent == worker_dir else f"{done.parent.name}/{number}"
+            entry = {"page": page, "worker": i, "path": str(data.relative_to(out_dir)), "bytes": data.stat().st_size}
+            if page in pages:
+                duplicates.append(entry)
+            else:
+                pages[page] = entry
+    ordered = sorted(pages.values(), key=lambda e: _page_order(e["page"]))
+    return {"pages": ordered, "page_count": len(ordered), "duplicates": duplicates}
+
+
+def consolidate(out_dir: Path, workers: int) -> dict[str, Any]:
+    stats_dir = out_dir / "_runner"
+    per_worker: dict[str, list[dict[str, Any]]] = {}
+    for path in sorted(stats_dir.glob("worker-*.attempt-*.json")):
+        name = path.name.split(".attempt-")[0]
+        per_worker.setdefault(name, []).append(json.loads(path.read_text(encoding="utf-8")))
+    worker_totals = {name: merge_stats(attempts) for name, attempts in per_worker.items()}
+    stats = {"workers": worker_totals, "total": merge_stats(worker_totals.values())}
+    manifest = build_manifest(out_dir, workers)
+    (out_dir / "stats.json").write_text(json.dumps(stats, indent=2, default=str), encoding="utf-8")
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return {"stats": stats, "manifest": manifest}
+
+
+# --------------------------------------------------------------------------- #
+# Metrics
+# --------------------------------------------------------------------------- #
+def start_metrics(port: int, multiproc_dir: Path) -> Callable[[int], None] | None:
+    """Serve the workers' aggregated metrics; returns the dead-process hook, or None without prometheus_client."""
+    try:
+        from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+    except ImportError:
+        logger.warning("--metrics-port given but prometheus_client is not installed")
+        return None
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(multiproc_dir))
+    start_http_server(port, registry=registry)
+    logger.info("aggregated worker metrics on :%d", port)
+    return lambda pid: multiprocess.mark_process_dead(pid, path=str(multiproc_dir))
+
+
+# --------------------------------------------------------------------------- #
+# Driver
+# --------------------------------------------------------------------------- #
+def _spider_start_urls(spider: str) -> list[str]:
+    from scrapy.spiderloader import SpiderLoader
+    from scrapy.utils.project import get_project_settings
+
+    return list(getattr(SpiderLoader.from_settings(get_project_settings()).load(spider), "start_urls", []))
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a spider in several worker processes")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--spider", default="zalando")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--start-url", action="append", default=[], help="repeatable; default: the spider's")
+    parser.add_argument("--partition", choices=PARTITIONS, default="frontier")
+    parser.add_argument("--out-dir", default="out/products")
+    parser.add_argument("--jobdir", default="", help="base JOBDIR for static partitions (one subdir per worker)")
+    parser.add_argument("--metrics-port", type=int, default=0)
+    parser.add_argument("--max-restarts", type=int, default=3)
+    parser.add_argument("--restart-backoff", type=float, default=5.0, help="seconds, doubled per restart")
+    parser.add_argument("--shutdown-timeout", type=float, default=60.0)
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--browser-server", action="store_true", help="one shared Chromium for all workers (CDP)")
+    parser.add_argument("-s", "--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Scrapy setting for every worker")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    if args.worker:
+        run_worker(WorkerSpec(**json.loads(Path(args.worker).read_text(encoding="utf-8"))))
+        return 0
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s runner %(levelname)s %(message)s")
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start_urls = args.start_url or _spider_start_urls(args.spider)
+    server = None
+    if args.browser_server:
+        from scrapy.utils.project import get_project_settings
+
+        from scrapy_playwright_demo.fleet import browser_server
+
+        server = browser_server(get_project_settings())
+        args.set = [*args.set, f"PLAYWRIGHT_CDP_URL={server.start()}"]
+    specs = build_specs(args, start_urls)
+
+    base_env = dict(os.environ)
+    on_exit = None
+    if args.metrics_port:
+        multiproc_dir = out_dir / "_runner" / "prometheus"
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        multiproc_dir.mkdir(parents=True)
+        base_env["PROMETHEUS_MULTIPROC_DIR"] = str(multiproc_dir)
+        on_exit = start_metrics(args.metrics_port, multiproc_dir)
+
+    supervisor = WorkerSupervisor(
+        specs,
+        spawn=lambda spec: spawn_subprocess(spec, base_env),
+        max_restarts=args.max_restarts,
+        restart_backoff_s=args.restart_backoff,
+        shutdown_timeout_s=args.shutdown_timeout,
+        on_exit=on_exit,
+    )
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: supervisor.stop())
+    logger.info("starting %d %s workers (%s partition)", len(specs), args.spider, args.partition)
+    try:
+        ok = supervisor.run()
+    finally:
+        if server is not None:
+            server.stop()
+
+    result = consolidate(out_dir, len(specs))
+    logger.info("%d pages from %d workers → %s", result["manifest"]["page_count"], len(specs), out_dir / "manifest.json")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+# scrapy_playwright_demo/scheduler.py
+"""
+Scheduler that actually waits before sending a retry.
+
+Retry paths (``CustomRetryMiddleware``, spider errbacks) build their retry
+with ``RetryPolicy.retry_request()``, which stores the backoff in
+``meta["retry_delay"]``. Scrapy itself ignores that key, so
+``DelayedRetryScheduler`` parks such requests in a heap ordered by due
+time. A single reactor timer (nothing blocks) hands them back to the engine
+once due, after which they go through the regular queues and dupefilter.
+
+Parked retries count as pending work, so the spider is not considered idle
+(and not closed) while they wait. On close they are pushed to the disk queue
+when ``JOBDIR`` is set, so a resumed job still retries them.
+
+``FrontierScheduler`` adds a shared, multi-node frontier on top (see
+``frontier/``). Listing-page requests marked with ``meta["frontier"]`` go to
+the shared backend instead of the local queue. When the local queue runs dry,
+the node claims the next page range under a lease, renews the lease while it
+works on those pages, and completes the task once the page is written
+(``PerPageSinkPipeline`` sends ``frontier_task_done`` after the sink write).
+
+It also consults the crawl ``Checkpoint`` (see ``checkpoint.py``) when the DI
+container provides one: listing pages already written to the sink are
+dropped on enqueue and on dequeue, before they reach Playwright (keyed like
+the sink's pages: per category when the request carries one). If a resumed
+job finds its queue empty (a hard crash leaves Scrapy's disk queue without
+its state), the listing pages known but not finished are issued again. The
+scheduler closes after the item pipelines (and may still remember requests
+while persisting delayed retries), so it is the one that closes the checkpoint.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import os
+import pickle
+import socket
+
+from scrapy.core.scheduler import Scheduler
+from scrapy.utils.request import request_from_dict
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+
+from scrapy_playwright_demo import signals as project_signals
+from scrapy_playwright_demo.checkpoint import Checkpoint
+from scrapy_playwright_demo.frontier import FRONTIER_LEASE, FRONTIER_META, FrontierBackend, Task, build_frontier, task_position
+from scrapy_playwright_demo.items import CATEGORY_META, page_key
+from scrapy_playwright_demo.retry import RETRY_DELAY_KEY
+
+try:
+    from prometheus_client import Gauge, Histogram
+
+    retry_pending = Gauge("retry_pending_requests", "Retries waiting for their backoff delay")
+    retry_applied_delay = Histogram(
+        "retry_applied_delay_seconds",
+        "Time retries actually waited before being re-queued",
+        buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300),
+    )
+except ImportError:
+    retry_pending = retry_applied_delay = None
+
+logger = logging.getLogger(__name__)
+
+
+class DelayedRetryScheduler(Scheduler):
+    def __init__(self, *args, clock=None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.clock = clock or reactor
+        self._delayed: list[tuple[float, int, float, object]] = []  # (due, seq, enqueued_at, request)
+        self._seq = itertools.count()
+        self._timer = None
+
+    # Queueing --------------------------------------------------------------
+
+    def enqueue_request(self, request) -> bool:
+        delay = request.meta.pop(RETRY_DELAY_KEY, None)
+        if not delay or delay <= 0:
+            return super().enqueue_request(request)
+        now = self.clock.seconds()
+        heapq.heappush(self._delayed, (now + delay, next(self._seq), now, request))
+        self.stats.inc_value("retry/delayed/enqueued")
+        self._publish_depth()
+        self._arm()
+        return True
+
+    def has_pending_requests(self) -> bool:
+        return bool(self._delayed) or super().has_pending_requests()
+
+    def __len__(self) -> int:
+        return super().__len__() + len(self._delayed)
+
+    def close(self, reason: str):
+        if self._timer is not None and self._timer.active():
+            self._timer.cancel()
+        self._timer = None
+        pending = [entry[3] for entry in sorted(self._delayed)]
+        self._delayed.clear()
+        self._publish_depth()
+        if pending:
+            if self.dqs is not None:
+                for request in pending:
+                    super().enqueue_request(request)
+                logger.info("persisted %d delayed retries to the job queue", len(pending))
+            else:
+                self.stats.inc_value("retry/delayed/dropped_on_close", len(pending))
+                logger.warning("dropping %d delayed retries on close (%s)", len(pending), reason)
+        return super().close(reason)
+
+    # Timer -----------------------------------------------------------------
+
+    def _arm(self) -> None:
+        if not self._delayed:
+            return
+        due = self._delayed[0][0]
+        if self._timer is not None and self._timer.active():
+            if self._timer.getTime() <= due:
+                return
+            self._timer.cancel()
+        self._timer = self.clock.callLater(max(0.0, due - self.clock.seconds()), self._release)
+
+    def _release(self) -> None:
+        self._timer = None
+        now = self.clock.seconds()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, enqueued_at, request = heapq.heappop(self._delayed)
+            waited = now - enqueued_at
+            self.stats.inc_value("retry/delayed/released")
+            self.stats.inc_value("retry/delayed/applied_seconds", waited, start=0.0)
+            self.stats.max_value("retry/delayed/applied_seconds/max", round(waited, 3))
+            if retry_applied_delay is not None:
+                retry_applied_delay.observe(waited)
+            self._requeue(request)
+        self._publish_depth()
+        self._arm()
+
+    def _requeue(self, request) -> None:
+        # Through the engine so request_scheduled fires and the engine wakes up
+        # immediately instead of on its next heartbeat.
+        self.crawler.engine.crawl(request)
+
+    def _publish_depth(self) -> None:
+        depth = len(self._delayed)
+        self.stats.set_value("retry/delayed/pending", depth)
+        self.stats.max_value("retry/delayed/pending/max", depth)
+        if retry_pending is not None:
+            retry_pending.set(depth)
+
+
+class FrontierScheduler(DelayedRetryScheduler):
+    """
+    ``DelayedRetryScheduler`` backed by a shared frontier when ``FRONTIER_ENABLED``.
+
+    A node renews only the leases it has touched (enqueued a retry for, or
+    dequeued) within ``FRONTIER_LEASE_S``. A page whose last attempt ended in
+    an errback without a retry is therefore left to expire, and is then claimed
+    again (by any node) until ``FRONTIER_MAX_ATTEMPTS``. A crashed node's
+    pages come back the same way. The spider stays open while the frontier has
+    outstanding tasks, even if other nodes hold them, because their leases may
+    still expire.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.frontier: FrontierBackend | None = None
+        self.node = f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_s = 300.0
+        self.heartbeat_s = 30.0
+        self.claim_size = 4
+        self.max_leases = 8
+        self.max_attempts = 3
+        self.poll_s = 2.0
+        self._held: dict[str, float] = {}  # lease key -> last time this node touched it
+        self._outstanding = 0
+        self._next_claim_at = 0.0
+        self._loop: LoopingCall | None = None
+        self.checkpoint: Checkpoint | None = None
+        self._replayed: set[str] = set()  # pages re-issued from the checkpoint, not dequeued yet
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        sched = super().from_crawler(crawler)
+        s = crawler.settings
+        if s.getbool("FRONTIER_ENABLED"):
+            sched.frontier = build_frontier(s)
+            sched.node = s.get("FRONTIER_NODE_ID") or sched.node
+            sched.lease_s = s.getfloat("FRONTIER_LEASE_S", 300.0)
+            sched.heartbeat_s = s.getfloat("FRONTIER_HEARTBEAT_S", 30.0)
+            sched.claim_size = s.getint("FRONTIER_CLAIM_SIZE", 4)
+            sched.max_leases = s.getint("FRONTIER_MAX_LEASES", 2 * sched.claim_size)
+            sched.max_attempts = s.getint("FRONTIER_MAX_ATTEMPTS", 3)
+            sched.poll_s = s.getfloat("FRONTIER_POLL_S", 2.0)
+        container = s.get("CONTAINER")
+        if container is not None:
+            sched.checkpoint = container.checkpoint(s)
+        return sched
+
+    def open(self, spider):
+        result = super().open(spider)
+        if self.frontier is not None:
+            self.crawler.signals.connect(self._task_done, signal=project_signals.frontier_task_done)
+            self.crawler.signals.connect(self._task_failed, signal=project_signals.frontier_task_failed)
+            self._loop = LoopingCall(self._heartbeat)
+            self._loop.clock = self.clock
+            self._loop.start(self.heartbeat_s, now=True)
+            logger.info("frontier node %s: claiming up to %d pages per lease", self.node, self.claim_size)
+        if self.checkpoint is not None and not len(self):
+            self._replay()
+        return result
+
+    def close(self, reason: str):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        result = super().close(reason)
+        if self.frontier is not None:
+            released = self.frontier.release_node(self.node)
+            if released:
+                self.stats.inc_value("frontier/released_on_close", released)
+                logger.info("frontier node %s: released %d unfinished leases", self.node, released)
+            self._held.clear()
+            self.frontier.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        return result
+
+    # Queueing --------------------------------------------------------------
+
+    def enqueue_request(self, request) -> bool:
+        meta = request.meta
+        if self.checkpoint is not None and meta.get(FRONTIER_META) and FRONTIER_LEASE not in meta:
+            if not self._checkpoint_admits(request):
+                return False
+        if self.frontier is None or not meta.get(FRONTIER_META) or FRONTIER_LEASE in meta:
+            lease = meta.get(FRONTIER_LEASE)
+            if lease is not None and self.frontier is not None:
+                self._held[lease] = self.clock.seconds()  # a retry keeps the lease alive
+            return super().enqueue_request(request)
+        added = self.frontier.add([self._task(request)])
+        self.stats.inc_value("frontier/added" if added else "frontier/duplicate")
+        self._outstanding += added
+        return bool(added)  # False → request_dropped, like a dupefilter hit
+
+    def next_request(self):
+        request = self._next_unfinished()
+        if request is None and self.frontier is not None and self._claim():
+            request = self._next_unfinished()
+        if request is not None and self.frontier is not None:
+            lease = request.meta.get(FRONTIER_LEASE)
+            if lease is not None:
+                self._held[lease] = self.clock.seconds()
+        return request
+
+    def has_pending_requests(self) -> bool:
+        return super().has_pending_requests() or self._outstanding > 0
+
+    # Checkpoint ------------------------------------------------------------
+
+    def _checkpoint_admits(self, request) -> bool:
+        page = self._page_key(request)
+        if self.checkpoint.is_done(page):
+            self.stats.inc_value("checkpoint/skipped/done")
+            return False
+        if page in self._replayed:
+            self.stats.inc_value("checkpoint/skipped/replayed")  # e.g. the start URL of a resumed job
+            return False
+        try:
+            self.checkpoint.remember_request(page, self._payload(request))
+        except ValueError:  # callback is not a spider method: cannot be replayed
+            logger.debug("checkpoint: cannot serialize %s", request)
+        return True
+
+    def _next_unfinished(self):
+        while True:
+            request = super().next_request()
+            if request is None or self.checkpoint is None or not request.meta.get(FRONTIER_META):
+                return request
+            page = self._page_key(request)
+            self._replayed.discard(page)
+            if not self.checkpoint.is_done(page):
+                return request
+            self.stats.inc_value("checkpoint/skipped/done")
+
+    def _replay(self) -> None:
+        payloads = self.checkpoint.pending_requests()
+        for payload in payloads:
+            request = request_from_dict(pickle.loads(payload), spider=self.spider)
+            if self.enqueue_request(request):
+                self._replayed.add(self._page_key(request))
+        if payloads:
+            self.stats.inc_value("checkpoint/replayed", len(self._replayed))
+            logger.info("checkpoint: re-issued %d unfinished listing pages", len(self._replayed))
+
+    # Frontier --------------------------------------------------------------
+
+    @staticmethod
+    def _position(request) -> tuple[str, int]:
+        position = request.meta.get(FRONTIER_META)
+        if isinstance(position, dict):
+            return position["group"], int(position["page"])
+        return task_position(request.url)
+
+    @classmethod
+    def _page_key(cls, request) -> str:
+        """Checkpoint key, the same one ``PerPageSinkPipeline`` marks done (see ``page_key``)."""
+        return page_key(cls._position(request)[1], request.meta.get(CATEGORY_META))
+
+    def _payload(self, request) -> bytes:
+        return pickle.dumps(request.to_dict(spider=self.spider), protocol=4)
+
+    def _task(self, request) -> Task:
+        group, page = self._position(request)
+        key = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        return Task(key, self._payload(request), group, page)
+
+    def _claim(self) -> bool:
+        now = self.clock.seconds()
+        room = min(self.claim_size, self.max_leases - len(self._held))
+        if now < self._next_claim_at or room <= 0:
+            return False
+        leases = self.frontier.claim(self.node, room, self.lease_s, self.max_attempts)
+        if not leases:
+            self._next_claim_at = now + self.poll_s
+            self._refresh()
+            return False
+        self.stats.inc_value("frontier/claims")
+        self.stats.inc_value("frontier/claimed", len(leases))
+        for lease in leases:
+            request = request_from_dict(pickle.loads(lease.payload), spider=self.spider)
+            request.meta[FRONTIER_LEASE] = lease.key
+            request.dont_filter = True  # the frontier already deduplicated it
+            self._held[lease.key] = now
+            super().enqueue_request(request)
+        return True
+
+    def _heartbeat(self) -> None:
+        now = self.clock.seconds()
+        active = [key for key, touched in self._held.items() if now - touched <= self.lease_s]
+        held = self.frontier.heartbeat(self.node, active, self.lease_s)
+        for key in list(self._held):
+            if key not in held:
+                del self._held[key]
+                if key in active:
+                    self.stats.inc_value("frontier/leases_lost")  # expired and claimed elsewhere
+        self._refresh()
+
+    def _refresh(self) -> None:
+        counts = self.frontier.counts()
+        self._outstanding = counts["pending"] + counts["leased"]
+        for state, n in counts.items():
+            self.stats.set_value(f"frontier/tasks/{state}", n)
+        self.stats.set_value("frontier/held", len(self._held))
+
+    def _task_done(self, lease, spider) -> None:
+        key = lease
+        if key is None:
+            return
+        self.frontier.complete(key)
+        self._held.pop(key, None)
+        self.stats.inc_value("frontier/done")
+
+    def _task_failed(self, request, spider, reason) -> None:
+        key = request.meta.get(FRONTIER_LEASE)
+        if key is None:
+            return
+        state = self.frontier.release(key, self.node, self.max_attempts)
+        self._held.pop(key, None)
+        self.stats.inc_value(f"frontier/released/{state.value}")
+        logger.warning("frontier page %s released as %s: %s", request.url, state.value, reason)
@@ -1,9 +1,12 @@
 # settings.py
 
-from scrapy_playwright_demo.config import app_settings  # noqa: F401  (must be imported before Scrapy reads settings)
-import scrapy_playwright_demo.bootstrap  # noqa: F401
+from scrapy_playwright_demo.config import get_app_settings
 from scrapy_playwright_demo.container import Container
 
+# Resolved once per process. Logging, Sentry and Prometheus are set up lazily
+# by ObservabilityExtension (see bootstrap.py), not when this module is imported.
+app_settings = get_app_settings()
+
 # Global DI container (singleton per process)
 CONTAINER = Container(app_settings)
 
@@ -21,7 +24,7 @@ ROBOTSTXT_OBEY = False
 LOG_LEVEL = app_settings.log_level
 
 # Recommended for Scrapy + Playwright (optional if set elsewhere)
-# TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
+TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 
 # -----------------
 # Playwright integration
@@ -35,14 +38,53 @@ PLAYWRIGHT_LAUNCH_OPTIONS = {"headless": app_settings.playwright_headless}
 PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT = app_settings.playwright_default_navigation_timeout_ms
 PLAYWRIGHT_MAX_CONTEXTS = app_settings.playwright_max_contexts
 PLAYWRIGHT_MAX_PAGES_PER_CONTEXT = app_settings.playwright_max_pages_per_context
+# Set by the fleet / runner browser server (or by hand): every crawler connects to that Chromium over CDP
+PLAYWRIGHT_CDP_URL = app_settings.playwright_cdp_url
+
+# Browser telemetry + context recycling (BrowserSupervisorMiddleware)
+BROWSER_SUPERVISOR_ENABLED = app_settings.browser_supervisor_enabled
+BROWSER_SAMPLE_INTERVAL_S = app_settings.browser_sample_interval_s
+CONTEXT_MAX_RSS_MB = app_settings.context_max_rss_mb
+CONTEXT_MAX_JS_HEAP_MB = app_settings.context_max_js_heap_mb
+CONTEXT_MAX_AGE_S = app_settings.context_max_age_s
+CONTEXT_MAX_PAGES = app_settings.context_max_pages
 
 # -----------------
 # Throttling / Retries
 # -----------------
 AUTOTHROTTLE_ENABLED = app_settings.autothrottle_enabled
 AUTOTHROTTLE_TARGET_CONCURRENCY = app_settings.autothrottle_target_concurrency
-RETRY_TIMES = app_settings.retry_times
+RETRY_TIMES = app_settings.retry_max_retries
 RETRY_HTTP_CODES = app_settings.retry_http_codes
+# Holds retries for their RetryPolicy backoff (meta["retry_delay"]) without blocking the reactor,
+# and shares listing pages between nodes when FRONTIER_ENABLED
+SCHEDULER = "scrapy_playwright_demo.scheduler.FrontierScheduler"
+
+# Per-host / per-proxy token buckets + circuit breakers (RateLimitMiddleware)
+RATELIMIT_ENABLED = app_settings.ratelimit_enabled
+RATELIMIT_HOST_RATE = app_settings.ratelimit_host_rate
+RATELIMIT_HOST_BURST = app_settings.ratelimit_host_burst
+RATELIMIT_PROXY_RATE = app_settings.ratelimit_proxy_rate
+RATELIMIT_PROXY_BURST = app_settings.ratelimit_proxy_burst
+CIRCUIT_FAILURE_RATE = app_settings.circuit_failure_rate
+CIRCUIT_MIN_REQUESTS = app_settings.circuit_min_requests
+CIRCUIT_WINDOW_S = app_settings.circuit_window_s
+CIRCUIT_OPEN_S = app_settings.circuit_open_s
+CIRCUIT_MAX_OPEN_S = app_settings.circuit_max_open_s
+CIRCUIT_HALF_OPEN_PROBES = app_settings.circuit_half_open_probes
+
+# Adaptive render concurrency (AdaptiveConcurrencyMiddleware)
+ADAPTIVE_CONCURRENCY_ENABLED = app_settings.adaptive_concurrency_enabled
+ADAPTIVE_CONCURRENCY_START = app_settings.adaptive_concurrency_start
+ADAPTIVE_CONCURRENCY_MIN = app_settings.adaptive_concurrency_min
+ADAPTIVE_CONCURRENCY_MAX = app_settings.adaptive_concurrency_max
+ADAPTIVE_CONCURRENCY_INTERVAL_S = app_settings.adaptive_concurrency_interval_s
+ADAPTIVE_CONCURRENCY_WINDOW_S = app_settings.adaptive_concurrency_window_s
+ADAPTIVE_CONCURRENCY_TARGET_LATENCY_S = app_settings.adaptive_concurrency_target_latency_s
+ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE = app_settings.adaptive_concurrency_max_error_rate
+ADAPTIVE_CONCURRENCY_MAX_THROTTLE_RATE = app_settings.adaptive_concurrency_max_throttle_rate
+ADAPTIVE_CONCURRENCY_MAX_CPU_PERCENT = app_settings.adaptive_concurrency_max_cpu_percent
+ADAPTIVE_CONCURRENCY_MIN_MEMORY_PERCENT = app_settings.adaptive_concurrency_min_memory_percent
 
 # -----------------
 # Middlewares
@@ -51,9 +93,47 @@ DOWNLOADER_MIDDLEWARES = {
     "scrapy_playwright_demo.middlewares.RotatingUserAgentAndProxyMiddleware": 543,
     # If you have your CustomRetryMiddleware enabled, leave it. If not, remove or fix the path.
     "scrapy_playwright_demo.middlewares.retry.CustomRetryMiddleware": 550,
+    # Both see raw responses, before CustomRetryMiddleware turns them into retries
+    "scrapy_playwright_demo.middlewares.proxy.ProxyPoolMiddleware": 551,
+    "scrapy_playwright_demo.middlewares.ratelimit.RateLimitMiddleware": 552,
+    "scrapy_playwright_demo.middlewares.concurrency.AdaptiveConcurrencyMiddleware": 555,
+    "scrapy_playwright_demo.middlewares.browser.BrowserSupervisorMiddleware": 560,
+    # Only active under the fleet runner (FLEET_SHARE): fair page slots across its spiders
+    "scrapy_playwright_demo.middlewares.fleet.FairShareMiddleware": 565,
     "scrapy.downloadermiddlewares.retry.RetryMiddleware": None,
 }
 
+# -----------------
+# Extensions
+# -----------------
+EXTENSIONS = {
+    # Validates config + configures logging when the crawler is built
+    "scrapy_playwright_demo.extensions.observability.ObservabilityExtension": 0,
+    "scrapy_playwright_demo.extensions.instrumentation.StageLatencyExtension": 500,
+    "scrapy_playwright_demo.extensions.memory.MemoryDiagnosticsExtension": 510,
+    "scrapy_playwright_demo.extensions.profiling.ProfilingExtension": 520,
+    "scrapy_playwright_demo.extensions.pricehistory.PriceHistoryExtension": 530,
+}
+INSTRUMENTATION_ENABLED = app_settings.instrumentation_enabled
+
+MEMORY_DIAGNOSTICS_ENABLED = app_settings.memory_diagnostics_enabled
+MEMORY_DIAGNOSTICS_SIGNAL = app_settings.memory_diagnostics_signal
+MEMORY_SNAPSHOT_EVERY_PAGES = app_settings.memory_snapshot_every_pages
+MEMORY_TOP_N = app_settings.memory_top_n
+MEMORY_REPORT_DIR = app_settings.memory_report_dir
+MEMORY_CEILING_MB = app_settings.memory_ceiling_mb
+MEMORY_CEILING_ACTION = app_settings.memory_ceiling_action
+MEMORY_RESUME_RATIO = app_settings.memory_resume_ratio
+MEMORY_PAUSE_MAX_S = app_settings.memory_pause_max_s
+MEMORY_CHECK_INTERVAL_S = app_settings.memory_check_interval_s
+
+PROFILING_CONTINUOUS_HZ = app_settings.profiling_continuous_hz
+PROFILING_EXPORT_INTERVAL_S = app_settings.profiling_export_interval_s
+PROFILING_TOP_N = app_settings.profiling_top_n
+PROFILING_OUTPUT_DIR = app_settings.profiling_output_dir
+
+PRICE_HISTORY_DIR = app_settings.price_history_dir
+
 # -----------------
 # Pipelines
 # -----------------
@@ -66,11 +146,21 @@ ITEM_PIPELINES = {
 # -----------------
 # Page sink config (used by PerPageSinkPipeline and sink implementations)
 # -----------------
-PAGE_SINK = app_settings.page_sink  # "file", "kafka", "s3", ...
+PAGE_SINK = app_settings.page_sink  # "file", "kafka", "s3", ... or "file,s3" (CompositeSink)
+PAGE_SINK_POLICIES = app_settings.page_sink_policies
+PAGE_SINK_QUEUE_SIZE = app_settings.page_sink_queue_size
+PAGE_SINK_CLOSE_TIMEOUT_S = app_settings.page_sink_close_timeout_s
+PAGE_SPOOL_DIR = app_settings.page_spool_dir
+PAGE_SPOOL_SINKS = app_settings.page_spool_sinks
+PAGE_SPOOL_SEGMENT_MB = app_settings.page_spool_segment_mb
+PAGE_SPOOL_FSYNC = app_settings.page_spool_fsync
+PAGE_SPOOL_DRAIN_TIMEOUT_S = app_settings.page_spool_drain_timeout_s
 PAGE_OUT_DIR = app_settings.page_out_dir
 PAGE_COMPRESS = app_settings.page_compress
 PAGE_IDEMPOTENT = app_settings.page_idempotent
 PAGE_DROP_MISSING_FIELD = app_settings.page_drop_missing_field
+VALIDATE_BATCH_SIZE = app_settings.validate_batch_size
+MONEY_MODE = app_settings.money_mode
 
 PAGE_KAFKA_TOPIC = app_settings.page_kafka_topic
 PAGE_KAFKA_BOOTSTRAP = app_settings.page_kafka_bootstrap
@@ -81,8 +171,61 @@ PAGE_S3_TEMPLATE = app_settings.page_s3_template
 # -----------------
 ROTATING_UA_LIST = app_settings.rotating_ua_list
 PROXY_LIST = app_settings.proxy_list
+PROXY_BAN_CODES = app_settings.proxy_ban_codes
+PROXY_FAILURE_THRESHOLD = app_settings.proxy_failure_threshold
+PROXY_MIN_SAMPLES = app_settings.proxy_min_samples
+PROXY_WINDOW_S = app_settings.proxy_window_s
+PROXY_QUARANTINE_BASE_S = app_settings.proxy_quarantine_base_s
+PROXY_QUARANTINE_MAX_S = app_settings.proxy_quarantine_max_s
+
+# -----------------
+# Shared crawl frontier (FrontierScheduler + FrontierSpiderMiddleware)
+# -----------------
+FRONTIER_ENABLED = app_settings.frontier_enabled
+FRONTIER_BACKEND = app_settings.frontier_backend
+FRONTIER_PATH = app_settings.frontier_path
+FRONTIER_SQLITE_JOURNAL_MODE = app_settings.frontier_sqlite_journal_mode
+FRONTIER_NODE_ID = app_settings.frontier_node_id
+FRONTIER_LEASE_S = app_settings.frontier_lease_s
+FRONTIER_HEARTBEAT_S = app_settings.frontier_heartbeat_s
+FRONTIER_CLAIM_SIZE = app_settings.frontier_claim_size
+FRONTIER_MAX_LEASES = app_settings.frontier_max_leases
+FRONTIER_MAX_ATTEMPTS = app_settings.frontier_max_attempts
+FRONTIER_POLL_S = app_settings.frontier_poll_s
+SPIDER_MIDDLEWARES = {
+    "scrapy_playwright_demo.middlewares.frontier.FrontierSpiderMiddleware": 900,
+    # Validates each page's items in one pydantic call before ValidateProductPipeline
+    "scrapy_playwright_demo.middlewares.validation.BatchValidationSpiderMiddleware": 800,
+}
+
+# -----------------
+# Sitemap discovery (SitemapDiscoveryMixin, `-a discovery=sitemap`)
+# -----------------
+SITEMAP_URLS = app_settings.sitemap_urls
+SITEMAP_CATEGORY_PATTERNS = app_settings.sitemap_category_patterns
+SITEMAP_PRODUCT_PATTERNS = app_settings.sitemap_product_patterns
+SITEMAP_SINCE = app_settings.sitemap_since
+SITEMAP_STATE_PATH = app_settings.sitemap_state_path
+SITEMAP_BATCH_SIZE = app_settings.sitemap_batch_size
+
+# -----------------
+# Site profiles (SiteListingSpider, `scrapy crawl sites -a site=<name>`)
+# -----------------
+SITE_PROFILE = app_settings.site_profile
+SITE_PROFILES_DIR = app_settings.site_profiles_dir
+
+# -----------------
+# Spider fleet (python -m scrapy_playwright_demo.fleet)
+# -----------------
+FLEET_CONTEXT_BUDGET = app_settings.fleet_context_budget
+FLEET_PAGE_BUDGET = app_settings.fleet_page_budget
+BROWSER_SERVER_EXECUTABLE = app_settings.browser_server_executable
 
 # -----------------
 # Resumable jobs
 # -----------------
 JOBDIR = app_settings.jobdir
+# Completed pages and partial page buffers (scrapy_playwright_demo.checkpoint)
+CHECKPOINT_ENABLED = app_settings.checkpoint_enabled
+CHECKPOINT_PATH = app_settings.checkpoint_path
+CHECKPOINT_FLUSH_ITEMS = app_settings.checkpoint_flush_items
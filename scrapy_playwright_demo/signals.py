@@ -0,0 +1,13 @@
+# scrapy_playwright_demo/signals.py
+"""
+Project signals (sent through ``crawler.signals`` like Scrapy's own).
+
+frontier_task_done(lease, spider)
+    A frontier page is finished: the sink has it (sent by ``PerPageSinkPipeline``),
+    or its callback ended without a retry and without a ``PageDone`` to write.
+frontier_task_failed(request, spider, reason)
+    The callback for a frontier page raised.
+"""
+
+frontier_task_done = object()
+frontier_task_failed = object()
@@ -1,6 +1,7 @@
-from .base import PageSink
+from .base import EncodedPage, PageSink
+from .composite import CompositeSink
 from .file import FileSink
 from .registry import build_sink
 from .fake import FakeSink
 
-__all__ = ["PageSink", "FileSink", "build_sink", "FakeSink"]
\ No newline at end of file
+__all__ = ["PageSink", "EncodedPage", "FileSink", "CompositeSink", "build_sink", "FakeSink"]
\ No newline at end of file
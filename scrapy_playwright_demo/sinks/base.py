@@ -1,6 +1,49 @@
+import json
 from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from decimal import Decimal
 from typing import Iterable, Mapping, Any
 
+
+def json_default(o: Any):
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, datetime):
+        return o.isoformat()
+    if hasattr(o, "__dataclass_fields__"):
+        return asdict(o)
+    raise TypeError(f"Type {type(o)} not serializable")
+
+
+def encode_items(items: Iterable[dict[str, Any]]) -> bytes:
+    """Items as UTF-8 JSON lines, the one serialization shared by every sink."""
+    return "".join(
+        json.dumps(obj, ensure_ascii=False, default=json_default) + "\n" for obj in items
+    ).encode("utf-8")
+
+
+def split_page_key(page: str) -> tuple[str | None, str]:
+    """``"3"`` → ``(None, "3")``; ``"<category>/3"`` → ``("<category>", "3")`` (see ``items.page_key``)."""
+    category, _, number = str(page).rpartition("/")
+    return category or None, number
+
+
+@dataclass(frozen=True)
+class EncodedPage:
+    """A page serialized once (uncompressed JSON lines), ready for any number of sinks."""
+
+    page: str
+    finished_at: str
+    payload: bytes
+
+    def lines(self) -> list[bytes]:
+        return self.payload.splitlines()
+
+    def items(self) -> list[dict[str, Any]]:
+        return [json.loads(line) for line in self.lines()]
+
+
 class PageSink(ABC):
     @abstractmethod
     def write_page(
@@ -11,4 +54,18 @@ class PageSink(ABC):
         settings: Mapping[str, Any],
     ) -> None:
         """Write a page of items to the sink."""
-        pass 
\ No newline at end of file
+        pass
+
+    def write_encoded(self, page: EncodedPage, settings: Mapping[str, Any]) -> None:
+        """Write an already serialized page. Sinks that store bytes override this to skip re-encoding."""
+        self.write_page(page.items(), page.page, page.finished_at, settings)
+
+    def open(self, settings: Mapping[str, Any]) -> None:
+        """Called when the crawl starts, before any page is written."""
+
+    def completed_pages(self, settings: Mapping[str, Any]) -> set[str]:
+        """Pages the sink already holds in full, as page keys (used to seed the crawl checkpoint)."""
+        return set()
+
+    def close(self) -> None:
+        """Flush and release whatever the sink holds (queues, connections) when the crawl ends."""
@@ -0,0 +1,219 @@
+# scrapy_playwright_demo/sinks/composite.py
+"""
+Fan-out sink: a page is serialized once and written to several sinks at once.
+
+``PAGE_SINK=file,kafka,s3`` builds a ``CompositeSink``. Each child gets its
+own worker thread and its own bounded queue (``PAGE_SINK_QUEUE_SIZE``
+pages), so the children write concurrently and never wait on each other.
+They all receive the same encoded bytes (``EncodedPage``).
+``PAGE_SINK_POLICIES`` says what a child's failure means:
+
+* ``fatal`` (default): ``write_page`` waits until the child holds the page,
+  and raises if it failed. This matches a single sink, and the checkpoint
+  only marks a page done once every fatal sink has it;
+* ``log``: the page is handed over and the crawl moves on. Failures are
+  logged and counted. When the child falls ``PAGE_SINK_QUEUE_SIZE`` pages
+  behind, further pages are dropped *for that child* instead of blocking,
+  so a slow S3 never stalls the local files or the crawl.
+
+Per-child latency, failures, drops and queue depth come from ``stats()``
+(``sink/<name>/...`` in the crawl stats) and from the
+``sink_write_seconds{sink}`` histogram.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Mapping
+
+from scrapy_playwright_demo import instrumentation
+from scrapy_playwright_demo.instrumentation import StageStats
+
+from .base import EncodedPage, PageSink, encode_items
+
+try:
+    from prometheus_client import Histogram
+
+    sink_write_seconds = Histogram(
+        "sink_write_seconds",
+        "Time for one child sink to write a page",
+        ["sink"],
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+except ImportError:
+    sink_write_seconds = None
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("fatal", "log")
+
+
+@dataclass
+class _Job:
+    page: EncodedPage
+    settings: Mapping[str, Any]
+    context: contextvars.Context  # the caller's spider_scope, for the child's own timings
+    done: threading.Event | None = None  # only fatal children are waited for
+    error: BaseException | None = None
+
+
+@dataclass
+class _Child:
+    name: str
+    sink: PageSink
+    policy: str
+    queue: queue.Queue
+    latency: StageStats = field(default_factory=lambda: StageStats(1024))
+    written: int = 0
+    failed: int = 0
+    dropped: int = 0
+    queue_max: int = 0
+    thread: threading.Thread | None = None
+
+    @property
+    def fatal(self) -> bool:
+        return self.policy == "fatal"
+
+
+class CompositeSink(PageSink):
+    def __init__(
+        self,
+        children: Iterable[tuple[str, PageSink, str]],
+        queue_size: int = 8,
+        close_timeout_s: float = 60.0,
+    ) -> None:
+        self.children: list[_Child] = []
+        for name, sink, policy in children:
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown policy {policy!r} for sink {name!r}; expected one of {POLICIES}")
+            self.children.append(_Child(name, sink, policy, queue.Queue(maxsize=max(1, queue_size))))
+        if not self.children:
+            raise ValueError("CompositeSink needs at least one child sink")
+        self.close_timeout_s = close_timeout_s
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    # API -------------------------------------------------------------------
+
+    def write_page(
+        self,
+        items: Iterable[dict[str, Any]],
+        page: str,
+        finished_at: str,
+        settings: Mapping[str, Any],
+    ) -> None:
+        with instrumentation.timed("serialize"):
+            payload = encode_items(items)
+        self.write_encoded(EncodedPage(page, finished_at, payload), settings)
+
+    def write_encoded(self, page: EncodedPage, settings: Mapping[str, Any]) -> None:
+        waiting: list[tuple[_Child, _Job]] = []
+        for child in self.children:
+            self._start(child)
+            # A Context can only be entered by one thread at a time: one copy per child
+            job = _Job(page, settings, contextvars.copy_context(), threading.Event() if child.fatal else None)
+            if child.fatal:
+                child.queue.put(job)  # a required sink may push back on the crawl
+                waiting.append((child, job))
+            else:
+                try:
+                    child.queue.put_nowait(job)
+                except queue.Full:
+                    with self._lock:
+                        child.dropped += 1
+                    logger.warning("sink %s is %d pages behind; page %s skipped for it",
+                                   child.name, child.queue.maxsize, page.page)
+                    continue
+            with self._lock:
+                child.queue_max = max(child.queue_max, child.queue.qsize())
+
+        for child, job in waiting:
+            job.done.wait()
+        for child, job in waiting:
+            if job.error is not None:
+                raise RuntimeError(f"sink {child.name} failed to write page {page.page}: {job.error}") from job.error
+
+    def open(self, settings: Mapping[str, Any]) -> None:
+        for child in self.children:
+            child.sink.open(settings)
+
+    def completed_pages(self, settings: Mapping[str, Any]) -> set[str]:
+        """Pages every fatal child holds (every child, if none is fatal)."""
+        required = [c for c in self.children if c.fatal] or self.children
+        pages = [c.sink.completed_pages(settings) for c in required]
+        return set.intersection(*pages)
+
+    def close(self) -> None:
+        """Drain every queue (up to ``close_timeout_s`` in total), then close the children."""
+        deadline = time.monotonic() + self.close_timeout_s
+        for child in self.children:
+            if child.thread is not None:
+                try:
+                    child.queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Full:
+                    pass  # still stuck on a page; the join below times out and reports it
+        for child in self.children:
+            if child.thread is not None:
+                child.thread.join(max(0.0, deadline - time.monotonic()))
+                if child.thread.is_alive():
+                    logger.error("sink %s did not drain in %.0fs; %d pages not written",
+                                 child.name, self.close_timeout_s, child.queue.qsize())
+                child.thread = None
+            child.sink.close()
+
+    def stats(self) -> dict[str, Any]:
+        out: dict[str, Any] = {}
+        with self._lock:
+            for c in self.children:
+                prefix = f"sink/{c.name}"
+                summary = c.latency.summary()
+                out.update({
+                    f"{prefix}/written": c.written,
+                    f"{prefix}/failed": c.failed,
+                    f"{prefix}/dropped": c.dropped,
+                    f"{prefix}/queue_max": c.queue_max,
+                    f"{prefix}/p50_ms": round(summary["p50"] * 1000, 3),
+                    f"{prefix}/p99_ms": round(summary["p99"] * 1000, 3),
+                    f"{prefix}/max_ms": round(summary["max"] * 1000, 3),
+                })
+        for c in self.children:
+            child_stats = getattr(c.sink, "stats", None)
+            if child_stats is not None:
+                out.update(child_stats())
+        return out
+
+    # Workers ---------------------------------------------------------------
+
+    def _start(self, child: _Child) -> None:
+        if child.thread is None or not child.thread.is_alive():
+            child.thread = threading.Thread(target=self._run, args=(child,), name=f"sink-{child.name}", daemon=True)
+            child.thread.start()
+
+    def _run(self, child: _Child) -> None:
+        while True:
+            job = child.queue.get()
+            if job is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                job.context.run(child.sink.write_encoded, job.page, job.settings)
+            except Exception as e:
+                job.error = e
+                if not child.fatal:
+                    logger.warning("sink %s failed to write page %s: %s", child.name, job.page.page, e)
+            seconds = time.perf_counter() - t0
+            with self._lock:
+                if job.error is None:
+                    child.written += 1
+                else:
+                    child.failed += 1
+                child.latency.add(seconds, self._rng)
+            if sink_write_seconds is not None:
+                sink_write_seconds.labels(sink=child.name).observe(seconds)
+            if job.done is not None:
+                job.done.set()
@@ -17,4 +17,6 @@ class FakeSink(PageSink):
             "items": list(items),
             "finished_at": finished_at,
             "settings": dict(settings),
-        } 
\ No newline at end of file
+        } 
+    def completed_pages(self, settings: Mapping[str, Any]) -> set[str]:
+        return set(self.pages)
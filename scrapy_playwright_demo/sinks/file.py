@@ -2,29 +2,20 @@
 from __future__ import annotations
 
 import gzip
-import json
 import os
-from datetime import datetime
-from decimal import Decimal
 from typing import Any, Iterable, Mapping
 
-from .base import PageSink
+from scrapy_playwright_demo import instrumentation
 
-
-def _json_default(o: Any):
-    if isinstance(o, Decimal):
-        return str(o)
-    if isinstance(o, datetime):
-        # ISO sin perder zona si la hubiera
-        return o.isoformat()
-    # pydantic v2 dicts ya vienen serializables
-    raise TypeError(f"Type {type(o)} not serializable")
+from .base import EncodedPage, PageSink, encode_items, split_page_key
 
 
 class FileSink(PageSink):
     """
     File-based sink that writes:
       page-{N}.jl[.gz]  +  page-{N}.done
+    and, for pages keyed by category (``"<category>/N"``), the same files
+    under ``<category>/``.
 
     El constructor acepta argumentos opcionales para que los tests puedan
     instanciarlo como `FileSink()` sin romper. Si no se pasan, se toman de
@@ -68,13 +59,34 @@ class FileSink(PageSink):
 
     @staticmethod
     def _paths(out_dir: str, page: str, compress: bool) -> tuple[str, str]:
+        category, number = split_page_key(page)
+        if category:
+            out_dir = os.path.join(out_dir, category)
         suffix = ".jl.gz" if compress else ".jl"
-        data_path = os.path.join(out_dir, f"page-{page}{suffix}")
-        done_path = os.path.join(out_dir, f"page-{page}.done")
+        data_path = os.path.join(out_dir, f"page-{number}{suffix}")
+        done_path = os.path.join(out_dir, f"page-{number}.done")
         return data_path, done_path
 
+    @staticmethod
+    def _done_markers(directory: str) -> list[str]:
+        return [
+            name[len("page-"):-len(".done")]
+            for name in os.listdir(directory)
+            if name.startswith("page-") and name.endswith(".done")
+        ]
+
     # API -------------------------------------------------------------------
 
+    def completed_pages(self, settings: Mapping[str, Any]) -> set[str]:
+        out_dir, _, _ = self._resolve_config(settings)
+        if not os.path.isdir(out_dir):
+            return set()
+        pages = set(self._done_markers(out_dir))
+        for entry in os.scandir(out_dir):
+            if entry.is_dir():
+                pages.update(f"{entry.name}/{number}" for number in self._done_markers(entry.path))
+        return pages
+
     def write_page(
         self,
         items: Iterable[dict[str, Any]],
@@ -83,20 +95,31 @@ class FileSink(PageSink):
         settings: Mapping[str, Any],
     ) -> None:
         out_dir, compress, idempotent = self._resolve_config(settings)
-        os.makedirs(out_dir, exist_ok=True)
+        # Checked before serializing too: a finished page costs nothing
+        if idempotent and os.path.exists(self._paths(out_dir, page, compress)[1]):
+            return
+        with instrumentation.timed("serialize"):
+            payload = encode_items(items)
+        self.write_encoded(EncodedPage(page, finished_at, payload), settings)
 
-        data_path, done_path = self._paths(out_dir, page, compress)
+    def write_encoded(self, page: EncodedPage, settings: Mapping[str, Any]) -> None:
+        out_dir, compress, idempotent = self._resolve_config(settings)
+        data_path, done_path = self._paths(out_dir, page.page, compress)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
 
         # Idempotencia: si .done existe, salimos (esto también lo puede
         # controlar la pipeline antes de llamar, pero aquí es seguro repetirlo)
         if idempotent and os.path.exists(done_path):
             return
 
-        open_fn = gzip.open if compress else open
-        mode = "at" if compress else "a"  # gzip.open soporta "at"
-        with open_fn(data_path, mode, encoding="utf-8") as f:
-            for obj in items:
-                f.write(json.dumps(obj, ensure_ascii=False, default=_json_default) + "\n")
-
-        with open(done_path, "w", encoding="utf-8") as f:
-            f.write(finished_at + "\n")
+        payload = page.payload
+        if compress:
+            # Appending a new gzip member keeps the file a valid .gz stream
+            with instrumentation.timed("compress"):
+                payload = gzip.compress(payload)
+
+        with instrumentation.timed("write"):
+            with open(data_path, "ab") as f:
+                f.write(payload)
+            with open(done_path, "w", encoding="utf-8") as f:
+                f.write(page.finished_at + "\n")
@@ -1,23 +1,11 @@
 import json
-from decimal import Decimal
-from dataclasses import asdict
-from datetime import datetime
 from typing import Iterable, Mapping, Any
-from .base import PageSink
+from scrapy_playwright_demo import instrumentation
+from .base import EncodedPage, PageSink, encode_items
 
 class KafkaSink(PageSink):
     _producer = None
 
-    @staticmethod
-    def _json_default(o):
-        if isinstance(o, Decimal):
-            return str(o)
-        if isinstance(o, datetime):
-            return o.isoformat()
-        if hasattr(o, "__dataclass_fields__"):
-            return asdict(o)
-        raise TypeError(f"Type {type(o)} not serializable")
-
     def write_page(
         self,
         items: Iterable[dict[str, Any]],
@@ -25,6 +13,11 @@ class KafkaSink(PageSink):
         finished_at: str,
         settings: Mapping[str, Any],
     ) -> None:
+        with instrumentation.timed("serialize"):
+            payload = encode_items(items)
+        self.write_encoded(EncodedPage(page, finished_at, payload), settings)
+
+    def write_encoded(self, page: EncodedPage, settings: Mapping[str, Any]) -> None:
         try:
             from kafka import KafkaProducer
         except ImportError as e:
@@ -32,11 +25,15 @@ class KafkaSink(PageSink):
         topic = settings.get("PAGE_KAFKA_TOPIC", "scrapy_pages")
         bootstrap_servers = settings.get("PAGE_KAFKA_BOOTSTRAP", "localhost:9092")
         if KafkaSink._producer is None:
-            KafkaSink._producer = KafkaProducer(
-                bootstrap_servers=bootstrap_servers,
-                value_serializer=lambda v: json.dumps(v, default=KafkaSink._json_default).encode("utf-8"),
-            )
-        for obj in items:
-            KafkaSink._producer.send(topic, obj)
-        KafkaSink._producer.send(topic, {"page": page, "finished_at": finished_at, "type": "done"})
-        KafkaSink._producer.flush() 
\ No newline at end of file
+            # Values are sent as the JSON lines of the encoded page, one message per item
+            KafkaSink._producer = KafkaProducer(bootstrap_servers=bootstrap_servers)
+        done = {"page": page.page, "finished_at": page.finished_at, "type": "done"}
+        with instrumentation.timed("write"):
+            for line in page.lines():
+                KafkaSink._producer.send(topic, line)
+            KafkaSink._producer.send(topic, json.dumps(done).encode("utf-8"))
+            KafkaSink._producer.flush()
+
+    def close(self) -> None:
+        if KafkaSink._producer is not None:
+            KafkaSink._producer.flush()
@@ -1,15 +1,16 @@
 from __future__ import annotations
 
+import os
 from typing import Mapping, Any
 
 from scrapy.settings import Settings
 
 from .file import FileSink
 from .base import PageSink
-
-# (Opcional) cuando implementes KafkaSink y S3Sink, impórtalos aquí y añádelos al registro.
-# from .kafka import KafkaSink
-# from .s3 import S3Sink
+from .composite import CompositeSink
+from .kafka import KafkaSink
+from .s3 import S3Sink
+from .spool import SpoolingSink
 
 from collections.abc import Mapping
 
@@ -28,25 +29,66 @@ def _get(settings, key: str, default=None):
     return getattr(settings, attr, default)
 
 
-def build_sink(settings) -> PageSink:
-    sink_name = str(_get(settings, "PAGE_SINK", "file")).lower()
+def _policies(value) -> dict[str, str]:
+    """``PAGE_SINK_POLICIES`` as a dict, or as ``"kafka=log,s3=log"``."""
+    if not value:
+        return {}
+    if isinstance(value, Mapping):
+        return {str(k).lower(): str(v).lower() for k, v in value.items()}
+    pairs = (part.split("=", 1) for part in str(value).split(",") if "=" in part)
+    return {k.strip().lower(): v.strip().lower() for k, v in pairs}
+
+
+def _build_one(sink_name: str, settings) -> PageSink:
+    sink = _build_plain(sink_name, settings)
+    spool_dir = _get(settings, "PAGE_SPOOL_DIR")
+    spooled = _get(settings, "PAGE_SPOOL_SINKS", ["kafka", "s3"])
+    if isinstance(spooled, str):
+        spooled = spooled.split(",")
+    if not spool_dir or sink_name not in {s.strip().lower() for s in spooled}:
+        return sink
+    from scrapy_playwright_demo.retry import build_retry_policy
+
+    return SpoolingSink(
+        sink,
+        os.path.join(spool_dir, sink_name),
+        name=sink_name,
+        policy=build_retry_policy(settings),
+        segment_bytes=int(float(_get(settings, "PAGE_SPOOL_SEGMENT_MB", 64)) * 1024 * 1024),
+        fsync=bool(_get(settings, "PAGE_SPOOL_FSYNC", True)),
+        drain_timeout_s=float(_get(settings, "PAGE_SPOOL_DRAIN_TIMEOUT_S", 30.0)),
+    )
 
+
+def _build_plain(sink_name: str, settings) -> PageSink:
     if sink_name == "file":
         return FileSink(
             out_dir=_get(settings, "PAGE_OUT_DIR", "out/products"),
             compress=bool(_get(settings, "PAGE_COMPRESS", True)),
             idempotent=bool(_get(settings, "PAGE_IDEMPOTENT", True)),
         )
-
-    # if sink_name == "kafka":
-    #     return KafkaSink(
-    #         topic=_get(settings, "PAGE_KAFKA_TOPIC", "scrapy_pages"),
-    #         bootstrap_servers=_get(settings, "PAGE_KAFKA_BOOTSTRAP", "localhost:9092"),
-    #     )
-    # if sink_name == "s3":
-    #     return S3Sink(template=_get(settings, "PAGE_S3_TEMPLATE", "s3://bucket/prefix/page-{page}.jl.gz"))
+    # Both read their topic / template from the crawl settings and import their client lazily
+    if sink_name == "kafka":
+        return KafkaSink()
+    if sink_name == "s3":
+        return S3Sink()
 
     raise ValueError(f"Unknown PAGE_SINK: {sink_name}")
 
 
+def build_sink(settings) -> PageSink:
+    """One sink, or a ``CompositeSink`` fanning out to each of ``PAGE_SINK=file,kafka,...``."""
+    names = [n.strip().lower() for n in str(_get(settings, "PAGE_SINK", "file")).split(",") if n.strip()]
+    if len(names) == 1:
+        return _build_one(names[0], settings)
+    if len(set(names)) != len(names):
+        raise ValueError(f"PAGE_SINK lists a sink twice: {','.join(names)}")
+    policies = _policies(_get(settings, "PAGE_SINK_POLICIES"))
+    return CompositeSink(
+        [(name, _build_one(name, settings), policies.get(name, "fatal")) for name in names],
+        queue_size=int(_get(settings, "PAGE_SINK_QUEUE_SIZE", 8)),
+        close_timeout_s=float(_get(settings, "PAGE_SINK_CLOSE_TIMEOUT_S", 60.0)),
+    )
+
+
 __all__ = ["build_sink"]
@@ -0,0 +1,318 @@
+# scrapy_playwright_demo/sinks/spool.py
+"""
+Write-ahead spool in front of a remote sink (Kafka, S3).
+
+``SpoolingSink.write_page`` only appends the encoded page to a local
+segmented log (``spool-<seq>.log``, rolled at ``PAGE_SPOOL_SEGMENT_MB``)
+and returns. A page is durable once it is on local disk, so a broker or
+bucket outage no longer fails ``PerPageSinkPipeline._flush_page``, and the
+crawl never waits on remote latency. A background replayer delivers the
+records to the remote sink in order. It retries with the ``RetryPolicy``
+backoff until the sink accepts the page, then records the position in
+``ack.json``. Segments wholly behind that position are deleted.
+
+Each record is framed as ``magic | length | crc32`` followed by a JSON
+header line and the page's JSON lines. On open, a torn tail (a crash mid-
+append) is cut at the last whole record. Everything after ``ack.json`` is
+replayed, which includes the pages a previous run spooled but never
+delivered. Delivery is at-least-once: a crash between a delivery and its
+ack sends that page again.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Mapping
+
+from scrapy_playwright_demo import instrumentation
+from scrapy_playwright_demo.retry import RetryPolicy
+
+from .base import EncodedPage, PageSink, encode_items
+
+try:
+    from prometheus_client import Gauge
+
+    spool_backlog_pages = Gauge("spool_backlog_pages", "Spooled pages not delivered yet", ["sink"])
+except ImportError:
+    spool_backlog_pages = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SPL1"
+_HEADER = struct.Struct(">4sII")  # magic, body length, crc32(body)
+_SEGMENT_RE = re.compile(r"^spool-(\d{10})\.log$")
+_MAX_BACKOFF_ATTEMPT = 32  # the policy's cap applies long before; keeps the power finite
+_STOP_GRACE_S = 1.0  # an idle or backing-off replayer sees the stop event well within this
+
+Position = tuple[int, int]  # (segment seq, byte offset)
+
+
+def _encode_record(page: EncodedPage) -> bytes:
+    head = json.dumps({"page": page.page, "finished_at": page.finished_at}).encode("utf-8")
+    body = head + b"\n" + page.payload
+    return _HEADER.pack(MAGIC, len(body), zlib.crc32(body)) + body
+
+
+def _decode_body(body: bytes) -> EncodedPage:
+    head, _, payload = body.partition(b"\n")
+    meta = json.loads(head)
+    return EncodedPage(meta["page"], meta["finished_at"], payload)
+
+
+class SpoolLog:
+    """Segmented, checksummed append-only log of pages with an acknowledged position."""
+
+    def __init__(self, directory: str | Path, segment_bytes: int = 64 * 1024 * 1024, fsync: bool = True) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._ack_path = self.directory / "ack.json"
+        self.acked = self._read_ack()
+        segments = self._segments()
+        self._active = segments[-1] if segments else max(1, self.acked[0])
+        self._size = self._recover(self._active)
+        self._file = open(self._path(self._active), "ab")
+        self.backlog = sum(1 for _ in self._scan(self.acked, self.end))
+
+    # Layout ----------------------------------------------------------------
+
+    def _path(self, seq: int) -> Path:
+        return self.directory / f"spool-{seq:010d}.log"
+
+    def _segments(self) -> list[int]:
+        return sorted(int(m.group(1)) for p in self.directory.iterdir() if (m := _SEGMENT_RE.match(p.name)))
+
+    def _read_ack(self) -> Position:
+        try:
+            data = json.loads(self._ack_path.read_text(encoding="utf-8"))
+            return int(data["segment"]), int(data["offset"])
+        except (OSError, ValueError, KeyError):
+            segments = self._segments()
+            return (segments[0] if segments else 1), 0
+
+    def _recover(self, seq: int) -> int:
+        """Size of the valid prefix of ``seq``, cutting a torn last record off."""
+        path = self._path(seq)
+        if not path.exists():
+            return 0
+        valid = 0
+        with open(path, "rb") as f:
+            while self._read_record(f) is not None:
+                valid = f.tell()
+        if valid != path.stat().st_size:
+            logger.warning("spool %s: dropping %d bytes of torn record", path, path.stat().st_size - valid)
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+        return valid
+
+    @staticmethod
+    def _read_record(f) -> bytes | None:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        magic, length, crc = _HEADER.unpack(header)
+        if magic != MAGIC:
+            return None
+        body = f.read(length)
+        if len(body) < length or zlib.crc32(body) != crc:
+            return None
+        return body
+
+    # Writing ---------------------------------------------------------------
+
+    @property
+    def end(self) -> Position:
+        return self._active, self._size
+
+    def append(self, page: EncodedPage) -> Position:
+        record = _encode_record(page)
+        with self._cond:
+            if self._file.closed:
+                self._file = open(self._path(self._active), "ab")
+            if self._size and self._size + len(record) > self.segment_bytes:
+                self._file.close()
+                self._active, self._size = self._active + 1, 0
+                self._file = open(self._path(self._active), "ab")
+            self._file.write(record)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._size += len(record)
+            self.backlog += 1
+            self._cond.notify_all()
+            return self.end
+
+    # Reading ---------------------------------------------------------------
+
+    def _scan(self, start: Position, stop: Position) -> Iterator[tuple[EncodedPage, Position]]:
+        seq, offset = start
+        while (seq, offset) < stop:
+            path = self._path(seq)
+            if not path.exists():
+                seq, offset = seq + 1, 0
+                continue
+            with open(path, "rb") as f:
+                f.seek(offset)
+                while (seq, offset) < stop and (body := self._read_record(f)) is not None:
+                    offset = f.tell()
+                    yield _decode_body(body), (seq, offset)
+            if seq < stop[0]:
+                seq, offset = seq + 1, 0
+            else:
+                break
+
+    def next_after(self, position: Position, timeout: float) -> tuple[EncodedPage, Position] | None:
+        """The record following ``position``, waiting up to ``timeout`` for one to be appended."""
+        with self._cond:
+            if position >= self.end:
+                self._cond.wait(timeout)
+            stop = self.end
+        return next(self._scan(position, stop), None)
+
+    def pages(self) -> set[str]:
+        """Pages spooled but not acknowledged yet."""
+        with self._cond:
+            stop = self.end
+        return {page.page for page, _ in self._scan(self.acked, stop)}
+
+    def ack(self, position: Position) -> None:
+        tmp = self._ack_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"segment": position[0], "offset": position[1]}), encoding="utf-8")
+        tmp.replace(self._ack_path)
+        with self._cond:
+            self.acked = position
+            self.backlog = max(0, self.backlog - 1)
+        for seq in self._segments():
+            if seq < position[0]:
+                self._path(seq).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._cond:
+            self._file.close()
+            self._cond.notify_all()
+
+
+class SpoolingSink(PageSink):
+    def __init__(
+        self,
+        remote: PageSink,
+        directory: str | Path,
+        name: str = "remote",
+        policy: RetryPolicy | None = None,
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync: bool = True,
+        drain_timeout_s: float = 30.0,
+    ) -> None:
+        self.remote = remote
+        self.name = name
+        self.policy = policy
+        self.log = SpoolLog(directory, segment_bytes, fsync)
+        self.drain_timeout_s = drain_timeout_s
+        self.appended = self.delivered = self.delivery_failures = 0
+        self._settings: Mapping[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # API -------------------------------------------------------------------
+
+    def open(self, settings: Mapping[str, Any]) -> None:
+        """Start delivering, beginning with whatever a previous run left in the spool."""
+        self._settings = settings
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"spool-{self.name}", daemon=True)
+            self._thread.start()
+
+    def write_page(
+        self,
+        items: Iterable[dict[str, Any]],
+        page: str,
+        finished_at: str,
+        settings: Mapping[str, Any],
+    ) -> None:
+        with instrumentation.timed("serialize"):
+            payload = encode_items(items)
+        self.write_encoded(EncodedPage(page, finished_at, payload), settings)
+
+    def write_encoded(self, page: EncodedPage, settings: Mapping[str, Any]) -> None:
+        with instrumentation.timed("write"):
+            self.log.append(page)
+        self.appended += 1
+        self._gauge()
+        self.open(settings)
+
+    def completed_pages(self, settings: Mapping[str, Any]) -> set[str]:
+        """The remote's pages plus the spooled ones: both survive a crash."""
+        return self.remote.completed_pages(settings) | self.log.pages()
+
+    def close(self) -> None:
+        """Give the replayer ``drain_timeout_s`` to catch up; the rest waits in the spool for the next run.
+
+        A replayer stuck in a remote write is left behind (it is a daemon thread): its page is
+        still in the spool, so it is replayed next run even if the write never returns.
+        """
+        if self._thread is not None:
+            deadline = time.monotonic() + self.drain_timeout_s
+            while self.log.backlog and time.monotonic() < deadline and self._thread.is_alive():
+                time.sleep(0.05)
+            self._stop.set()
+            self._thread.join(_STOP_GRACE_S)
+            if self._thread.is_alive():
+                logger.warning("spool %s: replayer still blocked in a remote write; not waiting for it", self.name)
+            self._thread = None
+        if self.log.backlog:
+            logger.warning("spool %s: %d pages left for the next run", self.name, self.log.backlog)
+        self.log.close()
+        self.remote.close()
+
+    def stats(self) -> dict[str, Any]:
+        prefix = f"spool/{self.name}"
+        return {
+            f"{prefix}/appended": self.appended,
+            f"{prefix}/delivered": self.delivered,
+            f"{prefix}/delivery_failures": self.delivery_failures,
+            f"{prefix}/backlog": self.log.backlog,
+        }
+
+    # Replayer --------------------------------------------------------------
+
+    def _run(self) -> None:
+        position = self.log.acked
+        attempt = 0
+        while not self._stop.is_set():
+            record = self.log.next_after(position, timeout=0.5)
+            if record is None:
+                continue
+            page, after = record
+            try:
+                self.remote.write_encoded(page, self._settings)
+            except Exception as e:
+                self.delivery_failures += 1
+                delay = self._delay(attempt)
+                attempt += 1
+                logger.warning("spool %s: page %s not delivered (%s); retry in %.1fs", self.name, page.page, e, delay)
+                self._stop.wait(delay)
+                continue
+            attempt = 0
+            self.log.ack(after)
+            position = after
+            self.delivered += 1
+            self._gauge()
+
+    def _delay(self, attempt: int) -> float:
+        if self.policy is None:
+            return min(60.0, 2.0 ** attempt)
+        return self.policy.next_delay(min(attempt, _MAX_BACKOFF_ATTEMPT))
+
+    def _gauge(self) -> None:
+        if spool_backlog_pages is not None:
+            spool_backlog_pages.labels(sink=self.name).set(self.log.backlog)
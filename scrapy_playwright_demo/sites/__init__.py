@@ -0,0 +1,327 @@
+# scrapy_playwright_demo/sites/__init__.py
+"""
+Declarative site profiles for the generic listing spider (``scrapy crawl sites``).
+
+A profile is a TOML file that describes one retailer and country domain:
+
+* which hosts it covers and where it starts;
+* the consent button to click;
+* the product-card selector and the link/title fields inside a card;
+* where prices are and their locale (thousands and decimal separators);
+* how to paginate: next-page selectors, tried in order, the page query
+  parameter, and the total-page hints.
+
+Selectors starting with ``/``, ``./`` or ``(`` are XPath; anything else is
+CSS, including parsel's ``::text``/``::attr(name)``. ``zalando-es.toml``
+next to this module is the built-in example. Extra profiles are read from
+``SITE_PROFILES_DIR`` and override built-ins of the same name.
+
+Loading validates a profile (unknown keys, bad selectors, bad patterns are
+errors naming the file). It also compiles every selector once into an
+``lxml.etree.XPath`` and the price locale into a regex. Extraction then runs
+those compiled objects on the response's lxml tree, with no selector
+translation or compilation per page or per card. Compiled profiles are
+cached per file and modification time.
+"""
+from __future__ import annotations
+
+import re
+import tomllib
+import urllib.parse
+from collections.abc import Iterable, Iterator
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from cssselect import SelectorError
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from scrapy_playwright_demo import money
+from scrapy_playwright_demo.items import Currency, MinorUnitProductItem, ProductItem
+
+BUILTIN_DIR = Path(__file__).resolve().parent
+_XPATH_PREFIXES = ("/", "./", "(")
+_NAMESPACES = {"re": "http://exslt.org/regular-expressions"}  # as in parsel
+_translator = HTMLTranslator()
+
+
+# --------------------------------------------------------------------------- #
+# Profile format
+# --------------------------------------------------------------------------- #
+class _Rules(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+
+class ConsentRules(_Rules):
+    click: str | None = None           # Playwright selector; clicked if present
+    timeout_ms: int = 5_000
+
+
+class CardRules(_Rules):
+    selector: str
+    link: str
+    title: str
+    title_join: str = " "
+
+
+class PriceRules(_Rules):
+    selector: str                      # text nodes holding prices, relative to a card
+    thousands: str = "."
+    decimal: str = ","
+
+
+class PaginationRules(_Rules):
+    param: str = "p"
+    next: list[str] = Field(default_factory=list)
+    total_pages: list[str] = Field(default_factory=list)
+    total_pages_pattern: str | None = None  # regex on the page text, group 1 = total
+
+
+class SiteProfile(_Rules):
+    name: str
+    domains: list[str]
+    start_urls: list[str] = Field(default_factory=list)
+    currency: Currency
+    consent: ConsentRules = Field(default_factory=ConsentRules)
+    cards: CardRules
+    prices: PriceRules
+    pagination: PaginationRules = Field(default_factory=PaginationRules)
+
+
+# --------------------------------------------------------------------------- #
+# Compiled profile
+# --------------------------------------------------------------------------- #
+def compile_selector(query: str) -> etree.XPath:
+    """An XPath or CSS query as a compiled ``etree.XPath`` (CSS through parsel's translator)."""
+    xpath = query if query.lstrip().startswith(_XPATH_PREFIXES) else _translator.css_to_xpath(query)
+    return etree.XPath(xpath, namespaces=_NAMESPACES, smart_strings=False)
+
+
+def _price_pattern(rules: PriceRules) -> re.Pattern:
+    thousands = rf"(?:{re.escape(rules.thousands)}\d{{3}})*" if rules.thousands else r"\d*"
+    return re.compile(rf"\d{{1,3}}{thousands}{re.escape(rules.decimal)}\d{{{money.MINOR_DIGITS}}}")
+
+
+class Site:
+    """A validated profile with its selectors compiled."""
+
+    def __init__(self, profile: SiteProfile, source: str = "<memory>") -> None:
+        self.profile = profile
+        self.name = profile.name
+        self.domains = frozenset(d.lower() for d in profile.domains)
+        self.currency = profile.currency
+        try:
+            self._cards = compile_selector(profile.cards.selector)
+            self._link = compile_selector(profile.cards.link)
+            self._title = compile_selector(profile.cards.title)
+            self._prices = compile_selector(profile.prices.selector)
+            self._next = [compile_selector(q) for q in profile.pagination.next]
+            self._total = [compile_selector(q) for q in profile.pagination.total_pages]
+            self._price_re = _price_pattern(profile.prices)
+            pattern = profile.pagination.total_pages_pattern
+            self._total_re = re.compile(pattern) if pattern else None
+        except (etree.XPathError, SelectorError, re.error, ValueError) as e:
+            raise ValueError(f"site profile {profile.name!r} ({source}): {e}") from e
+
+    # Requests --------------------------------------------------------------
+
+    @property
+    def start_urls(self) -> list[str]:
+        return list(self.profile.start_urls)
+
+    def request_meta(self, first: bool = True) -> dict[str, Any]:
+        """Playwright meta for a listing page; the first one also clicks the consent banner."""
+        meta: dict[str, Any] = {
+            "playwright": True,
+            "playwright_context": "persistent",
+            "playwright_include_page": True,
+        }
+        if first:
+            meta["playwright_page_goto_kwargs"] = {"wait_until": "domcontentloaded", "timeout": 45_000}
+            if self.profile.consent.click:
+                from scrapy_playwright.page import PageMethod
+
+                meta["playwright_page_methods"] = [
+                    PageMethod("click", self.profile.consent.click, timeout=self.profile.consent.timeout_ms, strict=False),
+                ]
+        return meta
+
+    # Extraction ------------------------------------------------------------
+
+    @staticmethod
+    def _strings(xpath: etree.XPath, node) -> list[str]:
+        result = xpath(node)
+        if not isinstance(result, list):
+            return [str(result)] if result not in (None, "") else []
+        return [r if isinstance(r, str) else "".join(r.itertext()) for r in result]
+
+    def prices(self, card, minor: bool = False) -> list[Decimal] | list[int]:
+        """Every price in the card, sorted (Decimals, or int cents)."""
+        rules = self.profile.prices
+        found: set = set()
+        for text in self._strings(self._prices, card):
+            for raw in self._price_re.findall(text.replace("\xa0", " ")):
+                if minor:
+                    found.add(money.parse_amount(raw, rules.thousands, rules.decimal))
+                else:
+                    plain = raw.replace(rules.thousands, "") if rules.thousands else raw
+                    found.add(Decimal(plain.replace(rules.decimal, ".")))
+        return sorted(found)
+
+    def title(self, card) -> str:
+        return self.profile.cards.title_join.join(t.strip() for t in self._strings(self._title, card) if t.strip())
+
+    def link(self, card) -> str | None:
+        links = self._strings(self._link, card)
+        return links[0] if links else None
+
+    def cards(self, response) -> list:
+        return self._cards(response.selector.root)
+
+    def products(self, response, page_no: int, item_cls: type[ProductItem] = ProductItem) -> Iterator[ProductItem]:
+        """``item_cls`` items for every card with a link (lowest price = discounted, highest = original)."""
+        minor = item_cls is MinorUnitProductItem
+        for card in self.cards(response):
+            href = self.link(card)
+            if not href:
+                continue
+            plist = self.prices(card, minor)
+            price_now = plist[0] if plist else None
+            price_orig = plist[-1] if len(plist) > 1 and plist[-1] != price_now else None
+            yield item_cls(
+                page=page_no,
+                title=self.title(card),
+                price_discounted=price_now,
+                price_original=price_orig,
+                currency=self.currency,
+                link=response.urljoin(href),
+            )
+
+    # Pagination ------------------------------------------------------------
+
+    def page_number(self, url: str) -> int:
+        value = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query).get(self.profile.pagination.param, ["1"])[0]
+        return int(value) if value.isdigit() else 1
+
+    def page_url(self, url: str, page_no: int) -> str:
+        parsed = urllib.parse.urlsplit(url)
+        qs = urllib.parse.parse_qs(parsed.query)
+        qs[self.profile.pagination.param] = [str(page_no)]
+        return parsed._replace(query=urllib.parse.urlencode(qs, doseq=True)).geturl()
+
+    def total_pages(self, response) -> int | None:
+        root = response.selector.root
+        for xpath in self._total:
+            for value in self._strings(xpath, root):
+                if value.strip().isdigit():
+                    return int(value.strip())
+        if self._total_re is not None:
+            m = self._total_re.search(response.text)
+            if m:
+                return int(m.group(1))
+        return None
+
+    def next_page_href(self, response) -> str | None:
+        root = response.selector.root
+        for xpath in self._next:
+            values = self._strings(xpath, root)
+            if values:
+                return values[0]
+        total = self.total_pages(response)
+        current = self.page_number(response.url)
+        if total and current < total:
+            return self.page_url(response.url, current + 1)
+        return None
+
+
+# --------------------------------------------------------------------------- #
+# Loading
+# --------------------------------------------------------------------------- #
+def parse_profile(data: dict[str, Any], source: str = "<memory>") -> Site:
+    try:
+        profile = SiteProfile.model_validate(data)
+    except ValidationError as e:
+        raise ValueError(f"invalid site profile {source}: {e}") from e
+    return Site(profile, source)
+
+
+@lru_cache(maxsize=256)
+def _load_file(path: str, mtime_ns: int) -> Site:
+    try:
+        data = tomllib.loads(Path(path).read_text(encoding="utf-8"))
+    except tomllib.TOMLDecodeError as e:
+        raise ValueError(f"invalid site profile {path}: {e}") from e
+    return parse_profile(data, path)
+
+
+def load_file(path: str | Path) -> Site:
+    path = Path(path).resolve()
+    return _load_file(str(path), path.stat().st_mtime_ns)
+
+
+def _profile_files(directory: str | Path | None) -> Iterable[Path]:
+    yield from sorted(BUILTIN_DIR.glob("*.toml"))
+    if directory:
+        yield from sorted(Path(directory).glob("*.toml"))
+
+
+def load_sites(directory: str | Path | None = None) -> dict[str, Site]:
+    """Built-in profiles plus ``directory``'s, by name (a later file with the same name wins)."""
+    sites: dict[str, Site] = {}
+    for path in _profile_files(directory):
+        site = load_file(path)
+        sites[site.name] = site
+    return sites
+
+
+def get_site(name: str, directory: str | Path | None = None) -> Site:
+    sites = load_sites(directory)
+    if name not in sites:
+        raise ValueError(f"Unknown site profile {name!r}; known: {', '.join(sorted(sites))}")
+    return sites[name]
+
+
+# --------------------------------------------------------------------------- #
+# Command line
+# --------------------------------------------------------------------------- #
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--profiles-dir", help="extra profiles (default: SITE_PROFILES_DIR)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="validate, compile and list every profile")
+    crawl = sub.add_parser("crawl", help="crawl several sites in one process on one browser (fleet)")
+    crawl.add_argument("sites", nargs="+")
+    crawl.add_argument("--out-dir", help="writes <out-dir>/<site>/ (default: PAGE_OUT_DIR/<site>)")
+    crawl.add_argument("-s", "--set", action="append", default=[], metavar="KEY=VALUE")
+    args = parser.parse_args(argv)
+
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    directory = args.profiles_dir or settings.get("SITE_PROFILES_DIR")
+    known = load_sites(directory)
+    if args.command == "list":
+        for site in known.values():
+            print(f"{site.name:<20} {','.join(sorted(site.domains)):<40} {site.currency.value}")  # noqa: T201
+        return 0
+
+    unknown = [name for name in args.sites if name not in known]
+    if unknown:
+        parser.error(f"unknown site profiles: {', '.join(unknown)}; known: {', '.join(sorted(known))}")
+    from scrapy_playwright_demo import fleet
+    from scrapy_playwright_demo.runner import _parse_overrides
+
+    # One crawler per site on one shared browser, each with its own sink, checkpoint and page numbers
+    settings.setdict(dict(_parse_overrides(args.set)), priority="cmdline")
+    if directory:
+        settings.set("SITE_PROFILES_DIR", directory, priority="cmdline")
+    members = fleet.plan_fleet([f"sites:site={name}" for name in args.sites],
+                               settings.getint("FLEET_CONTEXT_BUDGET"), settings.getint("PLAYWRIGHT_MAX_CONTEXTS", 1))
+    stats = fleet.run_fleet(members, settings, args.out_dir or settings.get("PAGE_OUT_DIR"),
+                            settings.get("JOBDIR") or "", page_budget=settings.getint("FLEET_PAGE_BUDGET"))
+    return 0 if all(s.get("finish_reason") == "finished" for s in stats["spiders"].values()) else 1
@@ -0,0 +1,5 @@
+import sys
+
+from scrapy_playwright_demo.sites import main
+
+sys.exit(main())
@@ -1,8 +1,10 @@
 # scrapy_playwright_demo/spiders/__init__.py
 from .zalando import ZalandoSpider
 from .base import PlaywrightListingSpider
+from .detail import ProductDetailSpider
 
 __all__ = [
     "ZalandoSpider",
     "PlaywrightListingSpider",
+    "ProductDetailSpider",
 ]
@@ -4,25 +4,22 @@ import urllib.parse
 from datetime import datetime, UTC
 from scrapy import Spider, Request
 from scrapy_playwright.page import PageMethod
-from scrapy_playwright_demo.items import PageDone
+from scrapy_playwright_demo.items import CATEGORY_META, PageDone
 from scrapy_playwright_demo.constants import DEFAULT_USER_AGENT, PAGINATION_NEXT_SELECTOR
 import time
 from contextlib import asynccontextmanager
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 from scrapy_playwright_demo.types import PlaywrightMeta
 import logging
 from scrapy_playwright_demo.config import app_settings
 from scrapy_playwright_demo.utils.logging import get_logger
+from scrapy_playwright_demo import instrumentation
+from scrapy_playwright_demo.frontier import FRONTIER_META
+from scrapy_playwright_demo.retry import RETRY_ATTEMPT_KEY, RETRY_DELAY_KEY, build_retry_policy, plan_retry
+
+# rendered_page() timing keys → instrumentation stages
+_RENDER_STAGES = {"scroll": "scroll", "render": "snapshot", "total": "render"}
 
-try:
-    from prometheus_client import Histogram
-    crawl_page_seconds = Histogram(
-        "spider_crawl_page_seconds",
-        "Time spent rendering a page",
-        ["spider", "page"]
-    )
-except ImportError:
-    crawl_page_seconds = None
 
 def get_required_meta(meta: PlaywrightMeta, key: str) -> object:
     if key not in meta or meta[key] is None:
@@ -43,6 +40,12 @@ class PlaywrightListingSpider(Spider):
         "AUTOTHROTTLE_TARGET_CONCURRENCY": app_settings.autothrottle_target_concurrency,
     }
 
+    async def start(self):
+        # Scrapy >= 2.13 no longer falls back to start_requests(); keep it as
+        # the single place where subclasses build their initial requests.
+        for request in self.start_requests():
+            yield request
+
     def start_requests(self):
         meta = {
             "playwright": True,
@@ -50,20 +53,31 @@ class PlaywrightListingSpider(Spider):
             "playwright_include_page": True,
         }
         for url in getattr(self, "start_urls", []):
-            yield Request(url, meta=meta, dont_filter=True)
+            yield Request(url, meta={**meta, FRONTIER_META: True}, dont_filter=True)
 
     @staticmethod
     def _page_number(url: str) -> int:
         qs = urllib.parse.urlparse(url).query
         return int(urllib.parse.parse_qs(qs).get("p", ["1"])[0])
 
+    @staticmethod
+    def _page_url(url: str, page_no: int) -> str:
+        parsed = urllib.parse.urlparse(url)
+        qs = urllib.parse.parse_qs(parsed.query)
+        qs["p"] = [str(page_no)]
+        return parsed._replace(query=urllib.parse.urlencode(qs, doseq=True)).geturl()
+
+    def _frontier_enabled(self) -> bool:
+        settings = getattr(self, "settings", None)
+        return settings is not None and settings.getbool("FRONTIER_ENABLED")
+
     async def _scroll_to_bottom(self, page, loops: int = 5):
         for _ in range(loops):
             await page.mouse.wheel(0, 10_000)
             await page.wait_for_timeout(800)
 
-    def emit_page_done(self, page_no: int):
-        return PageDone(page=page_no, finished_at=datetime.now(UTC))
+    def emit_page_done(self, page_no: int, category: str | None = None):
+        return PageDone(page=page_no, finished_at=datetime.now(UTC), category=category)
 
     @asynccontextmanager
     async def rendered_page(self, response):
@@ -83,11 +97,10 @@ class PlaywrightListingSpider(Spider):
             yield page, rendered, timings
         finally:
             await page.close()
-            if crawl_page_seconds:
-                crawl_page_seconds.labels(
-                    spider=getattr(self, "name", "unknown"),
-                    page=str(self._page_number(response.url)),
-                ).observe(timings.get("total", 0.0))
+            spider_name = getattr(self, "name", None)
+            for key, stage in _RENDER_STAGES.items():
+                if key in timings:
+                    instrumentation.observe(stage, timings[key], spider_name)
 
     def get_next_page_href(self, response, selector: str | None = None) -> Optional[str]:
         """
@@ -116,14 +129,30 @@ class PlaywrightListingSpider(Spider):
         total = self.extract_total_pages(response)
         current = self._page_number(response.url)
         if total and current < total:
-            parsed = urllib.parse.urlparse(response.url)
-            qs = urllib.parse.parse_qs(parsed.query)
-            qs["p"] = [str(current + 1)]
-            new_query = urllib.parse.urlencode(qs, doseq=True)
-            new_url = parsed._replace(query=new_query).geturl()
-            return new_url
+            return self._page_url(response.url, current + 1)
         return None
 
+    def pagination_requests(self, response, meta: dict, **kwargs) -> Iterable[Request]:
+        """
+        Requests for the following listing pages, marked for the shared frontier.
+
+        With ``FRONTIER_ENABLED`` and a known page count, every remaining page
+        is requested at once, so other nodes can claim ranges of it (the
+        frontier drops pages it already has). Otherwise, only the next page.
+        The page's category (``meta["category"]``) is passed on to them.
+        """
+        total = self.extract_total_pages(response) if self._frontier_enabled() else None
+        if total:
+            current = self._page_number(response.url)
+            urls = [self._page_url(response.url, n) for n in range(current + 1, total + 1)]
+        else:
+            href = self.get_next_page_href(response)
+            urls = [response.urljoin(href)] if href else []
+        if response.meta.get(CATEGORY_META):
+            meta = {**meta, CATEGORY_META: response.meta[CATEGORY_META]}
+        for url in urls:
+            yield Request(url, meta={**meta, FRONTIER_META: True}, dont_filter=True, **kwargs)
+
     def extract_total_pages(self, response) -> Optional[int]:
         # Try to extract total pages from a hint in the HTML (override for site-specific logic)
         # Example: <span data-testid="pagination-total-pages">5</span>
@@ -135,4 +164,29 @@ class PlaywrightListingSpider(Spider):
         m = re.search(r'Page \d+ of (\d+)', response.text)
         if m:
             return int(m.group(1))
-        return None 
\ No newline at end of file
+        return None
+
+    def _container(self):
+        """The DI container, or None outside a crawl (RetryPolicy then comes from AppSettings)."""
+        settings = getattr(self, "settings", None)
+        return settings.get("CONTAINER") if settings is not None else None
+
+    def errback_timeout(self, failure):
+        """Unified retry logic for Playwright timeouts using RetryPolicy."""
+        from playwright._impl._errors import TimeoutError as PWTimeout
+        request = failure.request
+        container = self._container()
+        policy = container.retry_policy() if container is not None else build_retry_policy()
+        budget = container.retry_budget() if container is not None else None
+        attempt = request.meta.get(RETRY_ATTEMPT_KEY, 0)
+        logger = get_logger(self, url=request.url, attempt=attempt)
+        if failure.check(PWTimeout):
+            new = plan_retry(policy, budget, request, policy.classify_exception(failure.value),
+                             getattr(getattr(self, "crawler", None), "stats", None))
+            if new is not None:
+                delay = new.meta[RETRY_DELAY_KEY]
+                logger.info("retrying_playwright_timeout", url=request.url, attempt=attempt+1, delay=delay)
+                return new
+            else:
+                logger.warning("max_retries_exceeded_playwright", url=request.url)
+        # If not handled, Scrapy will log the failure as usual
@@ -0,0 +1,218 @@
+"""
+ProductDetailSpider — enriches a listing run's ProductItems from their product pages.
+
+* Reads ``ProductItem.link`` values from a listing run's output (``-a input=DIR``)
+* Fetches product pages with plain HTTP at high concurrency (no browser)
+* Extracts JSON-LD / hydration state into ``ProductDetailItem`` (see ``structured.py``)
+* Renders with Playwright only the pages where that extraction fails
+* One sink page per listing page: ``PageDone`` once every link of the page is settled
+  (per category, ``<category>/page-N``, when the listing run used sitemap discovery)
+* ``-a discovery=sitemap``: product URLs come from the sitemaps instead, in batches of
+  ``SITEMAP_BATCH_SIZE`` (one sink page each), most recently changed first
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from pydantic import ValidationError
+from scrapy import Request, Spider
+from scrapy.http import TextResponse
+
+from scrapy_playwright_demo import reader
+from scrapy_playwright_demo.config import app_settings
+from scrapy_playwright_demo.items import PageDone, ProductDetailItem, page_key
+from scrapy_playwright_demo.structured import extract_product
+
+from .discovery import SitemapDiscoveryMixin, SitemapHit
+
+logger = logging.getLogger(__name__)
+
+DETAIL_META = "detail"
+def read_listing_pages(path: str | Path) -> Iterator[tuple[int, str | None, list[dict[str, Any]]]]:
+    """``(page, category, items)`` for every finished page (``page-N.done`` present) of a FileSink directory."""
+    # In-process: the crawl pulls pages lazily, and forking a reactor with live threads is unsafe
+    for key, items in reader.iter_pages(path, workers=1):
+        category, _, number = key.rpartition("/")
+        if number.isdigit():
+            yield int(number), category or None, items
+
+
+class ProductDetailSpider(SitemapDiscoveryMixin, Spider):
+    name = "product_detail"
+
+    custom_settings = {
+        "ITEM_PIPELINES": {
+            "scrapy_playwright_demo.pipelines.PerPageSinkPipeline": 100,
+        },
+        "PAGE_OUT_DIR": app_settings.detail_out_dir,
+        # Its own checkpoint: the project JOBDIR belongs to the listing crawl
+        "JOBDIR": app_settings.detail_jobdir,
+        # Plain HTTP: many requests in flight, each host paced by its token bucket
+        "CONCURRENT_REQUESTS": app_settings.detail_concurrency,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": app_settings.detail_concurrency_per_host,
+        "DOWNLOAD_DELAY": 0,
+        "AUTOTHROTTLE_ENABLED": False,
+        "RATELIMIT_ENABLED": True,
+        "RATELIMIT_HOST_RATE": app_settings.detail_host_rate,
+        "RATELIMIT_HOST_BURST": app_settings.detail_host_burst,
+        # It caps every slot at the browser pool size, which would throttle plain HTTP
+        "ADAPTIVE_CONCURRENCY_ENABLED": False,
+        "FRONTIER_ENABLED": False,
+        # The fallback browser stays small; it is only launched if a page needs it
+        "PLAYWRIGHT_MAX_CONTEXTS": 1,
+        "PLAYWRIGHT_MAX_PAGES_PER_CONTEXT": app_settings.detail_fallback_max_pages,
+    }
+
+    def __init__(self, input: str | None = None, fallback: str | bool | None = None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.input = input or app_settings.detail_input
+        if fallback is None:
+            self.fallback = app_settings.detail_playwright_fallback
+        else:
+            self.fallback = str(fallback).lower() in {"1", "true", "yes", "on"}
+        self._remaining: dict[str, set[str]] = {}  # listing page key -> links not settled yet
+        self._seen: set[str] = set()
+        self._next_page = 1
+
+    async def start(self):
+        for request_or_item in self.start_requests():
+            yield request_or_item
+
+    def start_requests(self) -> Iterable[Request | PageDone]:
+        done = self._completed_pages()
+        if self.sitemap_discovery():
+            # Sitemap batches become new sink pages after the ones already written
+            self._next_page = max((int(p) for p in done if p.isdigit()), default=0) + 1
+            yield from self.sitemap_start_requests()
+            return
+        for page, category, items in read_listing_pages(self.input):
+            if page_key(page, category) in done:
+                self._inc("detail/pages_skipped")
+                continue
+            yield from self._page_requests(page, [(listing, 0) for listing in items], category)
+
+    def sitemap_batch(self, batch: list[SitemapHit]) -> Iterable[Request | PageDone]:
+        products = [({"link": entry.loc}, priority) for entry, kind, priority in batch if kind == "product"]
+        if not products:
+            return
+        page, self._next_page = self._next_page, self._next_page + 1
+        yield from self._page_requests(page, products)
+
+    def _page_requests(
+        self, page: int, listings: list[tuple[dict[str, Any], int]], category: str | None = None
+    ) -> Iterator[Request | PageDone]:
+        requests = []
+        for listing, priority in listings:
+            link = listing.get("link")
+            if not link or link in self._seen:
+                continue
+            self._seen.add(link)
+            requests.append(Request(
+                link,
+                callback=self.parse,
+                errback=self.errback,
+                priority=priority,
+                # The JOBDIR dupefilter would drop links fetched before a crash, and their
+                # pages would never settle; ``_seen`` and ``_remaining`` dedupe instead
+                dont_filter=True,
+                meta={DETAIL_META: {"page": page, "category": category, "listing": listing}},
+            ))
+        self._remaining[page_key(page, category)] = {r.meta[DETAIL_META]["listing"]["link"] for r in requests}
+        if not requests:
+            yield self.emit_page_done(page, category)
+        yield from requests
+
+    # --------------------------------------------------------------------- #
+    # Callbacks
+    # --------------------------------------------------------------------- #
+    def parse(self, response):
+        info = response.meta[DETAIL_META]
+        if not self._pending(info):
+            # A copy restored from the JOBDIR queue of a link already settled this run
+            self._inc("detail/duplicates")
+            return
+        rendered = bool(response.meta.get("playwright"))
+        extracted = extract_product(response) if isinstance(response, TextResponse) else None
+        if extracted is None and self.fallback and not rendered:
+            self._inc("detail/fallback/playwright")
+            yield response.request.replace(
+                meta={**response.request.meta, "playwright": True, "playwright_context": "detail"},
+                dont_filter=True,
+            )
+            return
+        if extracted is None:
+            self._inc("detail/extract_failed")
+            logger.warning("No structured product data on %s", response.url)
+        else:
+            fields, source = extracted
+            item = self._item(info, fields, "playwright" if rendered else source)
+            if item is not None:
+                self._inc(f"detail/source/{item.source}")
+                yield item
+        page_done = self._settle(info)
+        if page_done is not None:
+            yield page_done
+
+    def errback(self, failure):
+        info = failure.request.meta.get(DETAIL_META)
+        self._inc("detail/failed")
+        logger.warning("Product page failed: %s (%s)", failure.request.url, failure.getErrorMessage())
+        if info is not None:
+            return self._settle(info)
+        return None
+
+    # --------------------------------------------------------------------- #
+    # Helpers
+    # --------------------------------------------------------------------- #
+    def emit_page_done(self, page_no: int, category: str | None = None) -> PageDone:
+        return PageDone(page=page_no, finished_at=datetime.now(UTC), category=category)
+
+    def _pending(self, info: dict) -> bool:
+        key = page_key(info["page"], info.get("category"))
+        return info["listing"]["link"] in self._remaining.get(key, ())
+
+    def _settle(self, info: dict) -> PageDone | None:
+        """Settle one link; each link counts once, so restored duplicates never close a page early."""
+        key = page_key(info["page"], info.get("category"))
+        links = self._remaining.get(key)
+        if links is None or info["listing"]["link"] not in links:
+            return None
+        links.discard(info["listing"]["link"])
+        if links:
+            return None
+        del self._remaining[key]
+        return self.emit_page_done(info["page"], info.get("category"))
+
+    def _item(self, info: dict, fields: dict, source: str) -> ProductDetailItem | None:
+        listing = info["listing"]
+        try:
+            return ProductDetailItem(
+                **{**fields, "title": fields.get("title") or listing.get("title")},
+                page=info["page"],
+                category=info.get("category"),
+                link=listing["link"],
+                listing_price_discounted=listing.get("price_discounted"),
+                listing_price_original=listing.get("price_original"),
+                source=source,
+            )
+        except ValidationError as exc:
+            self._inc("detail/invalid")
+            logger.warning("Invalid product detail for %s: %s", listing.get("link"), exc)
+            return None
+
+    def _completed_pages(self) -> set[str]:
+        """Pages the detail sink already has: a re-run only fetches the rest."""
+        settings = getattr(self, "settings", None)
+        container = settings.get("CONTAINER") if settings is not None else None
+        if container is None:
+            return set()
+        return container.page_sink(settings).completed_pages(settings)
+
+    def _inc(self, key: str) -> None:
+        crawler = getattr(self, "crawler", None)
+        if crawler is not None and crawler.stats is not None:
+            crawler.stats.inc_value(key)
@@ -0,0 +1,150 @@
+"""
+SitemapDiscoveryMixin — find pages through the site's sitemaps instead of listing traversal.
+
+* ``-a discovery=sitemap`` switches a spider from its start URLs to ``SITEMAP_URLS``
+  (default: the ``Sitemap:`` lines of ``<start origin>/robots.txt``)
+* Sitemap indexes, child sitemaps and ``.xml.gz`` files are parsed as streams (``sitemaps.py``)
+* URLs are kept by ``SITEMAP_PRODUCT_PATTERNS`` / ``SITEMAP_CATEGORY_PATTERNS`` and, with
+  ``SITEMAP_SINCE`` (or ``-a since=``), by ``lastmod``; ``last`` means "since the last finished run"
+* Sitemaps are fetched first (plain HTTP); pages follow, most recently changed first
+* Spiders turn kept URLs into requests in ``sitemap_url_request()`` or ``sitemap_batch()``
+* Each category's pages are numbered from 1, so they are keyed by ``category_slug()`` too
+"""
+
+from __future__ import annotations
+
+import logging
+import urllib.parse
+from datetime import UTC, datetime
+from typing import Iterable
+from xml.etree.ElementTree import ParseError
+
+from scrapy import Request
+
+from scrapy_playwright_demo.config import app_settings
+from scrapy_playwright_demo.sitemaps import (
+    SitemapEntry,
+    SitemapFilter,
+    SitemapState,
+    change_priority,
+    iter_sitemap,
+    robots_sitemaps,
+)
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_META = "sitemap"
+SitemapHit = tuple[SitemapEntry, str, int]  # (entry, "product" | "category", request priority)
+
+
+def category_slug(url: str) -> str:
+    """``https://x/hombre/zapatillas/?p=2`` → ``"hombre-zapatillas"`` (a page-key namespace and directory name)."""
+    path = urllib.parse.urlsplit(url).path
+    return "-".join(part for part in path.split("/") if part) or "root"
+
+
+class SitemapDiscoveryMixin:
+    # Above every page priority, so all sitemaps are read before pages are ordered
+    SITEMAP_PRIORITY = 100
+
+    def sitemap_discovery(self) -> bool:
+        return str(getattr(self, "discovery", "listing")).lower() == "sitemap"
+
+    def sitemap_start_requests(self) -> Iterable[Request]:
+        self._sitemap_started_at = datetime.now(UTC)
+        spec = getattr(self, "since", None) or self._sitemap_setting("SITEMAP_SINCE", app_settings.sitemap_since)
+        self._sitemap_filter = SitemapFilter(
+            self._sitemap_setting("SITEMAP_CATEGORY_PATTERNS", app_settings.sitemap_category_patterns),
+            self._sitemap_setting("SITEMAP_PRODUCT_PATTERNS", app_settings.sitemap_product_patterns),
+            since=self._sitemap_state().since(spec),
+        )
+        urls = list(self._sitemap_setting("SITEMAP_URLS", app_settings.sitemap_urls))
+        if not urls:
+            origins = dict.fromkeys(
+                "{0.scheme}://{0.netloc}".format(urllib.parse.urlparse(u)) for u in getattr(self, "start_urls", [])
+            )
+            urls = [f"{origin}/robots.txt" for origin in origins]
+        if not urls:
+            logger.error("Sitemap discovery needs SITEMAP_URLS (or start_urls to find robots.txt)")
+        for url in urls:
+            yield self._sitemap_request(url)
+
+    def parse_sitemap(self, response):
+        if urllib.parse.urlparse(response.url).path.endswith("/robots.txt"):
+            for url in robots_sitemaps(response.text):
+                yield self._sitemap_request(response.urljoin(url))
+            return
+        now = datetime.now(UTC)
+        batch_size = int(self._sitemap_setting("SITEMAP_BATCH_SIZE", app_settings.sitemap_batch_size))
+        batch: list[SitemapHit] = []
+        try:
+            for entry in iter_sitemap(response.body):
+                if entry.kind == "sitemap":
+                    if self._sitemap_filter.fresh(entry):
+                        yield self._sitemap_request(entry.loc)
+                    else:
+                        self._sitemap_inc("sitemap/sitemaps_unchanged")
+                    continue
+                kind = self._sitemap_filter.classify(entry)
+                if kind is None:
+                    self._sitemap_inc("sitemap/urls_skipped")
+                    continue
+                self._sitemap_inc(f"sitemap/urls/{kind}")
+                batch.append((entry, kind, change_priority(entry.lastmod, now)))
+                if len(batch) >= batch_size:
+                    yield from self.sitemap_batch(batch)
+                    batch = []
+        except ParseError as exc:
+            self._sitemap_inc("sitemap/parse_errors")
+            logger.warning("Unparseable sitemap %s: %s", response.url, exc)
+        if batch:
+            yield from self.sitemap_batch(batch)
+
+    def sitemap_batch(self, batch: list[SitemapHit]) -> Iterable:
+        """Requests (or items) for a batch of kept URLs; one request per URL by default."""
+        for entry, kind, priority in batch:
+            request = self.sitemap_url_request(entry, kind, priority)
+            if request is not None:
+                yield request
+
+    def sitemap_url_request(self, entry: SitemapEntry, kind: str, priority: int) -> Request | None:
+        return None
+
+    def errback_sitemap(self, failure):
+        self._sitemap_inc("sitemap/failed")
+        logger.warning("Sitemap failed: %s (%s)", failure.request.url, failure.getErrorMessage())
+
+    def closed(self, reason: str) -> None:
+        started_at = getattr(self, "_sitemap_started_at", None)
+        if started_at is not None and reason == "finished":
+            self._sitemap_state().save(started_at)
+
+    # Helpers ---------------------------------------------------------------
+
+    def _sitemap_request(self, url: str) -> Request:
+        return Request(
+            url,
+            callback=self.parse_sitemap,
+            errback=self.errback_sitemap,
+            priority=self.SITEMAP_PRIORITY,
+            dont_filter=True,
+            meta={SITEMAP_META: True},
+        )
+
+    def _sitemap_state(self) -> SitemapState:
+        path = self._sitemap_setting("SITEMAP_STATE_PATH", app_settings.sitemap_state_path)
+        return SitemapState(str(path).format(spider=getattr(self, "name", "spider")))
+
+    def _sitemap_setting(self, key: str, default):
+        settings = getattr(self, "settings", None)
+        value = settings.get(key) if settings is not None else None
+        if value is None:
+            return default
+        if isinstance(default, list) and isinstance(value, str):
+            return [v for v in value.split(",") if v]
+        return value
+
+    def _sitemap_inc(self, key: str) -> None:
+        crawler = getattr(self, "crawler", None)
+        if crawler is not None and crawler.stats is not None:
+            crawler.stats.inc_value(key)
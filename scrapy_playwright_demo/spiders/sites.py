@@ -0,0 +1,121 @@
+"""
+SiteListingSpider — one generic listing spider driven by a site profile.
+
+* ``scrapy crawl sites -a site=zalando-es`` crawls the retailer described by
+  ``sites/zalando-es.toml`` (or a profile in ``SITE_PROFILES_DIR``)
+* Cards, fields, prices, pagination and the consent click all come from the
+  compiled profile (see ``scrapy_playwright_demo.sites``); no per-site code
+* ``{site}`` in ``PAGE_OUT_DIR`` / ``JOBDIR`` becomes the profile name, so
+  several sites can share one process without sharing page numbers
+  (``python -m scrapy_playwright_demo.sites crawl zalando-es ...``)
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from scrapy import Request
+from scrapy.exceptions import NotConfigured
+
+from scrapy_playwright_demo import instrumentation, sites
+from scrapy_playwright_demo.config import app_settings
+from scrapy_playwright_demo.frontier import FRONTIER_META
+from scrapy_playwright_demo.items import ProductItem, product_item_class
+
+from .base import PlaywrightListingSpider
+
+_PER_SITE_SETTINGS = ("PAGE_OUT_DIR", "JOBDIR", "CHECKPOINT_PATH")
+
+
+class SiteListingSpider(PlaywrightListingSpider):
+    name = "sites"
+
+    custom_settings = {
+        **PlaywrightListingSpider.custom_settings,
+        "ITEM_PIPELINES": {
+            "scrapy_playwright_demo.pipelines.ValidateProductPipeline": 50,
+            "scrapy_playwright_demo.pipelines.PerPageSinkPipeline": 100,
+        },
+        "PAGE_OUT_DIR": app_settings.page_out_dir,
+        "PAGE_COMPRESS": app_settings.page_compress,
+        "PAGE_IDEMPOTENT": app_settings.page_idempotent,
+        "PAGE_DROP_MISSING_FIELD": app_settings.page_drop_missing_field,
+    }
+
+    site: sites.Site
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        name = kwargs.get("site") or crawler.settings.get("SITE_PROFILE")
+        if not name:
+            raise NotConfigured("pass -a site=<profile name> (or set SITE_PROFILE)")
+        site = sites.get_site(name, crawler.settings.get("SITE_PROFILES_DIR"))
+        # Before the settings freeze: components built later see this site's paths
+        for key in _PER_SITE_SETTINGS:
+            value = crawler.settings.get(key)
+            if isinstance(value, str) and "{site}" in value:
+                crawler.settings.set(key, value.replace("{site}", site.name),
+                                     priority=crawler.settings.getpriority(key))
+        kwargs["site"] = site
+        return super().from_crawler(crawler, *args, **kwargs)
+
+    def __init__(self, *args, site: sites.Site | str | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        if isinstance(site, str):
+            site = sites.get_site(site)
+        if site is not None:
+            self.site = site
+            self.start_urls = kwargs.get("start_urls") or site.start_urls
+            if isinstance(self.start_urls, str):
+                self.start_urls = [u for u in self.start_urls.split(",") if u]
+            self.allowed_domains = sorted(site.domains)
+
+    def _item_cls(self) -> type[ProductItem]:
+        settings = getattr(self, "settings", None)
+        return product_item_class(settings.get("MONEY_MODE") if settings is not None else None)
+
+    # --------------------------------------------------------------------- #
+    # Requests
+    # --------------------------------------------------------------------- #
+    def start_requests(self) -> Iterable[Request]:
+        for url in self.start_urls:
+            yield Request(url, meta={**self.site.request_meta(), FRONTIER_META: True}, dont_filter=True,
+                          errback=self.errback_timeout)
+
+    # The profile's pagination rules replace the base class defaults
+    def _page_number(self, url: str) -> int:
+        return self.site.page_number(url)
+
+    def _page_url(self, url: str, page_no: int) -> str:
+        return self.site.page_url(url, page_no)
+
+    def get_next_page_href(self, response, selector: str | None = None) -> str | None:
+        if selector:
+            return super().get_next_page_href(response, selector)
+        return self.site.next_page_href(response)
+
+    def extract_total_pages(self, response) -> int | None:
+        return self.site.total_pages(response)
+
+    # --------------------------------------------------------------------- #
+    # Main callback
+    # --------------------------------------------------------------------- #
+    async def parse(self, response):
+        async with self.rendered_page(response) as (page, rendered, timings):
+            page_no = self._page_number(rendered.url)
+
+            with instrumentation.timed("extract", self.name):
+                products = list(self.site.products(rendered, page_no, self._item_cls()))
+            for product in products:
+                yield product
+
+            # Same ordering as ZalandoSpider: follow-ups before this page's PageDone
+            for request in self.pagination_requests(
+                rendered,
+                meta=self.site.request_meta(first=False),
+                callback=self.parse,
+                errback=self.errback_timeout,
+            ):
+                yield request
+
+            yield self.emit_page_done(page_no)
@@ -3,8 +3,10 @@ ZalandoSpider — Scrapes Zalando’s men sneakers category with Scrapy‑Playwr
 
 * Accepts the cookie banner once using a persistent Playwright context
 * Handles infinite scroll + numbered pagination (?p=N)
-* Yields typed ProductItem objects (Decimal money)
+* Yields typed ProductItem objects (Decimal money, or int cents with ``MONEY_MODE=minor``)
 * Emits PageDone(page=N, finished_at=...) so PerPageFilePipeline can flush one file per page
+* ``-a discovery=sitemap``: category URLs come from the sitemaps (SitemapDiscoveryMixin);
+  items and pages then carry their category, so each category's page N is kept apart
 * Async‑compatible with Scrapy ≥ 2.13
 """
 
@@ -21,11 +23,12 @@ from scrapy_playwright_demo.constants import (
     PRICE_RE,
     PAGINATION_NEXT_SELECTOR,
 )
-from scrapy_playwright_demo.items import ProductItem, Currency
+from scrapy_playwright_demo.items import CATEGORY_META, Currency, MinorUnitProductItem, ProductItem, product_item_class
 from .base import PlaywrightListingSpider
+from .discovery import SitemapDiscoveryMixin, category_slug
 from scrapy_playwright_demo.config import app_settings
-from scrapy_playwright_demo.retry import build_retry_policy
-from scrapy_playwright_demo.utils.logging import get_logger
+from scrapy_playwright_demo import instrumentation, money
+from scrapy_playwright_demo.frontier import FRONTIER_META
 
 import logging
 
@@ -41,7 +44,7 @@ def safe_urljoin(response: scrapy.http.Response, card) -> str | None:
     return response.urljoin(href)
 
 
-class ZalandoSpider(PlaywrightListingSpider):
+class ZalandoSpider(SitemapDiscoveryMixin, PlaywrightListingSpider):
     name = "zalando"
     NEXT_PAGE_SELECTOR = "a[data-testid='pagination-next']::attr(href)"
     start_urls = getattr(app_settings, "start_urls", ["https://www.zalando.es/zapatillas-hombre/"])
@@ -51,7 +54,7 @@ class ZalandoSpider(PlaywrightListingSpider):
         # Validation + per-page persistence
         "ITEM_PIPELINES": {
             "scrapy_playwright_demo.pipelines.ValidateProductPipeline": 50,
-            "scrapy_playwright_demo.pipelines.PerPageFilePipeline": 100,
+            "scrapy_playwright_demo.pipelines.PerPageSinkPipeline": 100,
         },
         # Per-page persistence options
         "PAGE_OUT_DIR": app_settings.page_out_dir,
@@ -64,7 +67,22 @@ class ZalandoSpider(PlaywrightListingSpider):
     # Requests bootstrap (cookie click, persistent context, etc.)
     # --------------------------------------------------------------------- #
     def start_requests(self) -> Iterable[scrapy.Request]:
-        meta = {
+        if self.sitemap_discovery():
+            yield from self.sitemap_start_requests()
+            return
+        for url in self.start_urls:
+            yield scrapy.Request(url, meta={**self._listing_meta(), FRONTIER_META: True}, dont_filter=True)
+
+    def sitemap_url_request(self, entry, kind, priority) -> scrapy.Request | None:
+        # Categories start a listing traversal; product URLs are for ProductDetailSpider
+        if kind != "category":
+            return None
+        meta = {**self._listing_meta(), FRONTIER_META: True, CATEGORY_META: category_slug(entry.loc)}
+        return scrapy.Request(entry.loc, meta=meta, priority=priority, dont_filter=True)
+
+    @staticmethod
+    def _listing_meta() -> dict:
+        return {
             "playwright": True,
             "playwright_context": "persistent",        # keep cookies/session/fingerprint
             "playwright_include_page": True,           # we need Page in parse()
@@ -81,23 +99,21 @@ class ZalandoSpider(PlaywrightListingSpider):
                 "timeout": 45_000,
             },
         }
-        for url in self.start_urls:
-            yield scrapy.Request(url, meta=meta, dont_filter=True)
 
     # --------------------------------------------------------------------- #
     # Helpers
     # --------------------------------------------------------------------- #
     @staticmethod
-    def _extract_prices(sel) -> list[Decimal]:
-        """Grab every price-like token inside the element and return sorted Decimals."""
-        prices: set[Decimal] = set()
+    def _extract_prices(sel, minor: bool = False) -> list[Decimal] | list[int]:
+        """Grab every price-like token inside the element and return them sorted (Decimals, or int cents)."""
+        prices: set = set()
         texts = sel.xpath(".//span[contains(text(),'€')]/text()").getall()
         for txt in texts:
             txt = html.unescape(txt).replace("\xa0", " ")
             for raw in PRICE_RE.findall(txt):
                 try:
-                    prices.add(Decimal(raw.replace(".", "").replace(",", ".")))
-                except InvalidOperation:
+                    prices.add(money.parse_es(raw) if minor else Decimal(raw.replace(".", "").replace(",", ".")))
+                except (InvalidOperation, ValueError):
                     continue
         return sorted(prices)
 
@@ -107,6 +123,29 @@ class ZalandoSpider(PlaywrightListingSpider):
             t.strip() for t in sel.css("header h3 span::text").getall() if t.strip()
         )
 
+    def _extract_products(self, rendered, page_no: int, category: str | None = None) -> Iterable[ProductItem]:
+        settings = getattr(self, "settings", None)
+        item_cls = product_item_class(settings.get("MONEY_MODE") if settings is not None else None)
+        minor = item_cls is MinorUnitProductItem
+        for card in rendered.css("article"):
+            plist = self._extract_prices(card, minor)
+            price_now = plist[0] if plist else None
+            price_orig = plist[-1] if len(plist) > 1 and plist[-1] != price_now else None
+
+            link = safe_urljoin(rendered, card)
+            if not link:
+                continue
+
+            yield item_cls(
+                page=page_no,
+                title=self._extract_title(card),
+                price_discounted=price_now,
+                price_original=price_orig,
+                currency=Currency.EUR,
+                link=link,
+                category=category,
+            )
+
     # --------------------------------------------------------------------- #
     # Main callback
     # --------------------------------------------------------------------- #
@@ -115,62 +154,28 @@ class ZalandoSpider(PlaywrightListingSpider):
         # returns (page, rendered_response, timings) and ALWAYS closes the page).
         async with self.rendered_page(response) as (page, rendered, timings):
             page_no = self._page_number(rendered.url)
-
-            # Extract product cards
-            for card in rendered.css("article"):
-                plist = self._extract_prices(card)
-                price_now: Decimal | None = plist[0] if plist else None
-                price_orig: Decimal | None = (
-                    plist[-1] if len(plist) > 1 and plist[-1] != price_now else None
-                )
-
-                link = safe_urljoin(rendered, card)
-                if not link:
-                    continue
-
-                yield ProductItem(
-                    page=page_no,
-                    title=self._extract_title(card),
-                    price_discounted=price_now,
-                    price_original=price_orig,
-                    currency=Currency.EUR,
-                    link=link,
-                )
+            category = response.meta.get(CATEGORY_META)  # sitemap discovery: pages are numbered per category
+
+            # Extract product cards (collected first so the stage is timed on its own)
+            with instrumentation.timed("extract", self.name):
+                products = list(self._extract_products(rendered, page_no, category))
+            for product in products:
+                yield product
+
+            # Follow pagination (all remaining pages at once when a shared frontier is on).
+            # Scheduled before this page is marked done, so a crash in between never
+            # leaves a finished page whose successor the checkpoint does not know.
+            for request in self.pagination_requests(
+                rendered,
+                meta={
+                    "playwright": True,
+                    "playwright_context": "persistent",
+                    "playwright_include_page": True,
+                },
+                callback=self.parse,
+                errback=self.errback_timeout,
+            ):
+                yield request
 
             # Mark this page as done so the pipeline can flush it
-            yield self.emit_page_done(page_no)
-
-            # Follow pagination
-            next_href = self.get_next_page_href(rendered)
-            if next_href:
-                yield scrapy.Request(
-                    rendered.urljoin(next_href),
-                    meta={
-                        "playwright": True,
-                        "playwright_context": "persistent",
-                        "playwright_include_page": True,
-                    },
-                    callback=self.parse,
-                    errback=self.errback_timeout,
-                    dont_filter=True,
-                )
-
-    def errback_timeout(self, failure):
-        """Unified retry logic for Playwright timeouts using RetryPolicy."""
-        from playwright._impl._errors import TimeoutError as PWTimeout
-        request = failure.request
-        policy = build_retry_policy(getattr(self, 'settings', None))
-        attempt = request.meta.get("retry_attempt", 0)
-        logger = get_logger(self, url=request.url, attempt=attempt)
-        if failure.check(PWTimeout):
-            if attempt < policy.max_retries:
-                delay = policy.next_delay(attempt)
-                new = request.copy()
-                new.meta["retry_attempt"] = attempt + 1
-                new.meta["download_delay"] = delay
-                new.dont_filter = True
-                logger.info("retrying_playwright_timeout", url=request.url, attempt=attempt+1, delay=delay)
-                return new
-            else:
-                logger.warning("max_retries_exceeded_playwright", url=request.url)
-        # If not handled, Scrapy will log the failure as usual
+            yield self.emit_page_done(page_no, category)
@@ -0,0 +1,157 @@
+# scrapy_playwright_demo/structured.py
+"""
+Structured product data embedded in server-rendered HTML.
+
+Most shops ship the product in the initial HTML twice: as a schema.org
+``Product`` in JSON-LD (for search engines), and as the app's hydration state
+(``__NEXT_DATA__``, ``window.__INITIAL_STATE__ = {...}``). Reading either one
+needs no browser. ``extract_product()`` tries JSON-LD first, then the embedded
+state, and returns flat fields for ``ProductDetailItem`` (or None).
+"""
+from __future__ import annotations
+
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Iterator
+
+_STATE_SCRIPT_IDS = ("__NEXT_DATA__", "__NUXT_DATA__", "__APOLLO_STATE__")
+_STATE_ASSIGN_RE = re.compile(
+    r"window\.__(?:INITIAL_STATE|PRELOADED_STATE|STATE)__\s*=\s*(\{.*?\})\s*;?\s*(?:</script>|$)", re.S
+)
+
+
+def _loads(text: str | None) -> Any:
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def _walk(node: Any) -> Iterator[dict]:
+    """Every dict in a JSON document, depth first (JSON-LD nests products in @graph / lists)."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(reversed(list(current.values())))
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+
+
+def _is_product(node: dict) -> bool:
+    types = node.get("@type")
+    types = types if isinstance(types, list) else [types]
+    return any(t in ("Product", "ProductGroup", "IndividualProduct") for t in types)
+
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _text(value: Any) -> str | None:
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("@id")
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _decimal(value: Any) -> Decimal | None:
+    if value in (None, ""):
+        return None
+    try:
+        return Decimal(str(value).replace(",", ".")) if not isinstance(value, Decimal) else value
+    except InvalidOperation:
+        return None
+
+
+def _images(value: Any) -> list[str]:
+    values = value if isinstance(value, list) else [value]
+    urls = []
+    for v in values:
+        url = v.get("url") or v.get("contentUrl") if isinstance(v, dict) else v
+        if isinstance(url, str) and url:
+            urls.append(url)
+    return urls
+
+
+def _offer(offers: Any) -> dict:
+    """The cheapest offer (AggregateOffer → lowPrice)."""
+    best: dict = {}
+    for offer in _walk(offers):
+        price = _decimal(offer.get("price", offer.get("lowPrice")))
+        if price is None:
+            spec = offer.get("priceSpecification")
+            price = _decimal(_first(spec).get("price")) if isinstance(_first(spec), dict) else None
+        if price is not None and ("price" not in best or price < best["price"]):
+            best = {
+                "price": price,
+                "currency": _text(offer.get("priceCurrency")),
+                "availability": _text(offer.get("availability")),
+            }
+    if best.get("availability"):
+        best["availability"] = best["availability"].rsplit("/", 1)[-1]  # https://schema.org/InStock → InStock
+    return best
+
+
+def product_from_json_ld(html_scripts: list[str]) -> dict | None:
+    for script in html_scripts:
+        for node in _walk(_loads(script)):
+            if _is_product(node) and node.get("name"):
+                return _fields(node)
+    return None
+
+
+def product_from_state(state: Any) -> dict | None:
+    """First product-looking object in a hydration state: a name plus a price, offers or sku."""
+    for node in _walk(state):
+        name = node.get("name") or node.get("title")
+        if isinstance(name, str) and name and (
+            "offers" in node or "sku" in node or _decimal(node.get("price")) is not None
+        ):
+            return _fields(node)
+    return None
+
+
+def _fields(node: dict) -> dict:
+    offer = _offer(node.get("offers")) if node.get("offers") else {}
+    if not offer and _decimal(node.get("price")) is not None:
+        offer = {"price": _decimal(node.get("price")), "currency": _text(node.get("currency") or node.get("priceCurrency"))}
+    rating = node.get("aggregateRating") if isinstance(node.get("aggregateRating"), dict) else {}
+    return {
+        "title": _text(node.get("name") or node.get("title")),
+        "brand": _text(node.get("brand")),
+        "sku": _text(node.get("sku") or node.get("productID")),
+        "gtin": _text(node.get("gtin13") or node.get("gtin") or node.get("gtin14") or node.get("gtin8")),
+        "description": _text(node.get("description")),
+        "color": _text(node.get("color")),
+        "images": _images(node.get("image")),
+        "price": offer.get("price"),
+        "currency": offer.get("currency"),
+        "availability": offer.get("availability"),
+        "rating": _decimal(rating.get("ratingValue")),
+        "review_count": int(rating["reviewCount"]) if str(rating.get("reviewCount", "")).isdigit() else None,
+    }
+
+
+def extract_product(response) -> tuple[dict, str] | None:
+    """``(fields, source)`` with source ``"json-ld"`` or ``"state"``, or None."""
+    fields = product_from_json_ld(response.css('script[type="application/ld+json"]::text').getall())
+    if fields:
+        return fields, "json-ld"
+    for script_id in _STATE_SCRIPT_IDS:
+        fields = product_from_state(_loads(response.css(f"script#{script_id}::text").get()))
+        if fields:
+            return fields, "state"
+    for script in response.xpath("//script[not(@src)]/text()").getall():
+        match = _STATE_ASSIGN_RE.search(script)
+        fields = product_from_state(_loads(match.group(1))) if match else None
+        if fields:
+            return fields, "state"
+    return None
@@ -7,4 +7,5 @@ class PlaywrightMeta(TypedDict, total=False):
     playwright_page: object  # cannot type the real Playwright Page without depending on it here
     playwright_page_methods: list
     playwright_page_goto_kwargs: dict[str, object]
-    retry_attempt: int 
\ No newline at end of file
+    retry_attempt: int 
+    retry_delay: float
@@ -1,8 +1,41 @@
+"""
+structlog helpers tuned for per-request hot paths.
+
+* ``get_logger(spider)`` returns a cached bound logger per spider, so middlewares
+  can call it on every request without rebinding or walking crawler settings.
+* ``configure_logging()`` installs a level-filtering wrapper
+  (``structlog.make_filtering_bound_logger``): calls below the level are no-op
+  methods, and no event dict is built at all.
+* Optional ``EventSampler`` keeps only a fraction of high-volume debug/info
+  events (per event name).
+* With ``async_emission=True`` the JSON rendering and the I/O happen on a
+  ``QueueListener`` thread. The reactor thread only timestamps the event and
+  enqueues it.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import weakref
+from collections import Counter
+from collections.abc import Mapping
+from typing import Any
+
 import structlog
 from scrapy import Spider
-from typing import Any
 
-def get_logger(spider: Spider | None = None, **extra: Any):
+_SAMPLED_LEVELS = frozenset({"debug", "info"})
+
+_spider_loggers: weakref.WeakKeyDictionary[Any, Any] = weakref.WeakKeyDictionary()
+_root_logger: Any | None = None
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _spider_bindings(spider: Spider | None) -> dict[str, Any]:
     bound = {}
     if spider is not None:
         bound["spider"] = getattr(spider, "name", None)
@@ -10,5 +43,136 @@ def get_logger(spider: Spider | None = None, **extra: Any):
             bound["job_id"] = spider.crawler.settings.get("JOB")
         except Exception:
             pass
-    bound.update({k: v for k, v in extra.items() if v is not None})
-    return structlog.get_logger().bind(**bound) 
\ No newline at end of file
+    return bound
+
+
+def get_logger(spider: Spider | None = None, **extra: Any):
+    global _root_logger
+    if spider is None:
+        if _root_logger is None:
+            _root_logger = structlog.get_logger().bind()
+        logger = _root_logger
+    else:
+        try:
+            logger = _spider_loggers.get(spider)
+        except TypeError:  # not weak-referenceable
+            logger = None
+        if logger is None:
+            logger = structlog.get_logger().bind(**_spider_bindings(spider))
+            try:
+                _spider_loggers[spider] = logger
+            except TypeError:
+                pass
+    extra = {k: v for k, v in extra.items() if v is not None}
+    return logger.bind(**extra) if extra else logger
+
+
+def reset_logger_cache() -> None:
+    """Drop cached loggers, e.g. after ``structlog.configure()`` changed the pipeline."""
+    global _root_logger
+    _spider_loggers.clear()
+    _root_logger = None
+
+
+class EventSampler:
+    """
+    structlog processor keeping ``rates[event]`` (0..1) of debug/info events.
+
+    Warnings and errors are never sampled. Dropped events are counted per
+    event name in ``dropped``.
+    """
+
+    def __init__(self, rates: Mapping[str, float], seed: int | None = None) -> None:
+        self.rates = dict(rates)
+        self.dropped: Counter[str] = Counter()
+        self._random = random.Random(seed).random
+
+    def __call__(self, logger: Any, method_name: str, event_dict: dict[str, Any]) -> dict[str, Any]:
+        if method_name in _SAMPLED_LEVELS:
+            event = event_dict.get("event")
+            rate = self.rates.get(event) if isinstance(event, str) else None
+            if rate is not None and self._random() >= rate:
+                self.dropped[event] += 1
+                raise structlog.DropEvent
+        return event_dict
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records untouched: formatting (JSON rendering) is the listener's job."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(
+    level: str | int = "INFO",
+    async_emission: bool = False,
+    sample_rates: Mapping[str, float] | None = None,
+    stream: Any = None,
+) -> EventSampler | None:
+    """
+    Configure structlog → stdlib with JSON output on ``stream`` (stderr by default).
+
+    Safe to call again (tests, benchmarks): previous handlers and the queue
+    listener are replaced.
+    """
+    global _listener
+    numeric = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+    sampler = EventSampler(sample_rates) if sample_rates else None
+
+    processors: list[Any] = []
+    if sampler is not None:
+        processors.append(sampler)
+    processors += [
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.stdlib.add_log_level,
+        structlog.processors.StackInfoRenderer(),
+        structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+    ]
+    structlog.configure(
+        processors=processors,
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.make_filtering_bound_logger(numeric),
+        cache_logger_on_first_use=True,
+    )
+    reset_logger_cache()
+
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(),
+        ],
+        # Plain stdlib records (Scrapy, Twisted) get the same JSON shape
+        foreign_pre_chain=[structlog.processors.TimeStamper(fmt="iso"), structlog.stdlib.add_log_level],
+    )
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(formatter)
+
+    stop_listener()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if getattr(handler, "_structlog_managed", False):
+            root.removeHandler(handler)
+    if async_emission:
+        records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        handler: logging.Handler = _RecordQueueHandler(records)
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+        _listener.start()
+        atexit.register(stop_listener)  # flush what is still queued on exit
+    else:
+        handler = output
+    handler._structlog_managed = True  # type: ignore[attr-defined]
+    root.addHandler(handler)
+    root.setLevel(numeric)
+    return sampler
+
+
+def stop_listener() -> None:
+    """Flush and stop the emission thread, if any (idempotent)."""
+    global _listener
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+    _listener = None
+
@@ -0,0 +1,58 @@
+# scrapy_playwright_demo/utils/window.py
+from __future__ import annotations
+
+import time
+from collections import deque
+from collections.abc import Callable
+
+
+class SlidingWindow:
+    """
+    Time-based sliding window of ``(timestamp, value)`` observations.
+
+    Used for rolling rates (errors, 429s, retries) and latencies. Old entries
+    are evicted lazily on every read/write, so memory is bounded by the event
+    rate times ``span`` seconds.
+    """
+
+    def __init__(self, span: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.span = span
+        self._clock = clock
+        self._events: deque[tuple[float, float]] = deque()
+        self._sum = 0.0
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.span
+        events = self._events
+        while events and events[0][0] <= cutoff:
+            self._sum -= events.popleft()[1]
+
+    def add(self, value: float = 1.0, now: float | None = None) -> None:
+        now = self._clock() if now is None else now
+        self._evict(now)
+        self._events.append((now, value))
+        self._sum += value
+
+    def count(self, now: float | None = None) -> int:
+        self._evict(self._clock() if now is None else now)
+        return len(self._events)
+
+    def total(self, now: float | None = None) -> float:
+        self._evict(self._clock() if now is None else now)
+        return self._sum
+
+    def mean(self, now: float | None = None) -> float:
+        n = self.count(now)
+        return self._sum / n if n else 0.0
+
+    def percentile(self, q: float, now: float | None = None) -> float:
+        self._evict(self._clock() if now is None else now)
+        ordered = sorted(v for _, v in self._events)
+        if not ordered:
+            return 0.0
+        rank = max(1, round(q / 100 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def clear(self) -> None:
+        self._events.clear()
+        self._sum = 0.0
@@ -0,0 +1,60 @@
+import urllib.error
+import urllib.request
+from decimal import Decimal
+
+import pytest
+from scrapy.selector import Selector
+
+from scrapy_playwright_demo.bench.catalog import CatalogConfig, CatalogServer, card_prices
+from scrapy_playwright_demo.bench.harness import percentile
+from scrapy_playwright_demo.spiders.zalando import ZalandoSpider
+
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=5) as resp:  # noqa: S310
+        return resp.status, resp.read().decode("utf-8")
+
+
+def test_catalog_listing_matches_spider_selectors():
+    config = CatalogConfig(pages=3, cards_per_page=6, lazy_cards=2)
+    with CatalogServer(config) as server:
+        status, html = fetch(server.start_url)
+    assert status == 200
+    sel = Selector(text=html)
+    cards = sel.css("#grid article")
+    # lazy cards are only injected by JS after scrolling
+    assert len(cards) == 4
+    original, discounted = card_prices(1, 0)
+    assert ZalandoSpider._extract_prices(cards[0]) == sorted(
+        [Decimal(discounted) / 100, Decimal(original) / 100]
+    )
+    assert ZalandoSpider._extract_title(cards[0]) == "Brand 0 Sneaker 1-0"
+    assert sel.css(ZalandoSpider.NEXT_PAGE_SELECTOR).get() == "?p=2"
+    assert sel.css("button[data-testid='uc-accept-all-button']")
+
+
+def test_catalog_last_page_and_out_of_range():
+    with CatalogServer(CatalogConfig(pages=2)) as server:
+        _, html = fetch(f"{server.base_url}/catalog/?p=2")
+        assert Selector(text=html).css(ZalandoSpider.NEXT_PAGE_SELECTOR).get() is None
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            fetch(f"{server.base_url}/catalog/?p=3")
+        assert exc.value.code == 404
+
+
+def test_catalog_injects_errors():
+    config = CatalogConfig(pages=1, error_429_rate=0.5, error_5xx_rate=0.5, seed=1)
+    with CatalogServer(config) as server:
+        for _ in range(10):
+            with pytest.raises(urllib.error.HTTPError) as exc:
+                fetch(server.start_url)
+            assert exc.value.code in (429, 503)
+        assert sum(server.stats.values()) == 10
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 99) == 3.0
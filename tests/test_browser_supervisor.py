@@ -0,0 +1,111 @@
+import asyncio
+from types import SimpleNamespace
+
+from scrapy import Request
+
+from scrapy_playwright_demo.middlewares.browser import (
+    BrowserSupervisorMiddleware,
+    ManagedContext,
+    RecycleThresholds,
+)
+
+
+class DummyStats(dict):
+    def set_value(self, key, value, spider=None):
+        self[key] = value
+
+    def max_value(self, key, value, spider=None):
+        self[key] = max(self.get(key, value), value)
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self[key] = self.get(key, start) + count
+
+
+class FakePage:
+    def on(self, event, callback):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = [FakePage()]
+        self.closed = False
+
+    def on(self, event, callback):
+        pass
+
+    async def storage_state(self):
+        return {"cookies": [{"name": "consent", "value": "1"}], "origins": []}
+
+    async def close(self):
+        self.closed = True
+
+
+def make_crawler(wrappers):
+    handler = SimpleNamespace(
+        context_wrappers=wrappers,
+        config=SimpleNamespace(browser_type_name="firefox"),
+    )
+    engine = SimpleNamespace(downloader=SimpleNamespace(handlers=SimpleNamespace(_handlers={"https": handler})))
+    return SimpleNamespace(engine=engine, stats=DummyStats())
+
+
+def pw_request():
+    return Request("https://example.com", meta={"playwright": True, "playwright_context": "persistent"})
+
+
+def test_thresholds():
+    ctx = ManagedContext("persistent", created_at=0.0, pages_opened=10, js_heap_mb=100)
+    assert RecycleThresholds().reason(ctx, 10_000, now=1e9) is None
+    assert RecycleThresholds(max_pages=10).reason(ctx, None, now=1.0) == "pages"
+    assert RecycleThresholds(max_age_s=60).reason(ctx, None, now=61.0) == "age"
+    assert RecycleThresholds(max_js_heap_mb=50).reason(ctx, None, now=1.0) == "js_heap"
+    assert RecycleThresholds(max_rss_mb=500).reason(ctx, 600, now=1.0) == "rss"
+
+
+def test_recycle_keeps_inflight_requests_and_reseeds_state():
+    old_context = FakeContext()
+    wrappers = {"persistent": SimpleNamespace(context=old_context, persistent=False)}
+    crawler = make_crawler(wrappers)
+    mw = BrowserSupervisorMiddleware(crawler, RecycleThresholds(max_pages=2), interval=0)
+    drains = []
+    mw._schedule_drain = lambda *_: drains.append(1)
+
+    first, second = pw_request(), pw_request()
+    mw.process_request(first, None)
+    mw.process_request(second, None)
+    assert first.meta["playwright_context"] == "persistent"
+    assert mw.inflight["persistent"] == 2
+
+    asyncio.run(mw.sample())
+    assert crawler.stats["browser/contexts_recycled/pages"] == 1
+    assert mw.draining == {"persistent"}
+    assert not old_context.closed  # two requests still in flight
+
+    third = pw_request()
+    mw.process_request(third, None)
+    assert third.meta["playwright_context"] == "persistent@1"
+    state = third.meta["playwright_context_kwargs"]["storage_state"]
+    assert state["cookies"][0]["name"] == "consent"
+
+    # A retry of an old request is routed by its logical name to the new generation
+    retry = first.copy()
+    mw.process_response(first, None, None)
+    mw.process_request(retry, None)
+    assert retry.meta["playwright_context"] == "persistent@1"
+
+    mw.process_exception(second, Exception(), None)
+    assert drains  # last in-flight request of the old generation triggers a drain
+    old_context.pages = []
+    asyncio.run(mw.close_drained())
+    assert old_context.closed
+    assert not mw.draining
+
+
+def test_persistent_contexts_are_not_recycled():
+    wrappers = {"persistent": SimpleNamespace(context=FakeContext(), persistent=True)}
+    crawler = make_crawler(wrappers)
+    mw = BrowserSupervisorMiddleware(crawler, RecycleThresholds(max_pages=1), interval=0)
+    mw.process_request(pw_request(), None)
+    asyncio.run(mw.sample())
+    assert "browser/contexts_recycled" not in crawler.stats
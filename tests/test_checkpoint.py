@@ -0,0 +1,165 @@
+import datetime
+
+from scrapy import Request, Spider
+from scrapy.utils.test import get_crawler
+
+from scrapy_playwright_demo.checkpoint import Checkpoint
+from scrapy_playwright_demo.config import AppSettings
+from scrapy_playwright_demo.container import Container
+from scrapy_playwright_demo.frontier import FRONTIER_META
+from scrapy_playwright_demo.items import PageDone, ProductItem
+from scrapy_playwright_demo.pipelines import PerPageSinkPipeline
+from scrapy_playwright_demo.scheduler import FrontierScheduler
+from scrapy_playwright_demo.sinks.fake import FakeSink
+from scrapy_playwright_demo.sinks.file import FileSink
+from scrapy_playwright_demo.sitemaps import SitemapEntry
+from scrapy_playwright_demo.spiders.zalando import ZalandoSpider
+
+
+def item(page, link):
+    return {"page": page, "title": "t", "link": link}
+
+
+def listing(page):
+    return Request(f"https://x.com/cat/?p={page}", meta={FRONTIER_META: True}, dont_filter=True)
+
+
+def test_checkpoint_survives_reopen(tmp_path):
+    path = tmp_path / "checkpoint.sqlite"
+    cp = Checkpoint(path)
+    assert cp.buffer_item("2", item(2, "a"))
+    assert not cp.buffer_item("2", item(2, "a"))  # same link: replaced, not duplicated
+    cp.remember_request("3", b"req-3")
+    assert cp.mark_done(["1", "1"]) == 1
+    cp.close()
+
+    cp = Checkpoint(path)
+    assert cp.is_done("1") and not cp.is_done("2")
+    assert cp.restore_buffers() == {"2": [item(2, "a")]}
+    assert cp.pending_requests() == [b"req-3"]
+    cp.mark_done(["2", "3"])
+    assert cp.restore_buffers() == {} and cp.pending_requests() == []
+
+
+def test_from_settings_needs_a_jobdir_or_path(tmp_path):
+    assert Checkpoint.from_settings({}) is None
+    assert Checkpoint.from_settings({"JOBDIR": str(tmp_path), "CHECKPOINT_ENABLED": False}) is None
+    assert Checkpoint.from_settings({"JOBDIR": str(tmp_path)}).path == str(tmp_path / "checkpoint.sqlite")
+
+
+def test_pipeline_resumes_partial_pages_after_a_crash(tmp_path):
+    path = tmp_path / "checkpoint.sqlite"
+    sink = FakeSink()
+    crashed = PerPageSinkPipeline(sink, checkpoint=Checkpoint(path, flush_items=2))
+    crashed.process_item(item(1, "a"), spider=None)
+    crashed.process_item(item(1, "b"), spider=None)  # the second item writes the batch
+    # the process dies here: nothing was flushed to the sink
+
+    resumed = PerPageSinkPipeline(sink, checkpoint=Checkpoint(path))
+    resumed.spider_opened(spider=None)
+    for link in ("a", "b", "c"):  # page 1 rendered again
+        resumed.process_item(item(1, link), spider=None)
+    resumed.process_item(PageDone(page=1, finished_at=datetime.datetime.now(datetime.UTC)), spider=None)
+    assert [i["link"] for i in sink.pages["1"]["items"]] == ["a", "b", "c"]
+    assert resumed.checkpoint.is_done("1") and resumed.checkpoint.restore_buffers() == {}
+
+
+def test_buffered_items_are_written_in_batches(tmp_path):
+    path = tmp_path / "checkpoint.sqlite"
+    cp = Checkpoint(path, flush_items=3)
+    assert cp.buffer_item("1", item(1, "a")) and cp.buffer_item("2", item(2, "b"))
+    assert not cp.buffer_item("1", item(1, "a"))  # a re-render is recognised before any write
+    assert Checkpoint(path).restore_buffers() == {}  # nothing written yet
+    cp.mark_done(["2"])  # one transaction: page 2 done, page 1's item written
+    assert Checkpoint(path).restore_buffers() == {"1": [item(1, "a")]}
+    for link in ("c", "d", "e"):
+        cp.buffer_item("3", item(3, link))  # the third one fills the batch
+    assert [i["link"] for i in Checkpoint(path).restore_buffers()["3"]] == ["c", "d", "e"]
+    cp.buffer_item("3", item(3, "f"))
+    assert cp.flush() == 1 and cp.flush() == 0
+
+
+def test_interrupted_close_keeps_partial_pages_unflushed(tmp_path):
+    sink = FakeSink()
+    pipe = PerPageSinkPipeline(sink, checkpoint=Checkpoint(tmp_path / "c.sqlite"))
+    pipe.process_item(item(4, "a"), spider=None)
+    pipe.close_spider(spider=None, reason="shutdown")
+    assert sink.pages == {} and pipe.checkpoint.restore_buffers() == {"4": [item(4, "a")]}
+
+
+def test_container_seeds_completed_pages_from_the_sink(tmp_path):
+    out = tmp_path / "out"
+    FileSink(out_dir=str(out), compress=False).write_page([item(7, "a")], "7", "now", {})
+    container = Container(AppSettings(), sink_factory=lambda _: FileSink(out_dir=str(out)))
+    checkpoint = container.checkpoint({"JOBDIR": str(tmp_path / "job")})
+    assert checkpoint.done_pages == {"7"}
+    assert container.checkpoint() is checkpoint
+
+
+def scheduler(tmp_path, jobdir):
+    crawler = get_crawler(Spider, {
+        "CONTAINER": Container(AppSettings(), sink_factory=lambda _: FakeSink()),
+        "JOBDIR": str(tmp_path / jobdir),
+        "CHECKPOINT_PATH": str(tmp_path / "checkpoint.sqlite"),
+        "SCHEDULER_PRIORITY_QUEUE": "scrapy.pqueues.ScrapyPriorityQueue",
+    })
+    crawler.spider = crawler._create_spider("s")
+    sched = FrontierScheduler.from_crawler(crawler)
+    sched.open(crawler.spider)
+    return sched
+
+
+def test_scheduler_drops_done_pages_and_replays_unfinished_ones(tmp_path):
+    first = scheduler(tmp_path, "job")
+    assert first.enqueue_request(listing(1)) and first.enqueue_request(listing(2))
+    first.checkpoint.mark_done(["1"])  # page 1 written; page 2 still rendering when the job dies
+    assert first.next_request().url.endswith("p=2")  # page 1 is skipped before the browser
+
+    resumed = scheduler(tmp_path, "lost-queue")  # the crash lost Scrapy's queue state
+    assert resumed.stats.get_value("checkpoint/replayed") == 1
+    assert not resumed.enqueue_request(listing(1))  # start URL, already written
+    assert not resumed.enqueue_request(listing(2))  # already re-issued from the checkpoint
+    assert resumed.next_request().url.endswith("p=2")
+    assert resumed.next_request() is None
+    assert resumed.stats.get_value("checkpoint/skipped/done") == 1
+
+
+def test_categories_from_the_sitemap_keep_their_pages_apart(tmp_path):
+    spider = ZalandoSpider()
+    men, women = (
+        spider.sitemap_url_request(SitemapEntry("url", f"https://x.com/{cat}/"), "category", 0)
+        for cat in ("zapatillas-hombre", "zapatillas-mujer")
+    )
+    out = tmp_path / "out"
+    container = Container(AppSettings(), sink_factory=lambda _: FileSink(out_dir=str(out), compress=False))
+    settings = {"CHECKPOINT_PATH": str(tmp_path / "checkpoint.sqlite")}
+    pipe = PerPageSinkPipeline(container.page_sink(settings), checkpoint=container.checkpoint(settings))
+    now = datetime.datetime.now(datetime.UTC)
+    for request, link in ((men, "a"), (women, "b")):  # both categories start at page 1
+        category = request.meta["category"]
+        pipe.process_item(ProductItem(page=1, title="t", currency="EUR", link=link, category=category), spider=None)
+        pipe.process_item(PageDone(page=1, finished_at=now, category=category), spider=None)
+    assert pipe.checkpoint.done_pages == {"zapatillas-hombre/1", "zapatillas-mujer/1"}
+    assert (out / "zapatillas-hombre" / "page-1.done").exists() and (out / "zapatillas-mujer" / "page-1.done").exists()
+    assert FileSink(out_dir=str(out)).completed_pages({}) == pipe.checkpoint.done_pages
+
+    sched = scheduler(tmp_path, "job")
+    sched.checkpoint.mark_done(["zapatillas-hombre/1"])
+    assert not sched.enqueue_request(men)
+    assert sched.enqueue_request(Request("https://x.com/zapatillas-mujer/?p=2", meta={**women.meta}, dont_filter=True))
+    assert sched.enqueue_request(Request("https://x.com/zapatillas-hombre/?p=2", meta={**men.meta}, dont_filter=True))
+
+
+def test_scheduler_closes_the_checkpoint_after_the_pipeline(tmp_path):
+    sched = scheduler(tmp_path, "job")
+    assert sched.enqueue_request(listing(1))
+    pipe = PerPageSinkPipeline(FakeSink(), checkpoint=sched.checkpoint)
+    pipe.process_item(item(1, "a"), spider=None)
+    pipe.close_spider(spider=None, reason="shutdown")
+    assert not sched.checkpoint.closed  # the scheduler closes last, and may still remember requests
+
+    sched.close("shutdown")
+    assert sched.checkpoint.closed
+    sched.checkpoint.close()  # a second close is a no-op
+    assert not (tmp_path / "checkpoint.sqlite-wal").exists()  # WAL checkpointed into the database
+    assert Checkpoint(tmp_path / "checkpoint.sqlite").restore_buffers() == {"1": [item(1, "a")]}
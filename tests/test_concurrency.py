@@ -0,0 +1,157 @@
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.utils.httpobj import urlparse_cached
+
+from scrapy_playwright_demo import instrumentation
+from scrapy_playwright_demo.concurrency import AimdController, ControllerConfig, LoadSample
+from scrapy_playwright_demo.middlewares import concurrency as concurrency_mw
+from scrapy_playwright_demo.middlewares.concurrency import AdaptiveConcurrencyMiddleware
+from scrapy_playwright_demo.utils.window import SlidingWindow
+
+
+class DummyStats(dict):
+    def set_value(self, key, value, spider=None):
+        self[key] = value
+
+    def max_value(self, key, value, spider=None):
+        self[key] = max(self.get(key, value), value)
+
+    def min_value(self, key, value, spider=None):
+        self[key] = min(self.get(key, value), value)
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self[key] = self.get(key, start) + count
+
+
+def healthy(**overrides):
+    values = {"requests": 20, "latency_s": 1.0, "peak_inflight": 100}
+    values.update(overrides)
+    return LoadSample(**values)
+
+
+def test_sliding_window_evicts_old_events():
+    window = SlidingWindow(10)
+    window.add(1.0, now=0)
+    window.add(3.0, now=5)
+    assert window.count(now=9) == 2
+    assert window.mean(now=9) == 2.0
+    assert window.count(now=12) == 1
+    assert window.percentile(90, now=12) == 3.0
+
+
+def test_controller_additive_increase_is_bounded():
+    ctl = AimdController(ControllerConfig(min_limit=1, max_limit=3), initial=2)
+    assert ctl.decide(healthy(), now=0).action == "increase"
+    assert ctl.limit == 3
+    decision = ctl.decide(healthy(), now=1)
+    assert (decision.action, decision.reason, ctl.limit) == ("hold", "at_max", 3)
+
+
+def test_controller_holds_when_limit_is_not_used():
+    ctl = AimdController(ControllerConfig(max_limit=8), initial=4)
+    assert ctl.decide(healthy(peak_inflight=2), now=0).reason == "underused"
+    assert ctl.decide(healthy(requests=1), now=0).reason == "no_traffic"
+    assert ctl.limit == 4
+
+
+@pytest.mark.parametrize(
+    ("sample", "reason"),
+    [
+        (healthy(throttle_rate=0.2), "throttled"),
+        (healthy(error_rate=0.5), "errors"),
+        (healthy(latency_s=120), "latency"),
+        (healthy(cpu_percent=99), "cpu"),
+        (LoadSample(memory_available_percent=2), "memory"),  # host signals need no traffic
+    ],
+)
+def test_controller_multiplicative_decrease(sample, reason):
+    ctl = AimdController(ControllerConfig(max_limit=10, cooldown_s=30), initial=10)
+    decision = ctl.decide(sample, now=0)
+    assert (decision.action, decision.reason, decision.limit) == ("decrease", reason, 7)
+    # the same overloaded window must not shrink the limit again right away
+    assert ctl.decide(sample, now=10).reason == "cooldown"
+    assert ctl.decide(sample, now=31).limit == 4
+
+
+def test_controller_never_goes_below_min():
+    ctl = AimdController(ControllerConfig(min_limit=2, max_limit=4, cooldown_s=0), initial=2)
+    assert ctl.decide(healthy(error_rate=1.0), now=0).limit == 2
+
+
+def make_middleware(monkeypatch, initial=4, max_limit=8):
+    monkeypatch.setattr(concurrency_mw, "psutil", None)
+    slots = {"example.com": SimpleNamespace(concurrency=8)}
+    get_slot = lambda request: ("example.com", slots["example.com"])  # noqa: E731
+    crawler = SimpleNamespace(
+        engine=SimpleNamespace(downloader=SimpleNamespace(slots=slots, _get_slot=get_slot)), stats=DummyStats()
+    )
+    config = ControllerConfig(max_limit=max_limit, min_samples=2, cooldown_s=0)
+    mw = AdaptiveConcurrencyMiddleware(crawler, AimdController(config, initial), interval=0, window_s=60)
+    return mw, crawler, slots
+
+
+def fetch(mw, status):
+    request = Request("https://example.com")
+    mw.process_request(request, None)
+    response = HtmlResponse(request.url, status=status, body=b"", request=request)
+    return mw.process_response(request, response, None)
+
+
+def test_middleware_backs_off_on_429_and_applies_to_slots(monkeypatch):
+    mw, crawler, slots = make_middleware(monkeypatch)
+    for status in (200, 429, 429, 200):
+        fetch(mw, status)
+    decision = mw.tick()
+    assert (decision.action, decision.reason) == ("decrease", "throttled")
+    assert slots["example.com"].concurrency == decision.limit == 2
+    assert crawler.stats["concurrency/decisions/decrease/throttled"] == 1
+    assert crawler.stats["concurrency/limit/min"] == 2
+    assert mw.inflight == 0
+
+
+def test_middleware_counts_timeouts_and_render_latency(monkeypatch):
+    mw, crawler, _ = make_middleware(monkeypatch)
+    mw.spider_opened(SimpleNamespace(name="zalando"))
+    try:
+        instrumentation.observe("render", 2.5, spider="zalando")
+        instrumentation.observe("render", 99.0, spider="other")
+    finally:
+        mw.spider_closed(None)
+    assert mw.render.count() == 1
+
+    request = Request("https://example.com")
+    mw.process_request(request, None)
+    mw.process_exception(request, TimeoutError(), None)
+    assert crawler.stats["concurrency/timeouts"] == 1
+    assert mw.sample().error_rate == 1.0
+
+
+class LazyDownloader:
+    """Like Scrapy's downloader: a slot is created (at CONCURRENT_REQUESTS_PER_DOMAIN) on first use."""
+
+    def __init__(self):
+        self.slots = {}
+
+    def _get_slot(self, request):
+        key = request.meta.get("download_slot") or urlparse_cached(request).hostname
+        return key, self.slots.setdefault(key, SimpleNamespace(concurrency=8))
+
+
+def test_hosts_first_seen_after_opening_start_at_the_current_limit(monkeypatch):
+    monkeypatch.setattr(concurrency_mw, "psutil", None)
+    downloader = LazyDownloader()
+    crawler = SimpleNamespace(engine=SimpleNamespace(downloader=downloader), stats=DummyStats())
+    config = ControllerConfig(min_limit=2, max_limit=4)
+    mw = AdaptiveConcurrencyMiddleware(crawler, AimdController(config, 3), interval=0, window_s=60)
+    mw.spider_opened(SimpleNamespace(name="s"))  # no slot exists yet
+    try:
+        mw.process_request(Request("https://new.example/a"), None)
+        mw.process_request(Request("https://x/b", meta={"download_slot": "pool"}), None)
+        del downloader.slots["new.example"]  # dropped by Scrapy's slot GC after idling
+        mw.process_request(Request("https://new.example/c"), None)
+    finally:
+        mw.spider_closed(None)
+    assert {key: slot.concurrency for key, slot in downloader.slots.items()} == {"new.example": 3, "pool": 3}
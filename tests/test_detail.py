@@ -0,0 +1,138 @@
+import gzip
+import json
+from decimal import Decimal
+
+from scrapy.crawler import Crawler
+from scrapy.http import HtmlResponse, Request
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapy_playwright_demo.config import AppSettings
+from scrapy_playwright_demo.container import Container
+from scrapy_playwright_demo.items import PageDone, ProductDetailItem
+from scrapy_playwright_demo.sinks.file import FileSink
+from scrapy_playwright_demo.spiders.detail import DETAIL_META, ProductDetailSpider, read_listing_pages
+from scrapy_playwright_demo.structured import extract_product
+
+JSON_LD = {
+    "@context": "https://schema.org",
+    "@graph": [
+        {"@type": "BreadcrumbList", "name": "Sneakers"},
+        {
+            "@type": "Product",
+            "name": "Runner 2",
+            "sku": "RU-2",
+            "brand": {"@type": "Brand", "name": "Acme"},
+            "image": ["https://img/1.jpg", {"url": "https://img/2.jpg"}],
+            "offers": {"@type": "AggregateOffer", "lowPrice": "79.95", "priceCurrency": "EUR",
+                       "offers": [{"price": "89.95", "priceCurrency": "EUR", "availability": "https://schema.org/InStock"}]},
+            "aggregateRating": {"ratingValue": "4.5", "reviewCount": "12"},
+        },
+    ],
+}
+
+
+def page_html(script):
+    return f"<html><head>{script}</head><body></body></html>"
+
+
+def response(url, html, **meta):
+    request = Request(url, meta={DETAIL_META: {"page": 1, "listing": {"link": url, "title": "Listing title"}}, **meta})
+    return HtmlResponse(url, body=html.encode(), encoding="utf-8", request=request)
+
+
+def test_json_ld_product_in_graph_takes_the_cheapest_offer(fake_response):
+    r = fake_response("https://x/p", page_html(f'<script type="application/ld+json">{json.dumps(JSON_LD)}</script>'))
+    fields, source = extract_product(r)
+    assert source == "json-ld"
+    assert (fields["title"], fields["brand"], fields["sku"]) == ("Runner 2", "Acme", "RU-2")
+    assert fields["price"] == Decimal("79.95") and fields["currency"] == "EUR"
+    assert fields["images"] == ["https://img/1.jpg", "https://img/2.jpg"]
+    assert (fields["rating"], fields["review_count"]) == (Decimal("4.5"), 12)
+
+
+def test_hydration_state_is_the_fallback(fake_response):
+    state = {"props": {"pageProps": {"product": {"name": "Runner 3", "sku": "RU-3", "price": 99, "currency": "EUR"}}}}
+    r = fake_response("https://x/p", page_html(f'<script id="__NEXT_DATA__">{json.dumps(state)}</script>'))
+    fields, source = extract_product(r)
+    assert (source, fields["title"], fields["price"]) == ("state", "Runner 3", Decimal("99"))
+    assigned = page_html("<script>window.__INITIAL_STATE__ = " + json.dumps(state) + ";</script>")
+    assert extract_product(fake_response("https://x/p", assigned))[1] == "state"
+    assert extract_product(fake_response("https://x/p", page_html(""))) is None
+
+
+def test_read_listing_pages_only_returns_finished_pages(tmp_path):
+    (tmp_path / "page-2.jl.gz").write_bytes(gzip.compress(b'{"link": "https://x/b"}\n'))
+    (tmp_path / "page-2.done").write_text("")
+    (tmp_path / "page-1.jl").write_text('{"link": "https://x/a"}\n')
+    (tmp_path / "page-1.done").write_text("")
+    (tmp_path / "page-3.jl").write_text('{"link": "https://x/c"}\n')  # still being written
+    (tmp_path / "botas").mkdir()  # a category of a sitemap-discovery run
+    (tmp_path / "botas" / "page-1.jl").write_text('{"link": "https://x/d"}\n')
+    (tmp_path / "botas" / "page-1.done").write_text("")
+    assert list(read_listing_pages(tmp_path)) == [
+        (1, None, [{"link": "https://x/a"}]), (2, None, [{"link": "https://x/b"}]), (1, "botas", [{"link": "https://x/d"}])
+    ]
+
+
+def test_spider_falls_back_to_playwright_and_closes_the_page_when_settled(tmp_path):
+    (tmp_path / "page-1.jl").write_text("".join(
+        json.dumps({"page": 1, "title": "t", "link": link}) + "\n" for link in ("https://x/a", "https://x/b", "https://x/a")
+    ))
+    (tmp_path / "page-1.done").write_text("")
+    crawler = get_crawler(ProductDetailSpider)
+    spider = crawler._create_spider(input=str(tmp_path), fallback="true")
+    requests = list(spider.start_requests())
+    assert [r.url for r in requests] == ["https://x/a", "https://x/b"]  # duplicate link fetched once
+
+    ld = page_html(f'<script type="application/ld+json">{json.dumps(JSON_LD)}</script>')
+    (item,) = spider.parse(response("https://x/a", ld))
+    assert isinstance(item, ProductDetailItem) and item.source == "json-ld" and item.page == 1
+
+    (retry,) = spider.parse(response("https://x/b", page_html("")))
+    assert retry.meta["playwright"] and retry.dont_filter
+    out = list(spider.parse(response("https://x/b", page_html(""), playwright=True)))
+    assert [type(o) for o in out] == [PageDone]  # nothing extracted, but the page is complete
+    assert crawler.stats.get_value("detail/extract_failed") == 1
+
+
+def test_detail_crawl_gets_its_own_sink_and_checkpoint_from_the_project_container(tmp_path):
+    listing, details = tmp_path / "products", tmp_path / "details"
+    for page in (1, 2):
+        FileSink(out_dir=str(listing), compress=False).write_page(
+            [{"page": page, "link": f"https://x/{page}"}], str(page), "now", {})
+    FileSink(out_dir=str(details), compress=False).write_page([{"page": 1, "link": "https://x/1"}], "1", "now", {})
+    # The project container is built from AppSettings, whose PAGE_OUT_DIR is the listing run
+    container = Container(AppSettings(page_out_dir=str(listing), jobdir=str(tmp_path / "state" / "listing")))
+    crawler = Crawler(ProductDetailSpider, Settings({
+        "CONTAINER": container, "PAGE_OUT_DIR": str(details), "JOBDIR": str(tmp_path / "state" / "detail"),
+    }, priority="cmdline"))
+    crawler.spider = spider = crawler._create_spider(input=str(listing))
+    crawler._stats = MemoryStatsCollector(crawler)
+
+    assert [r.url for r in spider.start_requests()] == ["https://x/2"]
+    sink = crawler.settings["CONTAINER"].page_sink(crawler.settings)
+    assert sink._resolve_config(crawler.settings)[0] == str(details)
+    assert crawler.settings["CONTAINER"].checkpoint(crawler.settings).done_pages == {"1"}
+    assert (tmp_path / "state" / "detail" / "checkpoint.sqlite").exists()
+    assert not (tmp_path / "state" / "listing").exists()
+
+
+def test_resumed_page_settles_once_per_link_despite_restored_duplicates(tmp_path):
+    (tmp_path / "page-1.jl").write_text("".join(
+        json.dumps({"page": 1, "title": "t", "link": link}) + "\n" for link in ("https://x/a", "https://x/b")
+    ))
+    (tmp_path / "page-1.done").write_text("")
+    crawler = get_crawler(ProductDetailSpider)
+    spider = crawler._create_spider(input=str(tmp_path), fallback="false")
+    a, b = spider.start_requests()
+    # https://x/a was fetched before the crash: the JOBDIR dupefilter must not drop it
+    assert a.dont_filter and b.dont_filter
+
+    ld = page_html(f'<script type="application/ld+json">{json.dumps(JSON_LD)}</script>')
+    assert [type(o) for o in spider.parse(response("https://x/a", ld))] == [ProductDetailItem]
+    # A copy of https://x/a restored from the JOBDIR queue neither yields nor settles the page again
+    assert list(spider.parse(response("https://x/a", ld))) == []
+    assert crawler.stats.get_value("detail/duplicates") == 1
+    assert [type(o) for o in spider.parse(response("https://x/b", ld))] == [ProductDetailItem, PageDone]
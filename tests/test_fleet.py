@@ -0,0 +1,110 @@
+import asyncio
+import sys
+
+import pytest
+from scrapy import Request
+from scrapy.utils.test import get_crawler
+from scrapy.exceptions import NotConfigured
+
+from scrapy_playwright_demo.fleet import (
+    BrowserServer,
+    FairShare,
+    devtools_endpoint,
+    member_settings,
+    plan_fleet,
+    split_budget,
+)
+from scrapy_playwright_demo.middlewares.fleet import FairShareMiddleware
+
+
+def test_plan_splits_the_context_budget_and_labels_spiders():
+    members = plan_fleet(["zalando", "sites:site=shop-us", "sites:site=shop-us", "zalando:start_urls=u"], 9)
+    assert [m.label for m in members] == ["zalando", "shop-us", "shop-us-2", "zalando-2"]
+    assert [m.contexts for m in members] == [3, 2, 2, 2] == split_budget(9, 4)
+    assert members[1].kwargs == {"site": "shop-us"}
+    assert [m.contexts for m in plan_fleet(["a", "b"], 0, contexts_each=3)] == [3, 3]
+    with pytest.raises(ValueError):
+        split_budget(1, 2)
+    with pytest.raises(ValueError, match="key=value"):
+        plan_fleet(["sites:site"])
+    settings = member_settings(members[1], "out", "state", "ws://127.0.0.1:9222/devtools/browser/x")
+    assert settings["PAGE_OUT_DIR"].endswith("shop-us") and settings["JOBDIR"].endswith("shop-us")
+    assert settings["PLAYWRIGHT_MAX_CONTEXTS"] == 2 and settings["PLAYWRIGHT_CDP_URL"].startswith("ws://")
+
+
+def test_freed_slots_go_to_the_spider_holding_fewest():
+    share, granted = FairShare(3), []
+    share.register("busy")
+    share.register("capped", limit=1)
+    assert all(share.acquire("busy", lambda: granted.append("busy")) for _ in range(3))
+    assert not share.acquire("busy", lambda: granted.append("busy"))
+    assert not share.acquire("quiet", lambda: granted.append("quiet"))
+    assert not share.acquire("capped", lambda: granted.append("capped"))
+    assert not share.acquire("capped", lambda: granted.append("capped-2"))
+
+    share.release("busy")   # quiet and capped hold none: both get a slot before busy
+    share.release("busy")
+    assert sorted(granted) == ["capped", "quiet"] and share.held == {"busy": 1, "quiet": 1, "capped": 1}
+    share.release("quiet")  # capped is at its limit: the slot goes to busy despite holding one
+    assert granted[-1] == "busy"
+    share.close("busy")     # frees its slots, but capped is still at its limit
+    assert share.free == 2 and "capped-2" not in granted
+    share.release("capped")
+    assert granted[-1] == "capped-2" and share.free == 2
+
+
+def test_server_reads_the_endpoint_chromium_writes(tmp_path):
+    assert devtools_endpoint(tmp_path) is None
+    (tmp_path / "DevToolsActivePort").write_text("9222\n")
+    assert devtools_endpoint(tmp_path) is None  # half written
+    fake = tmp_path / "chrome"
+    fake.write_text(
+        f"#!{sys.executable}\n"
+        "import pathlib, sys, time\n"
+        "profile = next(a.split('=', 1)[1] for a in sys.argv if a.startswith('--user-data-dir='))\n"
+        "pathlib.Path(profile, 'DevToolsActivePort').write_text('41234\\n/devtools/browser/abc\\n')\n"
+        "time.sleep(60)\n"
+    )
+    fake.chmod(0o755)
+    with BrowserServer(str(fake)) as server:
+        assert server.endpoint == "ws://127.0.0.1:41234/devtools/browser/abc"
+        assert server.proc.poll() is None
+    assert server.proc.poll() is not None
+
+    fake.write_text(f"#!{sys.executable}\nraise SystemExit(3)\n")
+    with pytest.raises(RuntimeError, match="exited with 3"):
+        BrowserServer(str(fake)).start()
+
+
+class FakePage:
+    def __init__(self):
+        self.on_close = []
+
+    def once(self, event, callback):
+        assert event == "close"
+        self.on_close.append(callback)
+
+    def close(self):
+        for callback in self.on_close:
+            callback(self)
+
+
+def test_middleware_holds_the_slot_until_the_page_closes():
+    with pytest.raises(NotConfigured):
+        FairShareMiddleware.from_crawler(get_crawler())
+    crawler = get_crawler(settings_dict={"FLEET_SHARE": FairShare(2), "FLEET_LABEL": "shop-us"})
+    crawler.stats.open_spider()
+    mw = FairShareMiddleware.from_crawler(crawler)
+    share = mw.share
+
+    plain = Request("https://shop.example.com/robots.txt")
+    rendered = Request("https://shop.example.com/sneakers", meta={"playwright": True})
+    asyncio.run(mw.process_request(plain, None))
+    asyncio.run(mw.process_request(rendered, None))
+    assert share.held == {"shop-us": 1}
+
+    page = rendered.meta["playwright_page"] = FakePage()
+    mw.process_response(rendered, object(), None)
+    assert share.held["shop-us"] == 1
+    page.close()
+    assert share.held["shop-us"] == 0 and crawler.stats.get_value("fleet/slots/requests") == 1
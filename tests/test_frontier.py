@@ -0,0 +1,182 @@
+import datetime
+import multiprocessing
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+from twisted.internet.task import Clock
+
+from scrapy_playwright_demo import signals as project_signals
+from scrapy_playwright_demo.config import AppSettings
+from scrapy_playwright_demo.container import Container
+from scrapy_playwright_demo.frontier import FRONTIER_LEASE, FRONTIER_META, SqliteFrontier, Task, TaskState, task_position
+from scrapy_playwright_demo.items import PageDone
+from scrapy_playwright_demo.middlewares.frontier import FrontierSpiderMiddleware
+from scrapy_playwright_demo.pipelines import PerPageSinkPipeline
+from scrapy_playwright_demo.scheduler import FrontierScheduler
+from scrapy_playwright_demo.sinks.fake import FakeSink
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def tasks(group, pages):
+    return [Task(f"{group}-{p}", b"x", group, p) for p in pages]
+
+
+def test_task_position_strips_page_parameter():
+    assert task_position("https://x.com/cat/?p=3&sort=new") == ("https://x.com/cat/?sort=new", 3)
+    assert task_position("https://x.com/cat/") == ("https://x.com/cat/", 1)
+
+
+def test_nodes_claim_disjoint_page_ranges_and_completed_pages_are_not_re_added(tmp_path):
+    path = tmp_path / "frontier.sqlite"
+    a, b = SqliteFrontier(path), SqliteFrontier(path)
+    assert a.add(tasks("cat", range(1, 9))) == 8
+
+    first = [lease.key for lease in a.claim("a", 3, lease_s=60, max_attempts=3)]
+    second = [lease.key for lease in b.claim("b", 3, lease_s=60, max_attempts=3)]
+    assert first == ["cat-1", "cat-2", "cat-3"]
+    assert second == ["cat-4", "cat-5", "cat-6"]
+
+    a.complete("cat-1")
+    assert b.add(tasks("cat", [1, 2, 9])) == 1  # done / leased pages are deduplicated
+    assert a.counts()[TaskState.DONE.value] == 1
+
+
+def test_expired_leases_are_reclaimed_until_max_attempts(tmp_path):
+    clock = FakeClock()
+    frontier = SqliteFrontier(tmp_path / "f.sqlite", clock=clock)
+    frontier.add(tasks("cat", [1]))
+
+    assert frontier.claim("crashed", 1, lease_s=60, max_attempts=2)
+    assert frontier.claim("other", 1, lease_s=60, max_attempts=2) == []  # still leased
+    clock.now += 61
+    assert frontier.heartbeat("crashed", ["cat-1"], 60) == {"cat-1"}  # renewing keeps it...
+    clock.now += 61
+    (lease,) = frontier.claim("other", 1, lease_s=60, max_attempts=2)  # ...until it stops
+    assert (lease.node, lease.attempts) == ("other", 2)
+    assert frontier.heartbeat("crashed", ["cat-1"], 60) == set()
+
+    clock.now += 61
+    assert frontier.claim("third", 1, lease_s=60, max_attempts=2) == []
+    assert frontier.counts()[TaskState.FAILED.value] == 1
+
+
+def test_release_node_returns_leases_without_spending_an_attempt(tmp_path):
+    frontier = SqliteFrontier(tmp_path / "f.sqlite")
+    frontier.add(tasks("cat", [1, 2]))
+    frontier.claim("a", 2, lease_s=60, max_attempts=1)
+    assert frontier.release_node("a") == 2
+    assert len(frontier.claim("b", 2, lease_s=60, max_attempts=1)) == 2
+
+
+def _claim_all(path, node, out):
+    frontier = SqliteFrontier(path)
+    claimed = []
+    while True:
+        leases = frontier.claim(node, 2, lease_s=60, max_attempts=3)
+        if not leases:
+            break
+        claimed += [lease.key for lease in leases]
+    out.put(claimed)
+
+
+def test_claims_are_atomic_across_processes(tmp_path):
+    path = str(tmp_path / "f.sqlite")
+    SqliteFrontier(path).add(tasks("cat", range(200)))
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_claim_all, args=(path, f"n{i}", out)) for i in range(4)]
+    for p in procs:
+        p.start()
+    claimed = [key for _ in procs for key in out.get(timeout=60)]
+    for p in procs:
+        p.join(10)
+    assert len(claimed) == 200 and len(set(claimed)) == 200
+
+
+@pytest.fixture
+def frontier_scheduler(tmp_path):
+    def make(node):
+        crawler = get_crawler(Spider, {
+            "FRONTIER_ENABLED": True,
+            "FRONTIER_PATH": str(tmp_path / "frontier.sqlite"),
+            "FRONTIER_NODE_ID": node,
+            "FRONTIER_CLAIM_SIZE": 2,
+            "SCHEDULER_PRIORITY_QUEUE": "scrapy.pqueues.ScrapyPriorityQueue",
+        })
+        crawler.spider = crawler._create_spider("s")
+        sched = FrontierScheduler.from_crawler(crawler)
+        sched.clock = Clock()
+        crawler.engine = SimpleNamespace(crawl=sched.enqueue_request)
+        sched.open(crawler.spider)
+        return sched, crawler
+
+    return make
+
+
+def test_scheduler_shares_marked_requests_between_nodes(frontier_scheduler):
+    a, crawler_a = frontier_scheduler("a")
+    b, _ = frontier_scheduler("b")
+    for page in (1, 2, 3):
+        assert a.enqueue_request(Request(f"https://x.com/cat/?p={page}", meta={FRONTIER_META: True}))
+    assert not b.enqueue_request(Request("https://x.com/cat/?p=1", meta={FRONTIER_META: True}))  # duplicate
+    assert a.enqueue_request(Request("https://x.com/detail"))  # unmarked: local queue
+
+    local = a.next_request()
+    assert local.url == "https://x.com/detail"
+    from_b = b.next_request()  # b's queue is empty: it claims the first range (pages 1-2)
+    assert FRONTIER_LEASE in from_b.meta
+    assert {from_b.url, b.next_request().url} == {"https://x.com/cat/?p=1", "https://x.com/cat/?p=2"}
+    assert a.next_request().url.endswith("p=3")
+
+    crawler_a.signals.send_catch_log(project_signals.frontier_task_done, lease=None, spider=None)
+    b.crawler.signals.send_catch_log(project_signals.frontier_task_done, lease=from_b.meta[FRONTIER_LEASE], spider=None)
+    b._heartbeat()
+    assert b.has_pending_requests()  # b's other page and page 3 (leased by a) are outstanding
+    assert b.stats.get_value("frontier/tasks/done") == 1
+    a.close("finished")
+    b.close("finished")
+
+
+def test_page_is_completed_only_once_the_sink_has_it():
+    crawler = get_crawler(Spider, {"FRONTIER_ENABLED": True})
+    mw = FrontierSpiderMiddleware.from_crawler(crawler)
+    done = []
+    crawler.signals.connect(lambda lease, spider: done.append(lease),
+                            signal=project_signals.frontier_task_done, weak=False)
+
+    request = Request("https://x.com/cat/?p=1", meta={FRONTIER_LEASE: "k"})
+    response = HtmlResponse(request.url, body=b"", request=request)
+    marker = PageDone(page=1, finished_at=datetime.datetime.now(datetime.UTC))
+    output = list(mw.process_spider_output(response, [{"page": 1, "link": "a"}, marker], None))
+    assert done == [] and output[1].lease == "k"  # the callback is over, the page is not written yet
+
+    sink = FakeSink()
+    pipe = PerPageSinkPipeline.from_crawler(get_crawler(Spider, {
+        "CONTAINER": Container(AppSettings(), sink_factory=lambda _: sink),
+    }))
+    pipe.signals = crawler.signals
+    pipe.process_item(output[0], None)
+    sink.write_page = lambda *a, **k: (_ for _ in ()).throw(OSError("disk full"))
+    with pytest.raises(OSError):
+        pipe.process_item(PageDone(page=1, finished_at=marker.finished_at, lease="k"), None)
+    assert done == []  # a failed write leaves the lease to expire
+    del sink.write_page
+    pipe.process_item({"page": 1, "link": "a"}, None)
+    pipe.process_item(marker, None)
+    assert done == ["k"] and "1" in sink.pages
+
+    list(mw.process_spider_output(response, [], None))  # nothing to write: complete right away
+    assert done == ["k", "k"]
+    retry = request.replace(dont_filter=True)
+    list(mw.process_spider_output(response, [retry], None))
+    assert done == ["k", "k"]  # the retry still holds the lease
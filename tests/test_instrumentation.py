@@ -0,0 +1,94 @@
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from scrapy_playwright_demo import instrumentation
+from scrapy_playwright_demo.extensions.instrumentation import StageLatencyExtension
+from scrapy_playwright_demo.instrumentation import LatencyRecorder
+from scrapy_playwright_demo.sinks.file import FileSink
+
+
+class DummyStats(dict):
+    def set_value(self, key, value, spider=None):
+        self[key] = value
+
+
+@pytest.fixture(autouse=True)
+def clean_recorder():
+    instrumentation.recorder.reset()
+    yield
+    instrumentation.recorder.reset()
+
+
+def test_recorder_rejects_unknown_stage():
+    with pytest.raises(ValueError, match="Unknown instrumentation stage"):
+        LatencyRecorder().observe("page-17", 0.1)
+
+
+def test_recorder_reservoir_is_bounded_and_exact_on_counts():
+    recorder = LatencyRecorder(reservoir_size=50, seed=1)
+    for ms in range(1, 1001):
+        recorder.observe("render", ms / 1000, spider="s")
+    summary = recorder.summary("s")["render"]
+    assert summary["count"] == 1000
+    assert summary["max"] == 1.0
+    assert summary["mean"] == pytest.approx(0.5005)
+    assert len(recorder._stats[("s", "render")].samples) == 50
+    assert 0.2 < summary["p50"] < 0.8
+
+
+def test_spider_scope_attributes_nested_observations():
+    recorder = instrumentation.recorder
+    with instrumentation.spider_scope("zalando"):
+        instrumentation.observe("write", 0.2)
+    instrumentation.observe("write", 0.4, spider="other")
+    assert recorder.summary("zalando")["write"]["count"] == 1
+    assert recorder.summary("other")["write"]["max"] == 0.4
+
+
+def test_file_sink_records_sink_stages(tmp_path):
+    sink = FileSink(out_dir=str(tmp_path), compress=True, idempotent=False)
+    sink.write_page([{"a": 1}], page="1", finished_at="t", settings={})
+    sink.write_page([{"a": 2}], page="1", finished_at="t", settings={})
+
+    with gzip.open(tmp_path / "page-1.jl.gz", "rt", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [{"a": 1}, {"a": 2}]
+    summary = instrumentation.recorder.summary()
+    assert {"serialize", "compress", "write"} <= summary.keys()
+    assert summary["write"]["count"] == 2
+
+
+def test_extension_publishes_percentiles_on_close():
+    stats = DummyStats()
+    ext = StageLatencyExtension(stats)
+    spider = SimpleNamespace(name="zalando")
+    request = SimpleNamespace(meta={})
+
+    ext.request_scheduled(request, spider)
+    ext.request_reached_downloader(request, spider)
+    ext.response_downloaded(None, request, spider)
+    instrumentation.observe("render", 0.25, spider="zalando")
+    ext.spider_closed(spider, "finished")
+
+    assert stats["latency/queue_wait/count"] == 1
+    assert stats["latency/navigation/count"] == 1
+    assert stats["latency/render/p99_ms"] == 250.0
+    assert not request.meta  # timestamps are consumed
+
+
+def test_each_crawler_reports_only_its_own_stages():
+    stats = DummyStats()
+    ext = StageLatencyExtension(stats)
+    spider = SimpleNamespace(name="zalando")
+    instrumentation.observe("render", 9.0, spider="zalando")  # a previous run in this process
+    ext.spider_opened(spider)
+    instrumentation.observe("render", 0.25, spider="zalando")
+    instrumentation.observe("render", 5.0, spider="other")  # another crawler of the fleet
+    instrumentation.observe("write", 0.5)  # a sink thread, outside any spider scope
+    ext.spider_closed(spider, "finished")
+
+    assert stats["latency/render/count"] == 1 and stats["latency/render/max_ms"] == 250.0
+    assert "latency/write/count" not in stats
+    assert stats["latency/unscoped/write/count"] == 1
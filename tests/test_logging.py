@@ -0,0 +1,79 @@
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from scrapy_playwright_demo.utils import logging as log_utils
+
+
+class Spider:
+    name = "demo"
+
+
+class ThreadStream(io.StringIO):
+    """Remembers which thread wrote each line."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def write(self, s):
+        self.threads.append(threading.current_thread().name)
+        return super().write(s)
+
+
+@pytest.fixture
+def restore_root_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    log_utils.stop_listener()
+    for handler in list(root.handlers):
+        if handler not in handlers:
+            root.removeHandler(handler)
+    root.setLevel(level)
+
+
+def events(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_logger_is_cached_per_spider(restore_root_logging):
+    log_utils.configure_logging("INFO", stream=io.StringIO())
+    a, b = Spider(), Spider()
+    assert log_utils.get_logger(a) is log_utils.get_logger(a)
+    assert log_utils.get_logger(a) is not log_utils.get_logger(b)
+    assert log_utils.get_logger(a, url="x") is not log_utils.get_logger(a)
+
+
+def test_disabled_level_emits_nothing(restore_root_logging):
+    stream = io.StringIO()
+    log_utils.configure_logging("INFO", stream=stream)
+    logger = log_utils.get_logger(Spider())
+    logger.debug("noisy", n=1)
+    logger.info("kept", n=2)
+    assert [(e["event"], e["level"], e["spider"]) for e in events(stream)] == [("kept", "info", "demo")]
+
+
+def test_sampler_drops_info_but_never_warnings(restore_root_logging):
+    stream = io.StringIO()
+    sampler = log_utils.configure_logging("INFO", sample_rates={"noisy": 0.0, "alarm": 0.0}, stream=stream)
+    logger = log_utils.get_logger(Spider())
+    for _ in range(5):
+        logger.info("noisy")
+    logger.warning("alarm")
+    logger.info("other")
+    assert [e["event"] for e in events(stream)] == ["alarm", "other"]
+    assert sampler.dropped["noisy"] == 5
+
+
+def test_async_emission_renders_off_the_calling_thread(restore_root_logging):
+    stream = ThreadStream()
+    log_utils.configure_logging("INFO", async_emission=True, stream=stream)
+    log_utils.get_logger(Spider()).info("queued", n=1)
+    logging.getLogger("scrapy.core").info("plain stdlib record")
+    log_utils.stop_listener()  # drains the queue
+    assert [e["event"] for e in events(stream)] == ["queued", "plain stdlib record"]
+    assert stream.threads and threading.current_thread().name not in stream.threads
@@ -0,0 +1,96 @@
+import json
+import tracemalloc
+from datetime import UTC, datetime
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+
+from scrapy_playwright_demo.extensions.memory import MemoryDiagnosticsExtension, count_objects, load_types
+from scrapy_playwright_demo.items import PageDone, ProductItem
+
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    def pause(self):
+        self.calls.append("pause")
+
+    def unpause(self):
+        self.calls.append("unpause")
+
+    def close_spider(self, spider, reason):
+        self.calls.append(reason)
+
+
+def extension(tmp_path, **settings):
+    crawler = get_crawler(settings_dict={"MEMORY_REPORT_DIR": str(tmp_path), "MEMORY_DIAGNOSTICS_SIGNAL": "", **settings})
+    return MemoryDiagnosticsExtension.from_crawler(crawler), crawler
+
+
+def test_off_unless_traced_signalled_or_capped(tmp_path):
+    with pytest.raises(NotConfigured):
+        extension(tmp_path)
+    assert "Page" not in load_types(["scrapy_playwright_demo.nope.Page", "scrapy.Request"])
+
+
+def test_page_snapshots_report_growth_and_live_objects(tmp_path):
+    ext, crawler = extension(tmp_path, MEMORY_DIAGNOSTICS_ENABLED=True, MEMORY_SNAPSHOT_EVERY_PAGES=2)
+    crawler.engine = FakeEngine()
+    was_tracing = tracemalloc.is_tracing()
+    ext.spider_opened(crawler._create_spider("memspider"))
+    held = []
+    for page in (1, 2):
+        held += [ProductItem(page=page, title="t", link=f"https://x/{page}-{i}", currency="EUR") for i in range(2000)]
+        ext.item_scraped(PageDone(page=page, finished_at=datetime.now(UTC)), None, None)
+    ext.spider_closed(None, "finished")
+    assert tracemalloc.is_tracing() == was_tracing
+
+    first, final = sorted(tmp_path.glob("memory-memspider-*.json"))
+    report = json.loads(first.read_text())
+    assert report["trigger"] == "pages" and report["pages"] == 2
+    assert report["objects"]["ProductItem"] >= len(held)
+    assert report["top"][0]["size_diff_kb"] > 0
+    assert json.loads(final.read_text())["trigger"] == "close"
+    assert crawler.stats.get_value("memory/reports") == 2
+
+
+def test_ceiling_pauses_once_and_resumes_below_the_resume_level(tmp_path):
+    ext, crawler = extension(tmp_path, MEMORY_CEILING_MB=1000, MEMORY_RESUME_RATIO=0.8, MEMORY_CHECK_INTERVAL_S=0)
+    crawler.engine = FakeEngine()
+    for rss in (900, 1100, 1200, 850, 790, 1000):
+        ext.check_ceiling(rss)
+    assert crawler.engine.calls == ["pause", "unpause", "pause"]
+    assert crawler.stats.get_value("memory/ceiling_hits") == 2
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+    ext, crawler = extension(tmp_path, MEMORY_CEILING_MB=10, MEMORY_CEILING_ACTION="close")
+    crawler.engine = FakeEngine()
+    ext.check_ceiling(11)
+    assert crawler.engine.calls == ["memory_ceiling"]
+
+
+def test_pause_escalates_to_close_when_rss_never_drops(tmp_path):
+    now = [0.0]
+    ext, crawler = extension(tmp_path, MEMORY_CEILING_MB=1000, MEMORY_PAUSE_MAX_S=60, MEMORY_CHECK_INTERVAL_S=0)
+    ext.clock = lambda: now[0]
+    crawler.engine = FakeEngine()
+    for now[0] in (0, 10, 30, 59):
+        ext.check_ceiling(1100)  # freed memory never goes back to the OS
+    assert crawler.engine.calls == ["pause"]
+    now[0] = 61
+    ext.check_ceiling(1100)
+    assert crawler.engine.calls == ["pause", "unpause", "memory_ceiling"]
+    assert crawler.stats.get_value("memory/pause_timeouts") == 1
+    now[0] = 200
+    ext.check_ceiling(1100)  # closing already: nothing more
+    assert len(crawler.engine.calls) == 3
+
+
+def test_count_objects_counts_subclasses():
+    class Sub(ProductItem):
+        pass
+
+    keep = [Sub(page=1, title="t", link="l", currency="EUR")]
+    assert count_objects({"ProductItem": ProductItem})["ProductItem"] >= len(keep)
@@ -3,9 +3,12 @@ from decimal import Decimal
 from types import SimpleNamespace
 
 import pytest
-from scrapy.exceptions import DropItem
+from scrapy import Request, Spider, signals
+from scrapy.exceptions import DropItem, NotConfigured
+from scrapy.utils.test import get_crawler
 
-from scrapy_playwright_demo.items import ProductItem, Currency
+from scrapy_playwright_demo.items import MinorUnitProductItem, PageDone, ProductItem, Currency
+from scrapy_playwright_demo.middlewares.validation import BatchValidationSpiderMiddleware
 from scrapy_playwright_demo.pipelines import ValidateProductPipeline, PerPageSinkPipeline
 from scrapy_playwright_demo.sinks.file import FileSink
 from scrapy_playwright_demo.sinks.fake import FakeSink
@@ -60,6 +63,70 @@ def test_validate_price_swap(valid_item: ProductItem):
     assert result.price_original == Decimal("30.0")
 
 
+def raw_item(**overrides):
+    item = {"page": 1, "title": "Shoe", "currency": "EUR", "link": "https://x/a",
+            "price_discounted": "10.00", "price_original": "20.00"}
+    item.update(overrides)
+    return item
+
+
+def test_validate_batch_keeps_order_and_reports_drop_reasons(valid_item: ProductItem):
+    crawler = get_crawler(Spider)
+    items = [
+        raw_item(),
+        raw_item(price_original="n/a"),
+        valid_item,
+        raw_item(title=""),
+        raw_item(price_discounted="30.00"),
+        {k: v for k, v in raw_item().items() if k != "link"},
+    ]
+    results = ValidateProductPipeline.validate_batch(items, stats=crawler.stats)
+    assert [reason for _, reason in results] == [
+        None, "invalid_price_original", None, "missing_title", None, "missing_link",
+    ]
+    assert results[2][0] is valid_item
+    swapped = results[4][0]
+    assert (swapped.price_discounted, swapped.price_original) == (Decimal("20.00"), Decimal("30.00"))
+    assert crawler.stats.get_value("validate/dropped") == 3
+    assert crawler.stats.get_value("validate/dropped/missing_title") == 1
+
+
+def test_batch_middleware_validates_each_page_before_its_marker():
+    pipelines = {"ITEM_PIPELINES": {"scrapy_playwright_demo.pipelines.ValidateProductPipeline": 50}}
+    crawler = get_crawler(Spider, {"VALIDATE_BATCH_SIZE": 10, **pipelines})
+    mw = BatchValidationSpiderMiddleware.from_crawler(crawler)
+    dropped = []
+
+    def on_dropped(item, exception):
+        dropped.append((item, exception))
+
+    crawler.signals.connect(on_dropped, signal=signals.item_dropped)
+    request = Request("https://x/?p=2")
+    done = PageDone(page=1, finished_at=datetime.datetime.now(datetime.UTC))
+    output = list(mw.process_spider_output(None, [raw_item(), raw_item(title=""), request, done, raw_item(page=2)], None))
+
+    assert output[0] is request  # requests are not held back
+    assert [type(o) for o in output[1:]] == [ProductItem, PageDone, ProductItem]
+    assert output[3].page == 2  # flushed at the end of the callback output
+    assert crawler.stats.get_value("validate/dropped/missing_title") == 1
+    # Not raised, but still reported like a pipeline drop (Scrapy's item_dropped_count)
+    [(item, exception)] = dropped
+    assert item["title"] == "" and isinstance(exception, DropItem)
+    assert str(exception) == "Missing required field: title"
+
+    # Spider-built ProductItems get the rules in the batch; the pipeline then passes them on as they are
+    built = ProductItem(page=1, title="t", currency=Currency.EUR, link="https://x/a",
+                        price_discounted=Decimal("30"), price_original=Decimal("20"))
+    [checked] = list(mw.process_spider_output(None, [built], None))
+    assert checked is built and checked._validated and checked.price_discounted == Decimal("20")
+    pipeline = ValidateProductPipeline.from_crawler(crawler)
+    pipeline._apply_rules = None  # would raise if the item were validated again
+    assert pipeline.process_item(checked, None) is checked
+
+    with pytest.raises(NotConfigured):
+        BatchValidationSpiderMiddleware.from_crawler(get_crawler(Spider, {"VALIDATE_BATCH_SIZE": 10}))
+
+
 def test_perpage_filesink_idempotency(tmp_path, valid_item: ProductItem):
     out_dir = tmp_path / "out"
     out_dir.mkdir()
@@ -112,8 +179,28 @@ def test_per_page_sink_pipeline_uses_container(monkeypatch):
     fake_sink = FakeSink()
     app_settings = AppSettings()
     container = Container(app_settings)
-    monkeypatch.setattr(container, "page_sink", lambda: fake_sink)
+    monkeypatch.setattr(container, "page_sink", lambda settings=None: fake_sink)
     settings = {"CONTAINER": container, "PAGE_DROP_MISSING_FIELD": True}
     crawler = DummyCrawler(settings)
     pipe = PerPageSinkPipeline.from_crawler(crawler)
     assert pipe.sink is fake_sink
+
+
+def test_minor_money_mode_keeps_int_cents_and_the_json_output():
+    crawler = get_crawler(Spider, {"MONEY_MODE": "minor"})
+    pipeline = ValidateProductPipeline.from_crawler(crawler)
+    assert pipeline.model is MinorUnitProductItem
+    item = pipeline.process_item(raw_item(price_discounted="30.00", price_original=Decimal("20.5")), None)
+    assert (item.price_discounted, item.price_original) == (2050, 3000)  # exact, then swapped as ints
+
+    results = ValidateProductPipeline.validate_batch([raw_item(), raw_item(price_original="20.001")], model=pipeline.model)
+    assert [reason for _, reason in results] == [None, "invalid_price_original"]
+    cents, decimal = results[0][0], ProductItem.model_validate(raw_item())
+    assert cents.price_discounted == 1000
+    assert cents.model_dump(mode="json", exclude={"scraped_at"}) == decimal.model_dump(mode="json", exclude={"scraped_at"})
+
+    mw = BatchValidationSpiderMiddleware.from_crawler(get_crawler(Spider, {
+        "MONEY_MODE": "minor", "VALIDATE_BATCH_SIZE": 10,
+        "ITEM_PIPELINES": {"scrapy_playwright_demo.pipelines.ValidateProductPipeline": 50},
+    }))
+    assert type(next(iter(mw.process_spider_output(None, [raw_item()], None)))) is MinorUnitProductItem
@@ -0,0 +1,66 @@
+import gzip
+import json
+from datetime import UTC, datetime
+
+import numpy as np
+from scrapy.utils.test import get_crawler
+
+from scrapy_playwright_demo.extensions.pricehistory import PriceHistoryExtension
+from scrapy_playwright_demo.pricehistory import PriceHistory, main
+
+
+def run(day, prices):
+    at = datetime(2024, 5, day, tzinfo=UTC).isoformat()
+    return [{"link": link, "price_discounted": disc, "price_original": orig, "currency": "EUR", "scraped_at": at}
+            for link, (disc, orig) in prices.items()]
+
+
+def test_runs_are_stored_once_and_queried_vectorized(tmp_path):
+    history = PriceHistory(tmp_path)
+    assert history.append_run(run(1, {"a": ("80.00", "100.00"), "b": (None, "10.00")})) == 2
+    assert history.append_run(run(2, {"a": ("60.00", "100.00"), "c": ("5.55", None)})) == 2
+    assert history.append_run(run(3, {"a": ("59.99", "100.00"), "b": (None, "12.00")})) == 2
+    assert history.append_run(run(3, {"a": ("1.00", None)})) == 0  # same run again
+
+    history = PriceHistory(tmp_path)  # reopened from disk
+    assert history.rows == 6 and history.keys == ["a", "b", "c"]
+    discounts = history.discounts(products=["a"])
+    np.testing.assert_allclose(discounts["discount_pct"], [20.0, 40.0, 40.01])
+
+    drops = history.price_drops(min_pct=10)
+    assert list(drops["key"]) == ["a"] and drops["price"][0] == 60.0 and drops["previous"][0] == 80.0
+    assert list(history.price_drops(since=datetime(2024, 5, 3, tzinfo=UTC))["key"]) == []
+
+    seen = history.seen()
+    assert list(seen["key"]) == ["a", "b", "c"] and list(seen["runs"]) == [3, 2, 1]
+    assert str(seen["first_seen"][1]) == "2024-05-01T00:00:00" and str(seen["last_seen"][1]) == "2024-05-03T00:00:00"
+    np.testing.assert_allclose(seen["last_price"], [59.99, 12.0, 5.55])
+    assert len(history.seen(products=["nope"])["key"]) == 0
+
+
+def test_torn_append_is_cut_back_on_open(tmp_path):
+    history = PriceHistory(tmp_path)
+    history.append_run(run(1, {"a": ("1.00", "2.00")}))
+    with open(tmp_path / "run.i8", "ab") as f:
+        f.write(b"\x00" * 5)  # crash mid-append, before meta.json moved
+    with open(tmp_path / "products.txt", "a") as f:
+        f.write("half\n")
+    history = PriceHistory(tmp_path)
+    assert (tmp_path / "run.i8").stat().st_size == 8 and history.keys == ["a"]
+    assert list(history.columns()["product"]) == [0]
+
+
+def test_finished_crawl_output_becomes_a_run(tmp_path, capsys):
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "page-1.jl.gz").write_bytes(gzip.compress("".join(json.dumps(r) + "\n" for r in run(1, {"a": ("9", "10")})).encode()))
+    (out / "page-1.done").write_text("")
+    crawler = get_crawler(settings_dict={"PRICE_HISTORY_DIR": str(tmp_path / "history"), "PAGE_OUT_DIR": str(out)})
+    crawler.stats.set_value("start_time", datetime(2024, 5, 1, 12, tzinfo=UTC))
+    ext = PriceHistoryExtension.from_crawler(crawler)
+    assert ext.spider_closed(crawler._create_spider("s"), "shutdown") is None
+    assert ext.ingest(crawler.stats.get_value("start_time")) == 1
+
+    assert main([str(tmp_path / "history"), "seen"]) == 0
+    assert json.loads(capsys.readouterr().out) == {"key": "a", "first_seen": "2024-05-01T12:00:00",
+                                                   "last_seen": "2024-05-01T12:00:00", "runs": 1, "last_price": 9.0}
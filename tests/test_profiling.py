@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+
+from scrapy_playwright_demo import profiling
+from scrapy_playwright_demo.extensions.profiling import ProfilingExtension
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def spin(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(1000))
+
+
+def call(app, path, query=""):
+    status = []
+    body = app({"PATH_INFO": path, "QUERY_STRING": query}, lambda s, headers: status.append(s))
+    return status[0], b"".join(body).decode()
+
+
+def test_samples_other_threads_as_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="sink-writer", daemon=True)
+    worker.start()
+    try:
+        text = profiling.profile_for(0.3, hz=200)
+    finally:
+        stop.set()
+        worker.join()
+    lines = [line.rsplit(" ", 1) for line in text.splitlines()]
+    writer = [(stack, int(count)) for stack, count in lines if stack.startswith("sink-writer;")]
+    assert writer and all(count > 0 for _, count in writer)
+    assert any("busy_loop (" in stack for stack, _ in writer)
+    assert not any(stack.startswith("profiler") for stack, _ in lines)
+
+
+def test_endpoint_serves_profiles_and_falls_back_to_metrics():
+    app = profiling.wsgi_app(lambda environ, start: (start("200 OK", []), [b"metrics"])[1], max_seconds=0.05)
+    status, body = call(app, profiling.PROFILE_PATH, "seconds=5&hz=200")  # capped at max_seconds
+    assert status == "200 OK" and body.startswith("reactor;")
+    assert call(app, profiling.PROFILE_PATH, "hz=5000")[0] == "400 Bad Request"
+    assert call(app, "/metrics") == ("200 OK", "metrics")
+    with profiling._profile_lock:
+        assert call(app, profiling.PROFILE_PATH)[0] == "409 Conflict"
+
+
+def test_continuous_profile_exports_top_frames_and_writes_the_run(tmp_path):
+    with pytest.raises(NotConfigured):
+        ProfilingExtension.from_crawler(get_crawler())
+    crawler = get_crawler(settings_dict={
+        "PROFILING_CONTINUOUS_HZ": 200,
+        "PROFILING_EXPORT_INTERVAL_S": 0.1,
+        "PROFILING_OUTPUT_DIR": str(tmp_path),
+    })
+    ext = ProfilingExtension.from_crawler(crawler)
+    spider = crawler._create_spider("profiled")
+    ext.spider_opened(spider)
+    spin(0.3)
+    assert profiling.continuous.top  # at least one export window went by
+    ext.spider_closed(spider, "finished")
+
+    assert profiling.continuous is None
+    assert crawler.stats.get_value("profile/samples") > 0
+    assert "reactor" in crawler.stats.get_value("profile/top/1")
+    assert "spin (" in (tmp_path / "profile-profiled.collapsed").read_text()
@@ -0,0 +1,109 @@
+import random
+from collections import Counter
+from types import SimpleNamespace
+
+from scrapy import Request
+from scrapy.http import HtmlResponse
+
+from scrapy_playwright_demo.middlewares.browser import META_LOGICAL
+from scrapy_playwright_demo.middlewares.proxy import ProxyPoolMiddleware
+from scrapy_playwright_demo.proxies import PoolConfig, ProxyPool, playwright_proxy
+
+
+class DummyStats(dict):
+    def set_value(self, key, value, spider=None):
+        self[key] = value
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self[key] = self.get(key, start) + count
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(n=3, **config):
+    clock = FakeClock()
+    urls = [f"http://user:pw@p{i}:8080" for i in range(n)]
+    return ProxyPool(urls, PoolConfig(**config), rng=random.Random(7), clock=clock), clock
+
+
+def test_playwright_proxy_splits_credentials():
+    assert playwright_proxy("http://us%40er:pw@p1:8080") == {
+        "server": "http://p1:8080", "username": "us@er", "password": "pw",
+    }
+    assert playwright_proxy("p2:3128") == {"server": "http://p2:3128"}
+
+
+def test_choice_is_weighted_towards_healthy_proxies():
+    pool, _ = make_pool(2)
+    good, bad = pool.proxies
+    for _ in range(20):
+        pool.record(good, ok=True, latency_s=0.5)
+    for _ in range(3):
+        pool.record(bad, ok=False)
+    picks = Counter(pool.choose().index for _ in range(500))
+    assert picks[0] > 4 * picks[1] > 0
+
+
+def test_ban_quarantines_with_exponential_cooldown():
+    pool, clock = make_pool(2, quarantine_base_s=10, quarantine_max_s=25)
+    proxy = pool.proxies[0]
+    assert pool.record(proxy, ok=False, banned=True)
+    assert {pool.choose().index for _ in range(50)} == {1}
+
+    clock.now = 11
+    assert pool.record(proxy, ok=False, banned=True)
+    assert proxy.quarantined_until == 31  # 20s, second strike
+    clock.now = 40
+    assert pool.record(proxy, ok=False, banned=True)
+    assert proxy.quarantined_until == 65  # capped at 25s
+    clock.now = 70
+    pool.record(proxy, ok=True)
+    assert proxy.strikes == 0
+
+
+def test_all_quarantined_falls_back_to_first_released():
+    pool, _ = make_pool(2)
+    pool.quarantine(pool.proxies[1])
+    pool.quarantine(pool.proxies[0])
+    pool.proxies[0].quarantined_until = 5
+    assert pool.choose().index == 0
+
+
+def test_max_active_limits_contexts_in_rotation():
+    pool, _ = make_pool(4, max_active=2)
+    assert len({pool.choose().index for _ in range(100)}) == 2
+    victim = next(iter(pool.active))
+    pool.quarantine(pool.proxies[victim])
+    assert victim not in {pool.choose().index for _ in range(100)}
+    assert len(pool.active) == 2
+
+
+def test_middleware_binds_proxy_to_context_and_records_outcomes():
+    pool, _ = make_pool(1)
+    stats = DummyStats()
+    crawler = SimpleNamespace(stats=stats, get_downloader_middleware=lambda cls: None)
+    mw = ProxyPoolMiddleware(crawler, pool, ban_codes={403})
+
+    request = Request("https://shop.example", meta={"playwright": True, "playwright_context": "persistent",
+                                                   META_LOGICAL: "persistent"})
+    mw.process_request(request, None)
+    assert request.meta["playwright_context"] == "proxy-0"
+    assert request.meta["playwright_context_kwargs"]["proxy"]["server"] == "http://p0:8080"
+    assert META_LOGICAL not in request.meta
+    assert "proxy" not in request.meta  # Playwright ignores it
+
+    mw.process_response(request, HtmlResponse(request.url, status=403, body=b"", request=request), None)
+    assert stats["proxy/proxy-0/ban"] == 1
+    assert stats["proxy/proxy-0/quarantined"] == 1
+
+    plain = Request("https://shop.example/api")
+    mw.process_request(plain, None)
+    assert plain.meta["proxy"] == "http://user:pw@p0:8080"
+    mw.process_exception(plain, ConnectionError(), None)
+    assert stats["proxy/proxy-0/requests"] == 2
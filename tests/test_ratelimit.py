@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from scrapy import Request
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from scrapy_playwright_demo.middlewares.ratelimit import RateLimitMiddleware, proxy_key
+from scrapy_playwright_demo.ratelimit import BreakerConfig, BreakerState, CircuitBreaker, TokenBucket
+from scrapy_playwright_demo.spiders.detail import ProductDetailSpider
+
+
+class DummyStats(dict):
+    def set_value(self, key, value, spider=None):
+        self[key] = value
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self[key] = self.get(key, start) + count
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_queues_callers_behind_each_other():
+    bucket = TokenBucket(rate=2.0, burst=2, now=0)
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) == pytest.approx(0.5)
+    assert bucket.reserve(0) == pytest.approx(1.0)
+    assert bucket.reserve(10) == 0  # refilled, capped at burst
+
+
+def test_token_bucket_block_until_applies_to_unlimited_buckets():
+    bucket = TokenBucket(rate=0, burst=1)
+    bucket.block_until(5.0)
+    assert bucket.reserve(2.0) == pytest.approx(3.0)
+    assert bucket.reserve(6.0) == 0
+
+
+def test_breaker_opens_probes_and_backs_off():
+    breaker = CircuitBreaker(BreakerConfig(failure_rate=0.5, min_requests=4, open_s=10, max_open_s=15))
+    for failure in (False, True, True, False):
+        breaker.record(failure, now=0)
+    assert breaker.state is BreakerState.OPEN
+    assert breaker.before_request(4) == pytest.approx(6)
+
+    assert breaker.before_request(10) == 0  # the probe
+    assert breaker.state is BreakerState.HALF_OPEN
+    assert breaker.before_request(10) > 0  # only one probe at a time
+    breaker.record(True, now=11)
+    assert breaker.state is BreakerState.OPEN
+    assert breaker.open_for == 15  # doubled, capped
+
+    assert breaker.before_request(26) == 0
+    breaker.record(False, now=27)
+    assert breaker.state is BreakerState.CLOSED
+    assert breaker.open_for == 10
+
+
+def test_proxy_key_strips_credentials():
+    assert proxy_key(Request("https://a.com", meta={"proxy": "http://user:pw@p1:8080"})) == "http://p1:8080"
+    pw = Request("https://a.com", meta={"playwright_context_kwargs": {"proxy": {"server": "p2:3128"}}})
+    assert proxy_key(pw) == "http://p2:3128"
+    assert proxy_key(Request("https://a.com")) is None
+
+
+def make_middleware(**overrides):
+    config = {"failure_rate": 0.5, "min_requests": 2, "open_s": 30}
+    config.update(overrides)
+    clock = FakeClock()
+    mw = RateLimitMiddleware(
+        DummyStats(), host_rate=1.0, host_burst=1, proxy_rate=0, proxy_burst=1,
+        breaker_config=BreakerConfig(**config), clock=clock,
+    )
+    return mw, clock
+
+
+def respond(mw, request, status, headers=None):
+    response = HtmlResponse(request.url, status=status, body=b"", headers=headers, request=request)
+    return mw.process_response(request, response, None)
+
+
+def test_middleware_holds_requests_for_open_host_only():
+    mw, clock = make_middleware()
+    bad, good = Request("https://bad.example/a"), Request("https://good.example/a")
+    assert asyncio.run(mw.process_request(bad, None)) is None  # admitted right away
+    respond(mw, bad, 503)
+    mw.process_exception(bad, TimeoutError(), None)
+    assert mw.stats["circuit/host/open"] == 1
+
+    clock.now = 5
+    assert mw.admission_delay(bad) == (pytest.approx(25), "circuit")
+    assert mw.admission_delay(good) == (0.0, None)
+    assert mw.admission_delay(good)[1] == "rate"  # one token per second
+
+    clock.now = 31
+    assert mw.admission_delay(bad) == (0.0, None)  # half-open probe
+    respond(mw, bad, 200)
+    assert mw.stats["circuit/host/closed"] == 1
+    assert mw.stats["circuit/not_closed"] == 0
+
+
+def test_retry_after_pauses_the_host_bucket():
+    mw, clock = make_middleware(min_requests=100)
+    request = Request("https://shop.example/a")
+    mw.admission_delay(request)
+    respond(mw, request, 429, headers={"Retry-After": "7"})
+    clock.now = 2
+    wait, reason = mw.admission_delay(request)
+    assert reason == "rate" and wait == pytest.approx(5)
+
+
+def test_breakers_are_on_by_default_and_buckets_need_a_rate():
+    mw = RateLimitMiddleware.from_crawler(get_crawler())
+    request = Request("https://a.com/1")
+    assert [mw.admission_delay(request) for _ in range(20)] == [(0.0, None)] * 20  # rate 0: unlimited
+    assert mw.breaker_config.failure_rate == 0.5
+    with pytest.raises(NotConfigured):
+        RateLimitMiddleware.from_crawler(get_crawler(settings_dict={"RATELIMIT_ENABLED": False}))
+    detail = RateLimitMiddleware.from_crawler(get_crawler(ProductDetailSpider))
+    assert detail.limits["host"][0] == ProductDetailSpider.custom_settings["RATELIMIT_HOST_RATE"]
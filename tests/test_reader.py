@@ -0,0 +1,56 @@
+import gzip
+import json
+
+from scrapy_playwright_demo.items import ProductItem
+from scrapy_playwright_demo.reader import LinkIndex, iter_pages, iter_records, main, page_files
+
+
+def product(page, n):
+    return {"page": page, "title": f"Zapatilla {n}", "link": f"https://x/{page}/{n}", "price_discounted": "19.99",
+            "currency": "EUR", "scraped_at": "2024-01-01T00:00:00"}
+
+
+def write_page(directory, page, done=True, compress=True, count=3):
+    directory.mkdir(parents=True, exist_ok=True)
+    data = "".join(json.dumps(product(page, n)) + "\n" for n in range(count)).encode()
+    if compress:
+        (directory / f"page-{page}.jl.gz").write_bytes(gzip.compress(data))
+    else:
+        (directory / f"page-{page}.jl").write_bytes(data)
+    if done:
+        (directory / f"page-{page}.done").write_text("")
+
+
+def test_pages_stream_in_order_across_workers_and_filters(tmp_path):
+    write_page(tmp_path / "worker-0", 1)
+    write_page(tmp_path / "worker-0", 10, compress=False)
+    write_page(tmp_path / "worker-1", 2)
+    write_page(tmp_path / "worker-1", 10)  # written twice (at-least-once): read once
+    write_page(tmp_path / "worker-1", 3, done=False)
+
+    assert [f.page for f in page_files(tmp_path)] == ["1", "2", "10"]
+    assert [f.page for f in page_files(tmp_path, done_only=False)] == ["1", "2", "3", "10"]
+    assert [f.page for f in page_files(tmp_path, pages=range(2, 11))] == ["2", "10"]
+
+    sequential = list(iter_pages(tmp_path, workers=1))
+    assert list(iter_pages(tmp_path, workers=2, prefetch=1)) == sequential
+    assert [(page, len(records)) for page, records in sequential] == [("1", 3), ("2", 3), ("10", 3)]
+    records = list(iter_records(tmp_path, pages=range(2, 3), models=True, workers=2))
+    assert all(isinstance(r, ProductItem) for r in records) and records[0].link == "https://x/2/0"
+
+
+def test_link_index_reads_one_record_back(tmp_path, capsys):
+    out = tmp_path / "out"
+    write_page(out, 1)
+    write_page(out, 2, compress=False)
+    index = LinkIndex(tmp_path / "links.sqlite")
+    assert index.build(out, workers=2) == 6
+    assert index.get("https://x/1/2") == product(1, 2)
+    assert index.get("https://x/2/1") == product(2, 1)
+    assert index.get("https://x/nope") is None
+    index.close()
+
+    assert main([str(out), "--index", str(tmp_path / "links.sqlite"), "--lookup", "https://x/2/2"]) == 0
+    assert json.loads(capsys.readouterr().out) == product(2, 2)
+    assert main([str(out), "--pages", "2", "--count", "--workers", "1"]) == 0
+    assert capsys.readouterr().out.strip() == "3"
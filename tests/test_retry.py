@@ -0,0 +1,109 @@
+import pytest
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.exceptions import IgnoreRequest
+from twisted.internet import error as net_error
+
+from scrapy_playwright_demo.middlewares.retry import CustomRetryMiddleware
+from scrapy_playwright_demo.retry import (
+    RETRY_DELAY_KEY,
+    ErrorClass,
+    RetryBudget,
+    RetryPolicy,
+    build_retry_budget,
+)
+
+
+class DummyStats(dict):
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self[key] = self.get(key, start) + count
+
+
+# Stand-ins with the same module/name as Playwright's errors (module-based detection)
+class PlaywrightTimeout(Exception):
+    pass
+
+
+PlaywrightTimeout.__module__ = "playwright._impl._errors"
+PlaywrightTimeout.__name__ = "TimeoutError"
+
+
+class PlaywrightError(Exception):
+    pass
+
+
+PlaywrightError.__module__ = "playwright._impl._errors"
+PlaywrightError.__name__ = "Error"
+
+
+def policy(**overrides):
+    values = dict(max_retries=3, backoff_base=2.0, backoff_cap=60.0, jitter=0.0,
+                  retry_http_codes={429, 503}, retry_exceptions=(Exception,))
+    values.update(overrides)
+    return RetryPolicy(**values)
+
+
+@pytest.mark.parametrize(
+    ("exc", "error_class", "kind"),
+    [
+        (PlaywrightTimeout("Timeout 45000ms exceeded"), ErrorClass.TRANSIENT, "timeout"),
+        (PlaywrightError("page.goto: net::ERR_CONNECTION_RESET at https://a.com"), ErrorClass.TRANSIENT, "navigation"),
+        (PlaywrightError("page.goto: net::ERR_CERT_DATE_INVALID"), ErrorClass.PERMANENT, "navigation"),
+        (PlaywrightError("Target page, context or browser has been closed"), ErrorClass.TRANSIENT, "browser"),
+        (net_error.TCPTimedOutError(), ErrorClass.TRANSIENT, "timeout"),
+        (net_error.ConnectionRefusedError(), ErrorClass.TRANSIENT, "network"),
+        (KeyError("price"), ErrorClass.PERMANENT, "error"),
+    ],
+)
+def test_classify_exception(exc, error_class, kind):
+    classification = policy().classify_exception(exc)
+    assert (classification.error_class, classification.kind) == (error_class, kind)
+
+
+def test_classify_status_and_throttled_backoff():
+    p = policy()
+    assert p.classify_status(200) is None
+    assert p.classify_status(404).error_class is ErrorClass.PERMANENT
+    assert p.classify_status(429).error_class is ErrorClass.THROTTLED
+    assert p.next_delay(2, ErrorClass.THROTTLED) == 2 * p.next_delay(2)
+
+
+def test_budget_caps_retry_fraction_per_host():
+    budget = RetryBudget(ratio=0.1, window_s=60, min_retries=2)
+    for _ in range(50):
+        budget.record_request("a.com", now=0)
+    assert [budget.try_spend("a.com", now=1) for _ in range(6)] == [True] * 5 + [False]
+    assert budget.try_spend("b.com", now=1)  # other hosts keep their own budget
+    assert budget.try_spend("a.com", now=61)  # window slid past the old retries
+
+
+def test_middleware_does_not_rerender_permanent_failures():
+    stats = DummyStats()
+    mw = CustomRetryMiddleware(policy(), stats=stats)
+    request = Request("https://a.com/p1")
+    assert mw.process_exception(request, ValueError("bad selector"), None) is None
+    assert stats["retry/class/permanent/error"] == 1
+    assert "retry/scheduled" not in stats
+
+
+def test_middleware_defers_or_drops_over_budget():
+    p = policy(budget_ratio=0.5, budget_min_retries=1, budget_window_s=30)
+    stats = DummyStats()
+    mw = CustomRetryMiddleware(p, build_retry_budget(p), stats)
+
+    def fail(url):
+        request = Request(url)
+        mw.process_request(request, None)
+        return mw.process_response(request, HtmlResponse(url, status=503, body=b"", request=request), None)
+
+    assert fail("https://a.com/1").meta[RETRY_DELAY_KEY] == 1.0
+    deferred = fail("https://a.com/2")
+    assert deferred.meta[RETRY_DELAY_KEY] == 30
+    assert stats["retry/budget/deferred"] == 1
+
+    p = policy(budget_ratio=0.5, budget_min_retries=0, budget_action="drop")
+    mw = CustomRetryMiddleware(p, build_retry_budget(p), stats)
+    fail("https://a.com/3")  # 1 request → budget 0.5 retries, none spent yet
+    with pytest.raises(IgnoreRequest):
+        fail("https://a.com/4")
+    assert stats["retry/budget/dropped"] == 1
@@ -0,0 +1,129 @@
+import argparse
+import json
+
+from scrapy_playwright_demo.runner import (
+    WorkerSpec,
+    WorkerSupervisor,
+    build_manifest,
+    build_specs,
+    merge_stats,
+    partition,
+)
+
+
+class FakeProc:
+    _pids = iter(range(1000, 2000))
+
+    def __init__(self, code=None):
+        self.code = code
+        self.pid = next(self._pids)
+        self.terminated = self.killed = False
+
+    def poll(self):
+        return self.code
+
+    def terminate(self):
+        self.terminated = True
+
+    def kill(self):
+        self.killed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def args(**overrides):
+    values = dict(spider="zalando", workers=3, partition="static", out_dir="out", jobdir="state",
+                  log_level="INFO", set=["PLAYWRIGHT_MAX_CONTEXTS=2"])
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def specs(n=2):
+    return [WorkerSpec(i, "zalando", f"out/worker-{i}", "out/_runner") for i in range(n)]
+
+
+def test_partition_deals_urls_round_robin():
+    assert partition(["a", "b", "c", "d", "e"], 2) == [["a", "c", "e"], ["b", "d"]]
+    assert partition(["a"], 4) == [["a"]]
+
+
+def test_static_specs_get_own_jobdir_and_sink_dir():
+    built = build_specs(args(), ["u1", "u2", "u3", "u4"])
+    assert [s.start_urls for s in built] == [["u1", "u4"], ["u2"], ["u3"]]
+    assert built[1].settings["JOBDIR"].endswith("worker-1")
+    assert built[1].env["PAGE_OUT_DIR"].endswith("worker-1")
+    assert built[1].settings["PLAYWRIGHT_MAX_CONTEXTS"] == "2"
+    assert built[1].env["PROMETHEUS_PORT"] == "0"
+
+
+def test_frontier_specs_share_one_frontier_and_all_start_urls():
+    built = build_specs(args(partition="frontier"), ["u1"])
+    assert len(built) == 3
+    assert {s.settings["FRONTIER_PATH"] for s in built} == {str(built[0].settings["FRONTIER_PATH"])}
+    assert all(s.start_urls == ["u1"] and s.settings["JOBDIR"] == "" for s in built)
+
+
+def test_crashed_worker_is_restarted_with_backoff():
+    clock = FakeClock()
+    procs = []
+
+    def spawn(spec):
+        procs.append((spec.index, spec.attempt, FakeProc()))
+        return procs[-1][2]
+
+    sup = WorkerSupervisor(specs(), spawn, max_restarts=1, restart_backoff_s=10, clock=clock)
+    sup.start()
+    procs[0][2].code, procs[1][2].code = -9, 0  # worker-0 OOM-killed, worker-1 finished
+    sup.poll()
+    assert [s.state for s in sup.slots] == ["pending", "done"]
+
+    clock.now = 10
+    sup.poll()
+    assert procs[-1][:2] == (0, 1)  # same worker, attempt 1
+    procs[-1][2].code = 1
+    sup.poll()
+    assert sup.finished and sup.slots[0].state == "failed"  # out of restarts
+
+
+def test_stop_terminates_then_kills_and_never_restarts():
+    clock = FakeClock()
+    running = []
+    sup = WorkerSupervisor(specs(), lambda spec: running.append(FakeProc()) or running[-1],
+                           shutdown_timeout_s=30, clock=clock)
+    sup.start()
+    sup.stop()
+    assert all(p.terminated for p in running)
+    running[0].code = -15
+    clock.now = 31
+    sup.poll()
+    assert sup.slots[0].state == "failed" and running[1].killed
+
+
+def test_merge_stats_sums_counters_and_keeps_extremes():
+    merged = merge_stats([
+        {"item_scraped_count": 10, "browser/rss_mb/max": 300, "start_time": "2026-01-01T10:00", "finish_reason": "finished"},
+        {"item_scraped_count": 5, "browser/rss_mb/max": 450, "start_time": "2026-01-01T09:00", "finish_reason": "shutdown"},
+    ])
+    assert merged["item_scraped_count"] == 15
+    assert merged["browser/rss_mb/max"] == 450
+    assert merged["start_time"] == "2026-01-01T09:00"
+    assert merged["finish_reason"] == ["finished", "shutdown"]
+
+
+def test_manifest_lists_each_finished_page_once(tmp_path):
+    for worker, page in ((0, 1), (1, 2), (1, 1)):
+        d = tmp_path / f"worker-{worker}"
+        d.mkdir(exist_ok=True)
+        (d / f"page-{page}.jl").write_text(json.dumps({"page": page}) + "\n")
+        (d / f"page-{page}.done").write_text("")
+    (tmp_path / "worker-0" / "page-3.jl").write_text("partial")  # no .done: not finished
+
+    manifest = build_manifest(tmp_path, 2)
+    assert [(e["page"], e["worker"]) for e in manifest["pages"]] == [("1", 0), ("2", 1)]
+    assert [(e["page"], e["worker"]) for e in manifest["duplicates"]] == [("1", 1)]
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+from twisted.internet.task import Clock
+
+from scrapy_playwright_demo.middlewares.retry import CustomRetryMiddleware
+from scrapy_playwright_demo.retry import RETRY_ATTEMPT_KEY, RETRY_DELAY_KEY, RetryPolicy
+from scrapy_playwright_demo.scheduler import DelayedRetryScheduler
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    def make(jobdir=None):
+        crawler = get_crawler(Spider, {
+            "JOBDIR": jobdir,
+            "SCHEDULER_PRIORITY_QUEUE": "scrapy.pqueues.ScrapyPriorityQueue",
+        })
+        crawler.spider = crawler._create_spider("s")
+        sched = DelayedRetryScheduler.from_crawler(crawler)
+        sched.clock = Clock()
+        crawler.engine = SimpleNamespace(crawl=sched.enqueue_request)
+        sched.open(crawler.spider)
+        return sched, crawler.stats
+
+    return make
+
+
+def policy(**overrides):
+    values = dict(max_retries=3, backoff_base=2.0, backoff_cap=60.0, jitter=0.0,
+                  retry_http_codes={429, 503}, retry_exceptions=(Exception,))
+    values.update(overrides)
+    return RetryPolicy(**values)
+
+
+def test_retry_request_carries_policy_delay():
+    retry = policy().retry_request(Request("https://a.com"), attempt=2)
+    assert retry.meta[RETRY_ATTEMPT_KEY] == 3
+    assert retry.meta[RETRY_DELAY_KEY] == 4.0
+    assert retry.dont_filter
+
+
+def test_retry_middleware_output_is_held_until_due(scheduler):
+    sched, stats = scheduler()
+    request = Request("https://a.com/p1")
+    response = HtmlResponse(request.url, status=503, body=b"", request=request)
+    retry = CustomRetryMiddleware(policy()).process_response(request, response, Spider("s"))
+
+    assert sched.enqueue_request(retry)
+    assert sched.next_request() is None
+    assert sched.has_pending_requests()  # keeps the spider from going idle
+    assert stats.get_value("retry/delayed/pending") == 1
+
+    sched.clock.advance(0.9)
+    assert sched.next_request() is None
+    sched.clock.advance(0.2)
+    assert sched.next_request() is retry
+    assert RETRY_DELAY_KEY not in retry.meta  # not delayed a second time
+    assert not sched.has_pending_requests()
+    assert stats.get_value("retry/delayed/applied_seconds/max") == pytest.approx(1.1)
+
+
+def test_earlier_retry_rearms_the_timer(scheduler):
+    sched, _ = scheduler()
+    late = Request("https://a.com/late", meta={RETRY_DELAY_KEY: 30.0})
+    early = Request("https://a.com/early", meta={RETRY_DELAY_KEY: 2.0})
+    sched.enqueue_request(late)
+    sched.enqueue_request(early)
+    sched.clock.advance(2)
+    assert sched.next_request() is early
+    assert len(sched) == 1
+
+
+def test_pending_retries_survive_close_with_jobdir(scheduler, tmp_path):
+    sched, _ = scheduler(jobdir=str(tmp_path))
+    sched.enqueue_request(Request("https://a.com/p1", meta={RETRY_DELAY_KEY: 60.0}))
+    sched.close("shutdown")
+
+    resumed, _ = scheduler(jobdir=str(tmp_path))
+    assert resumed.next_request().url == "https://a.com/p1"
+
+
+def test_pending_retries_are_counted_when_dropped(scheduler):
+    sched, stats = scheduler()
+    sched.enqueue_request(Request("https://a.com/p1", meta={RETRY_DELAY_KEY: 60.0}))
+    sched.close("finished")
+    assert stats.get_value("retry/delayed/dropped_on_close") == 1
+    assert not sched.clock.getDelayedCalls()
@@ -0,0 +1,147 @@
+import gzip
+import json
+import threading
+import time
+
+import pytest
+
+from scrapy_playwright_demo.pipelines import PerPageSinkPipeline
+from scrapy_playwright_demo.retry import RetryPolicy
+from scrapy_playwright_demo.sinks import CompositeSink, EncodedPage, FakeSink, FileSink, build_sink
+from scrapy_playwright_demo.sinks.base import PageSink
+from scrapy_playwright_demo.sinks.spool import SpoolingSink
+
+FAST_RETRY = RetryPolicy(max_retries=0, backoff_base=2, backoff_cap=0.01, jitter=0, retry_http_codes=set(),
+                         retry_exceptions=())
+
+ITEMS = [{"page": 1, "title": "Zapatilla ñ", "link": "https://x/1"}]
+
+
+class RecordingSink(PageSink):
+    def __init__(self, gate=None, fail=False):
+        self.pages: list[EncodedPage] = []
+        self.gate = gate
+        self.fail = fail
+        self.closed = False
+
+    def write_page(self, items, page, finished_at, settings):
+        raise AssertionError("a fan-out child only receives encoded pages")
+
+    def write_encoded(self, page, settings):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.fail:
+            raise OSError("bucket unreachable")
+        self.pages.append(page)
+
+    def close(self):
+        self.closed = True
+
+
+def test_page_is_serialized_once_for_every_child(tmp_path):
+    a, b = RecordingSink(), RecordingSink()
+    sink = CompositeSink([("a", a, "fatal"), ("b", b, "fatal"), ("file", FileSink(str(tmp_path), compress=True), "fatal")])
+    sink.write_page(ITEMS, "1", "2024-01-01T00:00:00", {})
+    sink.close()
+    assert a.pages[0].payload is b.pages[0].payload
+    assert a.pages[0].items() == ITEMS
+    assert gzip.decompress((tmp_path / "page-1.jl.gz").read_bytes()) == a.pages[0].payload
+    assert a.closed and b.closed
+    assert sink.completed_pages({}) == set()  # the recording children hold nothing durable
+
+
+def test_slow_logged_sink_never_stalls_the_others(tmp_path):
+    gate = threading.Event()
+    slow, fast = RecordingSink(gate=gate), FakeSink()
+    sink = CompositeSink([("fast", fast, "fatal"), ("s3", slow, "log")], queue_size=2)
+    started = time.monotonic()
+    for page in range(1, 7):
+        sink.write_page(ITEMS, str(page), "t", {})
+    assert time.monotonic() - started < 1
+    assert set(fast.pages) == {str(p) for p in range(1, 7)}
+
+    gate.set()
+    sink.close()
+    stats = sink.stats()
+    assert stats["sink/s3/written"] + stats["sink/s3/dropped"] == 6 and stats["sink/s3/dropped"] >= 3
+    assert stats["sink/fast/written"] == 6 and stats["sink/s3/queue_max"] <= 2
+
+
+def test_failure_policy_and_stats_reach_the_crawl(tmp_path):
+    broken = CompositeSink([("file", FakeSink(), "fatal"), ("s3", RecordingSink(fail=True), "fatal")])
+    with pytest.raises(RuntimeError, match="sink s3 failed to write page 1"):
+        broken.write_page(ITEMS, "1", "t", {})
+
+    sink = build_sink({"PAGE_SINK": "file,kafka", "PAGE_OUT_DIR": str(tmp_path), "PAGE_COMPRESS": False,
+                       "PAGE_SINK_POLICIES": "kafka=log"})
+    assert [(c.name, c.policy) for c in sink.children] == [("file", "fatal"), ("kafka", "log")]
+    sink.children[1].sink = RecordingSink(fail=True)  # no broker here
+
+    class Stats(dict):
+        def set_value(self, key, value):
+            self[key] = value
+
+    pipe = PerPageSinkPipeline(sink)
+    pipe.stats = Stats()
+    pipe.process_item(dict(ITEMS[0]), None)
+    pipe.close_spider(None)  # the kafka failure is only logged; the file still lands
+    assert json.loads((tmp_path / "page-1.jl").read_text()) == ITEMS[0]
+    assert pipe.stats["sink/file/written"] == 1 and pipe.stats["sink/kafka/failed"] == 1
+    assert sink.completed_pages({}) == {"1"}
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_spool_absorbs_a_remote_outage_and_delivers_in_order(tmp_path):
+    remote = RecordingSink(fail=True)
+    sink = SpoolingSink(remote, tmp_path, name="kafka", policy=FAST_RETRY, segment_bytes=1, fsync=False)
+    for page in ("1", "2", "3"):
+        sink.write_page(ITEMS, page, "t", {})  # returns once on local disk
+    assert wait_for(lambda: sink.delivery_failures >= 2)
+    assert sink.completed_pages({}) == {"1", "2", "3"}
+
+    remote.fail = False
+    assert wait_for(lambda: sink.log.backlog == 0)
+    sink.close()
+    assert [p.page for p in remote.pages] == ["1", "2", "3"] and remote.pages[0].items() == ITEMS
+    assert len(list(tmp_path.glob("spool-*.log"))) == 1  # acknowledged segments are gone
+    assert sink.stats()["spool/kafka/delivered"] == 3
+
+
+def test_spool_replays_undelivered_pages_after_a_crash(tmp_path):
+    down = SpoolingSink(RecordingSink(fail=True), tmp_path, policy=FAST_RETRY, fsync=False, drain_timeout_s=0)
+    down.write_page(ITEMS, "1", "t", {})
+    down.write_page(ITEMS, "2", "t", {})
+    down.close()
+    segment = next(tmp_path.glob("spool-*.log"))
+    size = segment.stat().st_size
+    with open(segment, "ab") as f:
+        f.write(b"SPL1\x00\x00")  # torn append
+
+    remote = RecordingSink()
+    sink = build_sink({"PAGE_SINK": "file,s3", "PAGE_OUT_DIR": str(tmp_path / "out"), "PAGE_SPOOL_DIR": str(tmp_path / "spools")})
+    assert isinstance(sink.children[1].sink, SpoolingSink)
+    sink = SpoolingSink(remote, tmp_path, policy=FAST_RETRY, fsync=False)
+    assert segment.stat().st_size == size and sink.log.backlog == 2
+    sink.open({})
+    assert wait_for(lambda: len(remote.pages) == 2)
+    sink.close()
+    assert [p.page for p in remote.pages] == ["1", "2"]
+
+
+def test_spool_close_does_not_wait_for_a_hung_remote(tmp_path):
+    gate = threading.Event()  # never set: the remote write hangs
+    remote = RecordingSink(gate=gate)
+    sink = SpoolingSink(remote, tmp_path, policy=FAST_RETRY, fsync=False, drain_timeout_s=0.1)
+    sink.write_page(ITEMS, "1", "t", {})
+    started = time.monotonic()
+    sink.close()
+    assert time.monotonic() - started < 3
+    assert remote.closed and sink.log.backlog == 1  # replayed by the next run
+
+    gate.set()  # let the abandoned daemon thread finish
@@ -0,0 +1,113 @@
+import gzip
+import tracemalloc
+from datetime import UTC, datetime, timedelta
+
+from scrapy.http import Request, Response, TextResponse
+from scrapy.utils.test import get_crawler
+
+from scrapy_playwright_demo.frontier import FRONTIER_META
+from scrapy_playwright_demo.items import PageDone
+from scrapy_playwright_demo.sitemaps import SitemapEntry, SitemapFilter, change_priority, iter_sitemap, parse_lastmod
+from scrapy_playwright_demo.spiders.detail import ProductDetailSpider
+from scrapy_playwright_demo.spiders.zalando import ZalandoSpider
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+NOW = datetime.now(UTC)
+
+
+def urlset(urls):
+    rows = "".join(
+        f"<url><loc>{loc}</loc>{f'<lastmod>{lastmod}</lastmod>' if lastmod else ''}</url>" for loc, lastmod in urls
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset {NS}>{rows}</urlset>'.encode()
+
+
+def index(locs):
+    rows = "".join(f"<sitemap><loc>{loc}</loc><lastmod>{lastmod}</lastmod></sitemap>" for loc, lastmod in locs)
+    return f"<sitemapindex {NS}>{rows}</sitemapindex>".encode()
+
+
+def test_streams_gzip_sitemaps_in_small_chunks():
+    body = gzip.compress(urlset([("https://x/a.html", "2024-05-01"), ("https://x/cat/", "2024-05-02T10:00:00Z")]))
+    entries = list(iter_sitemap(body, chunk_size=7))
+    assert entries == [
+        SitemapEntry("url", "https://x/a.html", datetime(2024, 5, 1, tzinfo=UTC)),
+        SitemapEntry("url", "https://x/cat/", datetime(2024, 5, 2, 10, tzinfo=UTC)),
+    ]
+    assert [e.kind for e in iter_sitemap(index([("https://x/s1.xml.gz", "2024-01-01")]))] == ["sitemap"]
+
+
+def test_memory_stays_flat_on_a_large_sitemap():
+    body = gzip.compress(urlset([(f"https://x/product-{i}.html", "2024-05-01") for i in range(50_000)]))
+    tracemalloc.start()
+    count = sum(1 for _ in iter_sitemap(body))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert count == 50_000
+    assert peak < 2 * 1024 * 1024  # the decompressed document alone is ~4 MB
+
+
+def test_filter_by_pattern_and_lastmod():
+    since = datetime(2024, 5, 1, tzinfo=UTC)
+    f = SitemapFilter([r"/[a-z-]+/$"], [r"\.html$"], since=since)
+    assert f.classify(SitemapEntry("url", "https://x/shoe.html", since)) == "product"
+    assert f.classify(SitemapEntry("url", "https://x/sneakers/", None)) == "category"  # unknown lastmod: kept
+    assert f.classify(SitemapEntry("url", "https://x/shoe.html", since - timedelta(days=1))) is None
+    assert not f.fresh(SitemapEntry("sitemap", "https://x/old.xml", since - timedelta(days=1)))
+    assert parse_lastmod("garbage") is None
+    assert [change_priority(NOW - timedelta(days=d), NOW) for d in (0, 3, 20, 90)] == [3, 2, 1, 0]
+    assert change_priority(None, NOW) == 0
+
+
+def crawl_spider(cls, tmp_path, settings=None, **kwargs):
+    crawler = get_crawler(cls, {"SITEMAP_STATE_PATH": str(tmp_path / "state-{spider}.json"), **(settings or {})})
+    spider = crawler._create_spider(discovery="sitemap", **kwargs)
+    return spider, crawler
+
+
+def response(url, body, cls=Response):
+    return cls(url, body=body, request=Request(url))
+
+
+def test_listing_spider_follows_fresh_sitemaps_and_categories_newest_first(tmp_path):
+    spider, crawler = crawl_spider(ZalandoSpider, tmp_path, since="2024-05-01")
+    (robots,) = spider.start_requests()
+    assert robots.url == "https://www.zalando.es/robots.txt" and robots.priority == 100
+
+    (child,) = spider.parse_sitemap(response(robots.url, b"User-agent: *\nSitemap: https://www.zalando.es/s.xml\n", TextResponse))
+    assert child.url == "https://www.zalando.es/s.xml"
+    listed = index([("https://www.zalando.es/new.xml.gz", "2024-06-01"), ("https://www.zalando.es/old.xml.gz", "2023-01-01")])
+    assert [r.url for r in spider.parse_sitemap(response(child.url, listed))] == ["https://www.zalando.es/new.xml.gz"]
+
+    today = NOW.date().isoformat()
+    body = gzip.compress(urlset([
+        ("https://www.zalando.es/zapatillas-hombre/", today),
+        ("https://www.zalando.es/shoe-a11.html", today),
+        ("https://www.zalando.es/botas-hombre/", "2024-05-02"),
+        ("https://www.zalando.es/sandalias/", "2023-12-31"),
+    ]))
+    requests = list(spider.parse_sitemap(response("https://www.zalando.es/new.xml.gz", body)))
+    assert [(r.url, r.priority) for r in requests] == [
+        ("https://www.zalando.es/zapatillas-hombre/", 3),
+        ("https://www.zalando.es/botas-hombre/", 0),
+    ]
+    assert all(r.meta["playwright"] and r.meta[FRONTIER_META] for r in requests)
+    assert crawler.stats.get_value("sitemap/urls/product") == 1
+    assert crawler.stats.get_value("sitemap/sitemaps_unchanged") == 1
+
+    spider.closed("finished")
+    again, _ = crawl_spider(ZalandoSpider, tmp_path, since="last")
+    list(again.start_requests())
+    assert again._sitemap_filter.since == spider._sitemap_started_at
+
+
+def test_detail_spider_turns_sitemap_batches_into_sink_pages(tmp_path):
+    spider, _ = crawl_spider(ProductDetailSpider, tmp_path, {"SITEMAP_URLS": ["https://x/sitemap.xml"], "SITEMAP_BATCH_SIZE": 2})
+    assert [r.url for r in spider.start_requests()] == ["https://x/sitemap.xml"]
+
+    body = urlset([("https://x/a.html", None), ("https://x/cat/", None), ("https://x/b.html", None), ("https://x/c.html", None)])
+    out = list(spider.parse_sitemap(response("https://x/sitemap.xml", body)))
+    assert [(r.url, r.meta["detail"]["page"]) for r in out] == [
+        ("https://x/a.html", 1), ("https://x/b.html", 2), ("https://x/c.html", 2),
+    ]
+    assert not any(isinstance(o, PageDone) for o in out)
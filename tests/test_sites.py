@@ -0,0 +1,92 @@
+import pytest
+from scrapy.http import HtmlResponse
+from scrapy.crawler import Crawler
+from scrapy.settings import Settings
+
+from scrapy_playwright_demo.bench.catalog import CatalogConfig, render_listing
+from scrapy_playwright_demo.config import AppSettings
+from scrapy_playwright_demo.container import Container
+from scrapy_playwright_demo.items import MinorUnitProductItem
+from scrapy_playwright_demo.sites import get_site, load_sites
+from scrapy_playwright_demo.spiders.sites import SiteListingSpider
+from scrapy_playwright_demo.spiders.zalando import ZalandoSpider
+
+US_PROFILE = """
+name = "shop-us"
+domains = ["shop.example.com"]
+start_urls = ["https://shop.example.com/sneakers"]
+currency = "USD"
+
+[cards]
+selector = "li.product"
+link = "./a/@href"
+title = "./h2//text()"
+
+[prices]
+selector = ".//span[@class='price']/text()"
+thousands = ","
+decimal = "."
+
+[pagination]
+param = "page"
+next = ["a.next::attr(href)"]
+"""
+
+US_PAGE = """
+<ul><li class="product"><a href="/p/1"></a><h2>Air <b>Max</b></h2><span class="price">$1,199.95</span>
+<span class="price">$999.00</span></li><li class="product"><h2>no link</h2></li></ul>
+<nav><span>Page 2 of 3</span></nav>
+"""
+
+
+def response(url, html):
+    return HtmlResponse(url, body=html.encode("utf-8"), encoding="utf-8")
+
+
+def test_builtin_profile_matches_the_hand_written_spider():
+    site = get_site("zalando-es")
+    page = response("https://www.zalando.es/zapatillas-hombre/?p=1",
+                    render_listing(CatalogConfig(pages=3, cards_per_page=6, lazy_cards=0), 1, True))
+    fields = {"scraped_at"}
+    assert [i.model_dump(exclude=fields) for i in site.products(page, 1)] == [
+        i.model_dump(exclude=fields) for i in ZalandoSpider()._extract_products(page, 1)
+    ]
+    assert site.next_page_href(page) == "?p=2" and site.total_pages(page) == 3
+    assert site.request_meta()["playwright_page_methods"][0].args == ("button[data-testid='uc-accept-all-button']",)
+    assert "playwright_page_methods" not in site.request_meta(first=False)
+
+
+def test_profiles_from_a_directory_are_validated_and_compiled(tmp_path):
+    (tmp_path / "us.toml").write_text(US_PROFILE)
+    site = load_sites(tmp_path)["shop-us"]
+    assert set(load_sites(tmp_path)) == {"zalando-es", "shop-us"}
+    page = response("https://shop.example.com/sneakers?page=2", US_PAGE)
+    [item] = site.products(page, 2, MinorUnitProductItem)
+    assert (item.title, item.link) == ("Air Max", "https://shop.example.com/p/1")
+    assert (item.price_discounted, item.price_original, item.currency.value) == (99900, 119995, "USD")
+    assert site.next_page_href(page) is None and site.page_url(page.url, 3).endswith("?page=3")
+
+    (tmp_path / "bad.toml").write_text(US_PROFILE.replace('name = "shop-us"', 'name = "bad"\ncolour = "red"'))
+    with pytest.raises(ValueError, match="bad.toml"):
+        load_sites(tmp_path)
+    (tmp_path / "bad.toml").write_text(US_PROFILE.replace('"li.product"', '"li[["').replace("shop-us", "bad"))
+    with pytest.raises(ValueError, match="site profile 'bad'"):
+        load_sites(tmp_path)
+
+
+def test_spider_takes_its_site_paths_and_requests_from_the_profile(tmp_path):
+    # As after `-s PAGE_OUT_DIR=...`, before the crawl freezes the settings
+    crawler = Crawler(SiteListingSpider, Settings({
+        "CONTAINER": Container(AppSettings(page_out_dir=str(tmp_path / "products"))),
+        "PAGE_OUT_DIR": str(tmp_path / "{site}"),
+    }, priority="cmdline"))
+    spider = SiteListingSpider.from_crawler(crawler, site="zalando-es")
+    assert crawler.settings.get("PAGE_OUT_DIR") == str(tmp_path / "zalando-es")
+    # What PerPageSinkPipeline writes to, not just the setting
+    sink = crawler.settings["CONTAINER"].page_sink(crawler.settings)
+    assert sink._resolve_config(crawler.settings)[0] == str(tmp_path / "zalando-es")
+    [request] = list(spider.start_requests())
+    assert request.url == "https://www.zalando.es/zapatillas-hombre/" and request.meta["playwright"]
+    assert spider._page_number("https://www.zalando.es/x/?p=4") == 4
+    with pytest.raises(ValueError, match="Unknown site profile"):
+        SiteListingSpider.from_crawler(Crawler(SiteListingSpider), site="nope")
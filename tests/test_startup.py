@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+
+from scrapy.utils.test import get_crawler
+
+from scrapy_playwright_demo import bootstrap
+from scrapy_playwright_demo.extensions.observability import ObservabilityExtension
+
+# Generous enough for a cold CI box; the eager bootstrap blew it by starting
+# threads and importing every integration, not by a few milliseconds.
+IMPORT_BUDGET_S = 1.5
+
+_PROBE = """
+import json, sys, threading, time
+import scrapy  # a crawler process has already paid for Scrapy itself
+t0 = time.perf_counter()
+import scrapy_playwright_demo.settings
+elapsed = time.perf_counter() - t0
+from scrapy_playwright_demo import config
+print(json.dumps({
+    "elapsed": elapsed,
+    "modules": [m for m in ("sentry_sdk", "playwright", "scrapy_playwright", "psutil", "numpy") if m in sys.modules],
+    "threads": [t.name for t in threading.enumerate() if t is not threading.main_thread()],
+    "settings_resolved": config.get_app_settings.cache_info().currsize,
+    "bootstrapped": sys.modules["scrapy_playwright_demo.bootstrap"]._configured
+        if "scrapy_playwright_demo.bootstrap" in sys.modules else False,
+}))
+"""
+
+
+def test_settings_import_is_lazy_and_within_budget():
+    out = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True, check=True)
+    probe = json.loads(out.stdout.strip().splitlines()[-1])
+    assert probe["modules"] == []
+    assert probe["threads"] == []
+    assert probe["bootstrapped"] is False
+    assert probe["settings_resolved"] == 1
+    assert probe["elapsed"] < IMPORT_BUDGET_S, f"settings import took {probe['elapsed']:.2f}s"
+
+
+def test_bootstrap_runs_once_per_process(monkeypatch):
+    calls = []
+    monkeypatch.setattr(bootstrap, "_configured", False)
+    monkeypatch.setattr(bootstrap, "_integrations_started", False)
+    monkeypatch.setattr(bootstrap, "_init_structlog", lambda s: calls.append("logging"))
+    monkeypatch.setattr(bootstrap, "_init_sentry", lambda dsn: calls.append("sentry"))
+    monkeypatch.setattr(bootstrap, "_start_prometheus", lambda port: calls.append("prometheus"))
+
+    first = ObservabilityExtension.from_crawler(get_crawler())
+    ObservabilityExtension.from_crawler(get_crawler())
+    assert calls == ["logging"]  # integrations wait for a spider
+
+    first.spider_opened(spider=None)
+    first.spider_opened(spider=None)
+    assert calls == ["logging", "sentry", "prometheus"]
@@ -1,6 +1,7 @@
 import pytest
 from decimal import Decimal
 from scrapy.selector import Selector
+from scrapy_playwright_demo import money
 from scrapy_playwright_demo.spiders.zalando import ZalandoSpider
 from scrapy_playwright_demo.spiders.base import PlaywrightListingSpider
 
@@ -18,6 +19,17 @@ def test_extract_prices(html, expected):
     sel = Selector(text=f"<div>{html}</div>")
     result = ZalandoSpider._extract_prices(sel)
     assert result == expected
+    # MONEY_MODE=minor: the same prices as int cents, parsed without Decimal
+    assert ZalandoSpider._extract_prices(sel, minor=True) == [int(p * 100) for p in expected]
+    assert money.parse_es("99,9") == 9990 and money.parse_es("12") == 1200
+
+
+@pytest.mark.parametrize("cents", [0, 5, 99, 1990, 119995, -1250])
+def test_money_round_trips_exactly(cents):
+    assert money.format_minor(cents) == str(money.from_minor(cents))
+    assert money.to_minor(money.format_minor(cents)) == cents
+    with pytest.raises(ValueError):
+        money.to_minor(money.format_minor(cents) + "1")  # a third decimal is never rounded away
 
 @pytest.mark.parametrize(
     "url,expected",